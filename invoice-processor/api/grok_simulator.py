@@ -0,0 +1,739 @@
+"""
+Grok Simulator
+==============
+Offline, OpenAI-compatible stand-in for the xAI API, for load tests and
+benchmarks that should not cost money or depend on network variance.
+
+Point the client at it (the grok backend is used unchanged):
+    python run_simulator.py
+    GROK_BASE_URL=http://localhost:8010/v1 XAI_API_KEY=sim python main.py
+
+Endpoints:
+- POST /v1/chat/completions  → Chat completions (json_object, streaming + usage)
+- GET  /v1/models            → Model list
+- POST /v1/files             → Upload a batch input file (JSONL)
+- GET  /v1/files/{id}/content → Download a file (batch output / errors)
+- POST /v1/batches           → Start a batch of chat completions
+- GET  /v1/batches/{id}      → Batch status and request counts
+- POST /v1/batches/{id}/cancel → Cancel a running batch
+- GET  /sim/config           → Current latency/error settings
+- POST /sim/config           → Change settings at runtime (partial update)
+- GET  /sim/stats            → Requests served, errors injected
+
+Replies are deterministic: the five sample invoices in data/invoices get
+fixed extractions, other invoices a rule-based one (targeted field
+re-extraction answers the requested subset, packed requests one
+extraction per invoice, compact-schema prompts the same extraction in
+compact form). Inventory matching,
+validation reasoning and rejection analysis are answered with rules that
+mirror the prompts.
+
+Latency = time to first token (lognormal around GROK_SIM_LATENCY_MS, plus
+prefill of the uncached prompt) + completion tokens /
+GROK_SIM_TOKENS_PER_SECOND. Streams are paced the same way, chunk by chunk.
+
+Batches wait GROK_SIM_BATCH_QUEUE_MS in the queue, then run their requests
+GROK_SIM_BATCH_CONCURRENCY at a time, each with the latency above; injected
+errors land in the batch's error file.
+
+Prompt caching is emulated like the real API: prompts are hashed in
+fixed-size blocks, and leading blocks already seen are reported as
+usage.prompt_tokens_details.cached_tokens (and skip prefill time).
+
+Configuration (environment, read at startup):
+- GROK_SIM_LATENCY_MS          median time to first token (default 400)
+- GROK_SIM_LATENCY_SIGMA       lognormal spread; 0 = constant (default 0.5)
+- GROK_SIM_TOKENS_PER_SECOND   completion speed (default 250)
+- GROK_SIM_PREFILL_TOKENS_PER_SECOND  prompt processing speed (default 5000)
+- GROK_SIM_PROMPT_CACHE        emulate prefix caching (default 1)
+- GROK_SIM_ERROR_RATE          share of requests answered with an error (default 0)
+- GROK_SIM_ERROR_STATUS        status for injected errors: 429, 500, 503 (default 503)
+- GROK_SIM_TIMEOUT_RATE        share of requests that hang for GROK_SIM_TIMEOUT_SECONDS
+- GROK_SIM_BATCH_CONCURRENCY   requests a batch runs in parallel (default 64)
+- GROK_SIM_BATCH_QUEUE_MS      time a new batch waits before it starts (default 1000)
+- GROK_SIM_SEED                random seed for latency and error draws (default 42)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from src.tools.compact_schema import compact_extraction
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+config = {
+    "latency_ms": float(os.environ.get("GROK_SIM_LATENCY_MS", "400")),
+    "latency_sigma": float(os.environ.get("GROK_SIM_LATENCY_SIGMA", "0.5")),
+    "tokens_per_second": float(os.environ.get("GROK_SIM_TOKENS_PER_SECOND", "250")),
+    "prefill_tokens_per_second": float(os.environ.get("GROK_SIM_PREFILL_TOKENS_PER_SECOND", "5000")),
+    "prompt_cache": os.environ.get("GROK_SIM_PROMPT_CACHE", "1").lower() not in ("0", "false", "no"),
+    "error_rate": float(os.environ.get("GROK_SIM_ERROR_RATE", "0")),
+    "error_status": int(os.environ.get("GROK_SIM_ERROR_STATUS", "503")),
+    "timeout_rate": float(os.environ.get("GROK_SIM_TIMEOUT_RATE", "0")),
+    "timeout_seconds": float(os.environ.get("GROK_SIM_TIMEOUT_SECONDS", "120")),
+    "batch_concurrency": int(os.environ.get("GROK_SIM_BATCH_CONCURRENCY", "64")),
+    "batch_queue_ms": float(os.environ.get("GROK_SIM_BATCH_QUEUE_MS", "1000")),
+    "chunk_chars": 24,
+}
+
+rng = random.Random(int(os.environ.get("GROK_SIM_SEED", "42")))
+
+stats = {
+    "requests": 0, "streamed": 0, "errors_injected": 0, "timeouts_injected": 0,
+    "prompt_tokens": 0, "cached_prompt_tokens": 0,
+    "batches": 0, "batch_requests": 0,
+}
+
+# Prompt cache emulation: cumulative hashes of leading prompt blocks
+PROMPT_CACHE_BLOCK_CHARS = 256
+PROMPT_CACHE_MAX_BLOCKS = 100_000
+_prompt_blocks: OrderedDict[str, None] = OrderedDict()
+
+
+# =============================================================================
+# SAMPLE INVOICE EXTRACTIONS
+# =============================================================================
+
+def _contact(name=None, address=None, email=None, phone=None) -> dict:
+    return {"name": name, "address": address, "email": email, "phone": phone}
+
+
+def _item(description, quantity, unit_price, sku=None) -> dict:
+    return {
+        "sku": sku,
+        "description": description,
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "amount": round(quantity * unit_price, 2),
+    }
+
+
+# Marker text unique to each sample (searched in the user message only; the
+# system prompt's few-shot examples reuse some of these names)
+SAMPLE_EXTRACTIONS = {
+    # data/invoices/invoice1.txt
+    "Widgets Inc.": {
+        "invoice_number": "INV-2026-0042", "invoice_date": "2026-01-26", "due_date": "2026-02-25",
+        "amount": 5000.0, "subtotal": 5000.0, "tax": 0.0, "currency": "USD",
+        "payment_terms": "Net 30", "po_number": "PO-2025-0892", "vendor": "Widgets Inc.",
+        "bill_from": _contact("Widgets Inc.", "500 Widget Way, Austin, TX 78701", "ar@widgets.com", "(512) 555-9876"),
+        "bill_to": {"name": "TechCorp Inc.", "address": "100 Tech Plaza, San Francisco, CA 94105", "entity": None},
+        "items": [_item("WidgetA", 10, 300.0, "WidgetA"), _item("WidgetB", 5, 400.0, "WidgetB")],
+        "confidence": 97, "flags": [],
+    },
+    # data/invoices/invoice2.txt
+    "Vndr: Gadgets Co.": {
+        "invoice_number": "UNKNOWN", "invoice_date": None, "due_date": "2026-01-30",
+        "amount": 15000.0, "subtotal": 15000.0, "tax": 0.0, "currency": "USD",
+        "payment_terms": "Net 20", "po_number": None, "vendor": "Gadgets Co.",
+        "bill_from": _contact("Gadgets Co.", "200 Gadget Lane, Seattle, WA 98101", "invoices@gadgets.co", "(206) 555-4321"),
+        "bill_to": {"name": None, "address": None, "entity": None},
+        "items": [_item("GadgetX", 20, 750.0)],
+        "confidence": 70, "flags": ["missing_invoice_number", "missing_invoice_date", "missing_bill_to"],
+    },
+    # data/invoices/invoice3.txt
+    "Fraudster LLC": {
+        "invoice_number": "UNKNOWN", "invoice_date": None, "due_date": None,
+        "amount": 100000.0, "subtotal": 100000.0, "tax": 0.0, "currency": "USD",
+        "payment_terms": None, "po_number": None, "vendor": "Fraudster LLC",
+        "bill_from": _contact("Fraudster LLC"),
+        "bill_to": {"name": None, "address": None, "entity": None},
+        "items": [_item("FakeItem", 100, 1000.0)],
+        "confidence": 40,
+        "flags": ["missing_invoice_number", "unusually_high_amount", "unparseable_date",
+                  "suspicious_vendor_name", "missing_bill_to"],
+    },
+    # data/invoices/sample_invoice.pdf
+    "INV-2026-0147": {
+        "invoice_number": "INV-2026-0147", "invoice_date": "2026-01-27", "due_date": "2026-02-26",
+        "amount": 6738.56, "subtotal": 6225.0, "tax": 513.56, "currency": "USD",
+        "payment_terms": "Net 30", "po_number": "PO-2026-0892", "vendor": "TechSupply Inc.",
+        "bill_from": _contact(
+            "TechSupply Inc.", "123 Technology Drive, Suite 400, San Francisco, CA 94105",
+            "billing@techsupply.com", "(415) 555-1234",
+        ),
+        "bill_to": {"name": "Acme Corporation", "address": "500 Innovation Way, Austin, TX 78701", "entity": None},
+        "items": [
+            _item("Enterprise Widget Model A7", 10, 300.0, "WIDGET-A7"),
+            _item("Premium Gadget X3 Series", 5, 450.0, "GADGET-X3"),
+            _item("USB-C Cable (6ft, Braided)", 25, 15.0, "CABLE-USB"),
+            _item("65W Power Adapter w/ USB-C PD", 8, 75.0, "ADAPTER-PD"),
+        ],
+        "confidence": 95, "flags": [],
+    },
+    # data/invoices/messy_invoice.pdf
+    "#2026-0223": {
+        "invoice_number": "2026-0223", "invoice_date": "2026-01-27", "due_date": "2026-02-26",
+        "amount": 17500.0, "subtotal": 17500.0, "tax": 0.0, "currency": "USD",
+        "payment_terms": "Net 30", "po_number": None, "vendor": "Gadgets Co.",
+        "bill_from": _contact("Gadgets Co.", "456 Gadget Ave, Denver, CO 80202"),
+        "bill_to": {"name": "SomeCorp LLC", "address": "789 Business Rd, Chicago, IL 60601", "entity": None},
+        "items": [_item("GadgetX", 20, 750.0), _item("GadgetY", 10, 250.0)],
+        "confidence": 88, "flags": [],
+    },
+}
+
+
+def _rule_based_extraction(text: str) -> dict:
+    """Deterministic extraction for invoices that are not samples."""
+    def find(pattern: str) -> Optional[str]:
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        return match.group(1).strip() if match else None
+
+    vendor = find(r"^(?:Vendor|Vndr|From|Bill From|Supplier)\s*:\s*(.+)$") or "UNKNOWN"
+    amount_text = find(r"(?:Total Due|Grand Total|Total|Amount Due|Amount|Amt)\s*:\s*\$?([\d,]+(?:\.\d+)?)")
+    amount = float(amount_text.replace(",", "")) if amount_text else 0.0
+    due = find(r"^Due(?: Date)?\s*:\s*(\d{4}-\d{2}-\d{2})")
+
+    items = []
+    for name, qty in re.findall(r"([A-Za-z][\w-]*)\s*:\s*(\d+)\b", text):
+        if name.lower() not in ("amount", "amt", "total", "due", "tax", "subtotal"):
+            items.append(_item(name, int(qty), 0.0))
+    if len(items) == 1 and amount:
+        items[0]["unit_price"] = round(amount / items[0]["quantity"], 2)
+        items[0]["amount"] = amount
+
+    flags = []
+    if vendor == "UNKNOWN":
+        flags.append("missing_vendor")
+    if not amount:
+        flags.append("missing_amount")
+    if not due:
+        flags.append("unparseable_date")
+
+    return {
+        "invoice_number": find(r"Invoice\s*(?:#|Number:?)\s*([\w-]+)") or "UNKNOWN",
+        "invoice_date": None, "due_date": due,
+        "amount": amount, "subtotal": amount, "tax": 0.0, "currency": "USD",
+        "payment_terms": find(r"Terms\s*:\s*(.+)$"), "po_number": None, "vendor": vendor,
+        "bill_from": _contact(vendor if vendor != "UNKNOWN" else None),
+        "bill_to": {"name": None, "address": None, "entity": None},
+        "items": items,
+        "confidence": max(0, 75 - 20 * len(flags)),
+        "flags": flags,
+    }
+
+
+# =============================================================================
+# RESPONDERS (one per agent prompt)
+# =============================================================================
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _respond_extraction(user: str) -> dict:
+    for marker, extraction in SAMPLE_EXTRACTIONS.items():
+        if marker in user:
+            return extraction
+    text = user.split("\n\n", 1)[-1] if "Extract invoice data" in user else user
+    return _rule_based_extraction(text)
+
+
+def _respond_packed(user: str) -> dict:
+    # Several invoices in one request, each after an "=== INVOICE n ===" line
+    parts = re.split(r"^=== INVOICE (\d+) ===$", user, flags=re.MULTILINE)
+    invoices = []
+    for index, text in zip(parts[1::2], parts[2::2]):
+        invoices.append({"index": int(index), **_respond_extraction(text.strip())})
+    return {"invoices": invoices}
+
+
+def _respond_chunk_items(user: str) -> dict:
+    # Line-item pass over a page group: table rows "Description  Qty  $Price  $Amount"
+    items = []
+    for description, qty, price, _ in re.findall(
+        r"^(\S.*?)\s+(\d+)\s+\$?([\d,]+\.\d{2})\s+\$?([\d,]+\.\d{2})\s*$", user, re.MULTILINE
+    ):
+        items.append(_item(description, int(qty), float(price.replace(",", ""))))
+    return {"items": items}
+
+
+def _respond_fields(user: str) -> dict:
+    # Targeted self-correction: answer only the requested fields
+    fields = re.findall(r'^- "(\w+)":', user, re.MULTILINE)
+    full = _respond_extraction(user)
+    reply = {field: full.get(field) for field in fields}
+    for field, value in reply.items():
+        if value in ("UNKNOWN", 0.0) and field != "tax":
+            reply[field] = None
+    reply["confidence"] = full.get("confidence", 0)
+    return reply
+
+
+def _respond_matching(user: str) -> dict:
+    invoice_items = re.findall(r'^- "(.*)"$', user, re.MULTILINE)
+    inventory = re.findall(r"^- (.+?) \(\d+ in stock\)$", user, re.MULTILINE)
+
+    matches = []
+    for item in invoice_items:
+        key = _normalize(re.sub(r"\(.*?\)", "", item))
+        best, confidence = None, 0.0
+        for candidate in inventory:
+            candidate_key = _normalize(candidate)
+            if candidate_key == _normalize(item):
+                best, confidence = candidate, 1.0
+                break
+            if candidate_key and (candidate_key in key or key in candidate_key):
+                best, confidence = candidate, 0.85
+        matches.append({
+            "invoice_item": item,
+            "matched_inventory": best,
+            "confidence": confidence,
+            "match_reason": "Normalized names match" if best else "No similar item found in inventory",
+        })
+    return {"matches": matches}
+
+
+def _respond_validation(user: str) -> dict:
+    errors, warnings = [], []
+    for line in user.splitlines():
+        line = line.strip()
+        if "NO MATCH IN INVENTORY" in line:
+            errors.append(f"INVENTORY: {line[2:].split(':')[0]} — not found in inventory")
+        elif "INSUFFICIENT" in line:
+            errors.append(f"INVENTORY: {line[2:].split(':')[0]} — insufficient stock")
+    if "null (missing)" in user:
+        errors.append("DUE_DATE: Missing or invalid due date")
+    if re.search(r"- Vendor: (UNKNOWN)?\s*$", user, re.MULTILINE):
+        errors.append("VENDOR: Missing or unknown vendor")
+    amount = re.search(r"- Amount: \$([\d,]+\.\d{2})", user)
+    if amount:
+        value = float(amount.group(1).replace(",", ""))
+        if value <= 0:
+            errors.append(f"AMOUNT: Invalid amount (${value:,.2f})")
+        elif value > 10000:
+            warnings.append(f"AMOUNT: High-value invoice (${value:,.2f}) — requires VP approval")
+    return {"is_valid": not errors, "errors": errors, "warnings": warnings}
+
+
+def _respond_rejection(user: str) -> dict:
+    vendor = re.search(r"- Vendor: (.*)", user)
+    reason = re.search(r"- Reason: (.*)", user)
+    flags = re.search(r"- Red Flags: (.*)", user)
+    factors = [f.strip() for f in flags.group(1).split(",")] if flags and flags.group(1) != "None" else []
+    return {
+        "title": f"Payment blocked: {vendor.group(1) if vendor else 'Unknown'}"[:50],
+        "description": f"Payment was blocked. {reason.group(1) if reason else ''}".strip(),
+        "details": {
+            "primary_reason": reason.group(1) if reason else "Invoice not approved",
+            "contributing_factors": factors,
+            "recommendation": "Review the invoice and vendor before resubmitting",
+        },
+        "severity": "critical" if factors else "medium",
+    }
+
+
+def respond(messages: list, json_mode: bool) -> str:
+    """Deterministic reply content for a chat request."""
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    # The first user turn carries the data; later turns are follow-up hints
+    user = next((str(m.get("content", "")) for m in messages if m.get("role") == "user"), "")
+
+    if system.startswith("You are an invoice data extraction system"):
+        if re.search(r"^=== INVOICE \d+ ===$", user, re.MULTILINE):
+            reply = _respond_packed(user)
+        elif "Header and Totals Only" in system:
+            reply = {**_respond_extraction(user), "items": []}
+        else:
+            reply = _respond_extraction(user)
+        if "## Compact Output" in system:
+            reply = compact_extraction(reply)
+    elif system.startswith("You extract the line items"):
+        reply = _respond_chunk_items(user)
+    elif system.startswith("You fill in invoice fields"):
+        reply = _respond_fields(user)
+    elif system.startswith("You are an inventory matching system"):
+        reply = _respond_matching(user)
+    elif system.startswith("You are an invoice validation system"):
+        reply = _respond_validation(user)
+    elif system.startswith("You are an AP audit system"):
+        reply = _respond_rejection(user)
+    elif json_mode:
+        reply = {}
+    else:
+        quoted = re.search(r"exactly: '(.+)'", user)
+        return quoted.group(1) if quoted else "OK"
+    return json.dumps(reply)
+
+
+# =============================================================================
+# LATENCY AND ERRORS
+# =============================================================================
+
+def _count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _cached_prompt_tokens(messages: list) -> int:
+    """Tokens of the prompt's leading blocks seen in earlier requests (then remember this prompt)."""
+    if not config["prompt_cache"]:
+        return 0
+    text = "".join(f"{m.get('role')}\x00{m.get('content')}\x01" for m in messages)
+    digest = hashlib.sha256()
+    cached_chars = 0
+    hit = True
+    for start in range(0, len(text) - PROMPT_CACHE_BLOCK_CHARS + 1, PROMPT_CACHE_BLOCK_CHARS):
+        digest.update(text[start:start + PROMPT_CACHE_BLOCK_CHARS].encode("utf-8"))
+        block = digest.hexdigest()
+        if hit and block in _prompt_blocks:
+            _prompt_blocks.move_to_end(block)
+            cached_chars += PROMPT_CACHE_BLOCK_CHARS
+        else:
+            hit = False
+            _prompt_blocks[block] = None
+    while len(_prompt_blocks) > PROMPT_CACHE_MAX_BLOCKS:
+        _prompt_blocks.popitem(last=False)
+    return cached_chars // 4
+
+
+def _first_token_delay(uncached_prompt_tokens: int = 0) -> float:
+    median = config["latency_ms"] / 1000
+    prefill = uncached_prompt_tokens / config["prefill_tokens_per_second"]
+    if config["latency_sigma"] <= 0:
+        return median + prefill
+    return rng.lognormvariate(0, config["latency_sigma"]) * median + prefill
+
+
+def _injected_error() -> Optional[JSONResponse]:
+    roll = rng.random()
+    if roll >= config["error_rate"]:
+        return None
+    stats["errors_injected"] += 1
+    status = config["error_status"]
+    headers = {"retry-after": "1"} if status == 429 else None
+    return JSONResponse(
+        status_code=status,
+        headers=headers,
+        content={"error": {
+            "message": f"Simulated error ({status})",
+            "type": "rate_limit_error" if status == 429 else "server_error",
+            "code": status,
+        }},
+    )
+
+
+# =============================================================================
+# API
+# =============================================================================
+
+app = FastAPI(title="Grok Simulator")
+
+
+def _usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> dict:
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+def _prepare(body: dict) -> dict:
+    """Reply content, token counts and time to first token for a request body."""
+    messages = body.get("messages", [])
+    json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+    content = respond(messages, json_mode)
+
+    prompt_tokens = sum(_count_tokens(str(m.get("content", ""))) for m in messages)
+    cached_tokens = min(_cached_prompt_tokens(messages), prompt_tokens)
+    stats["prompt_tokens"] += prompt_tokens
+    stats["cached_prompt_tokens"] += cached_tokens
+    return {
+        "id": f"chatcmpl-sim-{uuid.uuid4().hex[:12]}",
+        "created": int(time.time()),
+        "model": body.get("model", "grok-sim"),
+        "content": content,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": _count_tokens(content),
+        "first_token": _first_token_delay(prompt_tokens - cached_tokens),
+    }
+
+
+def _completion(reply: dict) -> dict:
+    """ChatCompletion body for a prepared reply."""
+    return {
+        "id": reply["id"],
+        "object": "chat.completion",
+        "created": reply["created"],
+        "model": reply["model"],
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply["content"]},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(reply["prompt_tokens"], reply["completion_tokens"], reply["cached_tokens"]),
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if rng.random() < config["timeout_rate"]:
+        stats["timeouts_injected"] += 1
+        await asyncio.sleep(config["timeout_seconds"])
+
+    error = _injected_error()
+    if error is not None:
+        await asyncio.sleep(_first_token_delay() / 4)
+        return error
+
+    reply = _prepare(body)
+    content = reply["content"]
+    model = reply["model"]
+    completion_id = reply["id"]
+    created = reply["created"]
+    first_token = reply["first_token"]
+    prompt_tokens = reply["prompt_tokens"]
+    completion_tokens = reply["completion_tokens"]
+    cached_tokens = reply["cached_tokens"]
+
+    if not body.get("stream"):
+        await asyncio.sleep(first_token + completion_tokens / config["tokens_per_second"])
+        return _completion(reply)
+
+    stats["streamed"] += 1
+    include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+    async def events():
+        def chunk(delta: dict, finish_reason=None, choices=True, usage=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if choices else [],
+            }
+            if usage is not None:
+                payload["usage"] = usage
+            return f"data: {json.dumps(payload)}\n\n"
+
+        await asyncio.sleep(first_token)
+        step = config["chunk_chars"]
+        for i in range(0, len(content), step):
+            delta = {"content": content[i:i + step]}
+            if i == 0:
+                delta["role"] = "assistant"
+            yield chunk(delta)
+            await asyncio.sleep(_count_tokens(delta["content"]) / config["tokens_per_second"])
+        yield chunk({}, finish_reason="stop")
+        if include_usage:
+            yield chunk({}, choices=False, usage=_usage(prompt_tokens, completion_tokens, cached_tokens))
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [
+        {"id": "grok-4-1-fast-reasoning", "object": "model", "owned_by": "grok-simulator"},
+    ]}
+
+
+# =============================================================================
+# BATCH API
+# =============================================================================
+
+_files: dict[str, dict] = {}
+_batches: dict[str, dict] = {}
+_batch_tasks: set = set()
+
+
+def _not_found(kind: str, object_id: str) -> JSONResponse:
+    return JSONResponse(status_code=404, content={"error": {
+        "message": f"No such {kind}: {object_id}", "type": "invalid_request_error", "code": 404,
+    }})
+
+
+def _store_file(data: bytes, filename: str, purpose: str) -> str:
+    file_id = f"file-sim-{uuid.uuid4().hex[:12]}"
+    _files[file_id] = {
+        "id": file_id,
+        "object": "file",
+        "bytes": len(data),
+        "created_at": int(time.time()),
+        "filename": filename,
+        "purpose": purpose,
+        "data": data,
+    }
+    return file_id
+
+
+def _file_object(file_id: str) -> dict:
+    return {key: value for key, value in _files[file_id].items() if key != "data"}
+
+
+def _jsonl(lines: list) -> bytes:
+    return "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+
+
+def _batch_line_error(line: dict, status: int, message: str) -> dict:
+    return {
+        "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+        "custom_id": line.get("custom_id"),
+        "response": {"status_code": status, "body": {"error": {"message": message, "code": status}}},
+        "error": None,
+    }
+
+
+async def _run_batch(batch: dict):
+    """Answer every line of the input file, then write the output/error files."""
+    data = _files[batch["input_file_id"]]["data"].decode("utf-8")
+    lines = [json.loads(raw) for raw in data.splitlines() if raw.strip()]
+    counts = batch["request_counts"]
+    counts["total"] = len(lines)
+
+    await asyncio.sleep(config["batch_queue_ms"] / 1000)
+    if batch["status"] == "validating":
+        batch["status"] = "in_progress"
+        batch["in_progress_at"] = int(time.time())
+
+    semaphore = asyncio.Semaphore(max(1, int(config["batch_concurrency"])))
+    outputs, errors = [], []
+
+    async def answer(line: dict):
+        async with semaphore:
+            if batch["status"] != "in_progress":
+                return
+            stats["batch_requests"] += 1
+            if line.get("url") != "/v1/chat/completions":
+                errors.append(_batch_line_error(line, 400, f"Unsupported url: {line.get('url')}"))
+            elif rng.random() < config["error_rate"]:
+                stats["errors_injected"] += 1
+                status = config["error_status"]
+                errors.append(_batch_line_error(line, status, f"Simulated error ({status})"))
+            else:
+                reply = _prepare(line.get("body") or {})
+                await asyncio.sleep(reply["first_token"] + reply["completion_tokens"] / config["tokens_per_second"])
+                outputs.append({
+                    "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                    "custom_id": line.get("custom_id"),
+                    "response": {"status_code": 200, "request_id": reply["id"], "body": _completion(reply)},
+                    "error": None,
+                })
+                counts["completed"] += 1
+                return
+            counts["failed"] += 1
+
+    await asyncio.gather(*(answer(line) for line in lines))
+
+    if outputs:
+        batch["output_file_id"] = _store_file(_jsonl(outputs), f"{batch['id']}_output.jsonl", "batch_output")
+    if errors:
+        batch["error_file_id"] = _store_file(_jsonl(errors), f"{batch['id']}_errors.jsonl", "batch_output")
+    if batch["status"] == "cancelling":
+        batch["status"] = "cancelled"
+        batch["cancelled_at"] = int(time.time())
+    else:
+        batch["status"] = "completed"
+        batch["completed_at"] = int(time.time())
+
+
+@app.post("/v1/files")
+async def upload_file(request: Request):
+    form = await request.form()
+    upload = form["file"]
+    data = await upload.read()
+    file_id = _store_file(data, upload.filename or "upload.jsonl", str(form.get("purpose", "batch")))
+    return _file_object(file_id)
+
+
+@app.get("/v1/files/{file_id}")
+async def get_file(file_id: str):
+    if file_id not in _files:
+        return _not_found("file", file_id)
+    return _file_object(file_id)
+
+
+@app.get("/v1/files/{file_id}/content")
+async def get_file_content(file_id: str):
+    if file_id not in _files:
+        return _not_found("file", file_id)
+    return Response(content=_files[file_id]["data"], media_type="application/jsonl")
+
+
+@app.post("/v1/batches")
+async def create_batch(body: dict):
+    input_file_id = body.get("input_file_id")
+    if input_file_id not in _files:
+        return _not_found("file", str(input_file_id))
+
+    batch_id = f"batch_sim_{uuid.uuid4().hex[:12]}"
+    batch = _batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": body.get("endpoint", "/v1/chat/completions"),
+        "errors": None,
+        "input_file_id": input_file_id,
+        "completion_window": body.get("completion_window", "24h"),
+        "status": "validating",
+        "output_file_id": None,
+        "error_file_id": None,
+        "created_at": int(time.time()),
+        "in_progress_at": None,
+        "completed_at": None,
+        "cancelled_at": None,
+        "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        "metadata": body.get("metadata"),
+    }
+    stats["batches"] += 1
+
+    # Keep a reference: the event loop only holds tasks weakly
+    task = asyncio.create_task(_run_batch(batch))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+    return batch
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    if batch_id not in _batches:
+        return _not_found("batch", batch_id)
+    return _batches[batch_id]
+
+
+@app.post("/v1/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    if batch_id not in _batches:
+        return _not_found("batch", batch_id)
+    batch = _batches[batch_id]
+    if batch["status"] in ("validating", "in_progress"):
+        batch["status"] = "cancelling"
+    return batch
+
+
+@app.get("/sim/config")
+async def get_config():
+    return config
+
+
+@app.post("/sim/config")
+async def update_config(update: dict):
+    """Change latency/error settings without restarting (unknown keys ignored)."""
+    for key, value in update.items():
+        if key in config:
+            config[key] = type(config[key])(value)
+    return config
+
+
+@app.get("/sim/stats")
+async def get_stats():
+    return stats
@@ -60,10 +60,11 @@ class StageStartEvent(BaseModel):
 
 
 class GrokCallEvent(BaseModel):
-    """Event when Grok API is called."""
+    """Event when Grok API is called (one per tier/model a stage used)."""
     event: Literal["grok_call"] = "grok_call"
     timestamp: float
     stage: str
+    tier: Optional[str] = None  # fast, reasoning (None: GROK_MODEL)
     model: str
     mode: str  # json, text
     temperature: float
@@ -53,12 +53,35 @@ from src.workflow import (
     run_payment_workflow,
 )
 from src.schemas.models import InvoiceStatus, APPROVAL_THRESHOLDS
+from src.agents.approval import duplicate_payment_block
+from src.client import (
+    close_async_client,
+    get_cache_stats,
+    get_rate_limit_metrics,
+    get_single_flight_stats,
+    get_hedge_stats,
+    get_resilience_stats,
+    get_budget_stats,
+    get_routing_stats,
+    get_batch_stats,
+    get_packing_stats,
+    get_chunking_stats,
+    get_speculation_stats,
+)
+from src.tools.invoice_parser import get_fast_path_stats
+from src.tools.extraction_memo import content_hash, find_duplicate, forget_extraction, get_memo_stats
+from src.tools.vendor_templates import get_template_stats
+from src.tools.compact_schema import get_compact_schema_stats
+from src.llm.decoding import get_decoding_stats
+from src.llm.usage import usage_scope
+from src.tools.pdf_pool import get_pdf_pool_stats, shutdown_pool
 from src.tools.database import (
     init_database,
     get_all_vendors,
     get_vendor_by_id,
     lookup_vendor_by_name,
     get_vendor_stats,
+    get_invoice_usage,
 )
 
 
@@ -233,10 +256,14 @@ async def upload_pdf_invoice(file: UploadFile = File(...)):
     The PDF will be saved temporarily and processed through the
     ingestion pipeline to extract invoice data.
     
+    A file whose bytes match an already-extracted upload is flagged as a
+    probable duplicate; processing it reuses that extraction.
+    
     Returns:
         - invoice_id: Generated ID for the invoice
         - filename: Original filename
         - file_path: Path where PDF is stored (for processing)
+        - probable_duplicate / duplicate_of: Earlier invoice with the same content
         
     Session: 2026-01-27_INGEST (Galatiq Committee)
     """
@@ -269,6 +296,11 @@ async def upload_pdf_invoice(file: UploadFile = File(...)):
     with open(file_path, "wb") as f:
         f.write(contents)
     
+    # Same bytes as an earlier upload? (checked only; counted when processed)
+    digest = await asyncio.to_thread(content_hash, contents)
+    memo = await asyncio.to_thread(find_duplicate, digest, touch=False)
+    duplicate_of = memo["invoice_id"] if memo else None
+    
     # Store metadata
     invoice_store[invoice_id] = {
         "id": invoice_id,
@@ -277,6 +309,8 @@ async def upload_pdf_invoice(file: UploadFile = File(...)):
         "source_path": str(file_path),
         "original_filename": file.filename,
         "file_size": len(contents),
+        "content_hash": digest,
+        "duplicate_of": duplicate_of,
         "status": "uploaded",
         "uploaded_at": datetime.utcnow().isoformat(),
         "workflow_state": None,
@@ -288,6 +322,8 @@ async def upload_pdf_invoice(file: UploadFile = File(...)):
         "filename": file.filename,
         "file_path": str(file_path),
         "file_size": len(contents),
+        "probable_duplicate": duplicate_of is not None,
+        "duplicate_of": duplicate_of,
         "status": "uploaded",
         "message": "PDF uploaded successfully. Use WebSocket /ws/process to process it.",
         "next_step": f"Connect to WebSocket and send: {{\"raw_invoice\": \"{file_path}\", \"invoice_id\": \"{invoice_id}\"}}",
@@ -427,8 +463,8 @@ async def route_to_approval(invoice_id: str):
             detail=f"Cannot route to approval - invoice status is '{current_status}', expected 'inbox'"
         )
     
-    # Run approval workflow
-    updated_state = run_approval_workflow(state)
+    # Run approval workflow (off the event loop)
+    updated_state = await asyncio.to_thread(run_approval_workflow, state)
     
     # Update store
     invoice_store[invoice_id]["workflow_state"] = updated_state
@@ -565,8 +601,14 @@ async def execute_payment(invoice_id: str):
             detail=f"Cannot execute payment - invoice status is '{current_status}', expected one of {valid_statuses}"
         )
     
-    # Run payment workflow
-    updated_state = run_payment_workflow(state)
+    blocked = duplicate_payment_block(state)
+    if blocked:
+        raise HTTPException(status_code=400, detail=f"Cannot execute payment - {blocked}")
+    
+    # Run payment workflow (may call Grok; keep it off the event loop).
+    # to_thread copies the context, so Grok usage is charged to this invoice.
+    with usage_scope(invoice_id, "payment"):
+        updated_state = await asyncio.to_thread(run_payment_workflow, state)
     
     # Update store
     invoice_store[invoice_id]["workflow_state"] = updated_state
@@ -600,6 +642,68 @@ async def get_invoice_store():
     }
 
 
+@app.get("/api/invoices/{invoice_id}/usage")
+async def invoice_usage(invoice_id: str):
+    """Get the Grok token cost ledger for an invoice (total and per stage)."""
+    return get_invoice_usage(invoice_id)
+
+
+@app.delete("/api/extraction-memo/{digest}")
+async def delete_extraction_memo(digest: str):
+    """
+    Invalidate a memoized extraction (e.g. one a reviewer found wrong).
+    
+    The next submission of that content is extracted afresh.
+    """
+    if not await asyncio.to_thread(forget_extraction, digest):
+        raise HTTPException(status_code=404, detail=f"No memoized extraction for {digest}")
+    return {"content_hash": digest, "message": "Memoized extraction removed"}
+
+
+@app.get("/api/metrics")
+async def grok_metrics():
+    """
+    Grok traffic metrics for this worker process.
+    
+    rate_limiter: queue depth, wait times, token estimate vs. actual
+    cache: response cache hits/misses/evictions
+    single_flight: identical in-flight calls collapsed into one
+    hedging: hedged calls, hedge wins/tokens, per-stage latency percentiles
+    resilience: retries and circuit breaker state
+    budget: prompts compressed/trimmed to stage budgets, estimated vs. actual tokens
+    routing: per-stage, per-tier calls, latency and acceptance vs. escalation
+    speculation: retry predictor precision/recall, speculative calls wasted
+    batch: batch jobs submitted, requests answered vs. sent one by one
+    packing: invoices packed per request, fallbacks, amortized cost per invoice
+    chunking: long invoices extracted in page groups, passes, item/subtotal mismatches
+    fast_path: invoices parsed by rules without Grok, estimated Grok time saved
+    extraction_memo: repeat submissions answered from the content-hash memo
+    templates: vendor layout template hits, spot checks and demotions
+    compact_schema: completion tokens of compact answers vs. the full schema
+    decoding: answers decoded directly, after a scan, repaired when cut off, or failed
+    pdf_pool: PDF parsing in worker processes, queue depth, parse time per page, timeouts
+    """
+    return {
+        "rate_limiter": get_rate_limit_metrics(),
+        "cache": get_cache_stats(),
+        "single_flight": get_single_flight_stats(),
+        "hedging": get_hedge_stats(),
+        "resilience": get_resilience_stats(),
+        "budget": get_budget_stats(),
+        "routing": get_routing_stats(),
+        "speculation": get_speculation_stats(),
+        "batch": get_batch_stats(),
+        "packing": get_packing_stats(),
+        "chunking": get_chunking_stats(),
+        "fast_path": get_fast_path_stats(),
+        "extraction_memo": get_memo_stats(),
+        "templates": get_template_stats(),
+        "compact_schema": get_compact_schema_stats(),
+        "decoding": get_decoding_stats(),
+        "pdf_pool": get_pdf_pool_stats(),
+    }
+
+
 # =============================================================================
 # WEBSOCKET ENDPOINT
 # =============================================================================
@@ -831,11 +935,21 @@ async def startup_event():
     print("  GET  /api/vendors/{id}               → Get vendor by ID")
     print("  GET  /api/vendors/lookup/{name}      → Lookup by name/alias")
     print()
+    print("Observability:")
+    print("  GET  /api/metrics                    → Grok rate limiter, cache, dedup metrics")
+    print()
     print(f"Database: {stats['total_vendors']} vendors, {stats['compliant']} compliant")
     print(f"Auto-approve threshold: <${APPROVAL_THRESHOLDS['auto_approve_max']:,}")
     print()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release the pooled Grok connections and stop the PDF workers."""
+    await close_async_client()
+    shutdown_pool()
+
+
 # =============================================================================
 # RUN DIRECTLY
 # =============================================================================
@@ -10,6 +10,14 @@ STAGED WORKFLOW (Session 2026-01-27_WORKFLOW):
 
 Each stage streams events independently, matching the human-in-the-loop workflow.
 
+During ingestion the Grok completion is streamed: every top-level field (and
+each line item) is sent as a partial_field event as soon as Grok finishes
+it, ahead of the final grok_response event.
+
+Content seen before (same PDF bytes or normalized text, see
+src/tools/extraction_memo.py) skips ingestion: the memoized extraction is
+reused and flagged as a probable duplicate.
+
 Created: Session 2026-01-26_CONNECT
 Updated: Session 2026-01-27_WORKFLOW (staged streaming)
 """
@@ -28,12 +36,14 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 import src  # noqa: F401 - triggers path setup
 
 from src.schemas.models import WorkflowState, InvoiceStatus, AuditEvent
-from src.agents.ingestion import ingestion_agent
-from src.agents.validation import validation_agent
-from src.agents.approval import approval_agent
-from src.agents.payment import payment_agent
+from src.agents.ingestion import ingestion_agent_async, is_clean_extraction
+from src.agents.validation import validation_agent_async
+from src.agents.approval import approval_agent, is_probable_duplicate
+from src.agents.payment import payment_agent_async
 from src.tools.database import init_database
-from src.client import get_last_usage, get_total_usage, reset_usage_tracking
+from src.tools.extraction_memo import content_hash, find_duplicate, remember_extraction, reuse_extraction
+from src.tools.vendor_templates import confirm_extraction
+from src.llm.usage import get_tracker, usage_scope
 from datetime import datetime
 
 
@@ -75,10 +85,11 @@ def log_event(level: str, message: str, stage: str = None) -> dict:
     return make_event("log", level=level, message=message, stage=stage)
 
 
-def token_event(stage: str) -> dict:
-    """Create a token usage event from the last Grok call."""
-    usage = get_last_usage()
-    total = get_total_usage()
+def token_event(invoice_id: str, stage: str) -> dict:
+    """Create a token usage event from the invoice's last Grok call in this stage."""
+    tracker = get_tracker(invoice_id)
+    usage = next((r for r in reversed(tracker.all()) if r.get("stage") == stage), None)
+    total = tracker.totals()
     return make_event(
         "token_usage",
         stage=stage,
@@ -87,6 +98,71 @@ def token_event(stage: str) -> dict:
     )
 
 
+def grok_call_events(invoice_id: str, stage: str, **kwargs) -> list:
+    """
+    One grok_call event per tier/model the stage actually called.
+    
+    The model is picked inside the agent (by route_tier, or escalation to
+    the reasoning tier), so it is read back from the usage records of the
+    stage's calls. Stages answered without Grok report no call.
+    """
+    used = dict.fromkeys(
+        (record.get("tier"), record.get("model"))
+        for record in get_tracker(invoice_id).all()
+        if record.get("stage") == stage
+    )
+    return [make_event("grok_call", stage=stage, tier=tier, model=model, **kwargs) for tier, model in used]
+
+
+def partial_field_event(stage: str, path: tuple, value: Any) -> dict:
+    """Create a partial_field event for one completed JSON field (or items[i])."""
+    return make_event(
+        "partial_field",
+        stage=stage,
+        field=path[0],
+        index=path[1] if len(path) > 1 else None,
+        value=value
+    )
+
+
+async def run_with_partials(invoice_id: str, stage: str, agent, state: WorkflowState, results: dict):
+    """
+    Run a streaming agent, yielding partial_field events while it works.
+    
+    The agent runs as its own task inside usage_scope(invoice_id, stage); its
+    on_partial callback feeds a queue drained here. The agent's return value
+    (or exception) is stored in results["result"] / raised when it finishes.
+    """
+    partials: asyncio.Queue = asyncio.Queue()
+    
+    def on_partial(path: tuple, value: Any):
+        partials.put_nowait(partial_field_event(stage, path, value))
+    
+    async def run_agent():
+        with usage_scope(invoice_id, stage):
+            return await agent(state, on_partial=on_partial)
+    
+    task = asyncio.create_task(run_agent())
+    try:
+        while True:
+            if not partials.empty():
+                yield partials.get_nowait()
+                continue
+            if task.done():
+                break
+            getter = asyncio.ensure_future(partials.get())
+            await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+    finally:
+        if not task.done():
+            task.cancel()
+    
+    results["result"] = task.result()
+
+
 # =============================================================================
 # INVOICE STORE REFERENCE
 # We import the store from server to maintain consistency
@@ -133,12 +209,13 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
     if not invoice_id:
         invoice_id = f"inv_{uuid.uuid4().hex[:8]}"
     
-    # Reset token tracking for this workflow run
-    reset_usage_tracking()
-    
     # Ensure database is ready
     init_database()
     
+    # Repeat submissions reuse the first extraction (no PDF parsing, no Grok)
+    digest = await asyncio.to_thread(content_hash, raw_invoice)
+    memo = await asyncio.to_thread(find_duplicate, digest)
+    
     # Initialize audit trail with "invoice received" event
     initial_audit_event = create_audit_event(
         event_type="invoice_received",
@@ -148,6 +225,7 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
         details={
             "input_length": len(raw_invoice),
             "invoice_id": invoice_id,
+            "content_hash": digest,
         },
     )
     
@@ -185,16 +263,35 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
     await asyncio.sleep(0.1)  # Small delay for UI responsiveness
     
     yield log_event("info", f"Input: {raw_invoice.strip()[:60]}...")
-    yield log_event("info", "Status: Extracting with Grok...")
-    
-    yield make_event("grok_call", stage="ingestion", model="grok-4-1-fast-reasoning", mode="json", temperature=0)
     
-    await asyncio.sleep(0.1)
-    
-    # Run ingestion agent (this calls Grok)
+    # Run ingestion agent (streams Grok; fields arrive as partial_field events)
     try:
-        ingestion_result = ingestion_agent(state)
-        state.update(ingestion_result)
+        if memo:
+            yield log_event("info", f"Status: Same content as {memo['invoice_id']} - reusing its extraction")
+            state.update({
+                "invoice_data": reuse_extraction(memo, raw_invoice, digest),
+                "current_agent": "validation",
+            })
+            extraction_method = f"Extraction memo (duplicate of {memo['invoice_id']})"
+        else:
+            yield log_event("info", "Status: Extracting with Grok...")
+            
+            await asyncio.sleep(0.1)
+            
+            ingestion = {}
+            async for event in run_with_partials(invoice_id, "ingestion", ingestion_agent_async, state, ingestion):
+                yield event
+            for event in grok_call_events(invoice_id, "ingestion", mode="json", temperature=0):
+                yield event
+            ingestion_result = ingestion["result"]
+            state.update(ingestion_result)
+            if state.get("invoice_data"):
+                state["invoice_data"]["content_hash"] = digest
+                # Only clean extractions are reused for resubmissions
+                if is_clean_extraction(state["invoice_data"]):
+                    await asyncio.to_thread(remember_extraction, digest, invoice_id, state["invoice_data"])
+            template = (state.get("invoice_data") or {}).get("extraction_template")
+            extraction_method = f"Vendor template ({template})" if template else "Grok AI"
         
         invoice_data = state.get("invoice_data")
         
@@ -237,10 +334,11 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
                 # Metadata
                 "confidence": invoice_data.get("confidence", 50),
                 "flags": invoice_data.get("flags", []),
+                "duplicate_of": invoice_data.get("duplicate_of"),
             }
             
             yield make_event("grok_response", stage="ingestion", data=extraction_data)
-            yield token_event("ingestion")
+            yield token_event(invoice_id, "ingestion")
             
             yield log_event("json", f"📤 Grok Response (JSON):")
             yield log_event("json", json.dumps(extraction_data, indent=2))
@@ -253,6 +351,8 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
             yield log_event("success", f"📊 Confidence: {invoice_data.get('confidence', 50)}%")
             if invoice_data.get("flags"):
                 yield log_event("warning", f"⚠️ Flags: {', '.join(invoice_data.get('flags', []))}")
+            if invoice_data.get("duplicate_of"):
+                yield log_event("warning", f"⚠️ Probable duplicate of {invoice_data['duplicate_of']}")
             
             # Add AI Processing audit event
             ai_processing_event = create_audit_event(
@@ -263,10 +363,11 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
                 details={
                     "confidence": invoice_data.get("confidence", 50),
                     "line_item_count": len(invoice_data.get("items", [])),
-                    "extraction_method": "Grok AI",
+                    "extraction_method": extraction_method,
                     "vendor": invoice_data.get("vendor"),
                     "amount": invoice_data.get("amount"),
                     "flags": invoice_data.get("flags", []),
+                    "duplicate_of": invoice_data.get("duplicate_of"),
                 },
             )
             state["audit_trail"] = state.get("audit_trail", []) + [ai_processing_event]
@@ -312,12 +413,13 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
     
     await asyncio.sleep(0.1)
     
-    yield make_event("grok_call", stage="validation", model="grok-4-1-fast-reasoning", mode="json", temperature=0)
-    
     # Run validation agent
     try:
-        validation_result = validation_agent(state)
+        with usage_scope(invoice_id, "validation"):
+            validation_result = await validation_agent_async(state)
         state.update(validation_result)
+        for event in grok_call_events(invoice_id, "validation", mode="json", temperature=0):
+            yield event
         
         val_data = state.get("validation_result", {})
         inventory_check = val_data.get("inventory_check", {})
@@ -373,7 +475,7 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
                 yield log_event("info", f"      Reason: {correction.get('reason', 'Unknown')[:60]}...")
         
         yield make_event("grok_response", stage="validation", data=validation_json)
-        yield token_event("validation")
+        yield token_event(invoice_id, "validation")
         yield log_event("json", "📤 Grok Response (JSON):")
         yield log_event("json", json.dumps(validation_json, indent=2))
         
@@ -488,7 +590,7 @@ async def process_invoice_streaming(raw_invoice: str, invoice_id: str = None) ->
     
     # Final event - Stage 1 complete, ready for routing
     processing_time = time.time() - start_time
-    total_usage = get_total_usage()
+    total_usage = get_tracker(invoice_id).totals()
     
     # Get corrections from validation result
     val_result = state.get("validation_result", {})
@@ -551,8 +653,6 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
         yield make_event("error", message="Invoice has no workflow state")
         return
     
-    reset_usage_tracking()
-    
     yield make_event("stage_start", stage="approval", description="Smart triage analysis")
     yield log_event("system", "═" * 50)
     yield log_event("system", "🤔 APPROVAL AGENT (Smart Triage)")
@@ -572,6 +672,7 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
     await asyncio.sleep(0.1)
     
     try:
+        # Approval is deterministic triage (no Grok call), safe to run inline
         approval_result = approval_agent(state)
         state.update(approval_result)
         
@@ -609,7 +710,7 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
                 yield log_event("warning", f"   • {flag}")
         
         yield make_event("grok_response", stage="approval", data=approval_json)
-        yield token_event("approval")
+        yield token_event(invoice_id, "approval")
         
         yield log_event("info", "")
         yield log_event("info", f"📊 Risk Score: {app_data.get('risk_score', 0):.2f}")
@@ -620,6 +721,8 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
         if route == "auto_approve":
             state["invoice_status"] = InvoiceStatus.AUTO_APPROVED.value
             yield log_event("success", "🟢 AUTO-APPROVED — Skipping human review, ready for payment")
+            # Approved extractions teach the vendor's layout template
+            await asyncio.to_thread(confirm_extraction, state["invoice_data"])
             status_msg = "complete"
             next_stage = "payment"
         elif route == "auto_reject":
@@ -633,6 +736,11 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
             yield log_event("warning", "🟡 ROUTED TO HUMAN — High-value invoice with validation issues needs review")
             status_msg = "warning"
             next_stage = "human_approval"
+        elif route == "route_to_human" and is_probable_duplicate(invoice_data):
+            state["invoice_status"] = InvoiceStatus.PENDING_APPROVAL.value
+            yield log_event("warning", "🟡 ROUTED TO HUMAN — Probable duplicate, a human must confirm it is not paid twice")
+            status_msg = "warning"
+            next_stage = "human_approval"
         else:
             # Standard high-value invoice (validation passed)
             state["invoice_status"] = InvoiceStatus.PENDING_APPROVAL.value
@@ -679,13 +787,14 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
             yield log_event("info", "")
             yield log_event("grok", "🤖 Analyzing rejection with Grok...")
             
-            yield make_event("grok_call", stage="payment", model="grok-3-mini", mode="json", temperature=0.1)
-            
             await asyncio.sleep(0.2)
             
             # Run Payment Agent to log the rejection
-            payment_result = payment_agent(state)
+            with usage_scope(invoice_id, "payment"):
+                payment_result = await payment_agent_async(state)
             state.update(payment_result)
+            for event in grok_call_events(invoice_id, "payment", mode="json", temperature=0.1):
+                yield event
             
             pay_data = state.get("payment_result", {})
             
@@ -729,7 +838,7 @@ async def process_approval_streaming(invoice_id: str) -> AsyncGenerator[dict, No
         invoice_store[invoice_id]["audit_trail"] = state.get("audit_trail", [])
         
         processing_time = time.time() - start_time
-        total_usage = get_total_usage()
+        total_usage = get_tracker(invoice_id).totals()
         
         yield make_event("stage2_complete",
                         result={"route": route, "invoice_status": state["invoice_status"], "audit_trail": state.get("audit_trail", [])},
@@ -815,7 +924,8 @@ async def process_payment_streaming(
     await asyncio.sleep(0.3)
     
     try:
-        payment_result = payment_agent(state)
+        with usage_scope(invoice_id, "payment"):
+            payment_result = await payment_agent_async(state)
         state.update(payment_result)
         
         pay_data = state.get("payment_result", {})
@@ -848,7 +958,7 @@ async def process_payment_streaming(
         invoice_store[invoice_id]["audit_trail"] = state.get("audit_trail", [])
         
         processing_time = time.time() - start_time
-        total_usage = get_total_usage()
+        total_usage = get_tracker(invoice_id).totals()
         
         final_result = {
             "status": state["invoice_status"],
@@ -26,6 +26,24 @@ const stages = [
   { id: 'payment', label: 'Payment', icon: '💰', description: 'Execute transaction' },
 ];
 
+// Ingestion fields streamed as partial_field events → extractedData keys
+const PARTIAL_FIELD_KEYS = {
+  invoice_number: 'invoiceNumber',
+  invoice_date: 'invoiceDate',
+  due_date: 'dueDate',
+  vendor: 'vendor',
+  amount: 'amount',
+  subtotal: 'subtotal',
+  tax: 'tax',
+  currency: 'currency',
+  payment_terms: 'paymentTerms',
+  po_number: 'poNumber',
+  bill_from: 'billFrom',
+  bill_to: 'billTo',
+  confidence: 'confidence',
+  flags: 'flags',
+};
+
 const WEBSOCKET_URL = 'ws://localhost:8000/ws/process';
 const APPROVAL_WEBSOCKET_URL = 'ws://localhost:8000/ws/approval';
 const PAYMENT_WEBSOCKET_URL = 'ws://localhost:8000/ws/payment';
@@ -235,7 +253,7 @@ export default function ProcessingView({ invoice, onComplete, approvalMode = fal
         
       case 'grok_call':
         addLog('grok', `🤖 Grok API Call:`, event.stage);
-        addLog('grok', `   Model: ${event.model}`, event.stage);
+        addLog('grok', `   Model: ${event.model}${event.tier ? ` (${event.tier} tier)` : ''}`, event.stage);
         addLog('grok', `   Mode: ${event.mode} (structured output)`, event.stage);
         addLog('grok', `   Temperature: ${event.temperature}`, event.stage);
         break;
@@ -301,6 +319,26 @@ export default function ProcessingView({ invoice, onComplete, approvalMode = fal
         }
         break;
         
+      case 'partial_field':
+        // Fields arrive while Grok is still generating; grok_response
+        // replaces them with the final (validated) extraction.
+        if (event.stage === 'ingestion') {
+          setExtractedData(prev => {
+            const next = { items: [], ...(prev || {}) };
+            if (event.field === 'items') {
+              if (event.index !== null && event.index !== undefined) {
+                const items = [...next.items];
+                items[event.index] = event.value;
+                next.items = items;
+              }
+            } else if (PARTIAL_FIELD_KEYS[event.field]) {
+              next[PARTIAL_FIELD_KEYS[event.field]] = event.value;
+            }
+            return next;
+          });
+        }
+        break;
+        
       case 'self_correction':
         addLog('warning', `⚠️  ${event.reason}`, event.stage);
         addLog('warning', `🔄 SELF-CORRECTION: Retry attempt ${event.attempt}`, event.stage);
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Run the Grok Simulator
+======================
+
+Usage:
+    python run_simulator.py [--port 8010]
+
+Then point the pipeline at it:
+    GROK_BASE_URL=http://localhost:8010/v1 XAI_API_KEY=sim python main.py
+
+Latency and error injection are configured with GROK_SIM_* variables
+(see api/grok_simulator.py) or at runtime via POST /sim/config.
+"""
+
+import argparse
+
+import uvicorn
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline OpenAI-compatible Grok simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    args = parser.parse_args()
+
+    print()
+    print("🧪 Starting Grok Simulator...")
+    print(f"   API: http://{args.host}:{args.port}/v1")
+    print(f"   Use: GROK_BASE_URL=http://{args.host}:{args.port}/v1 XAI_API_KEY=sim")
+    print()
+
+    uvicorn.run(
+        "api.grok_simulator:app",
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
@@ -6,14 +6,18 @@ Real Grok-powered agents for invoice processing.
 Created: Session 2026-01-26_FORGE
 """
 
-from src.agents.ingestion import ingestion_agent
-from src.agents.validation import validation_agent
+from src.agents.ingestion import ingestion_agent, ingestion_agent_async
+from src.agents.validation import validation_agent, validation_agent_async
 from src.agents.approval import approval_agent
-from src.agents.payment import payment_agent
+from src.agents.payment import payment_agent, payment_agent_async
 
 __all__ = [
     "ingestion_agent",
     "validation_agent", 
     "approval_agent",
     "payment_agent",
+    # Async variants for the streaming API (approval makes no Grok calls)
+    "ingestion_agent_async",
+    "validation_agent_async",
+    "payment_agent_async",
 ]
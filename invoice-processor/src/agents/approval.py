@@ -13,6 +13,10 @@ Five-flow decision logic:
 CRITICAL errors (suspended vendor, massive variance) bypass human review entirely.
 These are hard blocks, not edge cases for human judgment.
 
+Probable duplicates (a resubmission answered from the extraction memo) are
+never auto-approved: a human must confirm they are not paid twice, and the
+payment stage refuses them without a human approval.
+
 Session: 2026-01-26_FORGE (original)
 Updated: 2026-01-27_WORKFLOW (smart triage)
 Updated: 2026-01-27 (high-value invoices always route to human, even if validation fails)
@@ -22,7 +26,10 @@ Updated: 2026-01-28_TRIAGE (CRITICAL error detection for immediate rejection)
 # Initialize path setup via package init
 import src  # noqa: F401 - triggers path setup in __init__.py
 
+from typing import Optional
+
 from src.schemas.models import WorkflowState, ApprovalDecision, APPROVAL_THRESHOLDS
+from src.tools.extraction_memo import DUPLICATE_FLAG
 
 
 # =============================================================================
@@ -93,6 +100,29 @@ def detect_critical_flags(validation_result: dict, invoice_data: dict) -> list[s
     return critical_flags
 
 
+# =============================================================================
+# PROBABLE DUPLICATES (extraction memo hits)
+# =============================================================================
+
+def is_probable_duplicate(invoice_data: dict) -> bool:
+    """True for an invoice whose content matched an earlier submission."""
+    return bool(invoice_data.get("duplicate_of")) or DUPLICATE_FLAG in (invoice_data.get("flags") or [])
+
+
+def duplicate_payment_block(state: WorkflowState) -> Optional[str]:
+    """
+    Why an invoice may not be paid yet, if it is a probable duplicate that
+    no human has approved; None otherwise.
+    """
+    invoice_data = state.get("invoice_data") or {}
+    if not is_probable_duplicate(invoice_data):
+        return None
+    if (state.get("approved_by") or "").startswith("human:"):
+        return None
+    original = invoice_data.get("duplicate_of") or "an earlier invoice"
+    return f"Probable duplicate of {original} - payment needs a human approval"
+
+
 # =============================================================================
 # AGENT FUNCTION
 # =============================================================================
@@ -227,6 +257,26 @@ def approval_agent(state: WorkflowState) -> dict:
         print(f"      → Amount: ${amount:,.2f} >= ${threshold:,}")
         print(f"      → Result: ROUTE TO HUMAN")
     
+    # Probable duplicate (validation passed + LOW value) → ROUTE TO HUMAN,
+    # never auto-approved: the same content may already have been paid
+    elif is_probable_duplicate(invoice_data):
+        original = invoice_data.get("duplicate_of") or "an earlier invoice"
+        approved = False  # Recommend rejection, but human decides
+        reason = f"Probable duplicate of {original}: same content was already submitted. Human must confirm before payment."
+        requires_review = True
+        route = "route_to_human"
+        red_flags = [f"PROBABLE DUPLICATE: same content as {original}"]
+        reasoning_chain = [
+            "Validation: PASSED ✓",
+            f"Amount: ${amount:,.2f} < ${threshold:,} threshold",
+            f"Duplicate: same content as {original}",
+            "Result: ROUTE TO HUMAN (duplicates are never auto-approved)"
+        ]
+        print("   📋 Decision Flow:")
+        print(f"      → Validation: PASSED ✓")
+        print(f"      → Duplicate of {original}")
+        print(f"      → Result: ROUTE TO HUMAN")
+    
     # Flow 5: Validation passed + LOW value → AUTO-APPROVE
     else:
         approved = True
@@ -512,6 +562,23 @@ if __name__ == "__main__":
     
     result6 = approval_agent(state6)
     
+    # Test Case 7: Resubmitted invoice (extraction memo hit)
+    print("\n" + "─" * 60)
+    print("TEST 7: Small Valid Probable Duplicate → ROUTE TO HUMAN, payment blocked")
+    print("─" * 60)
+    
+    state7: WorkflowState = {
+        **state1,
+        "invoice_data": {
+            **state1["invoice_data"],
+            "flags": [DUPLICATE_FLAG],
+            "duplicate_of": "inv_1a2b3c4d",
+        },
+    }
+    
+    result7 = approval_agent(state7)
+    block7 = duplicate_payment_block({**state7, **result7, "approved_by": "agent"})
+    
     print("\n" + "═" * 60)
     print("RESULTS SUMMARY:")
     print(f"  Test 1 ($5K valid):             route={result1['approval_decision']['route']}")
@@ -520,6 +587,7 @@ if __name__ == "__main__":
     print(f"  Test 4 ($15K failed, minor):    route={result4['approval_decision']['route']}")
     print(f"  Test 5 ($50K CRITICAL):         route={result5['approval_decision']['route']} ← NEW")
     print(f"  Test 6 ($25K massive variance): route={result6['approval_decision']['route']} ← NEW")
+    print(f"  Test 7 ($5K duplicate):         route={result7['approval_decision']['route']}, payment blocked={block7 is not None}")
     print("═" * 60)
     print()
     print("Expected:")
@@ -529,4 +597,5 @@ if __name__ == "__main__":
     print("  Test 4: route_to_human (large + failed, minor variance → human reviews)")
     print("  Test 5: auto_reject    (CRITICAL: suspended vendor + massive variance)")
     print("  Test 6: auto_reject    (CRITICAL: variance -150, bypasses human review)")
+    print("  Test 7: route_to_human (duplicate: never auto-approved, not paid without a human)")
     print("═" * 60)
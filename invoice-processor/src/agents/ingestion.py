@@ -6,9 +6,22 @@ Parse raw invoice text (or PDF) into structured InvoiceData using Grok JSON mode
 This agent:
 1. Takes raw invoice text OR a PDF file path
 2. If PDF: extracts text using pdfplumber
-3. Uses Grok with JSON mode to extract structured data
-4. **Self-corrects** if extraction produces low-confidence results (Phase 3)
-5. Returns InvoiceData TypedDict for downstream agents
+3. PDFs from vendors with a learned layout template are read from their
+   word positions, and simple key/value invoices are parsed by rules alone
+   (fast path); neither calls Grok when the result passes the same checks
+   as a Grok extraction
+4. Otherwise uses Grok with JSON mode to extract structured data (clean, short
+   invoices on the fast model tier; inputs predicted to need a retry send
+   the hinted retry at the same time when GROK_SPECULATE_ENABLED is set)
+5. **Self-corrects** if extraction produces low-confidence results (Phase 3),
+   escalating to the reasoning model and re-extracting only the fields the
+   first pass missed
+6. Returns InvoiceData TypedDict for downstream agents
+
+In bulk runs (ingestion_agent_batch) with GROK_PACK_ENABLED, small invoices
+are packed several to one extraction request and split apart again. Long
+multi-page invoices go the other way in the per-invoice agents: a
+header/totals pass and one line-item pass per page group, sent at once.
 
 Session: 2026-01-27_INGEST (PDF Support added)
 Session: 2026-01-26_PHOENIX (Self-Correction added)
@@ -19,17 +32,62 @@ Self-Correction: CORR-001 (Feedback Loop Designer)
 PDF Integration: DOC-001 (PDF Extraction Expert)
 """
 
+import asyncio
+import contextvars
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Optional
 
 # Initialize path setup via package init
 import src  # noqa: F401 - triggers path setup in __init__.py
 
-from src.client import call_grok
+from src.client import (
+    call_grok,
+    call_grok_async,
+    call_grok_batch,
+    estimate_tokens,
+    forget_response,
+    get_model,
+    parse_or_forget,
+    plan_chunks,
+    plan_packs,
+    record_chunking,
+    record_packing,
+    record_speculation,
+    record_tier_outcome,
+    route_tier,
+    should_escalate,
+    should_speculate,
+    would_trim_prompt,
+)
+from src.llm.chunking import ChunkPlan, split_pages
+from src.llm.decoding import decode_object, decode_response
+from src.llm.resilience import CircuitOpenError
+from src.llm.routing import REASONING
+from src.llm.prompts import PromptLayout, extend_messages
 from src.schemas.models import WorkflowState, InvoiceData, InvoiceItem, ContactInfo
+from src.tools.compact_schema import (
+    COMPACT_OUTPUT_PROMPT,
+    compact_examples,
+    compact_schema_enabled,
+    compact_schema_stats,
+    expand_extraction,
+    expanding_partials,
+)
 from src.tools.pdf_extractor import extract_pdf, PDFExtractionResult
-from src.utils import clean_json_response, safe_get
+from src.tools.pdf_pool import extract_pdf_async
+from src.tools.vendor_templates import TemplateHit, apply_templates, check_template, has_active_templates
+from src.tools.invoice_parser import (
+    AMOUNT_TOLERANCE,
+    count_labels,
+    fast_path_enabled,
+    fast_path_min_confidence,
+    fast_path_stats,
+    parse_invoice,
+)
+from src.utils import safe_get
 
 
 # =============================================================================
@@ -75,18 +133,44 @@ def _extract_from_pdf_if_needed(input_data: str) -> tuple[str, Optional[str], Op
         return input_data, None, None
     
     # It's a PDF - extract text
+    pdf_path = _print_pdf_input(input_data)
+    
+    # Word positions are only needed when a vendor template could apply
+    result = extract_pdf(pdf_path, with_words=has_active_templates())
+    return _pdf_input(result)
+
+
+async def _extract_from_pdf_if_needed_async(input_data: str) -> tuple[str, Optional[str], Optional[dict]]:
+    """
+    Async _extract_from_pdf_if_needed: the PDF is parsed in the worker
+    process pool (src/tools/pdf_pool.py), so a large one does not hold the
+    server's GIL while other invoices stream.
+    """
+    if not _is_pdf_input(input_data):
+        return input_data, None, None
+    
+    pdf_path = _print_pdf_input(input_data)
+    with_words = await asyncio.to_thread(has_active_templates)
+    result = await extract_pdf_async(pdf_path, with_words=with_words)
+    return _pdf_input(result)
+
+
+def _print_pdf_input(input_data: str) -> str:
     pdf_path = input_data.strip()
     print(f"   📄 Detected PDF input: {pdf_path}")
     print("   📄 Extracting text from PDF...")
-    
-    result = extract_pdf(pdf_path)
-    
+    return pdf_path
+
+
+def _pdf_input(result: PDFExtractionResult) -> tuple[str, Optional[str], dict]:
+    """(text, error, pdf_metadata) from a PDF extraction, as _extract_from_pdf_if_needed returns them."""
     pdf_metadata = {
         "source_type": "pdf",
         "source_path": result.source_path,
         "page_count": result.page_count,
         "is_scanned": result.is_likely_scanned,
         "warnings": result.warnings,
+        "words": result.words,
     }
     
     if not result.success:
@@ -281,6 +365,168 @@ Extract SOMETHING for each field if there's any relevant text. Only use defaults
 Lower confidence if many fields are missing or ambiguous."""
 
 
+# =============================================================================
+# TARGETED RE-EXTRACTION PROMPTS
+# =============================================================================
+# Self-correction asks only for the fields the first pass missed, with a
+# compact schema and (for long invoices) only the lines likely to hold them.
+
+FIELD_RETRY_PROMPT = """You fill in invoice fields that a first extraction pass missed.
+
+Return a JSON object with exactly the requested keys plus "confidence" (0-100, your confidence in these fields).
+Use null for a field that is truly absent from the text. Dates are YYYY-MM-DD; relative dates ("yesterday", "ASAP") are null.
+Amounts are numbers without currency symbols ("5,000.00" -> 5000.0).
+The text may be excerpts of a longer invoice; "[...]" marks skipped lines."""
+
+# Compact schema for the fields a targeted retry can ask for (the key
+# fields of _score_extraction, plus subtotal/tax alongside the total)
+FIELD_SCHEMA = {
+    "invoice_number": 'string|null — invoice ID ("#", "Invoice #", "Inv:", "Reference:")',
+    "invoice_date": "string|null — invoice date, YYYY-MM-DD",
+    "due_date": "string|null — payment due date, YYYY-MM-DD",
+    "amount": 'number|null — invoice TOTAL ("Total", "Amount Due", "Balance")',
+    "subtotal": "number|null — subtotal before tax",
+    "tax": "number|null — tax amount",
+    "vendor": "string|null — vendor company name (letterhead, From:, Vendor:, Supplier:)",
+    "bill_from": "object — vendor contact: name, address, email, phone (null when absent)",
+    "items": "array — line items: sku, description, quantity, unit_price, amount",
+}
+
+# Words that mark the lines holding each field (lower case)
+FIELD_KEYWORDS = {
+    "invoice_number": ("invoice", "inv", "#", "reference", "ref"),
+    "invoice_date": ("date", "dated", "issued"),
+    "due_date": ("due", "pay by", "payable"),
+    "amount": ("total", "amount", "amt", "balance", "due"),
+    "subtotal": ("subtotal", "sub total", "sub-total"),
+    "tax": ("tax", "vat", "gst"),
+    "vendor": ("vendor", "vndr", "from", "supplier", "remit", "inc", "llc", "ltd", "co.", "corp"),
+    "bill_from": ("vendor", "vndr", "from", "supplier", "remit", "@", "phone", "tel"),
+    "items": ("item", "itms", "qty", "quantity", "@", "units", "sku", "description"),
+}
+
+# Fields requested together (vendor also fills bill_from, totals travel together)
+FIELD_GROUPS = {
+    "vendor": ("vendor", "bill_from"),
+    "amount": ("amount", "subtotal", "tax"),
+}
+
+# With more key fields than this missing, a full re-extraction is as cheap
+MAX_TARGETED_FIELDS = 5
+
+# Invoices up to this many lines are sent whole; longer ones as excerpts
+MIN_EXCERPT_LINES = 40
+HEADER_LINES = 5      # letterhead/header lines always included
+CONTEXT_LINES = 2     # lines kept around each keyword hit
+
+
+# =============================================================================
+# PACKED EXTRACTION PROMPT (bulk runs)
+# =============================================================================
+# Several short invoices share one request, so the instructions and
+# examples above are paid for once per pack instead of once per invoice.
+
+PACKED_PROMPT = """## Multiple Invoices
+The input holds several unrelated invoices, each starting with a line "=== INVOICE <n> ===".
+Extract every invoice on its own — never carry a vendor, item or amount over from another invoice.
+
+Return {"invoices": [...]} with one object per invoice, in input order: "index": <n> plus ALL fields of the Output Schema."""
+
+PACKED_INVOICE_HEADER = "=== INVOICE {index} ==="
+
+# Completion tokens allowed per packed invoice
+PACKED_MAX_TOKENS_PER_INVOICE = 1500
+
+# A packed answer missing any of these is re-extracted on its own
+PACKED_REQUIRED_FIELDS = ("invoice_number", "vendor", "amount", "items", "confidence")
+
+
+# =============================================================================
+# CHUNKED EXTRACTION PROMPTS (long multi-page invoices)
+# =============================================================================
+# A long invoice is read as a header/totals pass over its first and last
+# pages plus one line-item pass per page group, all sent at once.
+
+CHUNK_HEADER_PROMPT = """## Long Invoice — Header and Totals Only
+The input is the FIRST and LAST page of a long invoice; the pages in between are left out ("[... pages 2-N omitted ...]").
+Extract every field of the Output Schema except line items, and return "items": [] — line items are extracted separately, page by page."""
+
+CHUNK_ITEMS_PROMPT = """You extract the line items from some pages of a longer invoice.
+
+Return {"items": [...]} with one object per line item on these pages, in the order they appear:
+"sku" (string|null), "description" (string), "quantity" (number), "unit_price" (number), "amount" (number).
+Amounts are numbers without currency symbols ("5,000.00" -> 5000.0).
+Skip table headers, page totals, subtotal/tax/total rows and anything that is not a line item.
+Return {"items": []} if these pages hold no line items."""
+
+# Completion tokens allowed per page of a line-item pass
+CHUNK_MAX_TOKENS_PER_PAGE = 800
+
+# Flag for a merge whose items do not add up to the subtotal
+CHUNK_MISMATCH_FLAG = "chunked_items_mismatch"
+
+
+# =============================================================================
+# ANSWER TYPES (src/llm/decoding.py)
+# =============================================================================
+# Every extraction answer is converted to these types as it is decoded, so
+# "$1,234.50" or "85%" cannot fail the invoice later; nulls and values that
+# cannot be converted are dropped and take the usual defaults.
+
+EXTRACTION_TYPES = {
+    "invoice_number": str,
+    "invoice_date": str,
+    "due_date": str,
+    "amount": float,
+    "subtotal": float,
+    "tax": float,
+    "currency": str,
+    "payment_terms": str,
+    "po_number": str,
+    "vendor": str,
+    "bill_from": dict,
+    "bill_to": dict,
+    "items": list,
+    "confidence": int,
+    "flags": list,
+}
+
+ITEM_TYPES = {
+    "sku": str,
+    "description": str,
+    "name": str,
+    "quantity": int,
+    "unit_price": float,
+    "amount": float,
+}
+
+CONTACT_TYPES = {"name": str, "address": str, "email": str, "phone": str, "entity": str}
+
+# Flag for an answer cut off before its end (max_tokens): only its
+# complete fields were kept
+TRUNCATED_FLAG = "truncated_response"
+
+# Flag for an invoice whose text was over the ingestion prompt budget and
+# had its middle cut out (src/llm/budget.py): line items may be missing
+PROMPT_TRIMMED_FLAG = "prompt_trimmed"
+
+
+# =============================================================================
+# RETRY-RISK FEATURES (speculative retries)
+# =============================================================================
+# Cheap signals, computed before any Grok call, that the first extraction
+# will need a retry. Their sum (capped at 1) is compared with
+# GROK_SPECULATE_THRESHOLD.
+
+RISK_PDF_WARNINGS = 0.3   # pdfplumber reported problems
+RISK_SCANNED = 0.4        # little text per page: likely a scan
+RISK_GARBLED = 0.4        # unmapped glyphs, "(cid:123)"
+RISK_LONG = 0.3           # more than LONG_INPUT_TOKENS
+RISK_NO_LABELS = 0.5      # no "Vendor:", "Total:", ... labels at all
+RISK_FEW_LABELS = 0.25    # only one or two
+LONG_INPUT_TOKENS = 6000
+
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
@@ -341,23 +587,67 @@ def _needs_retry(extracted: dict, raw_text: str) -> bool:
     return False
 
 
+def is_clean_extraction(invoice_data: dict) -> bool:
+    """
+    Whether an extraction may be reused for repeat submissions (extraction
+    memo): it carries no flags and _needs_retry finds nothing to redo.
+    """
+    if invoice_data.get("flags"):
+        return False
+    return not _needs_retry(invoice_data, invoice_data.get("raw_text") or "")
+
+
+EXTRACTION_LAYOUT = PromptLayout(
+    SYSTEM_PROMPT,
+    FEW_SHOT_EXAMPLE,
+    task="Extract invoice data from the following text:",
+)
+
+# Same prompt with the compact output contract (GROK_COMPACT_SCHEMA_ENABLED)
+COMPACT_EXTRACTION_LAYOUT = PromptLayout(
+    SYSTEM_PROMPT,
+    compact_examples(FEW_SHOT_EXAMPLE),
+    COMPACT_OUTPUT_PROMPT,
+    task="Extract invoice data from the following text:",
+)
+
+PACKED_EXTRACTION_LAYOUT = PromptLayout(
+    SYSTEM_PROMPT,
+    FEW_SHOT_EXAMPLE,
+    PACKED_PROMPT,
+    task="Extract invoice data from each of the following invoices:",
+)
+
+CHUNK_HEADER_LAYOUT = PromptLayout(
+    SYSTEM_PROMPT,
+    FEW_SHOT_EXAMPLE,
+    CHUNK_HEADER_PROMPT,
+    task="Extract the invoice header and totals from the following pages:",
+)
+
+CHUNK_ITEMS_LAYOUT = PromptLayout(
+    CHUNK_ITEMS_PROMPT,
+    task="Extract the line items from these invoice pages:",
+)
+
+FIELD_RETRY_LAYOUT = PromptLayout(
+    FIELD_RETRY_PROMPT,
+    task="Extract only these fields from the invoice text below:",
+)
+
+
 def _build_retry_messages(invoice_text: str) -> List[dict]:
     """
     Build messages for retry attempt with enhanced extraction hints.
     
-    Uses the same system prompt but adds explicit guidance for
-    looking harder at ambiguous input.
-    """
-    return [
-        {
-            "role": "system",
-            "content": SYSTEM_PROMPT + "\n\n" + FEW_SHOT_EXAMPLE
-        },
-        {
-            "role": "user",
-            "content": f"{RETRY_PROMPT_HINT}\n\nExtract invoice data from:\n\n{invoice_text.strip()}"
-        }
-    ]
+    The first attempt's messages are re-sent unchanged and the hint is
+    appended as a follow-up turn, so the whole first prompt (instructions
+    and invoice text) is a prompt-cache hit and only the hint is new.
+    """
+    return extend_messages(
+        build_extraction_messages(invoice_text),
+        f"{RETRY_PROMPT_HINT}\n\nExtract the invoice data again from the text above."
+    )
 
 
 def build_extraction_messages(invoice_text: str) -> List[dict]:
@@ -367,215 +657,683 @@ def build_extraction_messages(invoice_text: str) -> List[dict]:
     This structure follows LLM best practices:
     - System message: Role definition, rules, schema (persistent context)
     - User message: The actual data to process (variable input)
+    
+    The static part is a stable prefix (see src/llm/prompts.py), so Grok's
+    prompt cache serves it on every call after the first.
+    
+    With GROK_COMPACT_SCHEMA_ENABLED the answer comes in the compact schema
+    (src/tools/compact_schema.py); parse it with _parse_extraction.
     """
-    return [
-        {
-            "role": "system",
-            "content": SYSTEM_PROMPT + "\n\n" + FEW_SHOT_EXAMPLE
-        },
-        {
-            "role": "user",
-            "content": f"Extract invoice data from the following text:\n\n{invoice_text.strip()}"
-        }
-    ]
+    if compact_schema_enabled():
+        return COMPACT_EXTRACTION_LAYOUT.messages(invoice_text)
+    return EXTRACTION_LAYOUT.messages(invoice_text)
 
 
-# =============================================================================
-# AGENT FUNCTION
-# =============================================================================
+def _typed_extraction(extracted, truncated: bool = False) -> dict:
+    """
+    A decoded extraction with its fields, line items and contacts in
+    EXTRACTION_TYPES / ITEM_TYPES / CONTACT_TYPES.
+    
+    A truncated answer is flagged TRUNCATED_FLAG.
+    """
+    typed = decode_object(extracted, EXTRACTION_TYPES)
+    if "items" in typed:
+        typed["items"] = [decode_object(item, ITEM_TYPES) for item in typed["items"] if isinstance(item, dict)]
+    for contact in ("bill_from", "bill_to"):
+        if contact in typed:
+            typed[contact] = decode_object(typed[contact], CONTACT_TYPES)
+    if truncated:
+        print("   ⚠️  Answer was cut off; keeping the fields it completed")
+        typed["flags"] = typed.get("flags", []) + [TRUNCATED_FLAG]
+    return typed
 
-def ingestion_agent(state: WorkflowState) -> dict:
+
+def _decode_answer(response: str) -> dict:
+    """A full-schema extraction answer (packed entries excepted), decoded and typed."""
+    return _typed_extraction(*decode_response(response))
+
+
+def _parse_extraction(response: str) -> dict:
     """
-    Parse raw invoice text OR PDF into structured InvoiceData.
+    Parse the answer to build_extraction_messages (or a hinted retry).
     
-    Uses Grok with JSON mode for reliable structured extraction.
-    Implements defensive defaults for all fields.
+    Compact-schema answers are expanded to the full schema, and their
+    completion tokens are compared with the full schema's for the same
+    extraction.
+    """
+    if not compact_schema_enabled():
+        return _decode_answer(response)
+    extracted, truncated = decode_response(response)
+    expanded = expand_extraction(extracted)
+    compact_schema_stats.record(estimate_tokens(response), estimate_tokens(json.dumps(expanded)))
+    return _typed_extraction(expanded, truncated)
+
+
+def _parse_second_pass(response: str, fields: Optional[List[str]]) -> dict:
+    """Parse a second-pass answer: targeted field retries always use full field names."""
+    if fields is None:
+        return _parse_extraction(response)
+    return _decode_answer(response)
+
+
+def _partials(on_partial):
+    """on_partial for extraction calls, translating compact keys when the compact schema is on."""
+    return expanding_partials(on_partial) if compact_schema_enabled() else on_partial
+
+
+def _report_second_pass(on_partial, before: dict, after: dict):
+    """
+    Re-send the fields a second pass changed, once it has been merged.
     
-    **PDF Support (Session 2026-01-27_INGEST):**
-    If input is a PDF file path, extracts text using pdfplumber first,
-    then processes the extracted text through the normal pipeline.
+    Only the first pass is streamed: second-pass values may still be
+    discarded by the merge, so they are reported afterwards, and only
+    where they were kept.
+    """
+    if on_partial is None:
+        return
+    for field in EXTRACTION_TYPES:
+        if after.get(field) != before.get(field):
+            on_partial((field,), after.get(field))
+
+
+def build_packed_extraction_messages(invoice_texts: List[str]) -> List[dict]:
+    """Messages extracting several invoices at once (numbered from 1, in order)."""
+    return PACKED_EXTRACTION_LAYOUT.messages("\n\n".join(
+        f"{PACKED_INVOICE_HEADER.format(index=index)}\n{text.strip()}"
+        for index, text in enumerate(invoice_texts, 1)
+    ))
+
+
+def _typed_packed_extraction(extracted: dict) -> Optional[dict]:
+    """A packed answer, typed, if it has every key field in a usable type; else None."""
+    if any(field not in extracted for field in PACKED_REQUIRED_FIELDS):
+        return None
+    typed = _typed_extraction(extracted)
+    usable = (
+        isinstance(extracted["items"], list)
+        and "confidence" in typed
+        and (extracted["amount"] is None or "amount" in typed)
+    )
+    return typed if usable else None
+
+
+def _split_packed_response(response: str, count: int) -> List[Optional[dict]]:
+    """
+    Per-invoice extractions from a packed answer, in input order.
     
-    **Self-Correction (Phase 3):**
-    If initial extraction produces low-confidence results (UNKNOWN vendor
-    or 0.0 amount when input suggests real data), the agent retries once
-    with enhanced extraction hints.
+    None marks an invoice the answer did not cover or got malformed; the
+    caller re-extracts those one by one, as well as invoices an answer
+    cut off at max_tokens did not finish (src/llm/decoding.py drops them).
+    """
+    results: List[Optional[dict]] = [None] * count
+    try:
+        parsed, _ = decode_response(response)
+    except ValueError:
+        return results
+    entries = parsed.get("invoices") if isinstance(parsed, dict) else None
+    if not isinstance(entries, list):
+        return results
+    
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.pop("index", position + 1)) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < count and results[index] is None:
+            results[index] = _typed_packed_extraction(entry)
+    return results
+
+
+# Points per filled-in key field when comparing extractions
+FIELD_WEIGHTS = {
+    "vendor": 10,
+    "amount": 10,
+    "invoice_number": 5,
+    "invoice_date": 5,
+    "due_date": 5,
+    "items": 5,
+    "bill_from": 5,
+}
+
+
+def _field_filled(ext: dict, field: str) -> bool:
+    """Whether a field holds real data rather than its default."""
+    value = ext.get(field)
+    if field in ("vendor", "invoice_number"):
+        return bool(value) and value != "UNKNOWN"
+    if field in ("amount", "subtotal"):
+        try:
+            return float(value or 0.0) > 0
+        except (TypeError, ValueError):
+            return False
+    if field in ("bill_from", "bill_to"):
+        return isinstance(value, dict) and bool(value.get("name"))
+    if field == "tax":
+        return value is not None
+    return bool(value)
+
+
+def _field_score(ext: dict, field: str) -> int:
+    """Points one field earns in _score_extraction (1 for unweighted fields)."""
+    return FIELD_WEIGHTS.get(field, 1) if _field_filled(ext, field) else 0
+
+
+def _score_extraction(ext: dict) -> int:
+    """Score an extraction by confidence plus filled-in key fields."""
+    return int(ext.get("confidence", 0)) + sum(_field_score(ext, field) for field in FIELD_WEIGHTS)
+
+
+def _pick_better_extraction(extracted: dict, retry_extracted: dict) -> dict:
+    """Compare the original and self-corrected extraction; keep the better one."""
+    original_score = _score_extraction(extracted)
+    retry_score = _score_extraction(retry_extracted)
+    
+    if retry_score > original_score:
+        print(f"   ✅ Self-correction improved extraction! ({original_score} → {retry_score})")
+        return retry_extracted
+    
+    print(f"   ℹ️  Self-correction did not improve; using original ({original_score} vs {retry_score})")
+    return extracted
+
+
+def _fields_to_reextract(extracted: dict) -> tuple[list[str], int]:
+    """
+    Key fields the first pass left at their defaults.
     
-    Args:
-        state: WorkflowState containing raw_invoice (text OR pdf path)
-        
     Returns:
-        Dict with invoice_data and updated current_agent
+        (fields to request, with grouped fields added; number of missing
+        key fields)
     """
-    print()
-    print("=" * 60)
-    print("📥 INGESTION AGENT (Grok-Powered + PDF Support + Self-Correction)")
-    print("=" * 60)
+    missing = [field for field in FIELD_WEIGHTS if not _field_filled(extracted, field)]
+    fields = []
+    for field in missing:
+        for grouped in FIELD_GROUPS.get(field, (field,)):
+            if grouped not in fields:
+                fields.append(grouped)
+    return fields, len(missing)
+
+
+def _relevant_excerpt(invoice_text: str, fields: List[str]) -> str:
+    """
+    The lines of invoice_text most likely to hold fields.
     
-    raw_input = state["raw_invoice"]
+    Short invoices are returned whole. Longer ones keep the header lines
+    plus every line mentioning a field keyword (with a little context);
+    skipped runs are marked "[...]".
+    """
+    lines = invoice_text.splitlines()
+    if len(lines) <= MIN_EXCERPT_LINES:
+        return invoice_text
     
-    # =========================================================================
-    # PDF EXTRACTION (if applicable)
-    # =========================================================================
-    raw_invoice, pdf_error, pdf_metadata = _extract_from_pdf_if_needed(raw_input)
+    keywords = {kw for field in fields for kw in FIELD_KEYWORDS.get(field, ())}
+    keep = set(range(min(HEADER_LINES, len(lines))))
+    for i, line in enumerate(lines):
+        lowered = line.lower()
+        if any(kw in lowered for kw in keywords):
+            keep.update(range(max(0, i - CONTEXT_LINES), min(len(lines), i + CONTEXT_LINES + 1)))
     
-    # Handle PDF extraction failure
-    if pdf_error:
-        print(f"   ❌ PDF extraction failed: {pdf_error}")
-        return {
-            "invoice_data": None,
-            "current_agent": "validation",
-            "status": "failed",
-            "error": f"PDF extraction failed: {pdf_error}",
-        }
+    excerpt = []
+    previous = -1
+    for i in sorted(keep):
+        if i > previous + 1:
+            excerpt.append("[...]")
+        excerpt.append(lines[i])
+        previous = i
+    if previous < len(lines) - 1:
+        excerpt.append("[...]")
+    return "\n".join(excerpt)
+
+
+def _build_field_retry_messages(invoice_text: str, fields: List[str]) -> List[dict]:
+    """Compact prompt asking only for fields, over the relevant text regions."""
+    schema = "\n".join(f'- "{field}": {FIELD_SCHEMA[field]}' for field in fields)
+    return FIELD_RETRY_LAYOUT.messages(
+        _relevant_excerpt(invoice_text, fields),
+        context=[f"Fields:\n{schema}"],
+    )
+
+
+def _merge_fields(extracted: dict, answer: dict, fields: List[str]) -> dict:
+    """
+    Merge a targeted re-extraction into the first pass, field by field.
     
-    # Log input source
+    Each answered field replaces the original only where it scores higher
+    (_field_score); missing_* flags for filled fields are dropped and the
+    confidence becomes the better of the two.
+    """
+    merged = dict(extracted)
+    improved = []
+    for field in fields:
+        if field not in answer or answer[field] is None:
+            continue
+        if _field_score(answer, field) > _field_score(extracted, field):
+            merged[field] = answer[field]
+            improved.append(field)
+    
+    # A first pass without a total guessed subtotal/tax too: take the set
+    if "amount" in improved:
+        for field in ("subtotal", "tax"):
+            if field not in improved and answer.get(field) is not None:
+                merged[field] = answer[field]
+                improved.append(field)
+    
+    if "vendor" in improved and not _field_filled(merged, "bill_from"):
+        merged["bill_from"] = {**(merged.get("bill_from") or {}), "name": merged["vendor"]}
+    
+    if not improved:
+        print(f"   ℹ️  Self-correction found none of: {', '.join(fields)}")
+        return extracted
+    
+    merged["flags"] = [
+        flag for flag in extracted.get("flags", [])
+        if not any(flag == f"missing_{field}" for field in improved)
+    ]
+    merged["confidence"] = max(int(extracted.get("confidence", 0)), int(answer.get("confidence") or 0))
+    print(
+        f"   ✅ Self-correction filled {', '.join(improved)} "
+        f"({_score_extraction(extracted)} → {_score_extraction(merged)})"
+    )
+    return merged
+
+
+def _second_pass(extracted: dict, raw_text: str, tier: str) -> Optional[str]:
+    """
+    Decide whether the first extraction needs a second, reasoning-tier call.
+    
+    Returns:
+        "retry" — self-correction with hints (_needs_retry triggered),
+        "escalate" — a fast-tier answer below GROK_ESCALATE_CONFIDENCE is
+        redone on the reasoning model with the same prompt, or None.
+    """
+    if _needs_retry(extracted, raw_text):
+        return "retry"
+    if should_escalate(tier, confidence=int(extracted.get("confidence", 0)) / 100):
+        return "escalate"
+    return None
+
+
+def _second_pass_plan(kind: str, invoice_text: str, extracted: dict) -> tuple[List[dict], Optional[List[str]], int]:
+    """
+    Messages for the second call, the fields it re-extracts and max_tokens.
+    
+    A retry asks only for the fields the first pass missed (fields is the
+    list); escalation, or a retry with nothing specific missing (low
+    confidence, or most of the invoice missing), re-extracts the whole
+    invoice (fields is None).
+    """
+    if kind == "retry":
+        fields, missing = _fields_to_reextract(extracted)
+        if fields and missing <= MAX_TARGETED_FIELDS:
+            print(f"   🎯 Re-extracting only: {', '.join(fields)}")
+            return _build_field_retry_messages(invoice_text, fields), fields, 1500 if "items" in fields else 500
+        return _build_retry_messages(invoice_text), None, 1500
+    return build_extraction_messages(invoice_text), None, 1500
+
+
+def _apply_second_pass(extracted: dict, answer: dict, fields: Optional[List[str]]) -> dict:
+    if fields is None:
+        return _pick_better_extraction(extracted, answer)
+    return _merge_fields(extracted, answer, fields)
+
+
+def _retry_risk(raw_text: str, pdf_metadata: Optional[dict]) -> float:
+    """Predicted chance (0-1) that the first extraction will need a retry."""
+    risk = 0.0
     if pdf_metadata:
-        print(f"   📄 Source: PDF ({pdf_metadata['page_count']} pages)")
-    else:
-        print(f"   📄 Source: Raw text")
+        if pdf_metadata.get("warnings"):
+            risk += RISK_PDF_WARNINGS
+        if pdf_metadata.get("is_scanned"):
+            risk += RISK_SCANNED
+    if "(cid:" in raw_text or "\ufffd" in raw_text:
+        risk += RISK_GARBLED
+    if estimate_tokens(raw_text, "ingestion") > LONG_INPUT_TOKENS:
+        risk += RISK_LONG
+    labels = count_labels(raw_text)
+    if labels == 0:
+        risk += RISK_NO_LABELS
+    elif labels <= 2:
+        risk += RISK_FEW_LABELS
+    return min(1.0, risk)
+
+
+def _print_speculation(risk: float):
+    print(f"   🔮 SPECULATIVE RETRY: input looks hard (risk {risk:.2f}); sending the hinted retry now")
+
+
+def _wasted_tokens(spent: dict, retry_messages: List[dict]) -> int:
+    """Tokens of an unneeded speculative retry: its usage if it completed, else its estimated prompt."""
+    if "usage" in spent:
+        return spent["usage"].get("total_tokens", 0)
+    return estimate_tokens(retry_messages, "ingestion")
+
+
+def _extract_speculatively(raw_invoice: str, tier: str, risk: float) -> tuple[dict, bool]:
+    """
+    First attempt and hinted retry (reasoning tier) sent concurrently.
     
-    print(f"   Input: {raw_invoice.strip()[:60]}...")
-    print("   Status: Extracting with Grok...")
-    print()
+    The retry runs in a worker thread. If the first attempt needs no
+    second pass, the retry is abandoned (its result, if any, is ignored)
+    and its tokens are scored as wasted once it ends; otherwise the better
+    of the two is kept, as in the serial flow.
     
-    # Build structured messages (system + user separation)
-    messages = build_extraction_messages(raw_invoice)
+    Returns:
+        (extraction, retry_attempted)
+    """
+    _print_speculation(risk)
+    retry_messages = _build_retry_messages(raw_invoice)
+    spent = {}
     
-    # Track retry state for observability
-    retry_attempted = False
+    def run_retry() -> dict:
+        response, spent["usage"] = call_grok(
+            messages=retry_messages,
+            json_mode=True,
+            max_tokens=1500,
+            return_usage=True,
+            stage="ingestion",
+            tier=REASONING
+        )
+        return parse_or_forget(spent["usage"], _parse_extraction, response)
+    
+    pool = ThreadPoolExecutor(max_workers=1)
+    # The worker runs in a copy of this context (usage/stage scope)
+    retry_future = pool.submit(contextvars.copy_context().run, run_retry)
+    pool.shutdown(wait=False)
     
     try:
-        # ATTEMPT 1: Initial extraction
-        response = call_grok(
-            messages=messages,
+        response, usage = call_grok(
+            messages=build_extraction_messages(raw_invoice),
             json_mode=True,
-            max_tokens=1500  # Increased for larger schema
+            max_tokens=1500,
+            return_usage=True,
+            stage="ingestion",
+            tier=tier
         )
-        
-        # Clean and parse the JSON response
-        cleaned_response = clean_json_response(response)
-        extracted = json.loads(cleaned_response)
-        
-        # =====================================================================
-        # SELF-CORRECTION CHECK (Phase 3)
-        # =====================================================================
-        if _needs_retry(extracted, raw_invoice):
-            print("   ⚠️  Low-confidence extraction detected")
-            print("   🔄 SELF-CORRECTION: Retrying with enhanced hints...")
-            print()
-            retry_attempted = True
-            
-            # ATTEMPT 2: Retry with explicit hints
-            retry_messages = _build_retry_messages(raw_invoice)
-            retry_response = call_grok(
-                messages=retry_messages,
-                json_mode=True,
-                max_tokens=1500
+        extracted = parse_or_forget(usage, _parse_extraction, response)
+    except CircuitOpenError:
+        raise
+    except Exception:
+        # The first attempt failed outright: the retry is the answer
+        record_speculation(risk, needed=True, speculated=True, stage="ingestion")
+        return retry_future.result(), True
+    
+    second_pass = _second_pass(extracted, raw_invoice, tier)
+    record_tier_outcome(tier, accepted=second_pass is None, stage="ingestion")
+    if second_pass is None:
+        # A running thread cannot be stopped: score the retry once its tokens are spent
+        retry_future.add_done_callback(lambda _: record_speculation(
+            risk, needed=False, speculated=True, stage="ingestion",
+            wasted_tokens=_wasted_tokens(spent, retry_messages),
+        ))
+        return extracted, False
+    record_speculation(risk, needed=True, speculated=True, stage="ingestion")
+    try:
+        retry_extracted = retry_future.result()
+    except CircuitOpenError as e:
+        _print_retry_skipped(e)
+        return extracted, False
+    return _pick_better_extraction(extracted, retry_extracted), True
+
+
+async def _extract_speculatively_async(raw_invoice: str, tier: str, risk: float, on_partial=None) -> tuple[dict, bool]:
+    """Async _extract_speculatively: the unneeded retry task is cancelled."""
+    _print_speculation(risk)
+    retry_messages = _build_retry_messages(raw_invoice)
+    spent = {}
+    
+    async def run_retry() -> dict:
+        response, spent["usage"] = await call_grok_async(
+            messages=retry_messages,
+            json_mode=True,
+            max_tokens=1500,
+            return_usage=True,
+            stage="ingestion",
+            tier=REASONING
+        )
+        return parse_or_forget(spent["usage"], _parse_extraction, response)
+    
+    retry_task = asyncio.create_task(run_retry())
+    try:
+        response, usage = await call_grok_async(
+            messages=build_extraction_messages(raw_invoice),
+            json_mode=True,
+            max_tokens=1500,
+            return_usage=True,
+            stream=on_partial is not None,
+            on_partial=_partials(on_partial),
+            stage="ingestion",
+            tier=tier
+        )
+        extracted = parse_or_forget(usage, _parse_extraction, response)
+    except CircuitOpenError:
+        retry_task.cancel()
+        raise
+    except Exception:
+        record_speculation(risk, needed=True, speculated=True, stage="ingestion")
+        return await retry_task, True
+    
+    second_pass = _second_pass(extracted, raw_invoice, tier)
+    record_tier_outcome(tier, accepted=second_pass is None, stage="ingestion")
+    if second_pass is None:
+        retry_task.cancel()
+        record_speculation(
+            risk, needed=False, speculated=True, stage="ingestion",
+            wasted_tokens=_wasted_tokens(spent, retry_messages),
+        )
+        return extracted, False
+    record_speculation(risk, needed=True, speculated=True, stage="ingestion")
+    try:
+        retry_extracted = await retry_task
+    except CircuitOpenError as e:
+        _print_retry_skipped(e)
+        return extracted, False
+    merged = _pick_better_extraction(extracted, retry_extracted)
+    _report_second_pass(on_partial, extracted, merged)
+    return merged, True
+
+
+def _chunk_requests(plan: ChunkPlan) -> List[tuple[List[dict], int, str]]:
+    """(messages, max_tokens, tier) for the header pass, then each page group's item pass."""
+    requests = [(CHUNK_HEADER_LAYOUT.messages(plan.header), 1500, route_tier(plan.header))]
+    for group in plan.groups:
+        max_tokens = CHUNK_MAX_TOKENS_PER_PAGE * len(split_pages(group))
+        requests.append((CHUNK_ITEMS_LAYOUT.messages(group), max_tokens, route_tier(group)))
+    return requests
+
+
+def _merge_chunks(header: dict, item_answers: List[dict]) -> tuple[dict, bool]:
+    """
+    The header pass with every group's items appended, in page order.
+    
+    The merged items must add up to the subtotal (total less tax when the
+    header pass found no subtotal); otherwise the result is flagged
+    CHUNK_MISMATCH_FLAG so a reviewer sees that rows may be missing.
+    
+    Returns:
+        (merged extraction, items add up)
+    """
+    merged = dict(header)
+    merged["items"] = [item for answer in item_answers for item in (answer.get("items") or [])]
+    try:
+        items_total = round(sum(float(item.get("amount") or 0) for item in merged["items"]), 2)
+        expected = float(header.get("subtotal") or 0) or float(header.get("amount") or 0) - float(header.get("tax") or 0)
+        matches = abs(items_total - expected) <= AMOUNT_TOLERANCE
+    except (TypeError, ValueError):
+        items_total, expected, matches = None, None, False
+    
+    if matches:
+        print(f"   ✅ {len(merged['items'])} line item(s) from {len(item_answers)} page group(s) add up to ${expected:,.2f}")
+    else:
+        merged["flags"] = list(merged.get("flags") or []) + [CHUNK_MISMATCH_FLAG]
+        print(f"   ⚠️  Merged line items ({items_total}) do not add up to the subtotal ({expected})")
+    return merged, matches
+
+
+def _plan_extraction(raw_invoice: str) -> tuple[Optional[ChunkPlan], bool]:
+    """
+    How to send an invoice: (page-chunk plan or None, whole text will be trimmed).
+    
+    Long multi-page invoices are chunked; so is any invoice with pages
+    whose whole-text prompt is over the ingestion budget, since trimming
+    would cut line items out of its middle. Text without pages is trimmed
+    and the result flagged PROMPT_TRIMMED_FLAG.
+    """
+    oversized = would_trim_prompt(build_extraction_messages(raw_invoice), "ingestion")
+    plan = plan_chunks(raw_invoice, oversized)
+    return plan, oversized and plan is None
+
+
+def _any_trimmed(requests: List[tuple[List[dict], int, str]]) -> bool:
+    return any(would_trim_prompt(messages, "ingestion") for messages, _, _ in requests)
+
+
+def _flag_prompt_trimmed(extracted: dict) -> dict:
+    """Mark an extraction made from trimmed invoice text for review."""
+    print("   ⚠️  Invoice text over the prompt budget: its middle was left out, line items may be missing")
+    return {**extracted, "flags": list(extracted.get("flags") or []) + [PROMPT_TRIMMED_FLAG]}
+
+
+def _print_chunk_plan(plan: ChunkPlan):
+    print(f"   📑 Long invoice: {plan.pages} pages → header pass + {len(plan.groups)} line-item pass(es), concurrently")
+
+
+def _extract_chunked(plan: ChunkPlan) -> dict:
+    """
+    Extract a long invoice with one header pass and one line-item pass per
+    page group, all in flight at once (see src/llm/chunking.py).
+    
+    Chunked extractions skip self-correction: a re-extraction would have to
+    read the whole invoice again. Gaps surface as flags for validation.
+    """
+    _print_chunk_plan(plan)
+    requests = _chunk_requests(plan)
+    trimmed = _any_trimmed(requests)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        # Workers run in a copy of this context (usage/stage scope)
+        futures = [
+            pool.submit(
+                contextvars.copy_context().run, call_grok,
+                messages=messages, json_mode=True, max_tokens=max_tokens, return_usage=True,
+                stage="ingestion", tier=tier,
             )
-            
-            retry_cleaned = clean_json_response(retry_response)
-            retry_extracted = json.loads(retry_cleaned)
-            
-            # Compare using confidence and completeness
-            original_confidence = int(extracted.get("confidence", 0))
-            retry_confidence = int(retry_extracted.get("confidence", 0))
-            
-            # Score based on: confidence + filled fields
-            def _score_extraction(ext):
-                score = int(ext.get("confidence", 0))
-                if ext.get("vendor", "UNKNOWN") != "UNKNOWN": score += 10
-                if float(ext.get("amount", 0.0)) > 0: score += 10
-                if ext.get("invoice_number", "UNKNOWN") != "UNKNOWN": score += 5
-                if ext.get("invoice_date"): score += 5
-                if ext.get("due_date"): score += 5
-                if len(ext.get("items", [])) > 0: score += 5
-                if ext.get("bill_from", {}).get("name"): score += 5
-                return score
-            
-            original_score = _score_extraction(extracted)
-            retry_score = _score_extraction(retry_extracted)
-            
-            if retry_score > original_score:
-                print(f"   ✅ Self-correction improved extraction! ({original_score} → {retry_score})")
-                extracted = retry_extracted
-            else:
-                print(f"   ℹ️  Self-correction did not improve; using original ({original_score} vs {retry_score})")
-        
-        # =====================================================================
-        # EXTRACT ALL FIELDS WITH DEFENSIVE DEFAULTS
-        # =====================================================================
-        
-        # Header Details
-        invoice_number = safe_get(extracted, "invoice_number", "UNKNOWN")
-        invoice_date = extracted.get("invoice_date")  # Can be None
-        due_date = extracted.get("due_date")  # Can be None
-        
-        # Amounts
-        amount = float(safe_get(extracted, "amount", 0.0))
-        subtotal = float(safe_get(extracted, "subtotal", amount))  # Default to amount
-        tax = float(safe_get(extracted, "tax", 0.0))
-        currency = safe_get(extracted, "currency", "USD")
-        
-        # Payment Info
-        payment_terms = extracted.get("payment_terms")  # Can be None
-        po_number = extracted.get("po_number")  # Can be None
-        
-        # Vendor (legacy + structured)
-        vendor = safe_get(extracted, "vendor", "UNKNOWN")
-        bill_from_raw = safe_get(extracted, "bill_from", {})
-        bill_from: ContactInfo = {
-            "name": safe_get(bill_from_raw, "name", vendor),
-            "address": bill_from_raw.get("address"),
-            "email": bill_from_raw.get("email"),
-            "phone": bill_from_raw.get("phone"),
-        }
-        
-        # Bill To
-        bill_to_raw = safe_get(extracted, "bill_to", {})
-        bill_to: ContactInfo = {
-            "name": bill_to_raw.get("name"),
-            "address": bill_to_raw.get("address"),
-            "entity": bill_to_raw.get("entity"),
-        }
-        
-        # Metadata
-        confidence = int(safe_get(extracted, "confidence", 50))
-        flags = safe_get(extracted, "flags", [])
-        
-        # Line items
-        items_raw = safe_get(extracted, "items", [])
-        
-        # Print extraction summary
-        print(f"   ✅ Invoice #: {invoice_number}")
-        print(f"   ✅ Vendor: {vendor}")
-        print(f"   ✅ Amount: ${amount:,.2f} {currency}")
-        print(f"   ✅ Items: {len(items_raw)} line item(s)")
-        print(f"   ✅ Invoice Date: {invoice_date or 'null'}")
-        print(f"   ✅ Due Date: {due_date or 'null'}")
-        print(f"   ✅ Payment Terms: {payment_terms or 'null'}")
-        print(f"   ✅ PO Number: {po_number or 'null'}")
-        print(f"   📊 Confidence: {confidence}%")
-        if flags:
-            print(f"   ⚠️  Flags: {', '.join(flags)}")
-        if retry_attempted:
-            print(f"   🔄 Self-correction: ATTEMPTED")
-        
-    except json.JSONDecodeError as e:
-        print(f"   ❌ JSON parsing failed: {e}")
-        return {
-            "invoice_data": None,
-            "current_agent": "validation",
-            "status": "failed",
-            "error": f"Ingestion failed: Invalid JSON response - {e}",
-        }
-    except Exception as e:
-        print(f"   ❌ Extraction failed: {e}")
-        return {
-            "invoice_data": None,
-            "current_agent": "validation",
-            "status": "failed",
-            "error": f"Ingestion failed: {e}",
-        }
+            for messages, max_tokens, tier in requests
+        ]
+        answers = [
+            parse_or_forget(usage, _decode_answer, response)
+            for response, usage in (future.result() for future in futures)
+        ]
+    extracted, matches = _merge_chunks(answers[0], answers[1:])
+    record_chunking(plan, time.perf_counter() - start, matches)
+    return _flag_prompt_trimmed(extracted) if trimmed else extracted
+
+
+async def _extract_chunked_async(plan: ChunkPlan) -> dict:
+    """Async _extract_chunked: the passes are gathered on the event loop."""
+    _print_chunk_plan(plan)
+    requests = _chunk_requests(plan)
+    trimmed = _any_trimmed(requests)
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        call_grok_async(
+            messages=messages, json_mode=True, max_tokens=max_tokens, return_usage=True,
+            stage="ingestion", tier=tier,
+        )
+        for messages, max_tokens, tier in requests
+    ))
+    answers = [parse_or_forget(usage, _decode_answer, response) for response, usage in responses]
+    extracted, matches = _merge_chunks(answers[0], answers[1:])
+    record_chunking(plan, time.perf_counter() - start, matches)
+    return _flag_prompt_trimmed(extracted) if trimmed else extracted
+
+
+def _print_tier(tier: str):
+    print(f"   🧭 Model tier: {tier} ({get_model(tier)})")
+
+
+def _print_retry_notice(kind: str = "retry"):
+    if kind == "escalate":
+        print("   ⚠️  Fast-model extraction below confidence threshold")
+        print(f"   🔄 ESCALATION: Re-extracting with {get_model(REASONING)}...")
+        print()
+        return
+    print("   ⚠️  Low-confidence extraction detected")
+    print("   🔄 SELF-CORRECTION: Retrying with enhanced hints...")
+    print()
+
+
+def _print_retry_skipped(e: Exception):
+    # Circuit open: keep the first-pass extraction rather than failing
+    print(f"   ⚠️  Self-correction skipped: {e}")
+    print()
+
+
+def _build_invoice_data(
+    extracted: dict,
+    raw_invoice: str,
+    pdf_metadata: Optional[dict],
+    retry_attempted: bool
+) -> InvoiceData:
+    """
+    Convert a parsed Grok extraction into InvoiceData with defensive defaults.
+    
+    Raises ValueError/TypeError if numeric fields cannot be converted.
+    """
+    # Header Details
+    invoice_number = safe_get(extracted, "invoice_number", "UNKNOWN")
+    invoice_date = extracted.get("invoice_date")  # Can be None
+    due_date = extracted.get("due_date")  # Can be None
+    
+    # Amounts
+    amount = float(safe_get(extracted, "amount", 0.0))
+    subtotal = float(safe_get(extracted, "subtotal", amount))  # Default to amount
+    tax = float(safe_get(extracted, "tax", 0.0))
+    currency = safe_get(extracted, "currency", "USD")
+    
+    # Payment Info
+    payment_terms = extracted.get("payment_terms")  # Can be None
+    po_number = extracted.get("po_number")  # Can be None
+    
+    # Vendor (legacy + structured)
+    vendor = safe_get(extracted, "vendor", "UNKNOWN")
+    bill_from_raw = safe_get(extracted, "bill_from", {})
+    bill_from: ContactInfo = {
+        "name": safe_get(bill_from_raw, "name", vendor),
+        "address": bill_from_raw.get("address"),
+        "email": bill_from_raw.get("email"),
+        "phone": bill_from_raw.get("phone"),
+    }
+    
+    # Bill To
+    bill_to_raw = safe_get(extracted, "bill_to", {})
+    bill_to: ContactInfo = {
+        "name": bill_to_raw.get("name"),
+        "address": bill_to_raw.get("address"),
+        "entity": bill_to_raw.get("entity"),
+    }
+    
+    # Metadata
+    confidence = int(safe_get(extracted, "confidence", 50))
+    flags = safe_get(extracted, "flags", [])
+    
+    # Line items
+    items_raw = safe_get(extracted, "items", [])
+    
+    # Print extraction summary
+    print(f"   ✅ Invoice #: {invoice_number}")
+    print(f"   ✅ Vendor: {vendor}")
+    print(f"   ✅ Amount: ${amount:,.2f} {currency}")
+    print(f"   ✅ Items: {len(items_raw)} line item(s)")
+    print(f"   ✅ Invoice Date: {invoice_date or 'null'}")
+    print(f"   ✅ Due Date: {due_date or 'null'}")
+    print(f"   ✅ Payment Terms: {payment_terms or 'null'}")
+    print(f"   ✅ PO Number: {po_number or 'null'}")
+    print(f"   📊 Confidence: {confidence}%")
+    if flags:
+        print(f"   ⚠️  Flags: {', '.join(flags)}")
+    if retry_attempted:
+        print(f"   🔄 Self-correction: ATTEMPTED")
     
     # Transform to our TypedDict structure with defensive defaults
     items: List[InvoiceItem] = []
@@ -628,12 +1386,614 @@ def ingestion_agent(state: WorkflowState) -> dict:
     print()
     print("   📄 InvoiceData created successfully (all fields populated)")
     
+    return invoice_data
+
+
+def _try_fast_path(raw_invoice: str, pdf_metadata: Optional[dict]) -> Optional[InvoiceData]:
+    """
+    Rule-based extraction for simple key/value invoices (no Grok call).
+    
+    The parsed result must pass the same checks that trigger a Grok retry
+    (_needs_retry) and reach GROK_FAST_PATH_MIN_CONFIDENCE; otherwise
+    None is returned and the invoice goes to Grok as usual.
+    """
+    if not fast_path_enabled():
+        return None
+    
+    start = time.perf_counter()
+    extracted = parse_invoice(raw_invoice)
+    hit = (
+        extracted is not None
+        and not _needs_retry(extracted, raw_invoice)
+        and extracted["confidence"] >= fast_path_min_confidence()
+    )
+    fast_path_stats.record(hit, time.perf_counter() - start)
+    if not hit:
+        return None
+    
+    print(f"   ⚡ FAST PATH: parsed without Grok (confidence {extracted['confidence']}%)")
+    return _build_invoice_data(extracted, raw_invoice, pdf_metadata, retry_attempted=False)
+
+
+def _try_template(raw_invoice: str, pdf_metadata: Optional[dict]) -> tuple[Optional[InvoiceData], Optional[TemplateHit]]:
+    """
+    Extract a PDF with its vendor's learned layout template (no Grok call).
+    
+    Returns:
+        (invoice_data, None) on a hit; (None, hit) when the hit is due for a
+        spot check, so Grok extracts the invoice and check_template compares;
+        (None, None) when no template fits.
+    """
+    if not pdf_metadata or not pdf_metadata.get("words"):
+        return None, None
+    
+    hit = apply_templates(pdf_metadata["words"])
+    if hit is None or _needs_retry(hit.extracted, raw_invoice):
+        return None, None
+    if hit.spot_check:
+        print(f"   🔍 TEMPLATE SPOT CHECK: {hit.label} also extracted by Grok")
+        return None, hit
+    
+    print(f"   ⚡ VENDOR TEMPLATE: {hit.label}, parsed without Grok")
+    invoice_data = _build_invoice_data(hit.extracted, raw_invoice, pdf_metadata, retry_attempted=False)
+    invoice_data["extraction_template"] = hit.label
+    return invoice_data, None
+
+
+def _try_local_extraction(raw_invoice: str, pdf_metadata: Optional[dict]) -> tuple[Optional[InvoiceData], Optional[TemplateHit]]:
+    """Vendor template, then fast path; see _try_template for the return value."""
+    invoice_data, spot_check = _try_template(raw_invoice, pdf_metadata)
+    if invoice_data or spot_check:
+        return invoice_data, spot_check
+    return _try_fast_path(raw_invoice, pdf_metadata), None
+
+
+def _finish_spot_check(spot_check: Optional[TemplateHit], extracted: dict):
+    """Compare a spot-checked template with Grok's extraction (demotes it on disagreement)."""
+    if spot_check is None:
+        return
+    if check_template(spot_check, extracted):
+        print(f"   ✅ Template {spot_check.label} agrees with Grok")
+    else:
+        print(f"   ⚠️  Template {spot_check.label} disagrees with Grok — demoted")
+
+
+def _print_agent_header():
+    print()
+    print("=" * 60)
+    print("📥 INGESTION AGENT (Grok-Powered + PDF Support + Self-Correction)")
+    print("=" * 60)
+
+
+def _print_input_summary(raw_invoice: str, pdf_metadata: Optional[dict]):
+    # Log input source
+    if pdf_metadata:
+        print(f"   📄 Source: PDF ({pdf_metadata['page_count']} pages)")
+    else:
+        print(f"   📄 Source: Raw text")
+    
+    print(f"   Input: {raw_invoice.strip()[:60]}...")
+    print("   Status: Extracting with Grok...")
+    print()
+
+
+def _pdf_failure_result(pdf_error: str) -> dict:
+    print(f"   ❌ PDF extraction failed: {pdf_error}")
+    return {
+        "invoice_data": None,
+        "current_agent": "validation",
+        "status": "failed",
+        "error": f"PDF extraction failed: {pdf_error}",
+    }
+
+
+def _extraction_failure_result(e: Exception) -> dict:
+    if isinstance(e, CircuitOpenError):
+        # Fail fast: there is no extraction without Grok
+        print(f"   ⛔ {e}")
+        error = f"Ingestion failed: {e}"
+    elif isinstance(e, json.JSONDecodeError):
+        print(f"   ❌ JSON parsing failed: {e}")
+        error = f"Ingestion failed: Invalid JSON response - {e}"
+    else:
+        print(f"   ❌ Extraction failed: {e}")
+        error = f"Ingestion failed: {e}"
+    return {
+        "invoice_data": None,
+        "current_agent": "validation",
+        "status": "failed",
+        "error": error,
+    }
+
+
+# =============================================================================
+# AGENT FUNCTION
+# =============================================================================
+
+def ingestion_agent(state: WorkflowState) -> dict:
+    """
+    Parse raw invoice text OR PDF into structured InvoiceData.
+    
+    Uses Grok with JSON mode for reliable structured extraction.
+    Implements defensive defaults for all fields.
+    
+    **PDF Support (Session 2026-01-27_INGEST):**
+    If input is a PDF file path, extracts text using pdfplumber first,
+    then processes the extracted text through the normal pipeline.
+    
+    **Self-Correction (Phase 3):**
+    If initial extraction produces low-confidence results (UNKNOWN vendor
+    or 0.0 amount when input suggests real data), the agent retries once.
+    The retry asks only for the missing fields, with a compact schema and
+    the text regions likely to hold them, and merges each answer into the
+    first pass where it scores higher. With nothing specific missing (or
+    most of the invoice missing) it re-extracts everything with hints.
+    
+    **Fast path:**
+    Simple key/value invoices that the rule-based parser reads with high
+    confidence (src/tools/invoice_parser.py) skip Grok entirely.
+    
+    **Vendor templates:**
+    PDFs from vendors whose layout was learned from approved invoices
+    (src/tools/vendor_templates.py) are read from word positions without
+    Grok. Spot-checked uses are extracted by Grok as usual and compared;
+    a disagreement demotes the template.
+    
+    **Speculative retry:**
+    Inputs that look hard before any call (PDF warnings, scans, garbled
+    glyphs, very long text, no recognizable labels) can send the hinted
+    retry together with the first attempt (GROK_SPECULATE_ENABLED), saving
+    a round trip when the retry turns out to be needed. Every prediction
+    is scored, so the predictor's precision shows in /api/metrics.
+    
+    **Long invoices:**
+    Invoices with GROK_CHUNK_MIN_PAGES or more pages, or with fewer pages
+    but over the ingestion prompt budget, are extracted as a header/totals
+    pass over the first and last pages plus one line-item pass per page
+    group, sent concurrently; the merged items are checked against the
+    subtotal. Text over the budget that cannot be split is trimmed, and the
+    result flagged prompt_trimmed.
+    
+    **Model tiers:**
+    Clean, short invoices are extracted by the fast model first. The retry
+    always runs on the reasoning model, which also redoes fast-tier answers
+    whose confidence is below GROK_ESCALATE_CONFIDENCE.
+    
+    Args:
+        state: WorkflowState containing raw_invoice (text OR pdf path)
+        
+    Returns:
+        Dict with invoice_data and updated current_agent
+    """
+    _print_agent_header()
+    
+    # =========================================================================
+    # PDF EXTRACTION (if applicable)
+    # =========================================================================
+    raw_invoice, pdf_error, pdf_metadata = _extract_from_pdf_if_needed(state["raw_invoice"])
+    
+    # Handle PDF extraction failure
+    if pdf_error:
+        return _pdf_failure_result(pdf_error)
+    
+    _print_input_summary(raw_invoice, pdf_metadata)
+    
+    # Known vendor layouts and simple layouts are parsed without Grok
+    invoice_data, spot_check = _try_local_extraction(raw_invoice, pdf_metadata)
+    if invoice_data:
+        return {
+            "invoice_data": invoice_data,
+            "current_agent": "validation",
+        }
+    
+    # Track retry state for observability
+    retry_attempted = False
+    
+    # Long multi-page invoices (and any over the prompt budget) are
+    # extracted page group by page group
+    chunk_plan, trimmed = _plan_extraction(raw_invoice)
+    
+    # Clean, short invoices start on the fast model
+    tier = route_tier(raw_invoice)
+    _print_tier(tier)
+    
+    # Inputs that look hard get the retry sent alongside the first attempt
+    risk = _retry_risk(raw_invoice, pdf_metadata)
+    
+    try:
+        start = time.perf_counter()
+        
+        if chunk_plan:
+            extracted = _extract_chunked(chunk_plan)
+        elif should_speculate(risk):
+            extracted, retry_attempted = _extract_speculatively(raw_invoice, tier, risk)
+        else:
+            # ATTEMPT 1: Initial extraction
+            response, usage = call_grok(
+                messages=build_extraction_messages(raw_invoice),
+                json_mode=True,
+                max_tokens=1500,  # Increased for larger schema
+                return_usage=True,
+                stage="ingestion",
+                tier=tier
+            )
+            extracted = parse_or_forget(usage, _parse_extraction, response)
+            
+            # =================================================================
+            # SELF-CORRECTION / ESCALATION CHECK (Phase 3)
+            # =================================================================
+            second_pass = _second_pass(extracted, raw_invoice, tier)
+            record_tier_outcome(tier, accepted=second_pass is None, stage="ingestion")
+            record_speculation(risk, needed=second_pass is not None, speculated=False, stage="ingestion")
+            if second_pass:
+                _print_retry_notice(second_pass)
+                retry_attempted = True
+            
+                # ATTEMPT 2: Re-extract the missing fields (or, on escalation,
+                # the whole invoice) on the reasoning model
+                messages, fields, max_tokens = _second_pass_plan(second_pass, raw_invoice, extracted)
+                try:
+                    retry_response, retry_usage = call_grok(
+                        messages=messages,
+                        json_mode=True,
+                        max_tokens=max_tokens,
+                        return_usage=True,
+                        stage="ingestion",
+                        tier=REASONING
+                    )
+                    retry_extracted = parse_or_forget(retry_usage, _parse_second_pass, retry_response, fields)
+                    extracted = _apply_second_pass(extracted, retry_extracted, fields)
+                except CircuitOpenError as e:
+                    _print_retry_skipped(e)
+        
+        fast_path_stats.record_llm(time.perf_counter() - start)
+        _finish_spot_check(spot_check, extracted)
+        if trimmed:
+            extracted = _flag_prompt_trimmed(extracted)
+        invoice_data = _build_invoice_data(extracted, raw_invoice, pdf_metadata, retry_attempted)
+        
+    except Exception as e:
+        return _extraction_failure_result(e)
+    
+    return {
+        "invoice_data": invoice_data,
+        "current_agent": "validation",
+    }
+
+
+async def ingestion_agent_async(state: WorkflowState, on_partial=None) -> dict:
+    """
+    Async version of ingestion_agent for the streaming API.
+    
+    Same fast path, extraction and self-correction flow, but Grok calls go
+    through the pooled async client and PDF parsing runs in a worker
+    process (src/tools/pdf_pool.py), so the event loop keeps serving other
+    invoices while this one waits. Fast-path invoices emit no partials; the result arrives at once.
+    
+    Args:
+        state: WorkflowState containing raw_invoice (text OR pdf path)
+        on_partial: Optional on_partial(path, value) callback; when given,
+            the extraction is streamed and each field (vendor, amount,
+            items[i], ...) is reported as soon as Grok completes it
+        
+    Returns:
+        Dict with invoice_data and updated current_agent
+    """
+    _print_agent_header()
+    
+    raw_invoice, pdf_error, pdf_metadata = await _extract_from_pdf_if_needed_async(state["raw_invoice"])
+    
+    if pdf_error:
+        return _pdf_failure_result(pdf_error)
+    
+    _print_input_summary(raw_invoice, pdf_metadata)
+    
+    # Template matching and the fast path read and write SQLite: off the loop
+    invoice_data, spot_check = await asyncio.to_thread(_try_local_extraction, raw_invoice, pdf_metadata)
+    if invoice_data:
+        return {
+            "invoice_data": invoice_data,
+            "current_agent": "validation",
+        }
+    
+    retry_attempted = False
+    
+    chunk_plan, trimmed = _plan_extraction(raw_invoice)
+    
+    tier = route_tier(raw_invoice)
+    _print_tier(tier)
+    
+    risk = _retry_risk(raw_invoice, pdf_metadata)
+    
+    try:
+        start = time.perf_counter()
+        if chunk_plan:
+            extracted = await _extract_chunked_async(chunk_plan)
+        elif should_speculate(risk):
+            extracted, retry_attempted = await _extract_speculatively_async(raw_invoice, tier, risk, on_partial)
+        else:
+            response, usage = await call_grok_async(
+                messages=build_extraction_messages(raw_invoice),
+                json_mode=True,
+                max_tokens=1500,
+                return_usage=True,
+                stream=on_partial is not None,
+                on_partial=_partials(on_partial),
+                stage="ingestion",
+                tier=tier
+            )
+            extracted = parse_or_forget(usage, _parse_extraction, response)
+            
+            second_pass = _second_pass(extracted, raw_invoice, tier)
+            record_tier_outcome(tier, accepted=second_pass is None, stage="ingestion")
+            record_speculation(risk, needed=second_pass is not None, speculated=False, stage="ingestion")
+            if second_pass:
+                _print_retry_notice(second_pass)
+                retry_attempted = True
+            
+                messages, fields, max_tokens = _second_pass_plan(second_pass, raw_invoice, extracted)
+                try:
+                    retry_response, retry_usage = await call_grok_async(
+                        messages=messages,
+                        json_mode=True,
+                        max_tokens=max_tokens,
+                        return_usage=True,
+                        stage="ingestion",
+                        tier=REASONING
+                    )
+                    retry_extracted = parse_or_forget(retry_usage, _parse_second_pass, retry_response, fields)
+                    merged = _apply_second_pass(extracted, retry_extracted, fields)
+                    _report_second_pass(on_partial, extracted, merged)
+                    extracted = merged
+                except CircuitOpenError as e:
+                    _print_retry_skipped(e)
+        
+        fast_path_stats.record_llm(time.perf_counter() - start)
+        await asyncio.to_thread(_finish_spot_check, spot_check, extracted)
+        if trimmed:
+            extracted = _flag_prompt_trimmed(extracted)
+        invoice_data = _build_invoice_data(extracted, raw_invoice, pdf_metadata, retry_attempted)
+        
+    except Exception as e:
+        return _extraction_failure_result(e)
+    
     return {
         "invoice_data": invoice_data,
         "current_agent": "validation",
     }
 
 
+def _print_batch_item(key: str):
+    print()
+    print(f"   ── {key} ──")
+
+
+def _extraction_request(messages: List[dict], tier: str, max_tokens: int = 1500) -> dict:
+    return {"messages": messages, "json_mode": True, "max_tokens": max_tokens, "tier": tier}
+
+
+def _timed_batch(requests: dict[str, dict]) -> tuple[dict, float]:
+    """call_grok_batch for the ingestion stage, plus its wall time."""
+    start = time.perf_counter()
+    outcomes = call_grok_batch(requests, stage="ingestion") if requests else {}
+    return outcomes, time.perf_counter() - start
+
+
+def _round_usage(outcomes) -> dict:
+    usage = {"prompt_tokens": 0, "total_tokens": 0}
+    for outcome in outcomes:
+        if not isinstance(outcome, Exception):
+            usage["prompt_tokens"] += outcome[1].get("prompt_tokens", 0)
+            usage["total_tokens"] += outcome[1].get("total_tokens", 0)
+    return usage
+
+
+def _parse_outcome(outcome) -> dict:
+    """The extraction in a call_grok_batch outcome; raises what the call raised."""
+    if isinstance(outcome, Exception):
+        raise outcome
+    return parse_or_forget(outcome[1], _parse_extraction, outcome[0])
+
+
+def _extract_singles(keys: List[str], inputs: dict) -> dict:
+    """One extraction request per invoice; {key: extraction dict or exception}."""
+    outcomes, seconds = _timed_batch({
+        key: _extraction_request(build_extraction_messages(inputs[key][0]), inputs[key][2])
+        for key in keys
+    })
+    if keys:
+        record_packing("single", len(keys), len(keys), _round_usage(outcomes.values()), seconds)
+    
+    results = {}
+    for key, outcome in outcomes.items():
+        try:
+            results[key] = _parse_outcome(outcome)
+        except Exception as e:
+            results[key] = e
+    return results
+
+
+def _extract_packs(packs: List[List[str]], inputs: dict) -> tuple[dict, List[str]]:
+    """
+    Packed extraction requests; returns ({key: extraction}, keys to re-extract alone).
+    """
+    requests = {
+        f"pack-{number}": _extraction_request(
+            build_packed_extraction_messages([inputs[key][0] for key in keys]),
+            inputs[keys[0]][2],
+            PACKED_MAX_TOKENS_PER_INVOICE * len(keys),
+        )
+        for number, keys in enumerate(packs)
+    }
+    outcomes, seconds = _timed_batch(requests)
+    
+    results, fallbacks = {}, []
+    for request_id, keys in zip(requests, packs):
+        outcome = outcomes[request_id]
+        if isinstance(outcome, Exception):
+            answers = [None] * len(keys)
+        else:
+            answers = _split_packed_response(outcome[0], len(keys))
+            if all(answer is None for answer in answers):
+                forget_response(outcome[1])
+        for key, answer in zip(keys, answers):
+            if answer is None:
+                fallbacks.append(key)
+            else:
+                results[key] = answer
+    
+    record_packing(
+        "packed", sum(map(len, packs)), len(packs), _round_usage(outcomes.values()), seconds,
+        fallbacks=len(fallbacks),
+    )
+    return results, fallbacks
+
+
+def _extract_first_passes(inputs: dict) -> dict:
+    """
+    First-pass extraction of every queued invoice in the batch agent.
+    
+    With GROK_PACK_ENABLED, small invoices routed to the same tier are
+    packed several to a request (up to GROK_PACK_MAX_TOKENS of invoice
+    text) and run alongside the unpacked ones. Packed invoices whose answer
+    is missing or malformed are re-extracted one by one.
+    
+    Args:
+        inputs: {key: (raw text, pdf metadata, tier)}
+        
+    Returns:
+        {key: extraction dict, or the exception that stopped it}
+    """
+    sizes = {key: estimate_tokens(raw, "ingestion") for key, (raw, _, _) in inputs.items()}
+    packs, singles = [], []
+    for tier in dict.fromkeys(tier for _, _, tier in inputs.values()):
+        tier_packs, tier_singles = plan_packs({key: sizes[key] for key, (_, _, t) in inputs.items() if t == tier})
+        packs.extend(tier_packs)
+        singles.extend(tier_singles)
+    
+    if not packs:
+        return _extract_singles(singles, inputs)
+    
+    print(f"   📦 Packing {sum(map(len, packs))} small invoice(s) into {len(packs)} request(s)...")
+    # Packed and unpacked requests run side by side, timed separately
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        packed = pool.submit(contextvars.copy_context().run, _extract_packs, packs, inputs)
+        unpacked = pool.submit(contextvars.copy_context().run, _extract_singles, singles, inputs)
+        (results, fallbacks), single_results = packed.result(), unpacked.result()
+    results.update(single_results)
+    
+    if fallbacks:
+        print(f"   ↩️  Re-extracting {len(fallbacks)} packed invoice(s) one by one...")
+        results.update(_extract_singles(fallbacks, inputs))
+    return results
+
+
+def ingestion_agent_batch(states: dict[str, WorkflowState]) -> dict[str, dict]:
+    """
+    Bulk version of ingestion_agent for backlogs (month-end imports).
+    
+    Same templates, fast path, extraction, routing and self-correction rules,
+    but each round of Grok calls is one batch job (call_grok_batch): first
+    passes for every invoice, then one batch with all retries and escalations. With
+    GROK_PACK_ENABLED, small invoices share first-pass requests
+    (_extract_first_passes).
+    
+    Args:
+        states: {invoice key: WorkflowState with raw_invoice}
+        
+    Returns:
+        {invoice key: the dict ingestion_agent would have returned}
+    """
+    print()
+    print("=" * 60)
+    print(f"📥 INGESTION AGENT — BATCH ({len(states)} invoices)")
+    print("=" * 60)
+    
+    results = {}
+    inputs = {}  # key -> (raw text, pdf metadata, tier)
+    spot_checks = {}  # key -> TemplateHit due for a spot check
+    for key, state in states.items():
+        raw_invoice, pdf_error, pdf_metadata = _extract_from_pdf_if_needed(state["raw_invoice"])
+        if pdf_error:
+            _print_batch_item(key)
+            results[key] = _pdf_failure_result(pdf_error)
+            continue
+        _print_batch_item(key)
+        invoice_data, spot_check = _try_local_extraction(raw_invoice, pdf_metadata)
+        if invoice_data:
+            results[key] = {
+                "invoice_data": invoice_data,
+                "current_agent": "validation",
+            }
+            continue
+        print("   ⏳ Queued for Grok batch extraction")
+        inputs[key] = (raw_invoice, pdf_metadata, route_tier(raw_invoice))
+        if spot_check:
+            spot_checks[key] = spot_check
+    
+    if not inputs:
+        return results
+    
+    print()
+    print(f"   🧾 Extracting {len(inputs)} invoice(s) in one batch...")
+    first = _extract_first_passes(inputs)
+    
+    extracted = {}
+    second_passes = {}
+    for key in inputs:
+        outcome = first[key]
+        if isinstance(outcome, Exception):
+            _print_batch_item(key)
+            results[key] = _extraction_failure_result(outcome)
+            continue
+        extracted[key] = outcome
+        raw, _, tier = inputs[key]
+        second_pass = _second_pass(extracted[key], raw, tier)
+        record_tier_outcome(tier, accepted=second_pass is None, stage="ingestion")
+        if second_pass:
+            second_passes[key] = _second_pass_plan(second_pass, raw, extracted[key])
+    
+    if second_passes:
+        print(f"   🔄 Self-correcting / escalating {len(second_passes)} invoice(s) in one batch...")
+        second = call_grok_batch(
+            {
+                key: _extraction_request(messages, REASONING, max_tokens)
+                for key, (messages, _, max_tokens) in second_passes.items()
+            },
+            stage="ingestion",
+        )
+        for key, outcome in second.items():
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                retry_extracted = parse_or_forget(outcome[1], _parse_second_pass, outcome[0], second_passes[key][1])
+            except Exception as e:
+                # Keep the first pass, as the per-invoice agent does
+                _print_batch_item(key)
+                _print_retry_skipped(e)
+                continue
+            _print_batch_item(key)
+            extracted[key] = _apply_second_pass(extracted[key], retry_extracted, second_passes[key][1])
+    
+    for key, ext in extracted.items():
+        raw, pdf_metadata, _ = inputs[key]
+        _print_batch_item(key)
+        _finish_spot_check(spot_checks.get(key), ext)
+        if would_trim_prompt(build_extraction_messages(raw), "ingestion"):
+            ext = _flag_prompt_trimmed(ext)
+        try:
+            invoice_data = _build_invoice_data(ext, raw, pdf_metadata, key in second_passes)
+        except Exception as e:
+            results[key] = _extraction_failure_result(e)
+            continue
+        results[key] = {
+            "invoice_data": invoice_data,
+            "current_agent": "validation",
+        }
+    
+    return results
+
+
 # =============================================================================
 # STANDALONE TEST
 # =============================================================================
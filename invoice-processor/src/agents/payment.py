@@ -13,7 +13,6 @@ Builder: PRAG-001 (The Implementer)
 """
 
 import uuid
-import json
 from datetime import datetime
 from typing import Optional
 
@@ -21,8 +20,11 @@ from typing import Optional
 import src  # noqa: F401 - triggers path setup in __init__.py
 
 from src.schemas.models import WorkflowState, PaymentResult, AuditEvent
-from src.client import call_grok
-from src.utils import clean_json_response
+from src.agents.approval import duplicate_payment_block
+from src.client import call_grok, call_grok_async, parse_or_forget
+from src.llm.routing import FAST
+from src.llm.prompts import PromptLayout
+from src.llm.decoding import decode_json
 
 
 # =============================================================================
@@ -74,9 +76,25 @@ def mock_payment_api(vendor: str, amount: float) -> dict:
 
 REJECTION_ANALYSIS_PROMPT = """You are an AP (Accounts Payable) system analyzing why an invoice payment was blocked.
 
-Given the following invoice data and approval decision, generate a clear, professional audit log entry explaining why the payment was rejected.
+Given the invoice data and approval decision below, generate a clear, professional audit log entry explaining why the payment was rejected.
 
-INVOICE DATA:
+Generate a JSON response with:
+{
+    "title": "Brief title for the audit log (max 50 chars)",
+    "description": "Clear 1-2 sentence explanation of why payment was blocked",
+    "details": {
+        "primary_reason": "The main reason payment was blocked",
+        "contributing_factors": ["list", "of", "contributing", "factors"],
+        "recommendation": "What action should be taken (e.g., review vendor, request approval)"
+    },
+    "severity": "critical" | "high" | "medium" | "low"
+}
+
+Be specific and actionable. Reference the actual data provided."""
+
+
+# Per-invoice data goes last so the instructions above stay a cached prefix
+REJECTION_DATA_TEMPLATE = """INVOICE DATA:
 - Vendor: {vendor}
 - Amount: ${amount:,.2f}
 - Invoice Number: {invoice_number}
@@ -91,21 +109,49 @@ APPROVAL DECISION:
 VALIDATION RESULT:
 - Valid: {validation_valid}
 - Errors: {validation_errors}
-- Warnings: {validation_warnings}
+- Warnings: {validation_warnings}"""
 
-Generate a JSON response with:
-{{
-    "title": "Brief title for the audit log (max 50 chars)",
-    "description": "Clear 1-2 sentence explanation of why payment was blocked",
-    "details": {{
-        "primary_reason": "The main reason payment was blocked",
-        "contributing_factors": ["list", "of", "contributing", "factors"],
-        "recommendation": "What action should be taken (e.g., review vendor, request approval)"
-    }},
-    "severity": "critical" | "high" | "medium" | "low"
-}}
 
-Be specific and actionable. Reference the actual data provided."""
+REJECTION_SYSTEM_MESSAGE = "You are an AP audit system. Generate clear, professional audit logs."
+
+REJECTION_LAYOUT = PromptLayout(REJECTION_SYSTEM_MESSAGE, REJECTION_ANALYSIS_PROMPT)
+
+
+def _build_rejection_messages(
+    invoice_data: dict,
+    approval_decision: dict,
+    validation_result: dict
+) -> list:
+    """Build the Grok messages for rejection analysis."""
+    data = REJECTION_DATA_TEMPLATE.format(
+        vendor=invoice_data.get("vendor", "Unknown"),
+        amount=invoice_data.get("amount", 0),
+        invoice_number=invoice_data.get("invoice_number", "Unknown"),
+        due_date=invoice_data.get("due_date", "Not specified"),
+        approved=approval_decision.get("approved", False),
+        approval_reason=approval_decision.get("reason", "No reason provided"),
+        risk_score=approval_decision.get("risk_score", 0),
+        red_flags=", ".join(approval_decision.get("red_flags", [])) or "None",
+        validation_valid=validation_result.get("is_valid", False),
+        validation_errors=", ".join(validation_result.get("errors", [])) or "None",
+        validation_warnings=", ".join(validation_result.get("warnings", [])) or "None",
+    )
+    return REJECTION_LAYOUT.messages(data)
+
+
+def _fallback_rejection_analysis(invoice_data: dict, approval_decision: dict, error: Exception) -> dict:
+    """Deterministic audit entry used when Grok analysis is unavailable."""
+    print(f"   ⚠️ Grok analysis failed, using fallback: {error}")
+    return {
+        "title": "Payment Rejected",
+        "description": f"Invoice from {invoice_data.get('vendor', 'Unknown')} was not approved for payment. {approval_decision.get('reason', 'See approval decision for details.')}",
+        "details": {
+            "primary_reason": approval_decision.get("reason", "Invoice not approved"),
+            "contributing_factors": approval_decision.get("red_flags", []),
+            "recommendation": "Review the approval decision and address any issues before resubmitting."
+        },
+        "severity": "high" if approval_decision.get("risk_score", 0) > 0.5 else "medium"
+    }
 
 
 def analyze_rejection_with_grok(
@@ -124,44 +170,45 @@ def analyze_rejection_with_grok(
     Returns:
         Dict with title, description, details for audit log
     """
-    prompt = REJECTION_ANALYSIS_PROMPT.format(
-        vendor=invoice_data.get("vendor", "Unknown"),
-        amount=invoice_data.get("amount", 0),
-        invoice_number=invoice_data.get("invoice_number", "Unknown"),
-        due_date=invoice_data.get("due_date", "Not specified"),
-        approved=approval_decision.get("approved", False),
-        approval_reason=approval_decision.get("reason", "No reason provided"),
-        risk_score=approval_decision.get("risk_score", 0),
-        red_flags=", ".join(approval_decision.get("red_flags", [])) or "None",
-        validation_valid=validation_result.get("is_valid", False),
-        validation_errors=", ".join(validation_result.get("errors", [])) or "None",
-        validation_warnings=", ".join(validation_result.get("warnings", [])) or "None",
-    )
+    messages = _build_rejection_messages(invoice_data, approval_decision, validation_result)
     
+    # Explains a decision already made: the fast model tier is enough
     try:
-        response = call_grok(
-            system_message="You are an AP audit system. Generate clear, professional audit logs.",
-            user_message=prompt,
-            model="grok-3-mini",  # Use faster model for audit logs
-            temperature=0.1,
+        response, usage = call_grok(
+            messages=messages,
             json_mode=True,
+            max_tokens=500,
+            return_usage=True,
+            stage="payment",
+            tier=FAST,
         )
         
-        cleaned = clean_json_response(response)
-        return json.loads(cleaned)
+        return parse_or_forget(usage, decode_json, response)
     except Exception as e:
         # Fallback if Grok fails
-        print(f"   ⚠️ Grok analysis failed, using fallback: {e}")
-        return {
-            "title": "Payment Rejected",
-            "description": f"Invoice from {invoice_data.get('vendor', 'Unknown')} was not approved for payment. {approval_decision.get('reason', 'See approval decision for details.')}",
-            "details": {
-                "primary_reason": approval_decision.get("reason", "Invoice not approved"),
-                "contributing_factors": approval_decision.get("red_flags", []),
-                "recommendation": "Review the approval decision and address any issues before resubmitting."
-            },
-            "severity": "high" if approval_decision.get("risk_score", 0) > 0.5 else "medium"
-        }
+        return _fallback_rejection_analysis(invoice_data, approval_decision, e)
+
+
+async def analyze_rejection_with_grok_async(
+    invoice_data: dict,
+    approval_decision: dict,
+    validation_result: dict
+) -> dict:
+    """Async version of analyze_rejection_with_grok (pooled Grok client)."""
+    messages = _build_rejection_messages(invoice_data, approval_decision, validation_result)
+    
+    try:
+        response, usage = await call_grok_async(
+            messages=messages,
+            json_mode=True,
+            max_tokens=500,
+            return_usage=True,
+            stage="payment",
+            tier=FAST,
+        )
+        return parse_or_forget(usage, decode_json, response)
+    except Exception as e:
+        return _fallback_rejection_analysis(invoice_data, approval_decision, e)
 
 
 def create_audit_event(
@@ -188,20 +235,8 @@ def create_audit_event(
 # AGENT FUNCTION
 # =============================================================================
 
-def payment_agent(state: WorkflowState) -> dict:
-    """
-    Execute payment for approved invoices OR log rejection for unapproved ones.
-    
-    Approval can come from:
-    1. AI auto-approve: approval_decision.approved = True
-    2. Human approval: approved_by starts with "human:" OR invoice_status is approved/ready_to_pay
-    
-    Args:
-        state: WorkflowState containing invoice_data and approval_decision
-        
-    Returns:
-        Dict with payment_result, final status, and audit_trail events
-    """
+def _payment_context(state: WorkflowState) -> dict:
+    """Resolve invoice details and approval status from every approval source."""
     print()
     print("=" * 60)
     print("💰 PAYMENT AGENT")
@@ -228,8 +263,13 @@ def payment_agent(state: WorkflowState) -> dict:
     invoice_status = state.get("invoice_status", "")
     status_approved = invoice_status in ["approved", "ready_to_pay", "auto_approved", "paying"]
     
-    # Invoice is considered approved if ANY of these conditions are true
+    # Invoice is considered approved if ANY of these conditions are true,
+    # except a probable duplicate, which only a human can approve
     approved = ai_approved or human_approved or status_approved
+    duplicate_block = duplicate_payment_block(state)
+    if duplicate_block:
+        approved = False
+        print(f"   ⚠️  {duplicate_block}")
     
     # Debug logging
     print(f"   Approval Check:")
@@ -243,51 +283,79 @@ def payment_agent(state: WorkflowState) -> dict:
     print(f"   Approval Status: {'APPROVED' if approved else 'NOT APPROVED'}")
     print()
     
-    # Initialize audit trail for this agent
+    return {
+        "invoice_data": invoice_data,
+        "approval_decision": approval_decision,
+        "validation_result": validation_result,
+        "existing_audit_trail": existing_audit_trail,
+        "vendor": vendor,
+        "amount": amount,
+        "invoice_number": invoice_number,
+        "approved": approved,
+        "ai_approved": ai_approved,
+        "human_approved": human_approved,
+        "approved_by": approved_by,
+        "invoice_status": invoice_status,
+    }
+
+
+def _print_rejection_notice():
+    print("   ❌ Payment blocked: Invoice not approved")
+    print("   🤖 Analyzing rejection with Grok...")
+
+
+def _rejection_result(ctx: dict, rejection_analysis: dict) -> dict:
+    """Log the Grok (or fallback) rejection analysis as an audit event."""
+    vendor = ctx["vendor"]
+    amount = ctx["amount"]
+    invoice_number = ctx["invoice_number"]
+    approval_decision = ctx["approval_decision"] or {}
+    existing_audit_trail = ctx["existing_audit_trail"]
     audit_events = []
     
-    # Safety check: Don't process payment if not approved
-    if not approved:
-        print("   ❌ Payment blocked: Invoice not approved")
-        print("   🤖 Analyzing rejection with Grok...")
-        
-        # Use Grok to analyze the rejection and create meaningful log
-        rejection_analysis = analyze_rejection_with_grok(
-            invoice_data or {},
-            approval_decision or {},
-            validation_result or {}
-        )
-        
-        print(f"   📝 Audit Log: {rejection_analysis.get('title', 'Payment Rejected')}")
-        
-        # Create audit event for the rejection
-        rejection_event = create_audit_event(
-            event_type="payment_rejected",
-            actor="ai:payment",
-            title=rejection_analysis.get("title", "Payment Rejected"),
-            description=rejection_analysis.get("description", "Invoice was not approved for payment."),
-            details={
-                **rejection_analysis.get("details", {}),
-                "vendor": vendor,
-                "amount": amount,
-                "invoice_number": invoice_number,
-                "approval_reason": approval_decision.get("reason", "Unknown"),
-                "risk_score": approval_decision.get("risk_score", 0),
-                "severity": rejection_analysis.get("severity", "medium"),
-            },
-            ai_summary=rejection_analysis.get("description"),
-        )
-        audit_events.append(rejection_event)
-        
-        return {
-            "payment_result": {
-                "success": False,
-                "transaction_id": None,
-                "error": "Payment blocked: Invoice was not approved",
-            },
-            "status": "rejected",
-            "audit_trail": existing_audit_trail + audit_events,
-        }
+    print(f"   📝 Audit Log: {rejection_analysis.get('title', 'Payment Rejected')}")
+    
+    # Create audit event for the rejection
+    rejection_event = create_audit_event(
+        event_type="payment_rejected",
+        actor="ai:payment",
+        title=rejection_analysis.get("title", "Payment Rejected"),
+        description=rejection_analysis.get("description", "Invoice was not approved for payment."),
+        details={
+            **rejection_analysis.get("details", {}),
+            "vendor": vendor,
+            "amount": amount,
+            "invoice_number": invoice_number,
+            "approval_reason": approval_decision.get("reason", "Unknown"),
+            "risk_score": approval_decision.get("risk_score", 0),
+            "severity": rejection_analysis.get("severity", "medium"),
+        },
+        ai_summary=rejection_analysis.get("description"),
+    )
+    audit_events.append(rejection_event)
+    
+    return {
+        "payment_result": {
+            "success": False,
+            "transaction_id": None,
+            "error": "Payment blocked: Invoice was not approved",
+        },
+        "status": "rejected",
+        "audit_trail": existing_audit_trail + audit_events,
+    }
+
+
+def _execute_payment(ctx: dict) -> dict:
+    """Call the payment API for an approved invoice and record audit events."""
+    vendor = ctx["vendor"]
+    amount = ctx["amount"]
+    invoice_number = ctx["invoice_number"]
+    approved_by = ctx["approved_by"]
+    invoice_status = ctx["invoice_status"]
+    human_approved = ctx["human_approved"]
+    ai_approved = ctx["ai_approved"]
+    existing_audit_trail = ctx["existing_audit_trail"]
+    audit_events = []
     
     # Invoice is approved - proceed with payment
     print("   📤 Calling payment API...")
@@ -369,6 +437,59 @@ def payment_agent(state: WorkflowState) -> dict:
     }
 
 
+def payment_agent(state: WorkflowState) -> dict:
+    """
+    Execute payment for approved invoices OR log rejection for unapproved ones.
+    
+    Approval can come from:
+    1. AI auto-approve: approval_decision.approved = True
+    2. Human approval: approved_by starts with "human:" OR invoice_status is approved/ready_to_pay
+    
+    Args:
+        state: WorkflowState containing invoice_data and approval_decision
+        
+    Returns:
+        Dict with payment_result, final status, and audit_trail events
+    """
+    ctx = _payment_context(state)
+    
+    # Safety check: Don't process payment if not approved
+    if not ctx["approved"]:
+        _print_rejection_notice()
+        
+        # Use Grok to analyze the rejection and create meaningful log
+        rejection_analysis = analyze_rejection_with_grok(
+            ctx["invoice_data"] or {},
+            ctx["approval_decision"] or {},
+            ctx["validation_result"] or {}
+        )
+        return _rejection_result(ctx, rejection_analysis)
+    
+    return _execute_payment(ctx)
+
+
+async def payment_agent_async(state: WorkflowState) -> dict:
+    """
+    Async version of payment_agent for the streaming API.
+    
+    Only the Grok rejection analysis awaits the network; the mock payment
+    API is local and runs inline.
+    """
+    ctx = _payment_context(state)
+    
+    if not ctx["approved"]:
+        _print_rejection_notice()
+        
+        rejection_analysis = await analyze_rejection_with_grok_async(
+            ctx["invoice_data"] or {},
+            ctx["approval_decision"] or {},
+            ctx["validation_result"] or {}
+        )
+        return _rejection_result(ctx, rejection_analysis)
+    
+    return _execute_payment(ctx)
+
+
 # =============================================================================
 # STANDALONE TEST
 # =============================================================================
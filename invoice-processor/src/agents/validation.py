@@ -6,7 +6,8 @@ Validate invoice against inventory database and business rules using Grok reason
 This agent:
 1. Takes InvoiceData from ingestion
 2. Checks inventory database for stock availability
-3. Uses Grok to reason about validation concerns
+3. Uses Grok to reason about validation concerns (fast model for clean
+   invoices and first-pass matching, reasoning model on escalation)
 4. **CORRECTS/INFERS** fields that were poorly extracted (e.g., payment terms)
 5. Returns ValidationResult with pass/fail, corrections, and detailed reasons
 
@@ -16,18 +17,27 @@ Builder: PRAG-001 (The Implementer)
 Prompts: LLM-002 (Prompt Engineer) — Senior-level pattern
 """
 
-import json
 import re
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, Callable
 
 # Initialize path setup via package init
 import src  # noqa: F401 - triggers path setup in __init__.py
 
-from src.client import call_grok
+from src.client import (
+    call_grok,
+    call_grok_async,
+    call_grok_batch,
+    forget_response,
+    parse_or_forget,
+    record_tier_outcome,
+    should_escalate,
+)
+from src.llm.routing import FAST, REASONING
+from src.llm.prompts import PromptLayout
+from src.llm.decoding import decode_json, decode_object, decode_response, to_float
 from src.schemas.models import WorkflowState, ValidationResult
 from src.tools.database import validate_inventory, lookup_vendor_by_name, get_all_inventory, check_stock
-from src.utils import clean_json_response
 
 
 # =============================================================================
@@ -379,30 +389,14 @@ OUTPUT:
 # INVENTORY MATCHING FUNCTION
 # =============================================================================
 
-def match_invoice_items_to_inventory(invoice_items: list[dict]) -> dict:
-    """
-    Use Grok to fuzzy-match invoice items to inventory items.
-    
-    This handles typos, model numbers, case differences, etc.
-    
-    Args:
-        invoice_items: List of invoice line items with 'name' and 'quantity'
-        
-    Returns:
-        Dict with:
-        - matches: list of match results
-        - matched_inventory_check: dict mapping matched names to stock info
-    """
-    # Get all inventory items from database
-    all_inventory = get_all_inventory()
-    
-    if not all_inventory:
-        return {
-            "matches": [],
-            "matched_inventory_check": {},
-            "error": "No inventory items in database"
-        }
-    
+MATCHING_LAYOUT = PromptLayout(
+    INVENTORY_MATCHING_PROMPT,
+    task="Match these invoice items to inventory. Return the matches as JSON.",
+)
+
+
+def _build_matching_messages(invoice_items: list[dict], all_inventory: list[dict]) -> list:
+    """Build the Grok messages for fuzzy inventory matching."""
     # Build inventory list for prompt
     inventory_list = "\n".join([
         f"- {item['item']} ({item['stock']} in stock)"
@@ -415,60 +409,71 @@ def match_invoice_items_to_inventory(invoice_items: list[dict]) -> dict:
         for item in invoice_items
     ])
     
-    # Build the prompt
-    messages = [
-        {
-            "role": "system",
-            "content": INVENTORY_MATCHING_PROMPT
-        },
-        {
-            "role": "user",
-            "content": f"""Match these invoice items to inventory:
+    # Inventory changes rarely: keep it ahead of the invoice items so it
+    # stays part of the cached prompt prefix
+    return MATCHING_LAYOUT.messages(
+        f"INVOICE ITEMS:\n{invoice_items_list}",
+        context=[f"AVAILABLE INVENTORY:\n{inventory_list}"],
+    )
 
-INVOICE ITEMS:
-{invoice_items_list}
 
-AVAILABLE INVENTORY:
-{inventory_list}
+def _try_parse_matches(response: str, usage: dict) -> Optional[list]:
+    """Matches from a Grok answer, or None (and the answer uncached) if it is not usable JSON."""
+    try:
+        matches = decode_json(response).get("matches", [])
+    except (ValueError, AttributeError):
+        matches = None
+    if not isinstance(matches, list):
+        forget_response(usage)
+        return None
+    return matches
 
-Return the matches as JSON."""
-        }
-    ]
+
+def _escalate_matching(tier: str, matches: Optional[list], invoice_items: list[dict]) -> bool:
+    """
+    Redo a fast-tier matching on the reasoning model?
     
-    try:
-        response = call_grok(
-            messages=messages,
-            json_mode=True,
-            max_tokens=500
-        )
-        
-        cleaned_response = clean_json_response(response)
-        result = json.loads(cleaned_response)
-        matches = result.get("matches", [])
-        
-    except Exception as e:
-        print(f"   ⚠️ Grok matching failed, using exact matching fallback: {e}")
-        # Fallback to exact matching
-        matches = []
-        for item in invoice_items:
-            item_name = item.get("name", "")
-            exact_match = check_stock(item_name)
-            if exact_match:
-                matches.append({
-                    "invoice_item": item_name,
-                    "matched_inventory": item_name,
-                    "confidence": 1.0,
-                    "match_reason": "Exact match"
-                })
-            else:
-                matches.append({
-                    "invoice_item": item_name,
-                    "matched_inventory": None,
-                    "confidence": 0,
-                    "match_reason": "No match found (exact matching only)"
-                })
-    
-    # Now do stock checks using matched names
+    Yes when the answer is unusable, skips items, or its weakest
+    non-empty match is below GROK_ESCALATE_CONFIDENCE.
+    """
+    failed = matches is None or len(matches) < len(invoice_items)
+    lowest = min(
+        (to_float(m.get("confidence")) or 0.0 for m in matches or [] if m.get("matched_inventory")),
+        default=None,
+    )
+    escalate = should_escalate(tier, confidence=lowest, failed=failed)
+    record_tier_outcome(tier, accepted=not escalate, stage="validation")
+    if escalate:
+        print("   🔄 Uncertain matches from fast model; escalating to reasoning model...")
+    return escalate
+
+
+def _exact_match_fallback(invoice_items: list[dict], error: Exception) -> list[dict]:
+    """Exact-name matching used when Grok matching is unavailable."""
+    print(f"   ⚠️ Grok matching failed, using exact matching fallback: {error}")
+    matches = []
+    for item in invoice_items:
+        item_name = item.get("name", "")
+        exact_match = check_stock(item_name)
+        if exact_match:
+            matches.append({
+                "invoice_item": item_name,
+                "matched_inventory": item_name,
+                "confidence": 1.0,
+                "match_reason": "Exact match"
+            })
+        else:
+            matches.append({
+                "invoice_item": item_name,
+                "matched_inventory": None,
+                "confidence": 0,
+                "match_reason": "No match found (exact matching only)"
+            })
+    return matches
+
+
+def _check_matched_stock(matches: list[dict], invoice_items: list[dict]) -> dict:
+    """Run stock checks against the matched inventory names."""
     matched_inventory_check = {}
     for i, match in enumerate(matches):
         invoice_item = match.get("invoice_item", "")
@@ -514,10 +519,114 @@ Return the matches as JSON."""
                 "available": False,
                 "variance": -quantity,
             }
+    return matched_inventory_check
+
+
+def _no_inventory_result() -> dict:
+    return {
+        "matches": [],
+        "matched_inventory_check": {},
+        "error": "No inventory items in database"
+    }
+
+
+def match_invoice_items_to_inventory(invoice_items: list[dict]) -> dict:
+    """
+    Use Grok to fuzzy-match invoice items to inventory items.
+    
+    This handles typos, model numbers, case differences, etc.
+    
+    Args:
+        invoice_items: List of invoice line items with 'name' and 'quantity'
+        
+    Returns:
+        Dict with:
+        - matches: list of match results
+        - matched_inventory_check: dict mapping matched names to stock info
+    """
+    # Get all inventory items from database
+    all_inventory = get_all_inventory()
+    
+    if not all_inventory:
+        return _no_inventory_result()
+    
+    messages = _build_matching_messages(invoice_items, all_inventory)
+    
+    try:
+        # Fast model first; uncertain answers are redone by the reasoning model
+        response, usage = call_grok(
+            messages=messages,
+            json_mode=True,
+            max_tokens=500,
+            return_usage=True,
+            stage="validation",
+            tier=FAST
+        )
+        matches = _try_parse_matches(response, usage)
+        
+        if _escalate_matching(FAST, matches, invoice_items):
+            response, usage = call_grok(
+                messages=messages,
+                json_mode=True,
+                max_tokens=500,
+                return_usage=True,
+                stage="validation",
+                tier=REASONING
+            )
+            matches = _try_parse_matches(response, usage)
+        
+        if matches is None:
+            raise ValueError("Grok returned no usable matches")
+        
+    except Exception as e:
+        matches = _exact_match_fallback(invoice_items, e)
+    
+    return {
+        "matches": matches,
+        "matched_inventory_check": _check_matched_stock(matches, invoice_items),
+    }
+
+
+async def match_invoice_items_to_inventory_async(invoice_items: list[dict]) -> dict:
+    """Async version of match_invoice_items_to_inventory (pooled Grok client)."""
+    all_inventory = get_all_inventory()
+    
+    if not all_inventory:
+        return _no_inventory_result()
+    
+    messages = _build_matching_messages(invoice_items, all_inventory)
+    
+    try:
+        response, usage = await call_grok_async(
+            messages=messages,
+            json_mode=True,
+            max_tokens=500,
+            return_usage=True,
+            stage="validation",
+            tier=FAST
+        )
+        matches = _try_parse_matches(response, usage)
+        
+        if _escalate_matching(FAST, matches, invoice_items):
+            response, usage = await call_grok_async(
+                messages=messages,
+                json_mode=True,
+                max_tokens=500,
+                return_usage=True,
+                stage="validation",
+                tier=REASONING
+            )
+            matches = _try_parse_matches(response, usage)
+        
+        if matches is None:
+            raise ValueError("Grok returned no usable matches")
+        
+    except Exception as e:
+        matches = _exact_match_fallback(invoice_items, e)
     
     return {
         "matches": matches,
-        "matched_inventory_check": matched_inventory_check,
+        "matched_inventory_check": _check_matched_stock(matches, invoice_items),
     }
 
 
@@ -525,6 +634,16 @@ Return the matches as JSON."""
 # HELPER FUNCTIONS
 # =============================================================================
 
+VALIDATION_LAYOUT = PromptLayout(
+    SYSTEM_PROMPT,
+    FEW_SHOT_EXAMPLE,
+    task="Validate this invoice. Analyze against the validation rules and return your assessment.",
+)
+
+# Field types of a validation answer (src/llm/decoding.py)
+VALIDATION_TYPES = {"is_valid": bool, "errors": list, "warnings": list}
+
+
 def build_validation_messages(
     vendor: str,
     amount: float,
@@ -535,31 +654,19 @@ def build_validation_messages(
     """
     Build the messages array for validation reasoning.
     
-    Separates system instructions from the specific invoice data.
+    Separates system instructions from the specific invoice data; the
+    instructions form a stable prefix for Grok's prompt cache.
     """
-    user_content = f"""Validate this invoice:
-
-INVOICE DATA:
+    data = f"""INVOICE DATA:
 - Vendor: {vendor}
 - Amount: ${amount:,.2f}
 - Due Date: {due_date or "null (missing)"}
 - Items: {items_summary}
 
 INVENTORY CHECK RESULTS:
-{inventory_results}
+{inventory_results}"""
 
-Analyze against the validation rules and return your assessment."""
-
-    return [
-        {
-            "role": "system",
-            "content": SYSTEM_PROMPT + "\n\n" + FEW_SHOT_EXAMPLE
-        },
-        {
-            "role": "user",
-            "content": user_content
-        }
-    ]
+    return VALIDATION_LAYOUT.messages(data)
 
 
 def format_inventory_results(inventory_check: dict) -> str:
@@ -597,41 +704,27 @@ def format_inventory_results(inventory_check: dict) -> str:
 # AGENT FUNCTION
 # =============================================================================
 
-def validation_agent(state: WorkflowState) -> dict:
+def _missing_invoice_result() -> dict:
+    print("   ❌ No invoice data to validate")
+    return {
+        "validation_result": {
+            "is_valid": False,
+            "errors": ["INGESTION: No invoice data provided — extraction may have failed"],
+            "warnings": [],
+            "inventory_check": {},
+            "corrections": {},
+        },
+        "current_agent": "approval",
+    }
+
+
+def _prepare_validation(invoice_data: dict) -> dict:
     """
-    Validate invoice against inventory and business rules.
-    
-    Combines deterministic database checks with Grok reasoning
-    for comprehensive validation. Also performs SMART CORRECTIONS
-    on poorly-extracted fields (e.g., boilerplate payment terms).
+    Run the deterministic pre-Grok steps: vendor enrichment and field corrections.
     
-    Args:
-        state: WorkflowState containing invoice_data
-        
-    Returns:
-        Dict with validation_result, corrected invoice_data, and updated current_agent
+    Returns a context dict consumed by the matching, reasoning and
+    finalization steps of the validation agent.
     """
-    print()
-    print("=" * 60)
-    print("✅ VALIDATION AGENT (Grok-Powered + Smart Corrections)")
-    print("=" * 60)
-    
-    invoice_data = state.get("invoice_data")
-    
-    # Handle missing invoice data (ingestion failed)
-    if not invoice_data:
-        print("   ❌ No invoice data to validate")
-        return {
-            "validation_result": {
-                "is_valid": False,
-                "errors": ["INGESTION: No invoice data provided — extraction may have failed"],
-                "warnings": [],
-                "inventory_check": {},
-                "corrections": {},
-            },
-            "current_agent": "approval",
-        }
-    
     # Make a mutable copy of invoice_data for corrections
     corrected_invoice_data = dict(invoice_data)
     corrections = {}  # Track all corrections made
@@ -724,12 +817,22 @@ def validation_agent(state: WorkflowState) -> dict:
     
     print()
     
-    # Step 1: GROK-POWERED INVENTORY MATCHING (handles typos, variations)
-    print("   🔍 Matching invoice items to inventory (Grok-powered)...")
-    
-    matching_result = match_invoice_items_to_inventory(items)
+    return {
+        "corrected_invoice_data": corrected_invoice_data,
+        "corrections": corrections,
+        "enrichments": enrichments,
+        "vendor_profile": vendor_profile,
+        "vendor": vendor,
+        "amount": amount,
+        "items": items,
+        "due_date": due_date,
+    }
+
+
+def _report_matching(ctx: dict, matching_result: dict) -> list:
+    """Record matching results on the context and build the reasoning messages."""
     inventory_check = matching_result.get("matched_inventory_check", {})
-    matches = matching_result.get("matches", [])
+    ctx["inventory_check"] = inventory_check
     
     # Display matching results
     all_available = True
@@ -746,60 +849,108 @@ def validation_agent(state: WorkflowState) -> dict:
         else:
             print(f"      ❌ {item_name}: NO MATCH FOUND in inventory")
             all_available = False
+    ctx["all_available"] = all_available
     
     # Step 2: Build context for Grok reasoning
-    items_summary = ", ".join([f"{item['name']}:{item['quantity']}" for item in items]) or "None"
+    items_summary = ", ".join([f"{item['name']}:{item['quantity']}" for item in ctx["items"]]) or "None"
     inventory_results_str = format_inventory_results(inventory_check)
     
     print()
     print("   🤖 Grok analyzing validation rules...")
     
     # Step 3: Use Grok for validation reasoning
-    messages = build_validation_messages(
-        vendor=vendor,
-        amount=amount,
-        due_date=due_date,
+    return build_validation_messages(
+        vendor=ctx["vendor"],
+        amount=ctx["amount"],
+        due_date=ctx["due_date"],
         items_summary=items_summary,
         inventory_results=inventory_results_str
     )
+
+
+def _fallback_validation(ctx: dict, error: Exception) -> Tuple[bool, list, list]:
+    """Rule-based validation used when Grok reasoning is unavailable."""
+    print(f"   ⚠️ Grok reasoning failed, using deterministic fallback: {error}")
+    errors = []
+    warnings = []
+    inventory_check = ctx["inventory_check"]
+    vendor = ctx["vendor"]
+    amount = ctx["amount"]
     
-    try:
-        response = call_grok(
-            messages=messages,
-            json_mode=True,
-            max_tokens=600
-        )
-        
-        cleaned_response = clean_json_response(response)
-        validation = json.loads(cleaned_response)
-        
-        is_valid = validation.get("is_valid", False)
-        errors = validation.get("errors", [])
-        warnings = validation.get("warnings", [])
-        
-    except Exception as e:
-        print(f"   ⚠️ Grok reasoning failed, using deterministic fallback: {e}")
-        # Fallback to rule-based validation
-        errors = []
-        warnings = []
+    if not ctx["all_available"]:
+        for item_name, check in inventory_check.items():
+            if not check["available"]:
+                errors.append(
+                    f"INVENTORY: {item_name} — requested {check['requested']} "
+                    f"but only {check['in_stock']} in stock"
+                )
+    if not ctx["due_date"]:
+        errors.append("DUE_DATE: Missing or invalid due date")
+    if amount <= 0:
+        errors.append(f"AMOUNT: Invalid amount (${amount:.2f})")
+    if vendor in ("UNKNOWN", "", None):
+        errors.append("VENDOR: Missing or unknown vendor")
+    if amount > 10000:
+        warnings.append(f"AMOUNT: High-value invoice (${amount:,.2f} exceeds $10,000)")
         
-        if not all_available:
-            for item_name, check in inventory_check.items():
-                if not check["available"]:
-                    errors.append(
-                        f"INVENTORY: {item_name} — requested {check['requested']} "
-                        f"but only {check['in_stock']} in stock"
-                    )
-        if not due_date:
-            errors.append("DUE_DATE: Missing or invalid due date")
-        if amount <= 0:
-            errors.append(f"AMOUNT: Invalid amount (${amount:.2f})")
-        if vendor in ("UNKNOWN", "", None):
-            errors.append("VENDOR: Missing or unknown vendor")
-        if amount > 10000:
-            warnings.append(f"AMOUNT: High-value invoice (${amount:,.2f} exceeds $10,000)")
-            
-        is_valid = len(errors) == 0
+    return len(errors) == 0, errors, warnings
+
+
+def _parse_validation_response(response: str) -> Tuple[bool, list, list]:
+    """
+    (is_valid, errors, warnings) from a validation answer.
+    
+    Raises ValueError for an answer cut off before its end: the errors it
+    lost could have failed the invoice, so a repaired verdict is not used
+    (the fast tier escalates, otherwise the rule-based fallback decides).
+    """
+    decoded, truncated = decode_response(response)
+    if truncated:
+        raise ValueError("Validation answer was cut off before its end")
+    validation = decode_object(decoded, VALIDATION_TYPES)
+    return (
+        validation.get("is_valid", False),
+        validation.get("errors", []),
+        validation.get("warnings", []),
+    )
+
+
+def _validation_tier(ctx: dict) -> str:
+    """
+    Clean cases go to the fast model: a known, active vendor, a due date,
+    every item in stock and no corrections beyond vendor-master enrichment.
+    """
+    vendor_profile = ctx["vendor_profile"]
+    corrected = any(c.get("enrichment_type") != "vendor_master" for c in ctx["corrections"].values())
+    clean = (
+        vendor_profile is not None
+        and vendor_profile.get("status") != "suspended"
+        and ctx["due_date"]
+        and ctx["all_available"]
+        and not corrected
+    )
+    return FAST if clean else REASONING
+
+
+def _escalate_validation(tier: str, response: str, usage: dict) -> bool:
+    """A fast-tier verdict is confirmed by the reasoning model if unparseable (and then uncached) or failing."""
+    try:
+        is_valid = parse_or_forget(usage, _parse_validation_response, response)[0]
+    except (ValueError, AttributeError):
+        is_valid = None
+    escalate = should_escalate(tier, failed=not is_valid)
+    record_tier_outcome(tier, accepted=not escalate, stage="validation")
+    if escalate:
+        print("   🔄 Fast model did not pass this invoice; confirming with reasoning model...")
+    return escalate
+
+
+def _finalize_validation(ctx: dict, is_valid: bool, errors: list, warnings: list) -> dict:
+    """Apply vendor rules, build per-line detail, and assemble the agent result."""
+    corrections = ctx["corrections"]
+    vendor_profile = ctx["vendor_profile"]
+    vendor = ctx["vendor"]
+    inventory_check = ctx["inventory_check"]
     
     # Display results
     print()
@@ -837,7 +988,7 @@ def validation_agent(state: WorkflowState) -> dict:
     
     # Build detailed line items for frontend display
     line_items_validated = []
-    for item in items:
+    for item in ctx["items"]:
         item_name = item.get("name", "UNKNOWN")
         check = inventory_check.get(item_name, {})
         
@@ -869,7 +1020,7 @@ def validation_agent(state: WorkflowState) -> dict:
         "line_items_validated": line_items_validated,  # NEW: Detailed per-item info for frontend
         "corrections": corrections,  # Includes both corrections and enrichments
         "matched_vendor": vendor_profile.get("vendor_id") if vendor_profile else None,
-        "enrichments": enrichments,  # Separate tracking of enrichments
+        "enrichments": ctx["enrichments"],  # Separate tracking of enrichments
         # Full vendor profile from vendor master (Session 2026-01-28_VENDOR)
         # Used to populate Vendor Compliance section from authoritative source
         "vendor_profile": vendor_profile,
@@ -877,11 +1028,240 @@ def validation_agent(state: WorkflowState) -> dict:
     
     return {
         "validation_result": validation_result,
-        "invoice_data": corrected_invoice_data,  # Return corrected/enriched invoice data
+        "invoice_data": ctx["corrected_invoice_data"],  # Return corrected/enriched invoice data
         "current_agent": "approval",
     }
 
 
+def _print_agent_header():
+    print()
+    print("=" * 60)
+    print("✅ VALIDATION AGENT (Grok-Powered + Smart Corrections)")
+    print("=" * 60)
+
+
+def validation_agent(state: WorkflowState) -> dict:
+    """
+    Validate invoice against inventory and business rules.
+    
+    Combines deterministic database checks with Grok reasoning
+    for comprehensive validation. Also performs SMART CORRECTIONS
+    on poorly-extracted fields (e.g., boilerplate payment terms).
+    
+    Args:
+        state: WorkflowState containing invoice_data
+        
+    Returns:
+        Dict with validation_result, corrected invoice_data, and updated current_agent
+    """
+    _print_agent_header()
+    
+    invoice_data = state.get("invoice_data")
+    
+    # Handle missing invoice data (ingestion failed)
+    if not invoice_data:
+        return _missing_invoice_result()
+    
+    ctx = _prepare_validation(invoice_data)
+    
+    # Step 1: GROK-POWERED INVENTORY MATCHING (handles typos, variations)
+    print("   🔍 Matching invoice items to inventory (Grok-powered)...")
+    matching_result = match_invoice_items_to_inventory(ctx["items"])
+    messages = _report_matching(ctx, matching_result)
+    
+    tier = _validation_tier(ctx)
+    
+    try:
+        response, usage = call_grok(
+            messages=messages,
+            json_mode=True,
+            max_tokens=600,
+            return_usage=True,
+            stage="validation",
+            tier=tier
+        )
+        if _escalate_validation(tier, response, usage):
+            response, usage = call_grok(
+                messages=messages,
+                json_mode=True,
+                max_tokens=600,
+                return_usage=True,
+                stage="validation",
+                tier=REASONING
+            )
+        is_valid, errors, warnings = parse_or_forget(usage, _parse_validation_response, response)
+        
+    except Exception as e:
+        # Fallback to rule-based validation
+        is_valid, errors, warnings = _fallback_validation(ctx, e)
+    
+    return _finalize_validation(ctx, is_valid, errors, warnings)
+
+
+async def validation_agent_async(state: WorkflowState) -> dict:
+    """
+    Async version of validation_agent for the streaming API.
+    
+    Both Grok calls (inventory matching and validation reasoning) await the
+    pooled async client; the SQLite lookups are local and stay inline.
+    """
+    _print_agent_header()
+    
+    invoice_data = state.get("invoice_data")
+    
+    if not invoice_data:
+        return _missing_invoice_result()
+    
+    ctx = _prepare_validation(invoice_data)
+    
+    print("   🔍 Matching invoice items to inventory (Grok-powered)...")
+    matching_result = await match_invoice_items_to_inventory_async(ctx["items"])
+    messages = _report_matching(ctx, matching_result)
+    
+    tier = _validation_tier(ctx)
+    
+    try:
+        response, usage = await call_grok_async(
+            messages=messages,
+            json_mode=True,
+            max_tokens=600,
+            return_usage=True,
+            stage="validation",
+            tier=tier
+        )
+        if _escalate_validation(tier, response, usage):
+            response, usage = await call_grok_async(
+                messages=messages,
+                json_mode=True,
+                max_tokens=600,
+                return_usage=True,
+                stage="validation",
+                tier=REASONING
+            )
+        is_valid, errors, warnings = parse_or_forget(usage, _parse_validation_response, response)
+        
+    except Exception as e:
+        is_valid, errors, warnings = _fallback_validation(ctx, e)
+    
+    return _finalize_validation(ctx, is_valid, errors, warnings)
+
+
+def _print_batch_item(key: str):
+    print()
+    print(f"   ── {key} ──")
+
+
+def _run_tiered_batch(requests: dict[str, dict], escalate: Callable[[str, str, dict], bool]) -> dict[str, Any]:
+    """
+    Run requests as one batch, then redo the answers escalate(key, response,
+    usage) flags on the reasoning tier as a second batch.
+    
+    Returns:
+        {key: (response text, usage), or the exception that request raised}
+    """
+    answers = {}
+    escalated = {}
+    for key, outcome in call_grok_batch(requests, stage="validation").items():
+        answers[key] = outcome
+        if not isinstance(outcome, Exception) and escalate(key, *outcome):
+            escalated[key] = {**requests[key], "tier": REASONING}
+    
+    if escalated:
+        answers.update(call_grok_batch(escalated, stage="validation"))
+    return answers
+
+
+def validation_agent_batch(states: dict[str, WorkflowState]) -> dict[str, dict]:
+    """
+    Bulk version of validation_agent for backlogs.
+    
+    The deterministic steps run per invoice; the Grok steps run as batch
+    jobs (call_grok_batch) across all invoices: one for inventory matching,
+    one for validation reasoning, each followed by a batch of escalations.
+    
+    Args:
+        states: {invoice key: WorkflowState with invoice_data}
+        
+    Returns:
+        {invoice key: the dict validation_agent would have returned}
+    """
+    print()
+    print("=" * 60)
+    print(f"✅ VALIDATION AGENT — BATCH ({len(states)} invoices)")
+    print("=" * 60)
+    
+    results = {}
+    ctxs = {}
+    for key, state in states.items():
+        _print_batch_item(key)
+        invoice_data = state.get("invoice_data")
+        if not invoice_data:
+            results[key] = _missing_invoice_result()
+            continue
+        ctxs[key] = _prepare_validation(invoice_data)
+    
+    # Step 1: GROK-POWERED INVENTORY MATCHING, one batch for all invoices
+    print()
+    print(f"   🔍 Matching items of {len(ctxs)} invoice(s) to inventory in one batch...")
+    all_inventory = get_all_inventory()
+    matching = {}
+    if not all_inventory:
+        matching = {key: _no_inventory_result() for key in ctxs}
+    else:
+        answers = _run_tiered_batch(
+            {
+                key: {
+                    "messages": _build_matching_messages(ctx["items"], all_inventory),
+                    "json_mode": True,
+                    "max_tokens": 500,
+                    "tier": FAST,
+                }
+                for key, ctx in ctxs.items()
+            },
+            lambda key, response, usage: _escalate_matching(
+                FAST, _try_parse_matches(response, usage), ctxs[key]["items"]
+            ),
+        )
+        for key, ctx in ctxs.items():
+            answer = answers[key]
+            matches = None if isinstance(answer, Exception) else _try_parse_matches(*answer)
+            if matches is None:
+                error = answer if isinstance(answer, Exception) else ValueError("Grok returned no usable matches")
+                matches = _exact_match_fallback(ctx["items"], error)
+            matching[key] = {
+                "matches": matches,
+                "matched_inventory_check": _check_matched_stock(matches, ctx["items"]),
+            }
+    
+    # Step 2: validation reasoning, one batch for all invoices
+    requests = {}
+    for key, ctx in ctxs.items():
+        _print_batch_item(key)
+        requests[key] = {
+            "messages": _report_matching(ctx, matching[key]),
+            "json_mode": True,
+            "max_tokens": 600,
+            "tier": _validation_tier(ctx),
+        }
+    answers = _run_tiered_batch(
+        requests,
+        lambda key, response, usage: _escalate_validation(requests[key]["tier"], response, usage),
+    )
+    
+    for key, ctx in ctxs.items():
+        _print_batch_item(key)
+        try:
+            answer = answers[key]
+            if isinstance(answer, Exception):
+                raise answer
+            is_valid, errors, warnings = parse_or_forget(answer[1], _parse_validation_response, answer[0])
+        except Exception as e:
+            is_valid, errors, warnings = _fallback_validation(ctx, e)
+        results[key] = _finalize_validation(ctx, is_valid, errors, warnings)
+    
+    return results
+
+
 # =============================================================================
 # STANDALONE TEST
 # =============================================================================
@@ -0,0 +1,187 @@
+"""
+Pipeline Benchmark
+==================
+Time the three workflow stages over a corpus of invoices.
+
+Runs run_ingestion_workflow → run_approval_workflow → run_payment_workflow
+for every invoice (invoices left pending approval are approved by a
+"benchmark" approver so payment is exercised too) and reports, per stage,
+wall-clock p50/p95/p99 and CPU time.
+
+Combine with the replay backend to separate local regressions (PDF
+parsing, DB, JSON handling) from LLM latency:
+
+    # 1. Record once against Grok (or the simulator)
+    GROK_RECORD_PATH=data/bench.jsonl.gz GROK_CACHE_ENABLED=0 python main.py --benchmark
+
+    # 2. Replay: zero latency → local cost only; recorded → end-to-end
+    GROK_BACKEND=replay GROK_REPLAY_PATH=data/bench.jsonl.gz python main.py --benchmark
+    GROK_BACKEND=replay GROK_REPLAY_PATH=data/bench.jsonl.gz GROK_REPLAY_LATENCY=recorded \\
+        python main.py --benchmark
+
+Workflow output is silenced while timing; print cost still counts.
+
+Each run starts from a freshly seeded database and an empty response cache
+in a scratch directory, so approving invoices does not learn vendor
+templates in data/inventory.db and one run cannot speed up the next. The
+response cache and vendor templates are off unless GROK_CACHE_ENABLED /
+GROK_TEMPLATES_ENABLED are set for the run.
+"""
+
+import contextlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+CORPUS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data",
+    "invoices",
+)
+CORPUS_SUFFIXES = (".txt", ".pdf")
+STAGES = ("ingestion", "approval", "payment")
+
+
+def load_corpus(paths: Iterable[str] = (CORPUS_DIR,)) -> list[str]:
+    """Expand files and directories into a sorted list of invoice files (.txt / .pdf)."""
+    files = []
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            files.extend(str(f) for f in sorted(p.iterdir()) if f.suffix.lower() in CORPUS_SUFFIXES)
+        elif p.is_file():
+            files.append(str(p))
+    return files
+
+
+def _raw_invoice(path: str) -> str:
+    # The ingestion agent takes invoice text, or a path for PDFs
+    if path.lower().endswith(".pdf"):
+        return path
+    return Path(path).read_text(encoding="utf-8")
+
+
+def _timed(samples: list, fn: Callable, *args):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = fn(*args)
+    samples.append((time.perf_counter() - wall, time.process_time() - cpu))
+    return result
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0.0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+@contextlib.contextmanager
+def _scratch_state():
+    """Point the database and response cache at a temporary directory for the run."""
+    from src import client
+    from src.tools import database
+    
+    names = ("GROK_CACHE_ENABLED", "GROK_TEMPLATES_ENABLED", "GROK_CACHE_PATH")
+    saved_env = {name: os.environ.get(name) for name in names}
+    saved_path = database.DATABASE_PATH
+    
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as scratch:
+        os.environ.setdefault("GROK_CACHE_ENABLED", "0")
+        os.environ.setdefault("GROK_TEMPLATES_ENABLED", "0")
+        os.environ["GROK_CACHE_PATH"] = os.path.join(scratch, "grok_cache.db")
+        database.DATABASE_PATH = os.path.join(scratch, "inventory.db")
+        try:
+            database.init_database()
+            client.configure(force=True)
+            yield
+        finally:
+            database.DATABASE_PATH = saved_path
+            for name, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+            client.configure(force=True)
+
+
+def run_benchmark(corpus: list[str], iterations: int = 1) -> dict:
+    """
+    Run the staged workflow over corpus `iterations` times, against a
+    scratch database and response cache (see the module docstring).
+
+    Returns:
+        {"invoices", "iterations", "wall_seconds", "stages": {stage: {
+            "runs", "p50_ms", "p95_ms", "p99_ms", "cpu_ms", "cpu_p95_ms"}},
+            "fast_path": rule-based extraction hits and Grok time saved}
+    """
+    from src.schemas.models import InvoiceStatus
+    from src.tools.invoice_parser import get_fast_path_stats
+    from src.workflow import (
+        human_approve,
+        run_approval_workflow,
+        run_ingestion_workflow,
+        run_payment_workflow,
+    )
+
+    samples = {stage: [] for stage in STAGES}
+    started = time.perf_counter()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), _scratch_state():
+        for _ in range(iterations):
+            for path in corpus:
+                raw = _raw_invoice(path)
+                state = _timed(samples["ingestion"], run_ingestion_workflow, raw)
+                if not state.get("invoice_data"):
+                    continue
+                state = _timed(samples["approval"], run_approval_workflow, state)
+                if state.get("invoice_status") == InvoiceStatus.PENDING_APPROVAL.value:
+                    state = human_approve(state, "benchmark")
+                if state.get("invoice_status") in (
+                    InvoiceStatus.APPROVED.value, InvoiceStatus.AUTO_APPROVED.value
+                ):
+                    _timed(samples["payment"], run_payment_workflow, state)
+
+    stages = {}
+    for stage, runs in samples.items():
+        walls = [w * 1000 for w, _ in runs]
+        cpus = [c * 1000 for _, c in runs]
+        stages[stage] = {
+            "runs": len(runs),
+            "p50_ms": round(percentile(walls, 50), 2),
+            "p95_ms": round(percentile(walls, 95), 2),
+            "p99_ms": round(percentile(walls, 99), 2),
+            "cpu_ms": round(sum(cpus) / len(cpus), 2) if cpus else 0.0,
+            "cpu_p95_ms": round(percentile(cpus, 95), 2),
+        }
+
+    return {
+        "invoices": len(corpus),
+        "iterations": iterations,
+        "wall_seconds": round(time.perf_counter() - started, 3),
+        "stages": stages,
+        "fast_path": get_fast_path_stats(),
+    }
+
+
+def print_benchmark_report(report: dict):
+    """Print run_benchmark() results as a table."""
+    print(f"📊 Benchmark: {report['invoices']} invoices × {report['iterations']} iterations "
+          f"in {report['wall_seconds']:.2f}s")
+    print()
+    print(f"   {'Stage':<10} {'Runs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'CPU ms':>9} {'CPU p95':>9}")
+    print("   " + "-" * 64)
+    for stage, s in report["stages"].items():
+        print(f"   {stage:<10} {s['runs']:>5} {s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} "
+              f"{s['p99_ms']:>9.1f} {s['cpu_ms']:>9.1f} {s['cpu_p95_ms']:>9.1f}")
+    
+    fast = report.get("fast_path")
+    if fast and fast["attempts"]:
+        saved = fast["estimated_seconds_saved"]
+        print()
+        print(f"   ⚡ Fast path: {fast['hits']}/{fast['attempts']} invoices without Grok "
+              f"({fast['hit_rate']:.0%}, {fast['mean_fast_path_ms']:.2f} ms each"
+              + (f", ~{saved:.2f}s of Grok time saved)" if saved is not None else ")"))
@@ -4,73 +4,510 @@ Grok API Client
 Centralized client for xAI's Grok LLM.
 
 Usage:
-    from src.client import client, MODEL, test_connection
+    from src.client import call_grok, test_connection
     
     # Test that Grok is working
     test_connection()
     
     # Make API calls
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": "Hello"}]
+    content = call_grok([{"role": "user", "content": "Hello"}])
+    
+    # From async code (FastAPI/WebSocket handlers), use the pooled async client
+    content = await call_grok_async(messages, json_mode=True)
+    
+    # Stream, getting each JSON field as soon as Grok finishes it
+    content = await call_grok_async(
+        messages, json_mode=True, stream=True,
+        on_partial=lambda path, value: print(path, value),
     )
+
+Importing this module has no side effects: .env is loaded, settings are
+read and the backend is built on first use. GROK_BACKEND picks the backend
+(grok, replay, stub — see src/llm/backends.py); tests can swap one in with
+set_backend(). A missing XAI_API_KEY raises BackendConfigError on the first
+call instead of exiting the process.
+
+Identical requests (same model, messages, json_mode, max_tokens) are served
+from the response cache in src/llm/cache.py; pass use_cache=False to force a
+fresh completion. Answers cut off at max_tokens are never cached, and one
+the caller cannot parse is dropped with forget_response(usage). Everything that does reach Grok is shaped by the shared
+requests/min + tokens/min limiter in src/llm/rate_limiter.py, and
+concurrent identical requests share one in-flight call
+(src/llm/single_flight.py). With GROK_HEDGE_ENABLED (or hedge=True), a call
+slower than its stage's recent p95 races a duplicate (src/llm/hedging.py).
+Prompts are estimated locally first and shrunk to the stage's token budget
+when oversized (src/llm/budget.py). Calls may name a model tier
+(tier="fast" / "reasoning"); agents start clean invoices on the fast model
+and escalate to the reasoning model when needed (src/llm/routing.py).
+Inputs predicted to need a self-correction retry can run both attempts at
+once (GROK_SPECULATE_ENABLED, src/llm/speculation.py).
+
+Bulk backlogs use call_grok_batch(): cache misses are submitted as one
+batch job (src/llm/batch.py) and polled to completion. With
+GROK_PACK_ENABLED, small documents are packed several to a request first
+(plan_packs, src/llm/packing.py). Long multi-page documents are split into
+page groups extracted concurrently (plan_chunks, src/llm/chunking.py).
+
+Transient failures (timeouts, 429, 5xx) are retried with jittered backoff.
+If Grok keeps failing, the circuit breaker opens and calls raise
+CircuitOpenError immediately (src/llm/resilience.py); agents catch it and
+use their fallbacks instead of waiting out timeouts.
+
+Token usage is attributed per invoice and stage through contextvars:
+    with usage_scope(invoice_id, "ingestion"):
+        call_grok(...)
+    get_tracker(invoice_id).totals()
 """
 
+import asyncio
+import contextlib
+import contextvars
+import logging
 import os
 import sys
-from openai import OpenAI
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Validate API key exists
-api_key = os.environ.get("XAI_API_KEY")
-if not api_key:
-    print("❌ ERROR: XAI_API_KEY not found in environment")
-    print("   Please create a .env file with: XAI_API_KEY=your-key-here")
-    sys.exit(1)
-
-# Initialize the OpenAI-compatible client for xAI
-client = OpenAI(
-    api_key=api_key,
-    base_url="https://api.x.ai/v1"
-)
-
-# Model to use (can be overridden via environment)
-# Note: grok-beta deprecated 2025-09-15
-# Using grok-4-1-fast-reasoning: latest, fast, $0.20/M tokens
-MODEL = os.environ.get("GROK_MODEL", "grok-4-1-fast-reasoning")
-
-# Token usage tracking (updated after each call_grok)
-# Access via get_last_usage() or reset_usage_tracking()
-_usage_tracking = {
-    "last_call": None,
-    "total": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
-    "calls": []
-}
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from src.llm.backends import BackendConfigError, GrokBackend, RecordingBackend, create_backend
+from src.llm.batch import BatchRunner, batch_line, supports_batch
+from src.llm.budget import DEFAULT_STAGE_BUDGETS, PromptBudget, TokenEstimator, parse_budgets
+from src.llm.cache import ResponseCache, request_key
+from src.llm.chunking import ChunkPlan, PageChunker
+from src.llm.hedging import HedgePolicy, PartialGate, gate_partials
+from src.llm.incremental_json import IncrementalJSONParser
+from src.llm.packing import RequestPacker
+from src.llm.rate_limiter import RateLimiter
+from src.llm.routing import DEFAULT_FAST_MODEL, ModelRouter
+from src.llm.resilience import CircuitBreaker, RetryPolicy, is_retryable
+from src.llm.single_flight import SingleFlight
+from src.llm.speculation import SpeculationPolicy
+from src.llm.usage import current_stage, current_tracker, record_call, stage_scope
+from src.tools.database import DATABASE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# LAZY CONFIGURATION
+# =============================================================================
+
+DEFAULT_MODEL = "grok-4-1-fast-reasoning"
+
+# Populated by configure() on first use; read from .env / environment.
+#   model: Model to use (grok-beta deprecated 2025-09-15;
+#          grok-4-1-fast-reasoning: latest, fast, $0.20/M tokens)
+#   backend_name: GROK_BACKEND (grok | replay | stub | registered name)
+#   record_path: GROK_RECORD_PATH — record every backend call to this cassette
+_settings: dict = {}
+_backend = None
+_config_lock = threading.Lock()
+
+response_cache: ResponseCache | None = None
+rate_limiter: RateLimiter | None = None
+hedge_policy: HedgePolicy | None = None
+retry_policy: RetryPolicy | None = None
+circuit_breaker: CircuitBreaker | None = None
+prompt_budget: PromptBudget | None = None
+model_router: ModelRouter | None = None
+batch_runner: BatchRunner | None = None
+speculation_policy: SpeculationPolicy | None = None
+request_packer: RequestPacker | None = None
+page_chunker: PageChunker | None = None
+
+# In-flight deduplication: concurrent identical requests share one call
+single_flight = SingleFlight()
+
+
+def _env_flag(name: str, default: str = "1") -> bool:
+    return os.environ.get(name, default).lower() not in ("0", "false", "no")
+
+
+def configure(force: bool = False):
+    """
+    Load .env and build the cache and rate limiter from the environment.
+    
+    Runs once on first use; force=True re-reads the environment (tests).
+    The backend itself is built separately, by get_backend().
+    """
+    global response_cache, rate_limiter, hedge_policy, retry_policy, circuit_breaker, prompt_budget, model_router, batch_runner, speculation_policy, request_packer, page_chunker, _backend
+    if _settings and not force:
+        return
+    
+    with _config_lock:
+        if _settings and not force:
+            return
+        
+        from dotenv import load_dotenv
+        load_dotenv()
+        
+        data_dir = os.path.dirname(DATABASE_PATH)
+        
+        # Response cache (memory LRU + SQLite tier next to inventory.db)
+        response_cache = ResponseCache(
+            db_path=os.environ.get("GROK_CACHE_PATH", os.path.join(data_dir, "grok_cache.db")),
+            ttl_seconds=float(os.environ.get("GROK_CACHE_TTL_SECONDS", str(24 * 60 * 60))),
+            max_memory_entries=int(os.environ.get("GROK_CACHE_MAX_ENTRIES", "256")),
+            max_disk_bytes=int(float(os.environ.get("GROK_CACHE_MAX_MB", "50")) * 1024 * 1024),
+        )
+        
+        # Rate limiting (buckets shared by all threads and uvicorn workers via SQLite)
+        # Defaults match xAI's standard tier; set either limit to 0 to disable it.
+        rate_limiter = RateLimiter(
+            db_path=os.environ.get("GROK_RATE_LIMIT_PATH", os.path.join(data_dir, "grok_ratelimit.db")),
+            requests_per_minute=int(os.environ.get("GROK_RATE_LIMIT_RPM", "480")),
+            tokens_per_minute=int(os.environ.get("GROK_RATE_LIMIT_TPM", "4000000")),
+        )
+        
+        # Hedging (opt-in): duplicate a call that is slower than the stage's
+        # recent GROK_HEDGE_PERCENTILE latency; first response wins
+        hedge_policy = HedgePolicy(
+            enabled=_env_flag("GROK_HEDGE_ENABLED", "0"),
+            percentile=float(os.environ.get("GROK_HEDGE_PERCENTILE", "95")),
+            min_samples=int(os.environ.get("GROK_HEDGE_MIN_SAMPLES", "20")),
+            min_delay_seconds=float(os.environ.get("GROK_HEDGE_MIN_DELAY_MS", "200")) / 1000,
+        )
+        
+        # Retries with jittered backoff, and a circuit breaker that fails
+        # fast (CircuitOpenError) while Grok is erroring
+        retry_policy = RetryPolicy(
+            max_attempts=int(os.environ.get("GROK_RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.environ.get("GROK_RETRY_BASE_DELAY_MS", "500")) / 1000,
+            max_delay=float(os.environ.get("GROK_RETRY_MAX_DELAY_MS", "8000")) / 1000,
+        )
+        circuit_breaker = CircuitBreaker(
+            enabled=_env_flag("GROK_BREAKER_ENABLED"),
+            failure_rate=float(os.environ.get("GROK_BREAKER_FAILURE_RATE", "0.5")),
+            min_calls=int(os.environ.get("GROK_BREAKER_MIN_CALLS", "10")),
+            window=int(os.environ.get("GROK_BREAKER_WINDOW", "20")),
+            open_seconds=float(os.environ.get("GROK_BREAKER_OPEN_SECONDS", "30")),
+        )
+        
+        # Per-stage prompt budgets (GROK_PROMPT_BUDGETS="ingestion=12000,...");
+        # oversized invoice text is compressed, then trimmed, before sending
+        prompt_budget = PromptBudget(
+            TokenEstimator(),
+            budgets={**DEFAULT_STAGE_BUDGETS, **parse_budgets(os.environ.get("GROK_PROMPT_BUDGETS", ""))},
+            default_budget=int(os.environ.get("GROK_PROMPT_BUDGET_DEFAULT", "16000")),
+            enabled=_env_flag("GROK_PROMPT_BUDGET_ENABLED"),
+        )
+        
+        # Model tiers: fast model first, reasoning model on escalation
+        model = os.environ.get("GROK_MODEL", DEFAULT_MODEL)
+        model_router = ModelRouter(
+            fast_model=os.environ.get("GROK_FAST_MODEL", DEFAULT_FAST_MODEL),
+            reasoning_model=os.environ.get("GROK_REASONING_MODEL", model),
+            enabled=_env_flag("GROK_ROUTING_ENABLED"),
+            fast_max_tokens=int(os.environ.get("GROK_FAST_MAX_TOKENS", "2000")),
+            escalate_confidence=float(os.environ.get("GROK_ESCALATE_CONFIDENCE", "0.8")),
+        )
+        
+        # Batch jobs for bulk backlogs (call_grok_batch)
+        batch_runner = BatchRunner(
+            poll_seconds=float(os.environ.get("GROK_BATCH_POLL_SECONDS", "2")),
+            timeout_seconds=float(os.environ.get("GROK_BATCH_TIMEOUT_SECONDS", str(24 * 60 * 60))),
+            min_size=int(os.environ.get("GROK_BATCH_MIN_SIZE", "2")),
+        )
+        
+        # Speculative retries for inputs predicted to need one (scored even when off)
+        speculation_policy = SpeculationPolicy(
+            enabled=_env_flag("GROK_SPECULATE_ENABLED", "0"),
+            threshold=float(os.environ.get("GROK_SPECULATE_THRESHOLD", "0.5")),
+            min_precision=float(os.environ.get("GROK_SPECULATE_MIN_PRECISION", "0.5")),
+            min_samples=int(os.environ.get("GROK_SPECULATE_MIN_SAMPLES", "10")),
+        )
+        
+        # Several small documents per request in bulk runs (opt-in)
+        request_packer = RequestPacker(
+            enabled=_env_flag("GROK_PACK_ENABLED", "0"),
+            max_tokens=int(os.environ.get("GROK_PACK_MAX_TOKENS", "4000")),
+            max_items=int(os.environ.get("GROK_PACK_MAX_INVOICES", "8")),
+        )
+        
+        # Long documents split into page groups extracted concurrently
+        page_chunker = PageChunker(
+            enabled=_env_flag("GROK_CHUNK_ENABLED"),
+            min_pages=int(os.environ.get("GROK_CHUNK_MIN_PAGES", "4")),
+            pages_per_chunk=int(os.environ.get("GROK_CHUNK_PAGES", "2")),
+        )
+        
+        if force:
+            _backend = None
+        
+        _settings.update({
+            "model": model,
+            "backend_name": os.environ.get("GROK_BACKEND", "grok"),
+            "record_path": os.environ.get("GROK_RECORD_PATH"),
+            "cache_enabled": _env_flag("GROK_CACHE_ENABLED"),
+            "single_flight_enabled": _env_flag("GROK_SINGLE_FLIGHT_ENABLED"),
+            "batch_fallback_concurrency": int(os.environ.get("GROK_BATCH_FALLBACK_CONCURRENCY", "8")),
+        })
+
+
+def get_model(tier: str | None = None) -> str:
+    """Model for a tier ("fast" / "reasoning"); GROK_MODEL for untiered calls."""
+    configure()
+    if tier is None:
+        return _settings["model"]
+    return model_router.model_for(tier)
+
+
+def route_tier(text: str) -> str:
+    """Starting tier for a document: "fast" if it is short and cleanly extracted."""
+    configure()
+    tokens = prompt_budget.estimator.estimate([{"role": "user", "content": text}], current_stage())
+    return model_router.route(text, tokens)
+
+
+def should_escalate(tier: str | None, confidence: float | None = None, failed: bool = False) -> bool:
+    """
+    Whether an answer from tier should be redone on the reasoning tier.
+    
+    Args:
+        confidence: The answer's confidence, 0-1 (escalates below
+            GROK_ESCALATE_CONFIDENCE)
+        failed: The answer was unusable (unparseable, failed a check)
+    """
+    configure()
+    return model_router.should_escalate(tier, confidence, failed)
+
+
+def record_tier_outcome(tier: str | None, accepted: bool, stage: str | None = None):
+    """Record whether an answer from tier was kept or escalated (routing stats)."""
+    configure()
+    model_router.record_outcome(stage or current_stage(), tier, accepted)
+
+
+def should_speculate(risk: float) -> bool:
+    """Whether to run the retry alongside the first attempt for an input with this retry risk (0-1)."""
+    configure()
+    return speculation_policy.should_speculate(risk)
+
+
+def plan_packs(sizes: dict) -> tuple[list[list], list]:
+    """Group documents ({key: estimated tokens}) into packs and singles (GROK_PACK_* settings)."""
+    configure()
+    return request_packer.plan(sizes)
+
+
+def record_packing(kind: str, documents: int, requests: int, usage: dict, seconds: float, fallbacks: int = 0):
+    """Cost of a round of "packed" or "single" extraction requests (packing stats)."""
+    configure()
+    request_packer.record(kind, documents, requests, usage, seconds)
+    if fallbacks:
+        request_packer.record_fallbacks(fallbacks)
+
+
+def plan_chunks(text: str, oversized: bool = False) -> ChunkPlan | None:
+    """
+    Split a long multi-page document into header and page-group passes (GROK_CHUNK_* settings).
+    
+    oversized=True (the whole-document prompt would be trimmed) splits any
+    document with page markers, however few pages it has.
+    """
+    configure()
+    return page_chunker.plan(text, oversized)
+
+
+def record_chunking(plan: ChunkPlan, seconds: float, items_match: bool):
+    """One chunked extraction: its passes, wall time and subtotal check (chunking stats)."""
+    configure()
+    page_chunker.record(plan, seconds, items_match)
+
+
+def record_speculation(
+    risk: float,
+    needed: bool,
+    speculated: bool,
+    stage: str | None = None,
+    wasted_tokens: int = 0,
+):
+    """
+    Score a retry prediction: did the first attempt need the retry? (speculation stats)
+    
+    wasted_tokens is what an unneeded speculative retry cost.
+    """
+    configure()
+    speculation_policy.observe(risk, needed, speculated, stage or current_stage(), wasted_tokens)
+
+
+def get_backend():
+    """Get the active completion backend, building it on first use."""
+    global _backend
+    configure()
+    if _backend is None:
+        with _config_lock:
+            if _backend is None:
+                _backend = _with_recording(create_backend(_settings["backend_name"]))
+    return _backend
+
+
+def set_backend(backend):
+    """
+    Replace the active backend (a backend object or registered name).
+    
+    Useful in tests: set_backend(StubBackend(responder=...)).
+    """
+    global _backend
+    configure()
+    _backend = _with_recording(create_backend(backend) if isinstance(backend, str) else backend)
+
+
+def _with_recording(backend):
+    """Wrap backend in a RecordingBackend when GROK_RECORD_PATH is set."""
+    if _settings["record_path"]:
+        return RecordingBackend(backend, _settings["record_path"])
+    return backend
+
+
+def __getattr__(name: str):
+    # Backwards-compatible module attributes, resolved lazily
+    if name == "MODEL":
+        return get_model()
+    if name == "client":
+        backend = get_backend()
+        backend = getattr(backend, "inner", backend)  # unwrap RecordingBackend
+        if not isinstance(backend, GrokBackend):
+            raise AttributeError(f"'client' is only available with the grok backend (active: {backend.name})")
+        return backend.client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Token usage tracking is context-scoped (src/llm/usage.py): each call is
+# attributed to the invoice/stage of the caller's usage_scope(). The helpers
+# below read the current context's tracker (or the unscoped default).
 
 
 def get_last_usage() -> dict | None:
-    """Get token usage from the last Grok call."""
-    return _usage_tracking["last_call"]
+    """Get token usage from the last Grok call in the current context."""
+    return current_tracker().last()
 
 
 def get_total_usage() -> dict:
-    """Get cumulative token usage across all calls since last reset."""
-    return _usage_tracking["total"].copy()
+    """Get cumulative token usage for the current invoice (or since last reset)."""
+    return current_tracker().totals()
 
 
 def get_all_usage() -> list:
-    """Get list of all usage records since last reset."""
-    return _usage_tracking["calls"].copy()
+    """Get list of all usage records for the current invoice."""
+    return current_tracker().all()
 
 
 def reset_usage_tracking():
-    """Reset usage tracking (call at start of new workflow)."""
-    _usage_tracking["last_call"] = None
-    _usage_tracking["total"] = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-    _usage_tracking["calls"] = []
+    """Reset the current context's usage records (already-flushed ledger rows are kept)."""
+    current_tracker().reset()
+
+
+def get_cache_stats() -> dict:
+    """Get process-lifetime response cache counters (not reset per workflow)."""
+    configure()
+    return response_cache.get_stats()
+
+
+def get_single_flight_stats() -> dict:
+    """Get in-flight deduplication counters (leaders vs. shared results)."""
+    return single_flight.get_stats()
+
+
+def get_rate_limit_metrics() -> dict:
+    """Get rate limiter queue depth, wait time and token-estimate metrics."""
+    configure()
+    return rate_limiter.get_metrics()
+
+
+def get_hedge_stats() -> dict:
+    """Get hedging counters and the per-stage rolling latency percentiles."""
+    configure()
+    return hedge_policy.get_stats()
+
+
+def get_resilience_stats() -> dict:
+    """Get retry counters and the circuit breaker state."""
+    configure()
+    return {"retry": retry_policy.get_stats(), "circuit_breaker": circuit_breaker.get_stats()}
+
+
+def get_routing_stats() -> dict:
+    """Get per-stage, per-tier call counts, latency and acceptance rates."""
+    configure()
+    return model_router.get_stats()
+
+
+def get_speculation_stats() -> dict:
+    """Get retry predictor precision/recall and speculative calls made or wasted."""
+    configure()
+    return speculation_policy.get_stats()
+
+
+def get_batch_stats() -> dict:
+    """Get batch job counters (requests batched, failed, sent one by one)."""
+    configure()
+    return batch_runner.get_stats()
+
+
+def get_packing_stats() -> dict:
+    """Get packs sent, fallbacks, and amortized tokens/latency per packed vs. single document."""
+    configure()
+    return request_packer.get_stats()
+
+
+def get_chunking_stats() -> dict:
+    """Get documents extracted in page chunks, passes per document and item/subtotal mismatches."""
+    configure()
+    return page_chunker.get_stats()
+
+
+def get_budget_stats() -> dict:
+    """Get prompt budget counters and estimated-vs-actual prompt tokens per stage."""
+    configure()
+    return prompt_budget.get_stats()
+
+
+def would_trim_prompt(messages: list, stage: str | None = None) -> bool:
+    """True if the stage's prompt budget would cut the middle out of these messages."""
+    configure()
+    return prompt_budget.would_trim(messages, stage or current_stage())
+
+
+def estimate_tokens(messages: list | str, stage: str | None = None) -> int:
+    """
+    Estimate prompt tokens locally, without calling Grok.
+    
+    Accepts chat messages or a bare string; the estimate is calibrated
+    against the prompt_tokens Grok reported for earlier calls of the stage.
+    """
+    configure()
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    return prompt_budget.estimator.estimate(messages, stage or current_stage())
+
+
+def forget_response(usage: dict):
+    """
+    Drop the cached answer behind a call_grok(..., return_usage=True) result.
+    
+    For answers the caller could not use (e.g. they failed to parse), so the
+    same request goes back to Grok instead of replaying the bad answer.
+    """
+    key = usage.get("cache_key")
+    if key:
+        response_cache.delete(key)
+
+
+def parse_or_forget(usage: dict, parse: Callable, *args):
+    """parse(*args); when it raises, forget_response(usage) and re-raise."""
+    try:
+        return parse(*args)
+    except Exception:
+        forget_response(usage)
+        raise
+
+
+async def close_async_client():
+    """Close the backend's async connection pool (call on shutdown)."""
+    if _backend is not None:
+        await _backend.aclose()
 
 
 def test_connection() -> bool:
@@ -81,27 +518,31 @@ def test_connection() -> bool:
         True if connection successful, exits on failure.
     """
     print("🔌 Testing Grok API connection...")
-    print(f"   Model: {MODEL}")
-    print(f"   Base URL: https://api.x.ai/v1")
+    print(f"   Model: {get_model()}")
+    print(f"   Backend: {_settings['backend_name']}")
+    print(f"   Base URL: {os.environ.get('GROK_BASE_URL', 'https://api.x.ai/v1')}")
     print()
     
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
+        reply = call_grok(
+            [
                 {
                     "role": "user", 
                     "content": "Respond with exactly: 'Grok is ready for invoice processing'"
                 }
             ],
-            max_tokens=50
+            max_tokens=50,
+            use_cache=False,
         )
         
-        reply = response.choices[0].message.content
         print(f"✅ Grok responded: {reply}")
         print()
         print("🚀 CHECKPOINT 1 PASSED: Grok connection verified!")
         return True
+    
+    except BackendConfigError as e:
+        print(f"❌ ERROR: {e}")
+        sys.exit(1)
         
     except Exception as e:
         print(f"❌ Connection failed: {e}")
@@ -113,11 +554,375 @@ def test_connection() -> bool:
         sys.exit(1)
 
 
+def _build_request(messages: list, json_mode: bool, max_tokens: int, tier: str | None = None) -> dict:
+    """Build chat.completions.create kwargs shared by the sync and async paths."""
+    kwargs = {
+        "model": get_model(tier),
+        "messages": messages,
+        "max_tokens": max_tokens
+    }
+    
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+    
+    return kwargs
+
+
+def _usage_dict(usage) -> dict:
+    """
+    Token counts from an SDK usage object (None → zeros).
+    
+    cached_prompt_tokens is the part of the prompt served from the
+    provider's prompt cache (usage.prompt_tokens_details.cached_tokens).
+    """
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_prompt_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "total_tokens": usage.total_tokens or 0,
+        "cached_prompt_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+    }
+
+
+def _finish_flags(finish_reason: str | None) -> dict:
+    # An answer cut off at max_tokens is marked so it is not cached
+    return {"truncated": True} if finish_reason == "length" else {}
+
+
+def _response_usage(response) -> dict:
+    """Extract token usage from a completion."""
+    return {**_usage_dict(response.usage), **_finish_flags(response.choices[0].finish_reason)}
+
+
+def _body_result(body: dict) -> tuple[str, dict]:
+    """(content, usage) from a ChatCompletion in dict form (batch output lines)."""
+    usage = body.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    choice = body["choices"][0]
+    return choice["message"]["content"], {
+        "prompt_tokens": usage.get("prompt_tokens") or 0,
+        "completion_tokens": usage.get("completion_tokens") or 0,
+        "total_tokens": usage.get("total_tokens") or 0,
+        "cached_prompt_tokens": details.get("cached_tokens") or 0,
+        **_finish_flags(choice.get("finish_reason")),
+    }
+
+
+def _request_key(kwargs: dict, use_cache: bool) -> str | None:
+    """Content hash of a request, or None when the caller wants a fresh completion."""
+    if not use_cache:
+        return None
+    return request_key(
+        kwargs["model"],
+        kwargs["messages"],
+        "response_format" in kwargs,
+        kwargs["max_tokens"],
+    )
+
+
+def _cache_lookup(key: str | None) -> dict | None:
+    """Look a request up in the response cache (None on a miss or when caching is off)."""
+    if key is None or not _settings["cache_enabled"]:
+        return None
+    return response_cache.get(key)
+
+
+def _cacheable(key: str | None, content: str | None, usage: dict) -> bool:
+    return key is not None and _settings["cache_enabled"] and bool(content) and not usage.get("truncated")
+
+
+def _cache_store(key: str | None, kwargs: dict, content: str | None, usage: dict):
+    """Store a fresh completion (skipped when caching is off, or the reply is empty or truncated)."""
+    if not _cacheable(key, content, usage):
+        return
+    response_cache.put(key, content, usage, model=kwargs["model"])
+
+
+async def _cache_lookup_async(key: str | None) -> dict | None:
+    """Async _cache_lookup: keeps the SQLite tier off the event loop."""
+    if key is None or not _settings["cache_enabled"]:
+        return None
+    return await response_cache.get_async(key)
+
+
+async def _cache_store_async(key: str | None, kwargs: dict, content: str | None, usage: dict):
+    """Async _cache_store."""
+    if not _cacheable(key, content, usage):
+        return
+    await response_cache.put_async(key, content, usage, model=kwargs["model"])
+
+
+ZERO_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def _tier_flags(tier: str | None) -> dict:
+    return {"tier": tier} if tier else {}
+
+
+def _budget_flags(budget_info: dict) -> dict:
+    return {"budget_action": budget_info["action"]} if budget_info["action"] else {}
+
+
+def _record_cache_hit(kwargs: dict, key: str, entry: dict, tier: str | None, budget_info: dict) -> dict:
+    """A hit costs nothing; keep the original token count as "saved"."""
+    saved = entry["usage"].get("total_tokens", 0)
+    return record_call(
+        ZERO_USAGE, kwargs["model"], cached=True, saved_tokens=saved, cache_key=key,
+        **_tier_flags(tier), **_budget_flags(budget_info)
+    )
+
+
+NO_HEDGE = {"hedged": False, "hedge_won": False, "hedge_tokens": 0}
+
+
+def _record_fetched(
+    kwargs: dict,
+    key: str | None,
+    usage: dict,
+    shared: bool,
+    hedge_info: dict,
+    budget_info: dict,
+    tier: str | None,
+    batched: bool = False,
+) -> dict:
+    """Attribute a completed call (or a share of a leader's call) to the caller."""
+    flags = _tier_flags(tier)
+    if batched:
+        flags["batched"] = True
+    if key is not None and _settings["cache_enabled"]:
+        flags["cache_miss"] = True
+        flags["cache_key"] = key
+    if shared:
+        return record_call(
+            ZERO_USAGE, kwargs["model"],
+            deduplicated=True, saved_tokens=usage.get("total_tokens", 0), **flags
+        )
+    # Estimated vs actual prompt tokens; the estimator learns from the difference
+    prompt_budget.observe(budget_info, usage)
+    flags["estimated_prompt_tokens"] = budget_info["estimated_tokens"]
+    flags.update(_budget_flags(budget_info))
+    if hedge_info["hedged"]:
+        # Extra spend of the duplicate request, kept apart from the winner's usage
+        flags.update(hedged=True, hedge_won=hedge_info["hedge_won"], hedge_tokens=hedge_info["hedge_tokens"])
+    return record_call(usage, kwargs["model"], **flags)
+
+
+def _fit_budget(messages: list) -> tuple[list, dict]:
+    """Shrink messages to the current stage's prompt budget."""
+    configure()
+    return prompt_budget.fit(messages, current_stage())
+
+
+def _default_stage(stage: str | None):
+    """stage_scope(stage), unless the caller's context already names a stage."""
+    if stage is None or current_stage() is not None:
+        return contextlib.nullcontext()
+    return stage_scope(stage)
+
+
+def _latency_key(tier: str | None) -> str | None:
+    """Hedge latency is tracked per stage and tier: the fast model has its own p95."""
+    stage = current_stage()
+    return f"{stage or 'default'}/{tier}" if tier else stage
+
+
+def _use_hedge(hedge: bool | None) -> bool:
+    return hedge_policy.enabled if hedge is None else hedge
+
+
+def _prompt_chars(kwargs: dict) -> int:
+    return sum(len(str(m.get("content", ""))) for m in kwargs["messages"])
+
+
+PartialCallback = Callable[[tuple, Any], None]
+
+
+def _stream_state(on_partial: PartialCallback | None) -> dict:
+    return {
+        "parts": [], "usage": None, "finish_reason": None,
+        "parser": IncrementalJSONParser(), "on_partial": on_partial,
+    }
+
+
+def _consume_chunk(state: dict, chunk):
+    """Accumulate one stream chunk; report fields the parser completes."""
+    if chunk.usage is not None:
+        state["usage"] = chunk.usage
+    if not chunk.choices:
+        return
+    if chunk.choices[0].finish_reason:
+        state["finish_reason"] = chunk.choices[0].finish_reason
+    delta = chunk.choices[0].delta.content
+    if not delta:
+        return
+    state["parts"].append(delta)
+    if state["on_partial"] is not None:
+        for path, value in state["parser"].feed(delta):
+            state["on_partial"](path, value)
+
+
+def _stream_result(state: dict) -> tuple[str, dict]:
+    return "".join(state["parts"]), {**_usage_dict(state["usage"]), **_finish_flags(state["finish_reason"])}
+
+
+def _replay_partials(content: str, on_partial: PartialCallback | None):
+    """Report every field of an already-complete response (cache hit / shared)."""
+    if on_partial is None or not content:
+        return
+    for path, value in IncrementalJSONParser().feed(content):
+        on_partial(path, value)
+
+
+def _settle_gate(gate: PartialGate, outcome: tuple[tuple[str, dict], dict]) -> tuple[tuple[str, dict], dict]:
+    """After a hedged race, report the winner's fields if the loser owned the partial stream."""
+    (content, _), hedge_info = outcome
+    gate.settle(1 if hedge_info["hedge_won"] else 0, lambda: IncrementalJSONParser().feed(content or ""))
+    return outcome
+
+
+def _attempt(kwargs: dict, state: dict | None) -> tuple[str, dict]:
+    """One rate-limited Grok round trip (sync), guarded by the circuit breaker."""
+    circuit_breaker.before_call()
+    reserved = rate_limiter.estimate(kwargs["messages"], kwargs["max_tokens"])
+    rate_limiter.acquire(reserved)
+    
+    try:
+        if state is not None:
+            for chunk in get_backend().stream(**kwargs):
+                _consume_chunk(state, chunk)
+            content, usage = _stream_result(state)
+        else:
+            response = get_backend().complete(**kwargs)
+            content = response.choices[0].message.content
+            usage = _response_usage(response)
+    except BaseException as e:
+        _attempt_failed(kwargs, reserved, e)
+        raise
+    
+    circuit_breaker.record_success()
+    rate_limiter.reconcile(reserved, usage, _prompt_chars(kwargs))
+    return content, usage
+
+
+async def _attempt_async(kwargs: dict, state: dict | None) -> tuple[str, dict]:
+    """Async version of _attempt (the grok backend uses the pooled async client)."""
+    circuit_breaker.before_call()
+    reserved = rate_limiter.estimate(kwargs["messages"], kwargs["max_tokens"])
+    await rate_limiter.acquire_async(reserved)
+    
+    try:
+        if state is not None:
+            async for chunk in await get_backend().stream_async(**kwargs):
+                _consume_chunk(state, chunk)
+            content, usage = _stream_result(state)
+        else:
+            response = await get_backend().complete_async(**kwargs)
+            content = response.choices[0].message.content
+            usage = _response_usage(response)
+    except BaseException as e:
+        await _attempt_failed_async(kwargs, reserved, e)
+        raise
+    
+    circuit_breaker.record_success()
+    await rate_limiter.reconcile_async(reserved, usage, _prompt_chars(kwargs))
+    return content, usage
+
+
+def _record_attempt_failure(error: BaseException):
+    if is_retryable(error):
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.release()
+
+
+def _failed_attempt_usage(kwargs: dict, reserved: int) -> dict:
+    # The prompt may have been sent, the completion was not
+    return {"total_tokens": reserved - kwargs["max_tokens"]}
+
+
+def _attempt_failed(kwargs: dict, reserved: int, error: BaseException):
+    """Report a failed (or cancelled hedge loser) attempt to the breaker and limiter."""
+    _record_attempt_failure(error)
+    rate_limiter.reconcile(reserved, _failed_attempt_usage(kwargs, reserved))
+
+
+async def _attempt_failed_async(kwargs: dict, reserved: int, error: BaseException):
+    """Async _attempt_failed; the refund is shielded so a second cancellation cannot drop it."""
+    _record_attempt_failure(error)
+    await asyncio.shield(rate_limiter.reconcile_async(reserved, _failed_attempt_usage(kwargs, reserved)))
+
+
+def _retry_delay(attempt: int, error: Exception, state: dict | None) -> float | None:
+    """Backoff before the next attempt, or None to give up."""
+    if state is not None and state["parts"]:
+        # Fields were already reported to on_partial; a retry would repeat them
+        return None
+    return retry_policy.delay(attempt, error)
+
+
+def _fetch(
+    kwargs: dict,
+    key: str | None,
+    stream: bool = False,
+    on_partial: PartialCallback | None = None,
+) -> tuple[str, dict]:
+    """Grok round trip with retries (sync); fills the cache, returns (content, usage)."""
+    attempt = 0
+    while True:
+        state = _stream_state(on_partial) if stream else None
+        try:
+            content, usage = _attempt(kwargs, state)
+            break
+        except Exception as e:
+            delay = _retry_delay(attempt, e, state)
+            if delay is None:
+                raise
+            logger.warning(f"Grok call failed ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
+    
+    _cache_store(key, kwargs, content, usage)
+    return content, usage
+
+
+async def _fetch_async(
+    kwargs: dict,
+    key: str | None,
+    stream: bool = False,
+    on_partial: PartialCallback | None = None,
+) -> tuple[str, dict]:
+    """Async version of _fetch."""
+    attempt = 0
+    while True:
+        state = _stream_state(on_partial) if stream else None
+        try:
+            content, usage = await _attempt_async(kwargs, state)
+            break
+        except Exception as e:
+            delay = _retry_delay(attempt, e, state)
+            if delay is None:
+                raise
+            logger.warning(f"Grok call failed ({type(e).__name__}: {e}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    await _cache_store_async(key, kwargs, content, usage)
+    return content, usage
+
+
 def call_grok(
     messages: list,
     json_mode: bool = False,
     max_tokens: int = 1000,
-    return_usage: bool = False
+    return_usage: bool = False,
+    use_cache: bool = True,
+    stream: bool = False,
+    on_partial: PartialCallback | None = None,
+    hedge: bool | None = None,
+    stage: str | None = None,
+    tier: str | None = None
 ) -> str | tuple[str, dict]:
     """
     Convenience wrapper for Grok API calls.
@@ -127,36 +932,114 @@ def call_grok(
         json_mode: If True, request JSON-formatted response
         max_tokens: Maximum tokens in response
         return_usage: If True, return (content, usage_dict) tuple
+        use_cache: If False, bypass the response cache and in-flight
+            deduplication for this call
+        stream: If True, stream the completion from Grok
+        on_partial: Called as on_partial(path, value) for each top-level
+            JSON field, and each element of a top-level array, as soon as
+            it is complete — e.g. (("vendor",), "Widgets Inc.") or
+            (("items", 0), {...}). Cache hits and shared in-flight results
+            report all fields at once.
+        hedge: Race a duplicate request if this one is slower than the
+            stage's recent GROK_HEDGE_PERCENTILE latency (None: use
+            GROK_HEDGE_ENABLED). Extra tokens are reported as hedge_tokens.
+        stage: Workflow stage of the call (ingestion, validation, payment),
+            used when the caller has no stage_scope. Picks the prompt
+            budget; an over-budget prompt is compressed or trimmed first.
+        tier: Model tier — "fast" (GROK_FAST_MODEL) or "reasoning"
+            (GROK_REASONING_MODEL); None uses GROK_MODEL. See route_tier()
+            and should_escalate().
         
     Returns:
         If return_usage=False: The assistant's response content as a string
         If return_usage=True: Tuple of (content, usage_dict)
-            where usage_dict has prompt_tokens, completion_tokens, total_tokens
+            where usage_dict has prompt_tokens, completion_tokens, total_tokens,
+            model, invoice_id, stage (cache hits and deduplicated calls report
+            zero tokens plus cached=True / deduplicated=True and saved_tokens;
+            fresh calls add estimated_prompt_tokens; budget_action is set
+            when the prompt was shrunk, "trimmed" meaning part of the
+            invoice text was cut out)
     """
-    kwargs = {
-        "model": MODEL,
-        "messages": messages,
-        "max_tokens": max_tokens
-    }
+    with _default_stage(stage):
+        content, usage = _call_grok(
+            messages, json_mode, max_tokens, use_cache, stream, on_partial, hedge, tier
+        )
     
-    if json_mode:
-        kwargs["response_format"] = {"type": "json_object"}
+    if return_usage:
+        return content, usage
+    
+    return content
+
+
+def _call_grok(
+    messages: list,
+    json_mode: bool,
+    max_tokens: int,
+    use_cache: bool,
+    stream: bool,
+    on_partial: PartialCallback | None,
+    hedge: bool | None,
+    tier: str | None,
+) -> tuple[str, dict]:
+    messages, budget_info = _fit_budget(messages)
+    kwargs = _build_request(messages, json_mode, max_tokens, tier)
+    key = _request_key(kwargs, use_cache)
     
-    response = client.chat.completions.create(**kwargs)
-    content = response.choices[0].message.content
+    entry = _cache_lookup(key)
+    if entry is not None:
+        content = entry["content"]
+        usage = _record_cache_hit(kwargs, key, entry, tier, budget_info)
+        _replay_partials(content, on_partial)
+        return content, usage
     
-    # Track usage automatically
-    usage = {
-        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-        "total_tokens": response.usage.total_tokens if response.usage else 0,
-    }
+    if _use_hedge(hedge):
+        gate = gate_partials(on_partial)
+        fetch = lambda: _settle_gate(gate, hedge_policy.run(
+            lambda attempt: _fetch(kwargs, key, stream, gate(attempt)),
+            _latency_key(tier),
+            budget_info["estimated_tokens"],
+        ))
+    else:
+        fetch = lambda: (_fetch(kwargs, key, stream, on_partial), NO_HEDGE)
     
-    _usage_tracking["last_call"] = usage
-    _usage_tracking["calls"].append(usage)
-    _usage_tracking["total"]["prompt_tokens"] += usage["prompt_tokens"]
-    _usage_tracking["total"]["completion_tokens"] += usage["completion_tokens"]
-    _usage_tracking["total"]["total_tokens"] += usage["total_tokens"]
+    started = time.monotonic()
+    if key is not None and _settings["single_flight_enabled"]:
+        ((content, usage), hedge_info), shared = single_flight.do(key, fetch)
+    else:
+        ((content, usage), hedge_info), shared = fetch(), False
+    if shared:
+        _replay_partials(content, on_partial)
+    else:
+        model_router.observe(current_stage(), tier, time.monotonic() - started, usage)
+    return content, _record_fetched(kwargs, key, usage, shared, hedge_info, budget_info, tier)
+
+
+async def call_grok_async(
+    messages: list,
+    json_mode: bool = False,
+    max_tokens: int = 1000,
+    return_usage: bool = False,
+    use_cache: bool = True,
+    stream: bool = False,
+    on_partial: PartialCallback | None = None,
+    hedge: bool | None = None,
+    stage: str | None = None,
+    tier: str | None = None
+) -> str | tuple[str, dict]:
+    """
+    Async version of call_grok for use inside the event loop.
+    
+    Uses the pooled AsyncOpenAI client, so a slow Grok response only
+    suspends the awaiting coroutine instead of blocking every other
+    WebSocket served by the same worker. on_partial runs on the event loop,
+    and a hedge loser is cancelled rather than abandoned.
+    
+    Args/Returns: same as call_grok.
+    """
+    with _default_stage(stage):
+        content, usage = await _call_grok_async(
+            messages, json_mode, max_tokens, use_cache, stream, on_partial, hedge, tier
+        )
     
     if return_usage:
         return content, usage
@@ -164,6 +1047,143 @@ def call_grok(
     return content
 
 
+async def _call_grok_async(
+    messages: list,
+    json_mode: bool,
+    max_tokens: int,
+    use_cache: bool,
+    stream: bool,
+    on_partial: PartialCallback | None,
+    hedge: bool | None,
+    tier: str | None,
+) -> tuple[str, dict]:
+    messages, budget_info = _fit_budget(messages)
+    kwargs = _build_request(messages, json_mode, max_tokens, tier)
+    key = _request_key(kwargs, use_cache)
+    
+    entry = await _cache_lookup_async(key)
+    if entry is not None:
+        content = entry["content"]
+        usage = _record_cache_hit(kwargs, key, entry, tier, budget_info)
+        _replay_partials(content, on_partial)
+        return content, usage
+    
+    if _use_hedge(hedge):
+        gate = gate_partials(on_partial)
+        
+        async def fetch():
+            return _settle_gate(gate, await hedge_policy.run_async(
+                lambda attempt: _fetch_async(kwargs, key, stream, gate(attempt)),
+                _latency_key(tier),
+                budget_info["estimated_tokens"],
+            ))
+    else:
+        async def fetch():
+            return await _fetch_async(kwargs, key, stream, on_partial), NO_HEDGE
+    
+    started = time.monotonic()
+    if key is not None and _settings["single_flight_enabled"]:
+        ((content, usage), hedge_info), shared = await single_flight.do_async(key, fetch)
+    else:
+        ((content, usage), hedge_info), shared = await fetch(), False
+    if shared:
+        _replay_partials(content, on_partial)
+    else:
+        model_router.observe(current_stage(), tier, time.monotonic() - started, usage)
+    return content, _record_fetched(kwargs, key, usage, shared, hedge_info, budget_info, tier)
+
+
+def call_grok_batch(requests: dict[str, dict], stage: str | None = None) -> dict[str, tuple[str, dict] | Exception]:
+    """
+    Run many independent calls as one batch job (bulk backlogs).
+    
+    Each request is fitted to the stage budget and checked against the
+    response cache like call_grok. The remaining ones are submitted as a
+    single batch job (at least GROK_BATCH_MIN_SIZE of them, grok backend)
+    and polled until done. Requests the batch did not answer — and all of
+    them on backends without a batch API — go through call_grok, up to
+    GROK_BATCH_FALLBACK_CONCURRENCY at a time.
+    
+    Args:
+        requests: {request_id: {"messages", "json_mode", "max_tokens",
+            "tier", "use_cache"}} — call_grok's arguments; all but
+            messages are optional
+        stage: As for call_grok
+        
+    Returns:
+        {request_id: (content, usage_dict)}, or the exception raised for
+        that request. Batched usage records carry batched=True.
+    """
+    configure()
+    results: dict[str, tuple[str, dict] | Exception] = {}
+    
+    with _default_stage(stage):
+        pending = {}
+        for request_id, request in requests.items():
+            messages, budget_info = _fit_budget(request["messages"])
+            tier = request.get("tier")
+            kwargs = _build_request(messages, request.get("json_mode", False), request.get("max_tokens", 1000), tier)
+            key = _request_key(kwargs, request.get("use_cache", True))
+            entry = _cache_lookup(key)
+            if entry is not None:
+                results[request_id] = (entry["content"], _record_cache_hit(kwargs, key, entry, tier, budget_info))
+            else:
+                pending[request_id] = (kwargs, key, budget_info, tier)
+        
+        backend = get_backend()
+        if len(pending) >= batch_runner.min_size and supports_batch(backend):
+            try:
+                bodies = batch_runner.run(
+                    backend, [batch_line(request_id, kwargs) for request_id, (kwargs, *_) in pending.items()]
+                )
+            except Exception as e:
+                logger.warning(f"Batch submission failed ({type(e).__name__}: {e}); sending requests one by one")
+                bodies = {}
+            for request_id, body in bodies.items():
+                if body is None:
+                    continue
+                kwargs, key, budget_info, tier = pending.pop(request_id)
+                content, usage = _body_result(body)
+                _cache_store(key, kwargs, content, usage)
+                results[request_id] = (
+                    content,
+                    _record_fetched(kwargs, key, usage, False, NO_HEDGE, budget_info, tier, batched=True),
+                )
+        
+        if pending:
+            batch_runner.count_fallback(len(pending))
+            results.update(_call_each(requests, list(pending)))
+    
+    return results
+
+
+def _call_each(requests: dict[str, dict], request_ids: list[str]) -> dict[str, tuple[str, dict] | Exception]:
+    """call_grok for each request, a few at a time (the rate limiter paces them)."""
+    def run(request_id: str):
+        request = requests[request_id]
+        try:
+            return _call_grok(
+                request["messages"],
+                request.get("json_mode", False),
+                request.get("max_tokens", 1000),
+                request.get("use_cache", True),
+                False,
+                None,
+                None,
+                request.get("tier"),
+            )
+        except Exception as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=max(1, _settings["batch_fallback_concurrency"])) as pool:
+        # Each worker runs in a copy of the caller's context (usage/stage scope)
+        futures = {
+            request_id: pool.submit(contextvars.copy_context().run, run, request_id)
+            for request_id in request_ids
+        }
+        return {request_id: future.result() for request_id, future in futures.items()}
+
+
 # When run directly, test the connection
 if __name__ == "__main__":
     print("=" * 60)
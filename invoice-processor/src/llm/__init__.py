@@ -0,0 +1,106 @@
+"""
+LLM Infrastructure Package
+==========================
+Building blocks behind src.client.call_grok: pluggable backends, response
+caching, rate limiting, prompt token budgets, model tier routing, retries
+and circuit breaking, in-flight deduplication, hedged requests, speculative
+retries, batch jobs, request packing, page chunking, per-invoice usage
+accounting, prompt-cache-friendly message layout, incremental parsing
+of streamed JSON and typed decoding of finished answers. Nothing here
+imports the OpenAI SDK
+until a grok backend makes its first call.
+
+Agents should keep importing call_grok / call_grok_async from src.client;
+the modules here are wired in there.
+"""
+
+from src.llm.backends import (
+    BackendConfigError,
+    ReplayMissError,
+    GrokBackend,
+    RecordingBackend,
+    ReplayBackend,
+    StubBackend,
+    register_backend,
+    create_backend,
+    available_backends,
+    make_response,
+    make_stream_chunks,
+)
+from src.llm.batch import BatchRunner, batch_line, supports_batch
+from src.llm.budget import PromptBudget, TokenEstimator, compress_text, trim_middle
+from src.llm.cache import ResponseCache, request_key
+from src.llm.chunking import ChunkPlan, PageChunker, split_pages
+from src.llm.decoding import decode_json, decode_object, decode_response, json_span
+from src.llm.hedging import HedgePolicy, LatencyTracker, PartialGate, gate_partials
+from src.llm.incremental_json import IncrementalJSONParser
+from src.llm.packing import RequestPacker
+from src.llm.prompts import PromptLayout, extend_messages
+from src.llm.rate_limiter import RateLimiter, estimate_prompt_tokens
+from src.llm.routing import FAST, REASONING, ModelRouter
+from src.llm.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, is_retryable
+from src.llm.single_flight import SingleFlight
+from src.llm.speculation import SpeculationPolicy
+from src.llm.usage import (
+    UsageTracker,
+    usage_scope,
+    stage_scope,
+    current_tracker,
+    get_tracker,
+    record_call,
+)
+
+__all__ = [
+    "BackendConfigError",
+    "ReplayMissError",
+    "GrokBackend",
+    "RecordingBackend",
+    "ReplayBackend",
+    "StubBackend",
+    "register_backend",
+    "create_backend",
+    "available_backends",
+    "make_response",
+    "make_stream_chunks",
+    "BatchRunner",
+    "batch_line",
+    "supports_batch",
+    "PromptBudget",
+    "TokenEstimator",
+    "compress_text",
+    "trim_middle",
+    "ResponseCache",
+    "request_key",
+    "ChunkPlan",
+    "PageChunker",
+    "split_pages",
+    "decode_json",
+    "decode_object",
+    "decode_response",
+    "json_span",
+    "HedgePolicy",
+    "LatencyTracker",
+    "PartialGate",
+    "gate_partials",
+    "IncrementalJSONParser",
+    "RequestPacker",
+    "PromptLayout",
+    "extend_messages",
+    "RateLimiter",
+    "estimate_prompt_tokens",
+    "FAST",
+    "REASONING",
+    "ModelRouter",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "RetryPolicy",
+    "is_retryable",
+    "SingleFlight",
+    "SpeculationPolicy",
+    "UsageTracker",
+    "usage_scope",
+    "stage_scope",
+    "current_tracker",
+    "get_tracker",
+    "record_call",
+]
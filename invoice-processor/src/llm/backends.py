@@ -0,0 +1,559 @@
+"""
+Grok Backends
+=============
+Pluggable completion backends behind call_grok.
+
+A backend turns chat.completions.create kwargs into a response object with
+the OpenAI shape (response.choices[0].message.content, response.usage), or
+with stream()/stream_async() into an iterable of OpenAI-shaped chunks
+(chunk.choices[0].delta.content, then a final chunk carrying usage).
+GROK_BACKEND selects one by name:
+
+- grok:   the real xAI API (OpenAI SDK + pooled httpx client)
+- replay: answers from a recorded JSONL cassette (GROK_REPLAY_PATH), keyed
+          by the same request hash as the response cache, with zero or
+          recorded latency (GROK_REPLAY_LATENCY)
+- stub:   deterministic local replies — no network, no API key
+
+RecordingBackend wraps any of them and appends every request/response pair
+(with timing) to a cassette; src.client enables it with GROK_RECORD_PATH.
+
+Backends are built on first use, so importing this module (or src.client)
+never touches the network, the SDK or the API key. Register additional
+backends with register_backend(name, factory).
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Optional
+
+from src.llm.cache import request_key
+
+
+# =============================================================================
+# ERRORS
+# =============================================================================
+
+class BackendConfigError(RuntimeError):
+    """A backend cannot be built (missing API key, unknown name, bad file)."""
+
+
+class ReplayMissError(LookupError):
+    """The replay cassette has no recording for a request."""
+
+
+# =============================================================================
+# RESPONSE SHAPE
+# =============================================================================
+
+def _make_usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Any:
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_tokens=prompt_tokens + completion_tokens,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+    )
+
+
+def make_response(
+    content: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    model: str = "",
+    cached_tokens: int = 0,
+) -> Any:
+    """Build an object shaped like an OpenAI ChatCompletion."""
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(
+            index=0,
+            finish_reason="stop",
+            message=SimpleNamespace(role="assistant", content=content),
+        )],
+        usage=_make_usage(prompt_tokens, completion_tokens, cached_tokens),
+    )
+
+
+def make_stream_chunks(
+    content: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    model: str = "",
+    chunk_chars: int = 24,
+    cached_tokens: int = 0,
+) -> list:
+    """Split content into OpenAI-shaped stream chunks, ending with a usage chunk."""
+    chunks = [
+        SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(
+                index=0,
+                finish_reason=None,
+                delta=SimpleNamespace(role="assistant", content=content[i:i + chunk_chars]),
+            )],
+            usage=None,
+        )
+        for i in range(0, len(content), chunk_chars)
+    ]
+    chunks.append(SimpleNamespace(
+        model=model,
+        choices=[],
+        usage=_make_usage(prompt_tokens, completion_tokens, cached_tokens),
+    ))
+    return chunks
+
+
+def _cached_tokens(usage) -> int:
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def _response_to_chunks(response) -> list:
+    usage = response.usage
+    return make_stream_chunks(
+        response.choices[0].message.content or "",
+        usage.prompt_tokens,
+        usage.completion_tokens,
+        model=getattr(response, "model", ""),
+        cached_tokens=_cached_tokens(usage),
+    )
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+def _kwargs_key(kwargs: dict) -> str:
+    return request_key(
+        kwargs["model"],
+        kwargs["messages"],
+        "response_format" in kwargs,
+        kwargs["max_tokens"],
+    )
+
+
+# =============================================================================
+# GROK (xAI API)
+# =============================================================================
+
+class GrokBackend:
+    """
+    Real xAI API. The OpenAI SDK and httpx are imported on first call.
+
+    SDK-level retries are off: src.llm.resilience retries (and counts the
+    failures for the circuit breaker) instead.
+    """
+
+    name = "grok"
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeout: float = 60.0,
+    ):
+        if not api_key:
+            raise BackendConfigError(
+                "XAI_API_KEY not found in environment. "
+                "Please create a .env file with: XAI_API_KEY=your-key-here"
+            )
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self._client = None
+        self._async_client = None
+
+    @property
+    def client(self):
+        """Sync OpenAI client (created on first use)."""
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @property
+    def async_client(self):
+        """
+        Shared AsyncOpenAI client, created on first use.
+
+        The client owns a single httpx connection pool sized by
+        max_connections / max_keepalive_connections. Coroutines that find the
+        pool exhausted wait (up to timeout) for a free connection.
+        """
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                ),
+                timeout=httpx.Timeout(self.timeout, pool=self.timeout),
+            )
+            self._async_client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                max_retries=0,
+                http_client=http_client,
+            )
+        return self._async_client
+
+    def complete(self, **kwargs):
+        return self.client.chat.completions.create(**kwargs)
+
+    async def complete_async(self, **kwargs):
+        return await self.async_client.chat.completions.create(**kwargs)
+
+    def stream(self, **kwargs):
+        return self.client.chat.completions.create(
+            **kwargs, stream=True, stream_options={"include_usage": True}
+        )
+
+    async def stream_async(self, **kwargs):
+        return await self.async_client.chat.completions.create(
+            **kwargs, stream=True, stream_options={"include_usage": True}
+        )
+
+    # Batch API (see src/llm/batch.py)
+
+    def submit_batch(self, lines: list[dict]) -> str:
+        """Upload JSONL request lines and start a batch; returns the batch id."""
+        data = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        upload = self.client.files.create(file=("batch.jsonl", data), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    def get_batch(self, batch_id: str):
+        return self.client.batches.retrieve(batch_id)
+
+    def cancel_batch(self, batch_id: str):
+        return self.client.batches.cancel(batch_id)
+
+    def batch_results(self, batch) -> dict[str, Optional[dict]]:
+        """{custom_id: ChatCompletion body} for successful lines, None for failed ones."""
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for raw in self.client.files.content(file_id).text.splitlines():
+                if not raw.strip():
+                    continue
+                line = json.loads(raw)
+                response = line.get("response") or {}
+                ok = response.get("status_code") == 200 and not line.get("error")
+                results[line["custom_id"]] = response.get("body") if ok else None
+        return results
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+# =============================================================================
+# RECORD / REPLAY (cassettes)
+# =============================================================================
+
+def _open_cassette(path: str, mode: str):
+    # Appending to a .gz file adds a gzip member; gzip.open reads them all
+    if path.endswith(".gz"):
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordingBackend:
+    """
+    Wrap a backend and append each completed call to a JSONL cassette.
+
+    Each line: {"key", "model", "content", "usage", "latency", "ttft"}
+    where latency is the full call in seconds and ttft the time to the
+    first streamed content (null for non-streamed calls). Failed calls
+    are not recorded. The cassette can be served back by ReplayBackend.
+    """
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f"{inner.name}+record"
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str):
+        # client / async_client etc. of the wrapped backend
+        return getattr(self.inner, name)
+
+    def _write(self, kwargs: dict, content: str, usage, latency: float, ttft: Optional[float] = None):
+        entry = {
+            "key": _kwargs_key(kwargs),
+            "model": kwargs["model"],
+            "content": content,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                "completion_tokens": getattr(usage, "completion_tokens", 0),
+                "cached_prompt_tokens": _cached_tokens(usage),
+            },
+            "latency": round(latency, 4),
+            "ttft": None if ttft is None else round(ttft, 4),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            with _open_cassette(self.path, "at") as f:
+                f.write(line)
+
+    def _recorder(self, kwargs: dict, start: float):
+        """Return (on_chunk, finish) callbacks that accumulate a stream."""
+        state = {"parts": [], "usage": None, "ttft": None}
+
+        def on_chunk(chunk):
+            if chunk.usage is not None:
+                state["usage"] = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if state["ttft"] is None:
+                    state["ttft"] = time.perf_counter() - start
+                state["parts"].append(chunk.choices[0].delta.content)
+
+        def finish():
+            self._write(kwargs, "".join(state["parts"]), state["usage"],
+                        time.perf_counter() - start, state["ttft"])
+
+        return on_chunk, finish
+
+    def complete(self, **kwargs):
+        start = time.perf_counter()
+        response = self.inner.complete(**kwargs)
+        self._write(kwargs, response.choices[0].message.content, response.usage, time.perf_counter() - start)
+        return response
+
+    async def complete_async(self, **kwargs):
+        start = time.perf_counter()
+        response = await self.inner.complete_async(**kwargs)
+        self._write(kwargs, response.choices[0].message.content, response.usage, time.perf_counter() - start)
+        return response
+
+    def stream(self, **kwargs):
+        start = time.perf_counter()
+        chunks = self.inner.stream(**kwargs)
+        on_chunk, finish = self._recorder(kwargs, start)
+
+        def recorded():
+            for chunk in chunks:
+                on_chunk(chunk)
+                yield chunk
+            finish()
+
+        return recorded()
+
+    async def stream_async(self, **kwargs):
+        start = time.perf_counter()
+        chunks = await self.inner.stream_async(**kwargs)
+        on_chunk, finish = self._recorder(kwargs, start)
+
+        async def recorded():
+            async for chunk in chunks:
+                on_chunk(chunk)
+                yield chunk
+            finish()
+
+        return recorded()
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+class ReplayBackend:
+    """
+    Serve recorded completions from a JSONL (optionally .gz) cassette.
+
+    Each line: {"key": request_key, "content": str, "usage": {...}}, plus
+    optional "latency" / "ttft" seconds written by RecordingBackend.
+
+    latency="zero" answers immediately (isolates local cost in benchmarks);
+    latency="recorded" waits as long as the recorded call took, pacing
+    streams by the recorded time to first token.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: Optional[str], latency: str = "zero"):
+        if not path:
+            raise BackendConfigError("GROK_REPLAY_PATH must point to a recorded cassette")
+        if not os.path.exists(path):
+            raise BackendConfigError(f"Replay cassette not found: {path}")
+        if latency not in ("zero", "recorded"):
+            raise BackendConfigError(f"GROK_REPLAY_LATENCY must be 'zero' or 'recorded', not '{latency}'")
+        self.path = path
+        self.latency = latency
+        self.recordings: dict[str, dict] = {}
+
+        with _open_cassette(path, "rt") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    self.recordings[entry["key"]] = entry
+
+    def _lookup(self, kwargs: dict) -> tuple[Any, dict]:
+        key = _kwargs_key(kwargs)
+        entry = self.recordings.get(key)
+        if entry is None:
+            raise ReplayMissError(f"No recording for request {key[:12]} in {self.path}")
+        usage = entry.get("usage", {})
+        response = make_response(
+            entry["content"],
+            usage.get("prompt_tokens", 0),
+            usage.get("completion_tokens", 0),
+            model=kwargs["model"],
+            cached_tokens=usage.get("cached_prompt_tokens", 0),
+        )
+        return response, entry
+
+    def _delays(self, entry: dict, chunk_count: int) -> tuple[float, float]:
+        """(delay before the first chunk, delay between chunks)."""
+        if self.latency == "zero":
+            return 0.0, 0.0
+        latency = entry.get("latency") or 0.0
+        ttft = entry.get("ttft")
+        if ttft is None:
+            return latency, 0.0
+        return ttft, max(latency - ttft, 0.0) / max(chunk_count - 1, 1)
+
+    def complete(self, **kwargs):
+        response, entry = self._lookup(kwargs)
+        delay, _ = self._delays(entry, 1)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def complete_async(self, **kwargs):
+        response, entry = self._lookup(kwargs)
+        delay, _ = self._delays(entry, 1)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    def stream(self, **kwargs):
+        response, entry = self._lookup(kwargs)
+        chunks = _response_to_chunks(response)
+        first, between = self._delays(entry, len(chunks))
+
+        def paced():
+            for i, chunk in enumerate(chunks):
+                delay = first if i == 0 else between
+                if delay:
+                    time.sleep(delay)
+                yield chunk
+
+        return paced()
+
+    async def stream_async(self, **kwargs):
+        response, entry = self._lookup(kwargs)
+        chunks = _response_to_chunks(response)
+        first, between = self._delays(entry, len(chunks))
+
+        async def paced():
+            for i, chunk in enumerate(chunks):
+                delay = first if i == 0 else between
+                if delay:
+                    await asyncio.sleep(delay)
+                yield chunk
+
+        return paced()
+
+    async def aclose(self):
+        pass
+
+
+# =============================================================================
+# STUB (local, deterministic)
+# =============================================================================
+
+class StubBackend:
+    """
+    Deterministic local replies for tests and offline runs.
+
+    responder(kwargs) -> str decides the content; the default returns "{}"
+    for JSON-mode requests and "OK" otherwise. Token counts are estimated
+    at 4 characters per token.
+    """
+
+    name = "stub"
+
+    def __init__(self, responder: Optional[Callable[[dict], str]] = None):
+        self.responder = responder or self._default_responder
+        self.calls = 0
+
+    @staticmethod
+    def _default_responder(kwargs: dict) -> str:
+        return "{}" if "response_format" in kwargs else "OK"
+
+    def complete(self, **kwargs):
+        self.calls += 1
+        content = self.responder(kwargs)
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in kwargs["messages"])
+        return make_response(content, prompt_chars // 4, len(content) // 4, model=kwargs["model"])
+
+    async def complete_async(self, **kwargs):
+        return self.complete(**kwargs)
+
+    def stream(self, **kwargs):
+        return iter(_response_to_chunks(self.complete(**kwargs)))
+
+    async def stream_async(self, **kwargs):
+        return _aiter(_response_to_chunks(self.complete(**kwargs)))
+
+    async def aclose(self):
+        pass
+
+
+# =============================================================================
+# REGISTRY
+# =============================================================================
+
+_BACKENDS: dict[str, Callable[[], Any]] = {}
+
+
+def register_backend(name: str, factory: Callable[[], Any]):
+    """Register a zero-argument backend factory under name (overrides existing)."""
+    _BACKENDS[name] = factory
+
+
+def available_backends() -> list[str]:
+    return sorted(_BACKENDS)
+
+
+def create_backend(name: str):
+    """Build the backend registered under name."""
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise BackendConfigError(
+            f"Unknown GROK_BACKEND '{name}'. Available: {', '.join(available_backends())}"
+        )
+    return factory()
+
+
+register_backend("grok", lambda: GrokBackend(
+    api_key=os.environ.get("XAI_API_KEY"),
+    base_url=os.environ.get("GROK_BASE_URL", "https://api.x.ai/v1"),
+    max_connections=int(os.environ.get("GROK_MAX_CONNECTIONS", "20")),
+    max_keepalive_connections=int(os.environ.get("GROK_MAX_KEEPALIVE_CONNECTIONS", "10")),
+    timeout=float(os.environ.get("GROK_TIMEOUT", "60")),
+))
+register_backend("replay", lambda: ReplayBackend(
+    os.environ.get("GROK_REPLAY_PATH"),
+    latency=os.environ.get("GROK_REPLAY_LATENCY", "zero"),
+))
+register_backend("stub", lambda: StubBackend())
@@ -0,0 +1,118 @@
+"""
+Batch Submission
+================
+Submit many chat completions as one batch job instead of one HTTP round
+trip each.
+
+Uses the OpenAI-compatible Batch API (also served by api/grok_simulator.py):
+
+    1. upload a JSONL file, one {"custom_id", "method", "url", "body"} line
+       per request (POST /v1/files, purpose=batch)
+    2. create the batch (POST /v1/batches) and poll it until it is done
+    3. download the output (and error) file and map lines back by custom_id
+
+BatchRunner only talks to backends that implement submit_batch /
+get_batch / batch_results (the grok backend). src.client.call_grok_batch
+puts the cache, budgets and usage accounting around it and sends anything
+the batch could not answer — failed lines, an expired or timed-out batch,
+or a backend without batch support — through call_grok one by one.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def supports_batch(backend) -> bool:
+    return callable(getattr(backend, "submit_batch", None))
+
+
+def batch_line(custom_id: str, kwargs: dict) -> dict:
+    """One JSONL request line for chat.completions.create kwargs."""
+    return {"custom_id": custom_id, "method": "POST", "url": CHAT_COMPLETIONS_URL, "body": kwargs}
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+class BatchRunner:
+    """Submit a batch, poll it to completion and collect per-request results."""
+
+    def __init__(self, poll_seconds: float = 2.0, timeout_seconds: float = 24 * 60 * 60, min_size: int = 2):
+        self.poll_seconds = poll_seconds
+        self.timeout_seconds = timeout_seconds
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self.stats = {
+            "batches": 0, "requests": 0, "succeeded": 0, "failed": 0,
+            "fallback_requests": 0, "wait_seconds": 0.0,
+        }
+
+    def run(self, backend, lines: list[dict]) -> dict[str, Optional[dict]]:
+        """
+        Run lines as one batch job.
+
+        Returns:
+            {custom_id: response body (ChatCompletion dict), or None if the
+            batch did not produce one}
+        """
+        start = time.monotonic()
+        results: dict[str, Optional[dict]] = dict.fromkeys(line["custom_id"] for line in lines)
+        batch_id = backend.submit_batch(lines)
+        logger.info(f"Submitted batch {batch_id} ({len(lines)} requests)")
+
+        batch = self._wait(backend, batch_id, start)
+        if batch is not None:
+            for custom_id, body in backend.batch_results(batch).items():
+                if custom_id in results:
+                    results[custom_id] = body
+
+        succeeded = sum(1 for body in results.values() if body is not None)
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["requests"] += len(lines)
+            self.stats["succeeded"] += succeeded
+            self.stats["failed"] += len(lines) - succeeded
+            self.stats["wait_seconds"] += time.monotonic() - start
+        return results
+
+    def count_fallback(self, requests: int):
+        with self._lock:
+            self.stats["fallback_requests"] += requests
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+        stats["poll_seconds"] = self.poll_seconds
+        stats["min_size"] = self.min_size
+        return stats
+
+    def _wait(self, backend, batch_id: str, start: float) -> Optional[Any]:
+        """Poll until the batch is terminal; None if it timed out (and was cancelled)."""
+        while True:
+            batch = backend.get_batch(batch_id)
+            if batch.status in TERMINAL_STATUSES:
+                if batch.status != "completed":
+                    logger.warning(f"Batch {batch_id} ended as {batch.status}")
+                return batch
+            if time.monotonic() - start > self.timeout_seconds:
+                logger.warning(f"Batch {batch_id} still {batch.status} after {self.timeout_seconds:.0f}s; cancelling")
+                try:
+                    backend.cancel_batch(batch_id)
+                except Exception as e:
+                    logger.warning(f"Cancelling batch {batch_id} failed: {e}")
+                return None
+            time.sleep(self.poll_seconds)
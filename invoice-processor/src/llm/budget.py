@@ -0,0 +1,358 @@
+"""
+Prompt Token Budgets
+====================
+Estimate prompt tokens locally and keep each stage's prompts under budget.
+
+TokenEstimator approximates a BPE tokenizer without shipping one: text is
+split into words, digit runs, punctuation runs and line breaks, and each
+piece is costed the way BPE vocabularies tend to split it (short words are
+one token, digits go in groups of three, repeated punctuation merges).
+After every real call the estimate is compared with usage.prompt_tokens
+and a per-stage correction ratio is re-learned, so the estimator converges
+on what Grok actually bills.
+
+PromptBudget caps the prompt of each stage (GROK_PROMPT_BUDGETS). When a
+prompt is over budget, the largest user message — the invoice text — is
+shrunk before sending:
+
+    1. compress: drop trailing whitespace, extra blank lines, long rule
+       lines (-----, =====) and page headers/footers repeated on every page
+    2. trim: keep the head (vendor, invoice number, first items) and the
+       tail (last items, totals) and replace the middle with a marker
+
+Both steps are deterministic, so the same invoice always produces the same
+prompt (and still hits the response and prompt caches). Trimming can drop
+line items, so callers can ask first (would_trim) and split the document
+or flag the result; calls report the action as budget_action.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Max prompt tokens per stage; other stages use DEFAULT_BUDGET (0 = unlimited).
+# Ingestion carries the whole invoice text, validation the inventory list.
+DEFAULT_STAGE_BUDGETS = {
+    "ingestion": 12000,
+    "validation": 6000,
+    "payment": 3000,
+}
+DEFAULT_BUDGET = 16000
+
+# Role/formatting overhead per message and per request
+MESSAGE_OVERHEAD_TOKENS = 4
+REQUEST_OVERHEAD_TOKENS = 3
+
+# Learned estimate/actual ratio: moving-average weight and sane bounds
+CALIBRATION_ALPHA = 0.2
+MIN_RATIO = 0.5
+MAX_RATIO = 2.0
+
+# Share of the trimmed text kept from the start (the rest from the end)
+HEAD_SHARE = 0.6
+
+# Below this many tokens for the data itself, trimming would leave nothing
+# useful to extract from; the prompt is sent over budget instead
+MIN_DATA_TOKENS = 200
+
+# A digit-free line seen this often is a page header/footer
+REPEATED_LINE_MIN_COUNT = 3
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|\n+|([^\sA-Za-z\d])\1*")
+_RULE_LINE = re.compile(r"^\s*([-=_*~.#])\1{3,}\s*$")
+_BLANK_RUN = re.compile(r"\n{3,}")
+
+
+def parse_budgets(spec: str) -> dict[str, int]:
+    """Parse "ingestion=12000,validation=6000" into {stage: tokens}."""
+    budgets = {}
+    for part in spec.split(","):
+        stage, sep, value = part.partition("=")
+        if sep and stage.strip() and value.strip():
+            budgets[stage.strip()] = int(value)
+    return budgets
+
+
+# =============================================================================
+# ESTIMATOR
+# =============================================================================
+
+class TokenEstimator:
+    """Approximate BPE token counts, calibrated per stage against real usage."""
+
+    def __init__(self):
+        self._ratios: dict[Optional[str], float] = {}
+        self._stats: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def count(text: str) -> int:
+        """Uncalibrated token count of one string."""
+        tokens = 0
+        for match in _PIECE.finditer(text):
+            piece = match.group()
+            first = piece[0]
+            if first.isalpha():
+                # Common words are one token, longer ones split every ~6 chars
+                tokens += (len(piece) + 4) // 6
+            elif first.isdigit():
+                tokens += (len(piece) + 2) // 3
+            elif first == "\n":
+                tokens += 1
+            else:
+                # Runs like ---- or .... merge into a few tokens
+                tokens += (len(piece) + 7) // 8
+        return tokens
+
+    def count_messages(self, messages: list) -> int:
+        """Uncalibrated prompt tokens of a chat request."""
+        return REQUEST_OVERHEAD_TOKENS + sum(
+            MESSAGE_OVERHEAD_TOKENS + self.count(str(m.get("content", ""))) for m in messages
+        )
+
+    def ratio(self, stage: Optional[str]) -> float:
+        """Learned actual/estimated ratio for a stage (1.0 until calibrated)."""
+        return self._ratios.get(stage, self._ratios.get(None, 1.0))
+
+    def estimate(self, messages: list, stage: Optional[str] = None) -> int:
+        """Calibrated prompt-token estimate."""
+        return int(round(self.count_messages(messages) * self.ratio(stage)))
+
+    def observe(self, stage: Optional[str], raw_estimate: int, actual: int):
+        """Learn from one call: raw_estimate from count_messages, actual from usage."""
+        if raw_estimate <= 0 or actual <= 0:
+            return
+        observed = min(MAX_RATIO, max(MIN_RATIO, actual / raw_estimate))
+        with self._lock:
+            estimated = int(round(raw_estimate * self.ratio(stage)))
+            # The unstaged ratio learns from every call and seeds new stages
+            for key in ([stage, None] if stage is not None else [None]):
+                previous = self._ratios.get(key)
+                if previous is None:
+                    previous = self._ratios.get(None, observed)
+                self._ratios[key] = (1 - CALIBRATION_ALPHA) * previous + CALIBRATION_ALPHA * observed
+
+            stats = self._stats.setdefault(stage or "unknown", {
+                "calls": 0, "estimated_tokens": 0, "actual_tokens": 0, "abs_error_tokens": 0,
+            })
+            stats["calls"] += 1
+            stats["estimated_tokens"] += estimated
+            stats["actual_tokens"] += actual
+            stats["abs_error_tokens"] += abs(estimated - actual)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stages = {}
+            for stage, s in self._stats.items():
+                stages[stage] = {
+                    "calls": s["calls"],
+                    "estimated_tokens": s["estimated_tokens"],
+                    "actual_tokens": s["actual_tokens"],
+                    "mean_abs_error_pct": round(
+                        100.0 * s["abs_error_tokens"] / s["actual_tokens"], 2
+                    ) if s["actual_tokens"] else 0.0,
+                    "ratio": round(self.ratio(None if stage == "unknown" else stage), 4),
+                }
+            return stages
+
+
+# =============================================================================
+# SHRINKING
+# =============================================================================
+
+def compress_text(text: str) -> str:
+    """
+    Lossless-for-extraction cleanup of document text.
+
+    Drops trailing whitespace, rule lines and repeated digit-free lines
+    (page headers/footers, kept once), and collapses blank-line runs.
+    Lines with digits are never dropped — duplicate line items are real.
+    """
+    lines = [line.rstrip() for line in text.splitlines()]
+    repeated = Counter(
+        line.strip() for line in lines
+        if line.strip() and not any(ch.isdigit() for ch in line)
+    )
+    seen = set()
+    kept = []
+    for line in lines:
+        if _RULE_LINE.match(line):
+            continue
+        key = line.strip()
+        if key and repeated.get(key, 0) >= REPEATED_LINE_MIN_COUNT:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(line)
+    return _BLANK_RUN.sub("\n\n", "\n".join(kept)).strip()
+
+
+def trim_middle(text: str, max_tokens: int, count=TokenEstimator.count) -> str:
+    """Keep the first/last lines of text within max_tokens, marking the cut."""
+    lines = text.splitlines()
+    costs = [count(line) + 1 for line in lines]
+    if sum(costs) <= max_tokens:
+        return text
+
+    marker_cost = 12
+    head_budget = int((max_tokens - marker_cost) * HEAD_SHARE)
+    tail_budget = max_tokens - marker_cost - head_budget
+
+    head = 0
+    used = 0
+    while head < len(lines) and used + costs[head] <= head_budget:
+        used += costs[head]
+        head += 1
+    tail = len(lines)
+    used = 0
+    while tail > head and used + costs[tail - 1] <= tail_budget:
+        used += costs[tail - 1]
+        tail -= 1
+
+    if head == 0 and tail == len(lines):
+        # No line breaks to cut at (one huge line): cut by characters
+        keep = max(1, int(len(text) * max_tokens / max(1, sum(costs))))
+        return text[:keep] + "\n[... remainder omitted to fit the prompt budget ...]"
+
+    omitted = tail - head
+    return "\n".join(
+        lines[:head]
+        + [f"[... {omitted} lines omitted to fit the prompt budget ...]"]
+        + lines[tail:]
+    )
+
+
+# =============================================================================
+# BUDGET POLICY
+# =============================================================================
+
+class PromptBudget:
+    """
+    Per-stage prompt budgets enforced before a request is sent.
+
+    fit() returns the (possibly shrunk) messages and an info dict;
+    observe() feeds the actual prompt_tokens back into the estimator.
+    """
+
+    def __init__(
+        self,
+        estimator: TokenEstimator,
+        budgets: Optional[dict[str, int]] = None,
+        default_budget: int = DEFAULT_BUDGET,
+        enabled: bool = True,
+    ):
+        self.estimator = estimator
+        self.budgets = dict(DEFAULT_STAGE_BUDGETS if budgets is None else budgets)
+        self.default_budget = default_budget
+        self.enabled = enabled
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    def budget_for(self, stage: Optional[str]) -> int:
+        return self.budgets.get(stage, self.default_budget) if stage else self.default_budget
+
+    def fit(self, messages: list, stage: Optional[str]) -> tuple[list, dict]:
+        """
+        Shrink messages to the stage's budget (compress, then trim).
+
+        Returns:
+            (messages, info) with info = {"stage", "budget", "raw_tokens",
+            "estimated_tokens", "original_tokens", "action"}; action is
+            None, "compressed", "trimmed" or "over_budget".
+        """
+        fitted, info = self._fit(messages, stage)
+        if info["action"] == "over_budget":
+            logger.warning(
+                f"Prompt for stage {stage or 'unknown'} is ~{info['estimated_tokens']} tokens "
+                f"(budget {info['budget']}) and cannot be shrunk"
+            )
+        elif info["action"] == "trimmed":
+            logger.warning(
+                f"Prompt for stage {stage or 'unknown'} trimmed from ~{info['original_tokens']} "
+                f"to the {info['budget']}-token budget"
+            )
+        self._count(info)
+        return fitted, info
+
+    def would_trim(self, messages: list, stage: Optional[str]) -> bool:
+        """True if fit() would cut the middle out of these messages (nothing is counted)."""
+        return self._fit(messages, stage, trim=False)[1]["action"] == "trimmed"
+
+    def _fit(self, messages: list, stage: Optional[str], trim: bool = True) -> tuple[list, dict]:
+        raw = self.estimator.count_messages(messages)
+        ratio = self.estimator.ratio(stage)
+        budget = self.budget_for(stage) if self.enabled else 0
+        info = {
+            "stage": stage,
+            "budget": budget,
+            "raw_tokens": raw,
+            "estimated_tokens": int(round(raw * ratio)),
+            "original_tokens": int(round(raw * ratio)),
+            "action": None,
+        }
+        if budget <= 0 or info["estimated_tokens"] <= budget:
+            return messages, info
+
+        index = self._data_index(messages)
+        text = str(messages[index]["content"]) if index is not None else ""
+        allowed = int(budget / ratio) - (raw - self.estimator.count(text))
+        if index is None or allowed < MIN_DATA_TOKENS:
+            info["action"] = "over_budget"
+            return messages, info
+
+        shrunk = compress_text(text)
+        info["action"] = "compressed"
+        if self.estimator.count(shrunk) > allowed:
+            info["action"] = "trimmed"
+            if not trim:
+                return messages, info
+            shrunk = trim_middle(shrunk, allowed, self.estimator.count)
+
+        fitted = list(messages)
+        fitted[index] = {**messages[index], "content": shrunk}
+        info["raw_tokens"] = self.estimator.count_messages(fitted)
+        info["estimated_tokens"] = int(round(info["raw_tokens"] * ratio))
+        return fitted, info
+
+    def observe(self, info: dict, usage: dict):
+        """Calibrate the estimator from a completed call's usage."""
+        self.estimator.observe(info["stage"], info["raw_tokens"], usage.get("prompt_tokens", 0))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._stats)
+        return {
+            "enabled": self.enabled,
+            "budgets": {**self.budgets, "default": self.default_budget},
+            "checked": counts.get("checked", 0),
+            "compressed": counts.get("compressed", 0),
+            "trimmed": counts.get("trimmed", 0),
+            "over_budget": counts.get("over_budget", 0),
+            "tokens_removed": counts.get("tokens_removed", 0),
+            "estimator": self.estimator.get_stats(),
+        }
+
+    @staticmethod
+    def _data_index(messages: list) -> Optional[int]:
+        """Index of the largest user message (the per-call data)."""
+        sizes = [
+            (len(str(m.get("content", ""))), i)
+            for i, m in enumerate(messages) if m.get("role") == "user"
+        ]
+        return max(sizes)[1] if sizes else None
+
+    def _count(self, info: dict):
+        with self._lock:
+            self._stats["checked"] += 1
+            if info["action"]:
+                self._stats[info["action"]] += 1
+                self._stats["tokens_removed"] += info["original_tokens"] - info["estimated_tokens"]
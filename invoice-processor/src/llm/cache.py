@@ -0,0 +1,298 @@
+"""
+Grok Response Cache
+===================
+Content-addressed cache for chat completions.
+
+Re-uploads, re-runs after a restart and demo replays send byte-identical
+requests to Grok. The cache key is a SHA-256 of the canonical request
+(model, messages, json_mode, max_tokens), so any identical request is
+answered locally.
+
+Two tiers:
+- Memory: bounded LRU (OrderedDict) — a hit is a dict lookup plus the hash
+- SQLite: persistent tier in data/grok_cache.db (next to inventory.db),
+  survives server restarts and is shared by every worker process
+
+Both tiers honour a TTL. The SQLite tier is trimmed by total payload size,
+least-recently-used first.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MAX_MEMORY_ENTRIES = 256
+DEFAULT_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+
+# =============================================================================
+# CACHE KEY
+# =============================================================================
+
+def request_key(model: str, messages: list, json_mode: bool, max_tokens: int) -> str:
+    """
+    Hash a Grok request into a stable cache key.
+    
+    Messages are serialized as canonical JSON (sorted keys, no whitespace)
+    so logically identical requests always produce the same key.
+    """
+    payload = json.dumps(
+        [model, messages, bool(json_mode), int(max_tokens)],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# TWO-TIER CACHE
+# =============================================================================
+
+class ResponseCache:
+    """
+    In-memory LRU in front of a persistent SQLite table.
+    
+    Entries are {"content": str, "usage": dict} — usage is the token count
+    the original call paid for, kept so savings can be reported.
+    """
+    
+    def __init__(
+        self,
+        db_path: Optional[str],
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_memory_entries: int = DEFAULT_MAX_MEMORY_ENTRIES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_ready = False
+        
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+    
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+    
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached entry for key, or None on miss/expiry."""
+        now = time.time()
+        
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                created_at, entry = cached
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    return entry
+                del self._memory[key]
+                self.stats["expired"] += 1
+        
+        entry_with_time = self._disk_get(key, now)
+        
+        with self._lock:
+            if entry_with_time is None:
+                self.stats["misses"] += 1
+                return None
+            created_at, entry = entry_with_time
+            self._memory_put(key, created_at, entry)
+            self.stats["hits"] += 1
+            self.stats["disk_hits"] += 1
+            return entry
+    
+    def put(self, key: str, content: str, usage: dict, model: str = ""):
+        """Store a completion in both tiers."""
+        now = time.time()
+        entry = {"content": content, "usage": dict(usage)}
+        
+        with self._lock:
+            self._memory_put(key, now, entry)
+        
+        self._disk_put(key, entry, model, now)
+    
+    async def get_async(self, key: str) -> Optional[dict]:
+        """Async version of get(); the SQLite tier is read in a thread."""
+        return await asyncio.to_thread(self.get, key)
+    
+    async def put_async(self, key: str, content: str, usage: dict, model: str = ""):
+        """Async version of put(); the SQLite write and eviction run in a thread."""
+        await asyncio.to_thread(self.put, key, content, usage, model)
+    
+    def delete(self, key: str):
+        """Drop one entry from both tiers (e.g. an answer the caller could not parse)."""
+        with self._lock:
+            self._memory.pop(key, None)
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("DELETE FROM grok_response_cache WHERE key = ?", (key,))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Grok cache delete failed: {e}")
+        finally:
+            conn.close()
+    
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("DELETE FROM grok_response_cache")
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def get_stats(self) -> dict:
+        """Counters plus current memory-tier size."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        return stats
+    
+    # -------------------------------------------------------------------------
+    # Memory tier
+    # -------------------------------------------------------------------------
+    
+    def _memory_put(self, key: str, created_at: float, entry: dict):
+        """Insert into the LRU (caller holds the lock)."""
+        self._memory[key] = (created_at, entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+    
+    # -------------------------------------------------------------------------
+    # SQLite tier
+    # -------------------------------------------------------------------------
+    
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            if not self._disk_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS grok_response_cache (
+                        key TEXT PRIMARY KEY,
+                        model TEXT,
+                        content TEXT NOT NULL,
+                        usage TEXT,
+                        size_bytes INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_grok_cache_access "
+                    "ON grok_response_cache(last_access)"
+                )
+                conn.commit()
+                self._disk_ready = True
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"Grok cache database unavailable: {e}")
+            return None
+    
+    def _disk_get(self, key: str, now: float) -> Optional[tuple[float, dict]]:
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT content, usage, created_at FROM grok_response_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            content, usage, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM grok_response_cache WHERE key = ?", (key,))
+                conn.commit()
+                with self._lock:
+                    self.stats["expired"] += 1
+                return None
+            
+            conn.execute(
+                "UPDATE grok_response_cache SET last_access = ? WHERE key = ?",
+                (now, key)
+            )
+            conn.commit()
+            return created_at, {"content": content, "usage": json.loads(usage or "{}")}
+        except sqlite3.Error as e:
+            logger.warning(f"Grok cache read failed: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def _disk_put(self, key: str, entry: dict, model: str, now: float):
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            size_bytes = len(entry["content"].encode("utf-8"))
+            conn.execute("""
+                INSERT OR REPLACE INTO grok_response_cache
+                    (key, model, content, usage, size_bytes, created_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (key, model, entry["content"], json.dumps(entry["usage"]), size_bytes, now, now))
+            
+            # Expire stale rows, then trim least-recently-used rows over the size budget
+            conn.execute(
+                "DELETE FROM grok_response_cache WHERE created_at < ?",
+                (now - self.ttl_seconds,)
+            )
+            total_bytes = conn.execute(
+                "SELECT COALESCE(SUM(size_bytes), 0) FROM grok_response_cache"
+            ).fetchone()[0]
+            if total_bytes > self.max_disk_bytes:
+                evicted = 0
+                for row_key, row_size in conn.execute(
+                    "SELECT key, size_bytes FROM grok_response_cache ORDER BY last_access ASC"
+                ).fetchall():
+                    if total_bytes <= self.max_disk_bytes:
+                        break
+                    conn.execute("DELETE FROM grok_response_cache WHERE key = ?", (row_key,))
+                    total_bytes -= row_size
+                    evicted += 1
+                with self._lock:
+                    self.stats["evictions"] += evicted
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Grok cache write failed: {e}")
+        finally:
+            conn.close()
@@ -0,0 +1,124 @@
+"""
+Page Chunking
+=============
+Extract long multi-page documents as several small requests at once.
+
+A 30-page invoice sent as one prompt is slow twice over: the prompt is
+long, and the answer (every line item) is longer still, so it runs into
+max_tokens or the request timeout. PageChunker splits it instead:
+
+- one header pass over the first and last pages (parties, dates, totals),
+  with the pages in between left out
+- one line-item pass per group of GROK_CHUNK_PAGES pages
+
+The passes run concurrently, so the document takes about as long as its
+slowest group rather than the sum of all of them. The caller merges the
+item lists in page order and checks them against the subtotal.
+
+Pages are found by the "--- Page N ---" lines that
+src/tools/pdf_extractor.py puts before each page's text. Documents with
+fewer than GROK_CHUNK_MIN_PAGES pages are sent whole, as before, unless
+the whole document would be over the ingestion prompt budget: trimming
+it would cut line items out of the middle, so it is split instead.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+# Written by extract_pdf before each page's text
+PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+
+
+def split_pages(text: str) -> list[str]:
+    """Page texts (each starting with its marker line); [text] if there are no markers."""
+    starts = [match.start() for match in PAGE_MARKER.finditer(text)]
+    if not starts:
+        return [text]
+    starts[0] = 0  # anything before the first marker belongs to page 1
+    return [text[start:end].strip() for start, end in zip(starts, starts[1:] + [len(text)])]
+
+
+@dataclass
+class ChunkPlan:
+    """
+    How one document is split.
+
+    Attributes:
+        header: First and last page, for the header/totals pass
+        groups: Page groups in order, one line-item pass each
+        pages: Pages in the document
+    """
+    header: str
+    groups: list[str]
+    pages: int
+
+    @property
+    def passes(self) -> int:
+        return 1 + len(self.groups)
+
+
+# =============================================================================
+# CHUNKER
+# =============================================================================
+
+class PageChunker:
+    """Split long documents into header and page-group passes, and track them."""
+
+    def __init__(self, enabled: bool = True, min_pages: int = 4, pages_per_chunk: int = 2):
+        self.enabled = enabled
+        self.min_pages = min_pages
+        self.pages_per_chunk = max(1, pages_per_chunk)
+        self._lock = threading.Lock()
+        self.stats = {"documents": 0, "pages": 0, "passes": 0, "seconds": 0.0, "item_mismatches": 0}
+
+    def plan(self, text: str, oversized: bool = False) -> Optional[ChunkPlan]:
+        """
+        The ChunkPlan for a document, or None to send it whole.
+
+        oversized: The document is over the prompt budget as one request,
+            so any document of 2+ pages is split, below min_pages too
+        """
+        if not self.enabled:
+            return None
+        pages = split_pages(text)
+        if len(pages) < (2 if oversized else max(2, self.min_pages)):
+            return None
+        omitted = f"[... pages 2-{len(pages) - 1} omitted ...]" if len(pages) > 2 else ""
+        header = "\n\n".join(part for part in (pages[0], omitted, pages[-1]) if part)
+        groups = [
+            "\n\n".join(pages[i:i + self.pages_per_chunk])
+            for i in range(0, len(pages), self.pages_per_chunk)
+        ]
+        return ChunkPlan(header=header, groups=groups, pages=len(pages))
+
+    def record(self, plan: ChunkPlan, seconds: float, items_match: bool):
+        """
+        One chunked extraction.
+
+        Args:
+            plan: The plan it followed
+            seconds: Wall time of all passes together
+            items_match: The merged items added up to the subtotal
+        """
+        with self._lock:
+            self.stats["documents"] += 1
+            self.stats["pages"] += plan.pages
+            self.stats["passes"] += plan.passes
+            self.stats["seconds"] += seconds
+            self.stats["item_mismatches"] += not items_match
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        documents = stats["documents"]
+        seconds = stats.pop("seconds")
+        stats.update({
+            "enabled": self.enabled,
+            "min_pages": self.min_pages,
+            "pages_per_chunk": self.pages_per_chunk,
+            "pages_per_document": round(stats["pages"] / documents, 1) if documents else None,
+            "seconds_per_document": round(seconds / documents, 3) if documents else None,
+        })
+        return stats
@@ -0,0 +1,378 @@
+"""
+Response Decoding
+=================
+Grok's JSON answers to typed Python values, in one pass.
+
+Answers used to go through clean_json_response (strip, fence slice, two
+find()s, another slice), then json.loads, then per-field safe_get /
+float() / int() calls in the agents, and any of those could end the
+invoice: a "$1,234.50" amount raised ValueError, and an answer cut off at
+max_tokens raised JSONDecodeError. decode_json() instead:
+
+- slices from the first "{" (past any code fence or prose) to the last
+  "}" and hands that to orjson (the json module if orjson is not
+  installed); this is the whole cost for a well-formed answer
+- if that fails, scans once from the "{" to its matching "}", tracking
+  strings and escapes, so prose with braces after the answer is ignored
+- if the text ends before the object does, cuts it after the last
+  complete value and closes the containers still open: the caller gets
+  every field that did arrive instead of an exception (decode_response
+  tells it so)
+
+decode_object() then types a decoded dict against a field table: numbers
+written as strings ("$1,234.50", "-$5", "85%") become numbers, "true"/"false"
+become booleans, and nulls and values that cannot be converted are left
+out, so the agents' defaults apply instead of a conversion raising. A
+number whose separators could be read two ways ("1,234") is not guessed.
+
+Settings (read from the environment on each call):
+- GROK_JSON_REPAIR_ENABLED   close truncated answers instead of failing (default 1)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # optional: the json module decodes the same answers, slower
+    orjson = None
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+PARSER = "orjson" if orjson else "json"
+
+_loads = orjson.loads if orjson else json.loads
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# First number in a string: digits with "," / "." separators, and an exponent
+# A space, NBSP, narrow NBSP or apostrophe groups thousands only before exactly three digits
+_NUMBER = re.compile(r"[.,]?\d(?:[\d.,]|[ \u00a0\u202f'](?=\d{3}(?!\d)))*(?:[eE][-+]?\d+)?")
+_MANTISSA = re.compile(r"([\d.,\u00a0\u202f' ]*)((?:[eE][-+]?\d+)?)")
+_SPACE_GROUPED = re.compile(r"(\d{1,3}(?:[ \u00a0\u202f']\d{3})+)(?:[.,](\d+))?")
+_SPACE_GROUP = re.compile(r"[ \u00a0\u202f']")
+# Digits right after the number that did not form a group: "1 2345" is not 1
+_LOOSE_DIGITS = re.compile(r"[ \u00a0\u202f']+\d")
+# Before the number, any of these makes it negative: "-$5", "USD -5", "(12.00)"
+_NEGATIVE = ("-", "\u2212", "(")
+
+_TRUE = ("true", "yes", "y", "1")
+_FALSE = ("false", "no", "n", "0")
+
+
+def repair_enabled() -> bool:
+    return os.environ.get("GROK_JSON_REPAIR_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+# =============================================================================
+# JSON
+# =============================================================================
+
+def _scan(text: str, start: int) -> tuple[int, Optional[str]]:
+    """
+    Walk the JSON object opening at text[start].
+
+    Returns:
+        (end, None) when it closes at text[end - 1], or (-1, repaired) when
+        the text runs out first: the object up to its last complete value,
+        with the containers still open closed (None if nothing is complete).
+        An object left open inside an array (a line item cut off halfway)
+        is dropped whole rather than kept with some of its fields.
+    """
+    stack = ""  # open containers, innermost last
+    starts = []  # their offsets
+    expect_key = False
+    in_string = False
+    escaped = False
+    safe = None  # (cut offset, containers open there)
+
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+                if not expect_key:
+                    safe = (i + 1, stack)
+        elif c == '"':
+            in_string = True
+        elif c == "{" or c == "[":
+            stack += c
+            starts.append(i)
+            expect_key = c == "{"
+            safe = (i + 1, stack)
+        elif c == "}" or c == "]":
+            stack = stack[:-1]
+            starts.pop()
+            if not stack:
+                return i + 1, None
+            expect_key = False
+            safe = (i + 1, stack)
+        elif c == ",":
+            # Everything before the comma is complete
+            safe = (i, stack)
+            expect_key = stack[-1:] == "{"
+        elif c == ":":
+            expect_key = False
+
+    if safe is None:
+        return -1, None
+    # Nothing closed after the last safe point, so the containers open there
+    # are the first len(open_containers) of those open now
+    cut, open_containers = safe
+    row = open_containers.find("[{")
+    if row != -1:
+        cut = starts[row + 1]
+        open_containers = open_containers[:row + 1]
+    kept = text[start:cut].rstrip().rstrip(",")
+    return -1, kept + "".join(_CLOSERS[c] for c in reversed(open_containers))
+
+
+def json_span(response: str) -> str:
+    """The JSON object in a response, without fences or surrounding prose."""
+    start = response.find("{")
+    if start == -1:
+        return response.strip()
+    end = response.rfind("}") + 1
+    if end > start:
+        try:
+            _loads(response[start:end])
+            return response[start:end]
+        except ValueError:
+            pass
+    end, _ = _scan(response, start)
+    return response[start:end] if end != -1 else response[start:].strip()
+
+
+def decode_response(response: str) -> tuple[Any, bool]:
+    """
+    Decode the JSON object in a Grok answer.
+
+    Returns:
+        (value, repaired) — repaired is True when the answer was cut off
+        and value holds only its complete fields
+
+    Raises:
+        json.JSONDecodeError (a ValueError) if there is no usable object
+    """
+    started = time.perf_counter()
+    try:
+        value, outcome = _decode(response)
+    except ValueError:
+        decoding_stats.record("failed", time.perf_counter() - started)
+        raise
+    decoding_stats.record(outcome, time.perf_counter() - started)
+    return value, outcome == "repaired"
+
+
+def _decode(response: str) -> tuple[Any, str]:
+    start = response.find("{")
+    if start == -1:
+        raise json.JSONDecodeError("No JSON object in response", response, 0)
+
+    # Well-formed answers: one slice, one parse
+    end = response.rfind("}") + 1
+    if end > start:
+        try:
+            return _loads(response[start:end]), "direct"
+        except ValueError:
+            pass
+
+    end, repaired = _scan(response, start)
+    if end != -1:
+        return _loads(response[start:end]), "scanned"
+    if repaired is None or not repair_enabled():
+        raise json.JSONDecodeError("Response ends before the JSON object does", response, len(response))
+    return _loads(repaired), "repaired"
+
+
+def decode_json(response: str) -> Any:
+    """The JSON object in a Grok answer (see decode_response)."""
+    return decode_response(response)[0]
+
+
+# =============================================================================
+# TYPED FIELDS
+# =============================================================================
+
+def _grouped(parts: list[str]) -> bool:
+    """Digit groups of a thousands-separated number: 1-3 digits, then 3 each."""
+    return 1 <= len(parts[0]) <= 3 and all(len(part) == 3 for part in parts[1:])
+
+
+def _parse_number(text: str) -> Optional[float]:
+    """
+    A number written with "," / "." separators, or None when it is ambiguous.
+
+    With both separators, the last one is the decimal point and the other
+    must group thousands ("1.234,50" → 1234.5). With one kind only, several
+    of them group thousands ("1,234,567"), and a single one is the decimal
+    point unless exactly three digits follow it: "1,234" and "1.234" could
+    be either, so they are None ("0.125" is not ambiguous). After groups
+    separated by spaces or apostrophes ("1 234,50", "1'234.50"), a "," or
+    "." can only be the decimal point.
+    """
+    mantissa, exponent = _MANTISSA.fullmatch(text).groups()
+    last_comma, last_dot = mantissa.rfind(","), mantissa.rfind(".")
+    spaced = _SPACE_GROUPED.fullmatch(mantissa)
+    if spaced:
+        whole, fraction = spaced.groups()
+        digits = _SPACE_GROUP.sub("", whole) + "." + (fraction or "0")
+    elif _SPACE_GROUP.search(mantissa):
+        return None
+    elif last_comma != -1 and last_dot != -1:
+        point, group = (",", ".") if last_comma > last_dot else (".", ",")
+        whole, _, fraction = mantissa.rpartition(point)
+        if point in whole or not _grouped(whole.split(group)):
+            return None
+        digits = whole.replace(group, "") + "." + fraction
+    elif last_comma != -1 or last_dot != -1:
+        parts = mantissa.split("," if last_comma != -1 else ".")
+        if len(parts) > 2:
+            if not _grouped(parts):
+                return None
+            digits = "".join(parts)
+        else:
+            whole, fraction = parts
+            if len(fraction) == 3 and whole.strip("0"):
+                return None
+            digits = whole + "." + fraction
+    else:
+        digits = mantissa
+    try:
+        return float(digits + exponent)
+    except ValueError:
+        return None
+
+
+def to_float(value: Any) -> Optional[float]:
+    """
+    A number from a JSON value, or None.
+
+    "$1,234.50" → 1234.5, "1.234,50 EUR" → 1234.5, "-$5" → -5.0,
+    "(12.00)" → -12.0, "1e3" → 1000.0, "total: 1 234,50" → 1234.5;
+    "1,234" (thousands or decimals?) and "1 2345" → None.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match and not _LOOSE_DIGITS.match(value, match.end()):
+            number = _parse_number(match.group().rstrip(".,"))
+            if number is not None and any(c in value[:match.start()] for c in _NEGATIVE):
+                return -number
+            return number
+    return None
+
+
+def to_int(value: Any) -> Optional[int]:
+    number = to_float(value)
+    return round(number) if number is not None else None
+
+
+def to_bool(value: Any) -> Optional[bool]:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    if isinstance(value, (int, float)):
+        return bool(value)
+    return None
+
+
+def to_str(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def to_list(value: Any) -> Optional[list]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value:
+        return [value]
+    return None
+
+
+def to_dict(value: Any) -> Optional[dict]:
+    return value if isinstance(value, dict) else None
+
+
+_CONVERTERS = {float: to_float, int: to_int, bool: to_bool, str: to_str, list: to_list, dict: to_dict}
+
+
+def decode_object(data: Any, fields: dict[str, type]) -> dict:
+    """
+    A decoded object with the listed fields converted to their types.
+
+    Fields that are null or not convertible are left out, so the callers'
+    .get() defaults apply; keys not in fields are kept as they are.
+
+    Args:
+        data: A decoded JSON value (anything but a dict decodes as {})
+        fields: Field name → float, int, bool, str, list or dict
+    """
+    decoded = dict(data) if isinstance(data, dict) else {}
+    for field, kind in fields.items():
+        if field in decoded:
+            value = _CONVERTERS[kind](decoded[field]) if decoded[field] is not None else None
+            if value is None:
+                del decoded[field]
+            else:
+                decoded[field] = value
+    return decoded
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+class DecodingStats:
+    """How Grok answers decoded: directly, after a scan, repaired or not at all."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.outcomes = {"direct": 0, "scanned": 0, "repaired": 0, "failed": 0}
+        self.seconds = 0.0
+
+    def record(self, outcome: str, seconds: float):
+        with self._lock:
+            self.outcomes[outcome] += 1
+            self.seconds += seconds
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            seconds = self.seconds
+        answers = sum(outcomes.values())
+        return {
+            "parser": PARSER,
+            "repair_enabled": repair_enabled(),
+            "answers": answers,
+            **outcomes,
+            "microseconds_per_answer": round(seconds / answers * 1e6, 1) if answers else None,
+        }
+
+
+decoding_stats = DecodingStats()
+
+
+def get_decoding_stats() -> dict:
+    return decoding_stats.get_stats()
@@ -0,0 +1,310 @@
+"""
+Hedged Requests
+===============
+Cut tail latency by racing a duplicate request against a slow one.
+
+If a Grok call has not returned after the stage's recent p-th percentile
+latency (GROK_HEDGE_PERCENTILE, default p95), a second identical request is
+fired and whichever finishes first wins:
+
+- async: the loser task is cancelled (its HTTP request is closed)
+- sync:  the loser runs in a worker thread and is abandoned; its result is
+         discarded when it finishes
+
+Latency is tracked per stage (ingestion, validation, ...) in a rolling
+window of recent calls. Until a stage has GROK_HEDGE_MIN_SAMPLES samples no
+hedging happens. The extra tokens a hedge costs are returned so callers can
+put them in the usage ledger: the loser's real usage if it completed, else
+its estimated prompt tokens.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+DEFAULT_WINDOW = 200
+
+
+# =============================================================================
+# ROLLING LATENCY HISTOGRAM
+# =============================================================================
+
+class LatencyTracker:
+    """Recent call latencies per stage (rolling window)."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: Optional[str], seconds: float):
+        with self._lock:
+            samples = self._samples.get(stage or "default")
+            if samples is None:
+                samples = self._samples[stage or "default"] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, stage: Optional[str], pct: float) -> tuple[Optional[float], int]:
+        """Return (latency at pct, sample count); latency is None with no samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(stage or "default", ()))
+        if not samples:
+            return None, 0
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index], len(samples)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = list(self._samples)
+        result = {}
+        for stage in stages:
+            p50, count = self.percentile(stage, 50)
+            p95, _ = self.percentile(stage, 95)
+            p99, _ = self.percentile(stage, 99)
+            result[stage] = {
+                "samples": count,
+                "p50_seconds": round(p50, 4),
+                "p95_seconds": round(p95, 4),
+                "p99_seconds": round(p99, 4),
+            }
+        return result
+
+
+# =============================================================================
+# HEDGE POLICY
+# =============================================================================
+
+class HedgePolicy:
+    """Decides when to hedge and runs hedged calls (sync and async)."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        min_delay_seconds: float = 0.2,
+        window: int = DEFAULT_WINDOW,
+    ):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_seconds = min_delay_seconds
+        self.latency = LatencyTracker(window)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedge_tokens": 0}
+
+    def delay_for(self, stage: Optional[str]) -> Optional[float]:
+        """Seconds to wait before hedging, or None when there is not enough data."""
+        latency, count = self.latency.percentile(stage, self.percentile)
+        if latency is None or count < self.min_samples:
+            return None
+        return max(latency, self.min_delay_seconds)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "latency_by_stage": self.latency.snapshot(),
+        })
+        return stats
+
+    def _count(self, hedged: bool, hedge_won: bool, hedge_tokens: int):
+        with self._lock:
+            self.stats["calls"] += 1
+            if hedged:
+                self.stats["hedged"] += 1
+                self.stats["hedge_tokens"] += hedge_tokens
+            if hedge_won:
+                self.stats["hedge_wins"] += 1
+
+    # -------------------------------------------------------------------------
+    # Async
+    # -------------------------------------------------------------------------
+
+    async def run_async(
+        self,
+        attempt: Callable[[int], Awaitable[tuple[str, dict]]],
+        stage: Optional[str],
+        loser_estimate: int,
+    ) -> tuple[tuple[str, dict], dict]:
+        """
+        Run attempt(0); if it is slower than the stage threshold, race attempt(1).
+
+        Returns:
+            ((content, usage), hedge_info) where hedge_info has hedged,
+            hedge_won and hedge_tokens.
+        """
+        delay = self.delay_for(stage)
+        started = {0: time.monotonic()}
+        primary = asyncio.ensure_future(attempt(0))
+        tasks = {primary: 0}
+
+        try:
+            if delay is not None:
+                await asyncio.wait({primary}, timeout=delay)
+            if delay is None or primary.done():
+                result = await primary
+                self.latency.observe(stage, time.monotonic() - started[0])
+                self._count(False, False, 0)
+                return result, {"hedged": False, "hedge_won": False, "hedge_tokens": 0}
+
+            started[1] = time.monotonic()
+            hedge = asyncio.ensure_future(attempt(1))
+            tasks[hedge] = 1
+            pending = set(tasks)
+            winner = None
+            error: Optional[BaseException] = None
+
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+        finally:
+            # Cancel the loser (or both, if we were cancelled ourselves)
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if winner is None:
+            raise error
+
+        loser = hedge if winner is primary else primary
+        hedge_tokens = loser_estimate
+        if loser.done() and not loser.cancelled() and loser.exception() is None:
+            hedge_tokens = loser.result()[1].get("total_tokens", loser_estimate)
+
+        index = tasks[winner]
+        self.latency.observe(stage, time.monotonic() - started[index])
+        self._count(True, index == 1, hedge_tokens)
+        return winner.result(), {"hedged": True, "hedge_won": index == 1, "hedge_tokens": hedge_tokens}
+
+    # -------------------------------------------------------------------------
+    # Sync
+    # -------------------------------------------------------------------------
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="grok-hedge")
+            return self._executor
+
+    def run(
+        self,
+        attempt: Callable[[int], tuple[str, dict]],
+        stage: Optional[str],
+        loser_estimate: int,
+    ) -> tuple[tuple[str, dict], dict]:
+        """Sync version of run_async (the loser thread is abandoned, not killed)."""
+        delay = self.delay_for(stage)
+        if delay is None:
+            start = time.monotonic()
+            result = attempt(0)
+            self.latency.observe(stage, time.monotonic() - start)
+            self._count(False, False, 0)
+            return result, {"hedged": False, "hedge_won": False, "hedge_tokens": 0}
+
+        pool = self._pool()
+        started = {0: time.monotonic()}
+        # Copy the caller's context so usage/stage scoping follows the attempt
+        primary = pool.submit(contextvars.copy_context().run, attempt, 0)
+        done, _ = wait({primary}, timeout=delay)
+        if done:
+            result = primary.result()
+            self.latency.observe(stage, time.monotonic() - started[0])
+            self._count(False, False, 0)
+            return result, {"hedged": False, "hedge_won": False, "hedge_tokens": 0}
+
+        started[1] = time.monotonic()
+        hedge = pool.submit(contextvars.copy_context().run, attempt, 1)
+        futures = {primary: 0, hedge: 1}
+        pending = set(futures)
+        winner = None
+        error: Optional[BaseException] = None
+
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                error = future.exception()
+
+        if winner is None:
+            raise error
+
+        loser = hedge if winner is primary else primary
+        hedge_tokens = loser_estimate
+        if loser.done() and loser.exception() is None:
+            hedge_tokens = loser.result()[1].get("total_tokens", loser_estimate)
+
+        index = futures[winner]
+        self.latency.observe(stage, time.monotonic() - started[index])
+        self._count(True, index == 1, hedge_tokens)
+        return winner.result(), {"hedged": True, "hedge_won": index == 1, "hedge_tokens": hedge_tokens}
+
+
+class PartialGate:
+    """
+    Share one on_partial callback between racing attempts.
+
+    Whichever attempt reports a field first owns the stream; partials from
+    the other attempt are dropped, so the UI never sees fields twice. The
+    owner is not necessarily the winner: settle() then reports the
+    winner's fields that differ from what the losing owner already showed.
+    """
+
+    def __init__(self, on_partial: Optional[Callable[[tuple, Any], None]]):
+        self.on_partial = on_partial
+        self._owner: Optional[int] = None
+        self._reported: dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, index: int) -> Optional[Callable[[tuple, Any], None]]:
+        """The callback for attempt `index` (None without an on_partial)."""
+        if self.on_partial is None:
+            return None
+
+        def callback(path: tuple, value: Any):
+            with self._lock:
+                if self._owner is None:
+                    self._owner = index
+                if self._owner != index:
+                    return
+                self._reported[path] = value
+            self.on_partial(path, value)
+        return callback
+
+    def settle(self, winner: int, partials: Callable[[], Iterable[tuple[tuple, Any]]]):
+        """
+        Close the race: later partials from the loser are dropped and, if
+        the loser owned the stream, the winner's fields (partials(), in
+        order) are reported where they differ from what was shown.
+        """
+        with self._lock:
+            owner, self._owner = self._owner, winner
+            reported = dict(self._reported)
+        if owner is None or owner == winner:
+            return
+        for path, value in partials():
+            if path not in reported or reported[path] != value:
+                self.on_partial(path, value)
+
+
+def gate_partials(on_partial: Optional[Callable[[tuple, Any], None]]) -> PartialGate:
+    """
+    Share one on_partial callback between racing attempts (see PartialGate).
+
+    Returns a factory: gate(attempt_index) -> callback (or None); call
+    gate.settle() with the winner once the race is over.
+    """
+    return PartialGate(on_partial)
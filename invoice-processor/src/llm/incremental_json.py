@@ -0,0 +1,154 @@
+"""
+Incremental JSON Parser
+=======================
+Emit fields of a streamed JSON object as soon as each one is complete.
+
+Grok streams the ingestion JSON a few characters at a time. Instead of
+waiting for the closing brace, IncrementalJSONParser scans each chunk as it
+arrives and reports:
+
+- ("vendor",), "Widgets Inc."       — a top-level field, once its value closes
+- ("items", 0), {...}               — each element of a top-level array
+- ("items",), [...]                 — the whole array once it closes
+
+Only the new characters of each chunk are scanned (one pass overall); the
+text of a finished value is handed to json.loads once. Anything before the
+first "{" (e.g. a ```json fence) is skipped.
+"""
+
+import json
+from typing import Any
+
+Path = tuple
+
+
+class IncrementalJSONParser:
+    """Feed text chunks; collect (path, value) pairs for completed fields."""
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._done = False
+
+        # Container stack: each frame is {"kind": "{" | "[", "key": str|None,
+        #   "index": int, "expect_key": bool, "start": offset of the opening bracket}
+        self._stack: list[dict] = []
+
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+        # Start offset of the scalar/container value currently being read
+        # for the innermost frame (None between values)
+        self._value_start: list[int | None] = []
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def feed(self, chunk: str) -> list[tuple[Path, Any]]:
+        """Consume a chunk; return fields completed by it, in order."""
+        if self._done or not chunk:
+            return []
+        self.buffer += chunk
+        emitted: list[tuple[Path, Any]] = []
+
+        buf = self.buffer
+        i = self._pos
+        n = len(buf)
+
+        while i < n:
+            c = buf[i]
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append({"kind": "{", "key": None, "index": 0, "expect_key": True, "start": i})
+                    self._value_start.append(None)
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    frame = self._stack[-1]
+                    text = buf[self._string_start:i + 1]
+                    if frame["kind"] == "{" and frame["expect_key"]:
+                        frame["key"] = json.loads(text)
+                    else:
+                        self._value_start[-1] = None
+                        self._complete(self._string_start, i + 1, emitted)
+                i += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._stack.append({"kind": c, "key": None, "index": 0, "expect_key": c == "{", "start": i})
+                self._value_start.append(None)
+            elif c in "}]":
+                self._finish_scalar(i, emitted)
+                frame = self._stack.pop()
+                self._value_start.pop()
+                if not self._stack:
+                    self._done = True
+                    i += 1
+                    break
+                self._complete(frame["start"], i + 1, emitted)
+            elif c == ":":
+                self._stack[-1]["expect_key"] = False
+            elif c == ",":
+                self._finish_scalar(i, emitted)
+                frame = self._stack[-1]
+                if frame["kind"] == "{":
+                    frame["expect_key"] = True
+                    frame["key"] = None
+                else:
+                    frame["index"] += 1
+            elif not c.isspace():
+                if self._value_start[-1] is None:
+                    self._value_start[-1] = i
+            i += 1
+
+        self._pos = i
+        return emitted
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level object has closed."""
+        return self._done
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+
+    def _finish_scalar(self, end: int, emitted: list):
+        """Close a pending number/true/false/null ending before `end`."""
+        start = self._value_start[-1]
+        if start is not None:
+            self._value_start[-1] = None
+            self._complete(start, end, emitted)
+
+    def _path(self) -> Path:
+        """Path of the value currently completing in the innermost frame."""
+        path = []
+        for frame in self._stack:
+            path.append(frame["key"] if frame["kind"] == "{" else frame["index"])
+        # First frame is the root object; its entry is the field name
+        return tuple(path)
+
+    def _complete(self, start: int, end: int, emitted: list):
+        path = self._path()
+        # Top-level fields, and elements of top-level arrays
+        if len(path) == 1 or (len(path) == 2 and isinstance(path[1], int)):
+            try:
+                value = json.loads(self.buffer[start:end])
+            except json.JSONDecodeError:
+                return
+            emitted.append((path, value))
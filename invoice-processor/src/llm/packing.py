@@ -0,0 +1,130 @@
+"""
+Request Packing
+===============
+Put several small documents into one chat completion.
+
+For a short invoice most of the prompt is the fixed instructions and
+few-shot examples, not the invoice. Packing N invoices into one request
+pays for that prefix once and returns an array of N results, so the
+per-invoice cost drops roughly by the prefix share.
+
+RequestPacker decides which documents go together: each pack holds at
+most GROK_PACK_MAX_INVOICES documents whose estimated tokens add up to no
+more than GROK_PACK_MAX_TOKENS. Documents larger than half that budget are
+never packed — they would leave no room for a second one. The caller
+builds the packed prompt, splits the answer and sends anything it cannot
+use through the normal single-document path.
+
+To show whether packing pays off, the packer keeps the amortized cost and
+latency per document of packed and of single requests: tokens per
+document, and wall time of the request round divided by its documents.
+"""
+
+import threading
+from typing import Hashable
+
+
+# =============================================================================
+# PACKER
+# =============================================================================
+
+class RequestPacker:
+    """Group small documents into token-budgeted packs and track what they cost."""
+
+    def __init__(self, enabled: bool = False, max_tokens: int = 4000, max_items: int = 8):
+        self.enabled = enabled
+        self.max_tokens = max_tokens
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self.stats = {"packs": 0, "packed_documents": 0, "fallbacks": 0}
+        self._cost = {
+            kind: {"documents": 0, "requests": 0, "prompt_tokens": 0, "total_tokens": 0, "seconds": 0.0}
+            for kind in ("packed", "single")
+        }
+
+    def packable(self, tokens: int) -> bool:
+        return self.enabled and tokens * 2 <= self.max_tokens
+
+    def plan(self, sizes: dict[Hashable, int]) -> tuple[list[list[Hashable]], list[Hashable]]:
+        """
+        Split documents into packs (first-fit, largest first) and singles.
+
+        Args:
+            sizes: {key: estimated tokens}
+
+        Returns:
+            (packs of two or more keys, keys to send on their own)
+        """
+        if not self.enabled or self.max_items < 2:
+            return [], list(sizes)
+
+        bins: list[tuple[list[Hashable], int]] = []
+        singles = []
+        for key in sorted(sizes, key=sizes.get, reverse=True):
+            tokens = sizes[key]
+            if not self.packable(tokens):
+                singles.append(key)
+                continue
+            for i, (keys, used) in enumerate(bins):
+                if len(keys) < self.max_items and used + tokens <= self.max_tokens:
+                    keys.append(key)
+                    bins[i] = (keys, used + tokens)
+                    break
+            else:
+                bins.append(([key], tokens))
+
+        packs = []
+        for keys, _ in bins:
+            if len(keys) > 1:
+                packs.append(keys)
+            else:
+                singles.extend(keys)
+        return packs, singles
+
+    def record(self, kind: str, documents: int, requests: int, usage: dict, seconds: float):
+        """
+        Cost of one round of requests.
+
+        Args:
+            kind: "packed" or "single"
+            documents: Documents answered by the round
+            requests: Requests it took
+            usage: Summed usage of those requests (prompt_tokens, total_tokens)
+            seconds: Wall time of the round
+        """
+        with self._lock:
+            cost = self._cost[kind]
+            cost["documents"] += documents
+            cost["requests"] += requests
+            cost["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            cost["total_tokens"] += usage.get("total_tokens", 0)
+            cost["seconds"] += seconds
+            if kind == "packed":
+                self.stats["packs"] += requests
+                self.stats["packed_documents"] += documents
+
+    def record_fallbacks(self, documents: int):
+        """Packed documents whose result was unusable and were resent alone."""
+        with self._lock:
+            self.stats["fallbacks"] += documents
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            costs = {kind: dict(cost) for kind, cost in self._cost.items()}
+        stats.update({
+            "enabled": self.enabled,
+            "max_tokens": self.max_tokens,
+            "max_items": self.max_items,
+            "documents_per_pack": round(stats["packed_documents"] / stats["packs"], 2) if stats["packs"] else None,
+        })
+        for kind, cost in costs.items():
+            documents = cost["documents"]
+            stats[kind] = {
+                "documents": documents,
+                "requests": cost["requests"],
+                "prompt_tokens_per_document": round(cost["prompt_tokens"] / documents, 1) if documents else None,
+                "tokens_per_document": round(cost["total_tokens"] / documents, 1) if documents else None,
+                "seconds_per_document": round(cost["seconds"] / documents, 3) if documents else None,
+            }
+        return stats
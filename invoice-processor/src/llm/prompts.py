@@ -0,0 +1,51 @@
+"""
+Prompt Assembly
+===============
+Lay out chat messages so the provider's prompt cache can reuse them.
+
+xAI (like OpenAI) caches prompts by prefix: a request whose leading tokens
+match a recent request's is billed and served faster for the matching part
+(reported as usage.prompt_tokens_details.cached_tokens). So every prompt
+is assembled as
+
+    [system]  static instructions, schema, few-shot examples
+    [user]    static task line, then semi-static context (e.g. the
+              inventory list), then the per-invoice data — always last
+    [user]    follow-ups (self-correction hints) appended after, so a retry
+              re-sends the first attempt's prompt unchanged as its prefix
+
+Static blocks are normalized (stripped) once when a PromptLayout is built,
+so the prefix is byte-for-byte identical across calls and processes.
+"""
+
+from typing import Sequence
+
+
+class PromptLayout:
+    """A static system prompt plus an optional static task line."""
+
+    def __init__(self, *system_parts: str, task: str = ""):
+        self.system = "\n\n".join(part.strip() for part in system_parts if part and part.strip())
+        self.task = task.strip()
+
+    def messages(self, data: str, context: Sequence[str] = ()) -> list[dict]:
+        """
+        Build [system, user] messages with variable data last.
+
+        Args:
+            data: Per-call content (invoice text, extracted fields, ...)
+            context: Semi-static blocks placed before data (change rarely,
+                e.g. the inventory list), so they stay in the cached prefix
+        """
+        blocks = [self.task] if self.task else []
+        blocks.extend(block.strip() for block in context if block and block.strip())
+        blocks.append(data.strip())
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": "\n\n".join(blocks)},
+        ]
+
+
+def extend_messages(messages: list[dict], follow_up: str) -> list[dict]:
+    """Append a follow-up user turn to an earlier prompt, keeping it as the prefix."""
+    return list(messages) + [{"role": "user", "content": follow_up.strip()}]
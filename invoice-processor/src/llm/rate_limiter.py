@@ -0,0 +1,342 @@
+"""
+Grok Rate Limiter
+=================
+Token-bucket traffic shaping for Grok requests.
+
+Two buckets are tracked against xAI's per-minute limits:
+- requests: GROK_RATE_LIMIT_RPM requests per minute
+- tokens:   GROK_RATE_LIMIT_TPM tokens per minute
+
+Before a call, the prompt is estimated (chars / chars-per-token) and that
+estimate plus max_tokens is reserved. After the call the reservation is
+reconciled against response.usage, so over-estimates are refunded and the
+chars-per-token ratio is re-learned from real traffic.
+
+Bucket state lives in a small SQLite file (data/grok_ratelimit.db) and is
+updated under BEGIN IMMEDIATE, so every thread and every uvicorn worker
+process draws from the same budget. Inside a process, callers queue FIFO:
+only the oldest waiter may take from the buckets, so a large request is not
+starved by a stream of small ones. Callers wait; they never fail.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_CHARS_PER_TOKEN = 4.0
+POLL_INTERVAL_SECONDS = 0.05
+MAX_WAIT_SAMPLES = 500
+
+
+def estimate_prompt_tokens(messages: list, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN) -> int:
+    """Rough prompt-token estimate from message text length."""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    # Each message carries a few tokens of role/formatting overhead
+    return int(chars / chars_per_token) + 4 * len(messages)
+
+
+# =============================================================================
+# TOKEN BUCKET LIMITER
+# =============================================================================
+
+class RateLimiter:
+    """
+    Requests/min + tokens/min limiter shared across threads and processes.
+
+    A limit of 0 disables that bucket; with both at 0 acquire() returns
+    immediately.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str],
+        requests_per_minute: int,
+        tokens_per_minute: int,
+    ):
+        self.db_path = db_path
+        self.rpm = max(0, requests_per_minute)
+        self.tpm = max(0, tokens_per_minute)
+        self.chars_per_token = DEFAULT_CHARS_PER_TOKEN
+
+        # In-process FIFO of waiting tickets
+        self._queue: deque[int] = deque()
+        self._queue_lock = threading.Lock()
+        self._next_ticket = 0
+
+        # Fallback bucket state when SQLite is unavailable
+        self._local_state: dict[str, tuple[float, float]] = {}
+        self._local_lock = threading.Lock()
+        self._db_ready = False
+
+        self._metrics_lock = threading.Lock()
+        self._wait_samples: deque[float] = deque(maxlen=MAX_WAIT_SAMPLES)
+        self.metrics = {
+            "acquired": 0,
+            "throttled": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "max_queue_depth": 0,
+            "estimated_tokens": 0,
+            "actual_tokens": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def estimate(self, messages: list, max_tokens: int) -> int:
+        """Tokens to reserve for a request: prompt estimate + completion ceiling."""
+        return estimate_prompt_tokens(messages, self.chars_per_token) + max_tokens
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until one request and `tokens` tokens are available.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        if not self.enabled:
+            return 0.0
+
+        ticket = self._enqueue()
+        start = time.monotonic()
+        try:
+            while True:
+                if self._is_head(ticket):
+                    wait = self._try_take(tokens)
+                    if wait <= 0:
+                        break
+                    time.sleep(min(wait, POLL_INTERVAL_SECONDS * 4))
+                else:
+                    time.sleep(POLL_INTERVAL_SECONDS)
+        finally:
+            self._dequeue(ticket)
+
+        return self._record_wait(time.monotonic() - start)
+
+    async def acquire_async(self, tokens: int) -> float:
+        """Async version of acquire(); waits without blocking the event loop."""
+        if not self.enabled:
+            return 0.0
+
+        ticket = self._enqueue()
+        start = time.monotonic()
+        try:
+            while True:
+                if self._is_head(ticket):
+                    wait = await asyncio.to_thread(self._try_take, tokens)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(min(wait, POLL_INTERVAL_SECONDS * 4))
+                else:
+                    await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        finally:
+            self._dequeue(ticket)
+
+        return self._record_wait(time.monotonic() - start)
+
+    def reconcile(self, reserved_tokens: int, usage: dict, prompt_chars: int = 0):
+        """
+        Correct the token bucket once the real usage is known.
+
+        Refunds (or charges) the difference between the reservation and
+        usage["total_tokens"], and re-learns chars-per-token from the prompt.
+        """
+        actual = usage.get("total_tokens", 0)
+        prompt_tokens = usage.get("prompt_tokens", 0)
+
+        with self._metrics_lock:
+            self.metrics["estimated_tokens"] += reserved_tokens
+            self.metrics["actual_tokens"] += actual
+            if prompt_chars and prompt_tokens:
+                observed = prompt_chars / prompt_tokens
+                self.chars_per_token = 0.8 * self.chars_per_token + 0.2 * observed
+
+        if self.tpm and actual:
+            self._adjust_tokens(reserved_tokens - actual)
+
+    async def reconcile_async(self, reserved_tokens: int, usage: dict, prompt_chars: int = 0):
+        """Async version of reconcile(); the bucket update waits for the SQLite lock in a thread."""
+        await asyncio.to_thread(self.reconcile, reserved_tokens, usage, prompt_chars)
+
+    def get_metrics(self) -> dict:
+        """Queue depth, wait-time and estimate-accuracy metrics."""
+        with self._queue_lock:
+            queue_depth = len(self._queue)
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+            samples = sorted(self._wait_samples)
+            chars_per_token = self.chars_per_token
+
+        acquired = metrics["acquired"]
+        metrics.update({
+            "enabled": self.enabled,
+            "requests_per_minute": self.rpm,
+            "tokens_per_minute": self.tpm,
+            "queue_depth": queue_depth,
+            "avg_wait_seconds": round(metrics["total_wait_seconds"] / acquired, 4) if acquired else 0.0,
+            "p95_wait_seconds": round(samples[int(0.95 * (len(samples) - 1))], 4) if samples else 0.0,
+            "chars_per_token": round(chars_per_token, 3),
+        })
+        metrics["total_wait_seconds"] = round(metrics["total_wait_seconds"], 4)
+        metrics["max_wait_seconds"] = round(metrics["max_wait_seconds"], 4)
+        return metrics
+
+    # -------------------------------------------------------------------------
+    # FIFO queue
+    # -------------------------------------------------------------------------
+
+    def _enqueue(self) -> int:
+        with self._queue_lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._queue.append(ticket)
+            depth = len(self._queue)
+        with self._metrics_lock:
+            self.metrics["max_queue_depth"] = max(self.metrics["max_queue_depth"], depth)
+        return ticket
+
+    def _is_head(self, ticket: int) -> bool:
+        with self._queue_lock:
+            return bool(self._queue) and self._queue[0] == ticket
+
+    def _dequeue(self, ticket: int):
+        with self._queue_lock:
+            try:
+                self._queue.remove(ticket)
+            except ValueError:
+                pass
+
+    def _record_wait(self, waited: float) -> float:
+        with self._metrics_lock:
+            self.metrics["acquired"] += 1
+            self.metrics["total_wait_seconds"] += waited
+            self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], waited)
+            if waited > POLL_INTERVAL_SECONDS:
+                self.metrics["throttled"] += 1
+            self._wait_samples.append(waited)
+        return waited
+
+    # -------------------------------------------------------------------------
+    # Bucket state
+    # -------------------------------------------------------------------------
+
+    def _capacities(self) -> dict[str, float]:
+        caps = {}
+        if self.rpm:
+            caps["requests"] = float(self.rpm)
+        if self.tpm:
+            caps["tokens"] = float(self.tpm)
+        return caps
+
+    def _try_take(self, tokens: int) -> float:
+        """
+        Take from the buckets if both have room.
+
+        Returns:
+            0 on success, otherwise the seconds until enough has refilled.
+        """
+        caps = self._capacities()
+        # A request bigger than the whole bucket would never fit; clamp it
+        wanted = {"requests": 1.0, "tokens": float(min(tokens, caps.get("tokens", tokens)))}
+
+        def take(levels: dict[str, float]) -> float:
+            wait = 0.0
+            for name, cap in caps.items():
+                if levels[name] < wanted[name]:
+                    wait = max(wait, (wanted[name] - levels[name]) / (cap / 60.0))
+            if wait > 0:
+                return wait
+            for name in caps:
+                levels[name] -= wanted[name]
+            return 0.0
+
+        return self._update_buckets(take)
+
+    def _adjust_tokens(self, delta: float):
+        """Refund (positive) or charge (negative) the token bucket."""
+        def adjust(levels: dict[str, float]) -> float:
+            levels["tokens"] = min(float(self.tpm), levels["tokens"] + delta)
+            return 0.0
+
+        self._update_buckets(adjust)
+
+    def _update_buckets(self, fn) -> float:
+        """Refill buckets to now, apply fn(levels) and persist, atomically."""
+        caps = self._capacities()
+        conn = self._connect()
+
+        if conn is None:
+            with self._local_lock:
+                levels = self._refill(self._local_state, caps)
+                result = fn(levels)
+                now = time.time()
+                for name, level in levels.items():
+                    self._local_state[name] = (level, now)
+                return result
+
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT name, level, updated_at FROM grok_rate_buckets").fetchall()
+            state = {name: (level, updated_at) for name, level, updated_at in rows}
+            levels = self._refill(state, caps)
+            result = fn(levels)
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO grok_rate_buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                [(name, level, now) for name, level in levels.items()]
+            )
+            conn.commit()
+            return result
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter database error, retrying: {e}")
+            conn.rollback()
+            return POLL_INTERVAL_SECONDS
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _refill(state: dict[str, tuple[float, float]], caps: dict[str, float]) -> dict[str, float]:
+        now = time.time()
+        levels = {}
+        for name, cap in caps.items():
+            level, updated_at = state.get(name, (cap, now))
+            elapsed = max(0.0, now - updated_at)
+            levels[name] = min(cap, level + elapsed * cap / 60.0)
+        return levels
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.db_path:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            if not self._db_ready:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS grok_rate_buckets (
+                        name TEXT PRIMARY KEY,
+                        level REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                self._db_ready = True
+            return conn
+        except sqlite3.Error as e:
+            logger.warning(f"Rate limiter database unavailable, using in-process buckets: {e}")
+            return None
@@ -0,0 +1,207 @@
+"""
+Retry and Circuit Breaker
+=========================
+Keep Grok brownouts from stalling the pipeline.
+
+- RetryPolicy: retryable failures (timeouts, connection errors, 429, 5xx)
+  are retried with full-jitter exponential backoff, honoring Retry-After.
+  Client errors (400, 401, bad schema) and missing config fail at once.
+- CircuitBreaker: tracks the outcome of recent calls. Once the failure
+  rate over the window crosses the threshold, the circuit opens and every
+  call fails immediately with CircuitOpenError, so agents switch to their
+  fallbacks instead of waiting out timeouts. After open_seconds one probe
+  call is let through (half-open): success closes the circuit, failure
+  opens it again.
+
+Neither class imports the OpenAI SDK; errors are classified by type name
+and status code.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Exception type names (OpenAI SDK / httpx) that indicate a transient failure
+RETRYABLE_ERROR_NAMES = {
+    "APITimeoutError",
+    "APIConnectionError",
+    "RateLimitError",
+    "InternalServerError",
+    "TimeoutException",
+    "TransportError",
+}
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+
+class CircuitOpenError(RuntimeError):
+    """The Grok circuit is open; the call was not attempted."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Grok circuit open (Grok unavailable, retry in {retry_after:.0f}s)")
+
+
+def is_retryable(error: BaseException) -> bool:
+    """True for transient failures worth retrying (and counting against the circuit)."""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in RETRYABLE_STATUS_CODES or status >= 500)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After response header, if the error carries one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# =============================================================================
+# RETRY
+# =============================================================================
+
+class RetryPolicy:
+    """Jittered exponential backoff for retryable errors."""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.stats = {"retries": 0, "gave_up": 0}
+
+    def delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        Seconds to wait before retrying after attempt (0-based) failed.
+
+        Returns:
+            None when the error is not retryable or attempts are used up.
+        """
+        if not is_retryable(error):
+            return None
+        if attempt + 1 >= self.max_attempts:
+            with self._lock:
+                self.stats["gave_up"] += 1
+            return None
+
+        # Full jitter: spread retries from many workers over the window
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        with self._lock:
+            self.stats["retries"] += 1
+        return delay
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["max_attempts"] = self.max_attempts
+        return stats
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open probing (thread-safe)."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: int = 20,
+        open_seconds: float = 30.0,
+    ):
+        self.enabled = enabled
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "short_circuited": 0, "probes": 0}
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go out now."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if self.state == OPEN and remaining <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.stats["probes"] += 1
+                return
+            self.stats["short_circuited"] += 1
+        raise CircuitOpenError(max(remaining, 0.0))
+
+    def record_success(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                self.state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def release(self):
+        """The call ended without a verdict (cancelled, client error): free the probe slot."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        self.stats["opened"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            outcomes = list(self._outcomes)
+            stats.update({
+                "enabled": self.enabled,
+                "state": self.state,
+                "window_calls": len(outcomes),
+                "window_failures": outcomes.count(False),
+            })
+        return stats
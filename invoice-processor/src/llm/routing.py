@@ -0,0 +1,144 @@
+"""
+Model Tier Routing
+==================
+Send easy work to a fast model and escalate only what needs reasoning.
+
+Two tiers:
+- fast:      GROK_FAST_MODEL — cheap, low latency, no reasoning tokens
+- reasoning: GROK_REASONING_MODEL — the default GROK_MODEL
+
+Agents ask for a tier per call (call_grok(..., tier="fast")). Clean, short
+invoices start on the fast tier (route()); a fast answer is escalated to
+the reasoning tier when it fails to parse, trips the agent's self-
+correction check, or reports confidence below GROK_ESCALATE_CONFIDENCE
+(should_escalate()).
+
+Per stage and tier the router keeps call counts, tokens, a rolling latency
+window and outcomes (answer accepted vs. escalated), so thresholds can be
+tuned from data via GET /api/metrics.
+
+With GROK_ROUTING_ENABLED=0 both tiers resolve to GROK_MODEL and nothing
+is escalated.
+"""
+
+import re
+import threading
+from typing import Optional
+
+from src.llm.hedging import LatencyTracker
+
+FAST = "fast"
+REASONING = "reasoning"
+TIERS = (FAST, REASONING)
+
+DEFAULT_FAST_MODEL = "grok-4-1-fast-non-reasoning"
+
+# pdfplumber renders unmapped glyphs as "(cid:123)"
+_GARBLED = re.compile(r"\(cid:\d+\)|�")
+
+
+class ModelRouter:
+    """Tier → model mapping, routing/escalation rules and per-tier stats."""
+
+    def __init__(
+        self,
+        fast_model: str,
+        reasoning_model: str,
+        enabled: bool = True,
+        fast_max_tokens: int = 2000,
+        escalate_confidence: float = 0.8,
+        min_clean_ratio: float = 0.97,
+    ):
+        self.fast_model = fast_model
+        self.reasoning_model = reasoning_model
+        self.enabled = enabled
+        self.fast_max_tokens = fast_max_tokens
+        self.escalate_confidence = escalate_confidence
+        self.min_clean_ratio = min_clean_ratio
+        self.latency = LatencyTracker()
+        self._stats: dict[tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, tier: Optional[str]) -> str:
+        if tier == FAST and self.enabled:
+            return self.fast_model
+        return self.reasoning_model
+
+    def route(self, text: str, estimated_tokens: int) -> str:
+        """Pick the starting tier for a document: fast if short and cleanly extracted."""
+        if not self.enabled:
+            return REASONING
+        if estimated_tokens > self.fast_max_tokens:
+            return REASONING
+        return FAST if self.is_clean(text) else REASONING
+
+    def is_clean(self, text: str) -> bool:
+        """Text looks machine-generated: no garbled glyphs, almost all plain characters."""
+        if not text.strip() or _GARBLED.search(text):
+            return False
+        plain = sum(1 for ch in text if ch.isascii() and (ch.isprintable() or ch in "\n\t"))
+        return plain / len(text) >= self.min_clean_ratio
+
+    def should_escalate(self, tier: Optional[str], confidence: Optional[float] = None, failed: bool = False) -> bool:
+        """
+        Whether a fast-tier answer should be redone on the reasoning tier.
+
+        Args:
+            confidence: The answer's own confidence, 0-1 (None: not reported)
+            failed: The answer was unusable (unparseable, failed a check)
+        """
+        if not self.enabled or tier != FAST:
+            return False
+        if failed:
+            return True
+        return confidence is not None and confidence < self.escalate_confidence
+
+    # -------------------------------------------------------------------------
+    # Stats
+    # -------------------------------------------------------------------------
+
+    def observe(self, stage: Optional[str], tier: Optional[str], seconds: float, usage: dict):
+        """Record one completed call of a tier."""
+        key = (stage or "unknown", self._effective(tier))
+        self.latency.observe("/".join(key), seconds)
+        with self._lock:
+            stats = self._entry(key)
+            stats["calls"] += 1
+            stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            stats["completion_tokens"] += usage.get("completion_tokens", 0)
+
+    def record_outcome(self, stage: Optional[str], tier: Optional[str], accepted: bool):
+        """Record whether a tier's answer was kept (True) or escalated (False)."""
+        with self._lock:
+            stats = self._entry((stage or "unknown", self._effective(tier)))
+            stats["accepted" if accepted else "escalated"] += 1
+
+    def get_stats(self) -> dict:
+        latency = self.latency.snapshot()
+        with self._lock:
+            entries = {key: dict(stats) for key, stats in self._stats.items()}
+        tiers = {}
+        for (stage, tier), stats in sorted(entries.items()):
+            decided = stats["accepted"] + stats["escalated"]
+            stats["acceptance_rate"] = round(stats["accepted"] / decided, 4) if decided else None
+            stats["latency"] = latency.get(f"{stage}/{tier}")
+            tiers.setdefault(stage, {})[tier] = stats
+        return {
+            "enabled": self.enabled,
+            "models": {FAST: self.model_for(FAST), REASONING: self.model_for(REASONING)},
+            "fast_max_tokens": self.fast_max_tokens,
+            "escalate_confidence": self.escalate_confidence,
+            "stages": tiers,
+        }
+
+    def _effective(self, tier: Optional[str]) -> str:
+        # Stats are kept by the tier that actually served the call
+        return FAST if tier == FAST and self.enabled else REASONING
+
+    def _entry(self, key: tuple[str, str]) -> dict:
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "accepted": 0, "escalated": 0,
+            }
+        return stats
@@ -0,0 +1,94 @@
+"""
+Single-Flight Deduplication
+===========================
+Collapse identical in-flight Grok calls into one request.
+
+When the same invoice is submitted twice at once (double-click, frontend
+retry, two reviewers opening the same PDF) both callers compute the same
+request key. The first caller (the leader) makes the call; everyone else
+arriving before it finishes waits on the leader's future and receives the
+same result — or the same exception.
+
+One concurrent.futures.Future per key serves both call paths:
+- sync followers block on future.result()
+- async followers await asyncio.wrap_future(future)
+so a sync caller in a worker thread can share an async leader's request
+and vice versa.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """Per-key in-flight call registry."""
+
+    def __init__(self):
+        self._calls: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"leaders": 0, "shared": 0}
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        """Return (future, is_leader) for key."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.stats["leaders"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def do(self, key: str, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """
+        Run fn once per concurrent key.
+
+        Returns:
+            (result, shared) — shared is True when this caller received
+            another caller's result instead of running fn.
+        """
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            self._finish(key, future)
+            raise
+
+        future.set_result(result)
+        self._finish(key, future)
+        return result, False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Async version of do(); fn is a coroutine function."""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return await asyncio.wrap_future(future), True
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            self._finish(key, future)
+            raise
+
+        future.set_result(result)
+        self._finish(key, future)
+        return result, False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._calls)
+        return stats
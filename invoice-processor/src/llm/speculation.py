@@ -0,0 +1,137 @@
+"""
+Speculative Retries
+===================
+Run the first attempt and its self-correction retry at the same time when
+the input is predicted to need the retry anyway.
+
+The caller scores each input's retry risk (0-1) from cheap features before
+calling Grok. At or above GROK_SPECULATE_THRESHOLD, both prompts are sent
+concurrently and the caller keeps the better answer, so a hard input costs
+one round trip instead of two. The price is a wasted call whenever the
+prediction was wrong.
+
+Every prediction is scored against what actually happened (did the first
+attempt need a retry?), whether or not it was acted on. That keeps
+precision (speculations that were needed) and recall (retries that were
+predicted) measurable even with speculation disabled. When precision over
+the recent window drops below GROK_SPECULATE_MIN_PRECISION, speculation
+pauses — predictions are still scored — and resumes once it recovers.
+"""
+
+import logging
+import threading
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Log precision every this many scored predictions
+LOG_EVERY = 20
+
+
+class SpeculationPolicy:
+    """Decide when to speculate, and track how often the prediction was right."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold: float = 0.5,
+        min_precision: float = 0.5,
+        min_samples: int = 10,
+        window: int = 100,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.min_precision = min_precision
+        self.min_samples = min_samples
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen=window)  # (predicted, needed)
+        self._paused = False
+        self._lock = threading.Lock()
+        self.stats = {
+            "scored": 0, "speculated": 0, "needed": 0,
+            "true_positives": 0, "false_positives": 0, "false_negatives": 0,
+            "wasted_calls": 0, "wasted_tokens": 0, "pauses": 0,
+        }
+
+    def predicts_retry(self, risk: float) -> bool:
+        return risk >= self.threshold
+
+    def should_speculate(self, risk: float) -> bool:
+        """Whether to launch the retry alongside the first attempt."""
+        with self._lock:
+            return self.enabled and not self._paused and self.predicts_retry(risk)
+
+    def observe(
+        self,
+        risk: float,
+        needed: bool,
+        speculated: bool,
+        stage: Optional[str] = None,
+        wasted_tokens: int = 0,
+    ):
+        """
+        Score one prediction.
+
+        Args:
+            risk: The retry risk the caller predicted
+            needed: The first attempt did need a retry
+            speculated: The retry was launched speculatively
+            wasted_tokens: Tokens spent on a speculative retry that was not needed
+        """
+        predicted = self.predicts_retry(risk)
+        with self._lock:
+            self._outcomes.append((predicted, needed))
+            self.stats["scored"] += 1
+            self.stats["speculated"] += speculated
+            self.stats["needed"] += needed
+            self.stats["true_positives"] += predicted and needed
+            self.stats["false_positives"] += predicted and not needed
+            self.stats["false_negatives"] += needed and not predicted
+            self.stats["wasted_calls"] += speculated and not needed
+            self.stats["wasted_tokens"] += wasted_tokens
+
+            precision, positives = self._window_precision()
+            if positives >= self.min_samples:
+                if not self._paused and precision < self.min_precision:
+                    self._paused = True
+                    self.stats["pauses"] += 1
+                    logger.warning(
+                        f"Speculative retries paused: predictor precision {precision:.0%} "
+                        f"< {self.min_precision:.0%} over the last {positives} predictions"
+                    )
+                elif self._paused and precision >= self.min_precision:
+                    self._paused = False
+                    logger.info(f"Speculative retries resumed: predictor precision {precision:.0%}")
+
+            if self.stats["scored"] % LOG_EVERY == 0:
+                logger.info(
+                    f"Retry predictor ({stage or 'unknown'}): precision "
+                    + (f"{precision:.0%}" if positives else "n/a")
+                    + f" over {positives} recent predictions, {self.stats['wasted_calls']} wasted speculative calls"
+                    + f" ({self.stats['wasted_tokens']} tokens)"
+                )
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            precision, positives = self._window_precision()
+            paused = self._paused
+        tp = stats["true_positives"]
+        predicted = tp + stats["false_positives"]
+        stats.update({
+            "enabled": self.enabled,
+            "paused": paused,
+            "threshold": self.threshold,
+            "min_precision": self.min_precision,
+            "precision": round(tp / predicted, 4) if predicted else None,
+            "recall": round(tp / stats["needed"], 4) if stats["needed"] else None,
+            "window_precision": round(precision, 4) if positives else None,
+        })
+        return stats
+
+    def _window_precision(self) -> tuple[float, int]:
+        """(precision, positive predictions) over the recent window."""
+        positives = [needed for predicted, needed in self._outcomes if predicted]
+        if not positives:
+            return 0.0, 0
+        return sum(positives) / len(positives), len(positives)
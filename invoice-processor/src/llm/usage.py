@@ -0,0 +1,240 @@
+"""
+Grok Usage Accounting
+=====================
+Context-scoped token accounting for Grok calls.
+
+Every call_grok / call_grok_async is attributed to the invoice and stage
+active in the caller's context (contextvars), so concurrent invoices on the
+same event loop — or in worker threads started with asyncio.to_thread,
+which copies the context — never see each other's token counts.
+
+Usage:
+    with usage_scope(invoice_id):
+        with stage_scope("ingestion"):
+            call_grok(...)
+        tracker = current_tracker()
+        tracker.totals()      # this invoice only
+
+Each tracker keeps an append-only record list. list.append is atomic, and
+totals are summed from a snapshot of the list on read, so recording takes
+no lock. When the outermost scope for an invoice exits, unflushed records
+are written to the grok_usage_ledger table in inventory.db (per-invoice
+cost ledger).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Calls made outside any usage_scope land here (CLI runs, tests). Bounded so a
+# long-running server never grows it without limit.
+UNSCOPED_MAX_RECORDS = 1000
+
+# Recently used per-invoice trackers kept in memory; the ledger is the
+# source of truth for older invoices.
+MAX_TRACKERS = 500
+
+TOTAL_KEYS = (
+    "prompt_tokens", "completion_tokens", "total_tokens", "cached_prompt_tokens",
+    "cache_hits", "cache_misses", "cached_tokens_saved",
+    "deduplicated_calls", "hedged_calls", "hedge_tokens",
+)
+
+
+# =============================================================================
+# TRACKER
+# =============================================================================
+
+class UsageTracker:
+    """Append-only usage records for one invoice (or the unscoped default)."""
+
+    def __init__(self, invoice_id: Optional[str], max_records: Optional[int] = None):
+        self.invoice_id = invoice_id
+        self.records: deque[dict] = deque(maxlen=max_records)
+        self._flushed = 0
+        self._flush_lock = threading.Lock()
+
+    def add(self, record: dict) -> dict:
+        self.records.append(record)
+        return record
+
+    def last(self) -> Optional[dict]:
+        try:
+            return self.records[-1]
+        except IndexError:
+            return None
+
+    def all(self) -> list:
+        return list(self.records)
+
+    def totals(self, stage: Optional[str] = None) -> dict:
+        """Sum token counts and cache/dedup counters (optionally for one stage)."""
+        records = list(self.records)
+        if stage is not None:
+            records = [record for record in records if record.get("stage") == stage]
+        return self._sum(records)
+
+    def by_stage(self) -> dict:
+        """Totals keyed by stage name (records without one under "unknown")."""
+        stages: dict[str, list] = {}
+        for record in list(self.records):
+            stages.setdefault(record.get("stage") or "unknown", []).append(record)
+        return {stage: self._sum(records) for stage, records in stages.items()}
+
+    @staticmethod
+    def _sum(records: list) -> dict:
+        totals = dict.fromkeys(TOTAL_KEYS, 0)
+        for record in records:
+            totals["prompt_tokens"] += record.get("prompt_tokens", 0)
+            totals["completion_tokens"] += record.get("completion_tokens", 0)
+            totals["total_tokens"] += record.get("total_tokens", 0)
+            totals["cached_prompt_tokens"] += record.get("cached_prompt_tokens", 0)
+            totals["cached_tokens_saved"] += record.get("saved_tokens", 0)
+            totals["hedge_tokens"] += record.get("hedge_tokens", 0)
+            if record.get("cached"):
+                totals["cache_hits"] += 1
+            if record.get("deduplicated"):
+                totals["deduplicated_calls"] += 1
+            if record.get("cache_miss"):
+                totals["cache_misses"] += 1
+            if record.get("hedged"):
+                totals["hedged_calls"] += 1
+        return totals
+
+    def reset(self):
+        with self._flush_lock:
+            self.records.clear()
+            self._flushed = 0
+
+    def flush(self) -> int:
+        """
+        Write records not yet persisted to the cost ledger.
+
+        Returns:
+            Number of records written.
+        """
+        if self.invoice_id is None:
+            return 0
+
+        with self._flush_lock:
+            pending = list(self.records)[self._flushed:]
+            if not pending:
+                return 0
+            try:
+                from src.tools.database import record_usage_ledger
+                record_usage_ledger(self.invoice_id, pending)
+            except Exception as e:
+                logger.warning(f"Usage ledger flush failed for {self.invoice_id}: {e}")
+                return 0
+            self._flushed += len(pending)
+            return len(pending)
+
+
+# =============================================================================
+# CONTEXT
+# =============================================================================
+
+_unscoped = UsageTracker(None, max_records=UNSCOPED_MAX_RECORDS)
+_trackers: OrderedDict[str, UsageTracker] = OrderedDict()
+_trackers_lock = threading.Lock()
+
+_current_tracker: ContextVar[Optional[UsageTracker]] = ContextVar("grok_usage_tracker", default=None)
+_current_stage: ContextVar[Optional[str]] = ContextVar("grok_usage_stage", default=None)
+_scope_depth: ContextVar[int] = ContextVar("grok_usage_scope_depth", default=0)
+
+
+def get_tracker(invoice_id: str) -> UsageTracker:
+    """Get (or create) the in-memory tracker for an invoice."""
+    with _trackers_lock:
+        tracker = _trackers.get(invoice_id)
+        if tracker is None:
+            tracker = UsageTracker(invoice_id)
+            _trackers[invoice_id] = tracker
+        _trackers.move_to_end(invoice_id)
+        while len(_trackers) > MAX_TRACKERS:
+            _, evicted = _trackers.popitem(last=False)
+            evicted.flush()
+        return tracker
+
+
+def current_tracker() -> UsageTracker:
+    """Tracker for the active invoice, or the unscoped default."""
+    return _current_tracker.get() or _unscoped
+
+
+def current_stage() -> Optional[str]:
+    return _current_stage.get()
+
+
+@contextmanager
+def usage_scope(invoice_id: str, stage: Optional[str] = None) -> Iterator[UsageTracker]:
+    """
+    Attribute every Grok call in this context to invoice_id.
+
+    Nested scopes for the same invoice share one tracker; the ledger is
+    flushed when the outermost scope exits.
+    """
+    tracker = get_tracker(invoice_id)
+    tracker_token = _current_tracker.set(tracker)
+    stage_token = _current_stage.set(stage) if stage is not None else None
+    depth_token = _scope_depth.set(_scope_depth.get() + 1)
+    try:
+        yield tracker
+    finally:
+        outermost = _scope_depth.get() == 1
+        _scope_depth.reset(depth_token)
+        if stage_token is not None:
+            _current_stage.reset(stage_token)
+        _current_tracker.reset(tracker_token)
+        if outermost:
+            tracker.flush()
+
+
+@contextmanager
+def stage_scope(stage: str) -> Iterator[None]:
+    """Label Grok calls in this context with a workflow stage."""
+    token = _current_stage.set(stage)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def record_call(usage: dict, model: str, **flags) -> dict:
+    """
+    Attribute one Grok call to the current invoice and stage.
+
+    Args:
+        usage: prompt_tokens / completion_tokens / total_tokens /
+            cached_prompt_tokens (provider prompt-cache hits)
+        model: Model the request targeted
+        flags: cached, deduplicated, saved_tokens, cache_miss, hedged,
+            hedge_tokens, ...
+
+    Returns:
+        The stored record (also what call_grok returns as usage).
+    """
+    tracker = current_tracker()
+    record = {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+        "cached_prompt_tokens": usage.get("cached_prompt_tokens", 0),
+        **flags,
+        "model": model,
+        "invoice_id": tracker.invoice_id,
+        "stage": _current_stage.get(),
+        "timestamp": time.time(),
+    }
+    return tracker.add(record)
@@ -155,6 +155,13 @@ class InvoiceData(TypedDict, total=False):
     # === Source Provenance (Session 2026-01-27_INGEST) ===
     source_type: str         # "text" or "pdf" - how invoice was provided
     source_path: str         # File path if PDF, None if raw text
+    
+    # === Repeat Submissions (extraction memo) ===
+    content_hash: str        # SHA-256 of the PDF bytes / normalized text
+    duplicate_of: str        # Invoice first extracted from the same content
+    
+    # === Vendor Layout Templates ===
+    extraction_template: str # "VND-001 v2" if read with a learned template, not Grok
 
 
 class InventoryCheck(TypedDict):
@@ -8,6 +8,13 @@ from .database import (
     validate_inventory,
     get_all_inventory,
     get_connection,
+    record_usage_ledger,
+    get_invoice_usage,
+    get_extraction_memo,
+    save_extraction_memo,
+    delete_extraction_memo,
+    get_active_templates,
+    demote_vendor_template,
     DATABASE_PATH,
 )
 
@@ -18,5 +25,12 @@ __all__ = [
     "validate_inventory",
     "get_all_inventory",
     "get_connection",
+    "record_usage_ledger",
+    "get_invoice_usage",
+    "get_extraction_memo",
+    "save_extraction_memo",
+    "delete_extraction_memo",
+    "get_active_templates",
+    "demote_vendor_template",
     "DATABASE_PATH",
 ]
@@ -0,0 +1,239 @@
+"""
+Compact Extraction Schema
+=========================
+A shorter output contract for the ingestion prompt, expanded locally.
+
+The full Output Schema spells out every key ("payment_terms", "unit_price")
+and every null, so most of a short invoice's completion tokens are
+schema, not content. With GROK_COMPACT_SCHEMA_ENABLED, Grok answers in
+compact form instead:
+
+- short keys:  {"n": "INV-1", "v": "Acme Corp", "t": 162.0, ...}
+- defaults omitted: null, "UNKNOWN", zero amounts, currency "USD", no flags
+- line items as positional arrays: [sku, description, quantity,
+  unit_price, amount], trailing nulls dropped
+
+expand_extraction() turns the answer back into the full extraction dict,
+every key present and omitted ones at the full schema's defaults, before
+the ingestion agent applies its safe_get defaults, so nothing downstream
+changes. Answers that already use full keys pass through unchanged.
+
+Savings are measured per invoice: the answer's tokens against the same
+extraction serialized in the full schema, both by the local estimator.
+
+Settings (read from the environment on each call):
+- GROK_COMPACT_SCHEMA_ENABLED   ask for the compact schema (default 0)
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Any, Callable, Optional
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Full key → compact key (top level)
+COMPACT_KEYS = {
+    "invoice_number": "n",
+    "invoice_date": "d",
+    "due_date": "dd",
+    "amount": "t",
+    "subtotal": "st",
+    "tax": "tx",
+    "currency": "c",
+    "payment_terms": "pt",
+    "po_number": "po",
+    "vendor": "v",
+    "bill_from": "bf",
+    "bill_to": "bt",
+    "items": "i",
+    "confidence": "cf",
+    "flags": "f",
+}
+
+# Full key → compact key inside bill_from / bill_to
+CONTACT_KEYS = {"name": "n", "address": "a", "email": "e", "phone": "p", "entity": "en"}
+
+# Positions in a compact line item
+ITEM_FIELDS = ("sku", "description", "quantity", "unit_price", "amount")
+
+# The full schema's defaults: left out of compact answers and restored on
+# expansion (other omitted keys come back as null)
+SCHEMA_DEFAULTS = {
+    "invoice_number": "UNKNOWN",
+    "vendor": "UNKNOWN",
+    "amount": 0.0,
+    "subtotal": 0.0,
+    "tax": 0.0,
+    "currency": "USD",
+    "items": [],
+    "confidence": 50,
+    "flags": [],
+}
+
+# Contact blocks as the full schema has them
+CONTACT_FIELDS = {
+    "bill_from": ("name", "address", "email", "phone"),
+    "bill_to": ("name", "address", "entity"),
+}
+
+EXPANDED_KEYS = {short: full for full, short in COMPACT_KEYS.items()}
+
+
+def compact_schema_enabled() -> bool:
+    return os.environ.get("GROK_COMPACT_SCHEMA_ENABLED", "0").lower() not in ("0", "false", "no")
+
+
+COMPACT_OUTPUT_PROMPT = """## Compact Output (overrides the key names and "never omit" rule above)
+Return the Output Schema in compact form, to save tokens:
+- Keys: """ + ", ".join(f"{short}={full}" for full, short in COMPACT_KEYS.items()) + """
+- bill_from / bill_to keys: """ + ", ".join(f"{short}={full}" for full, short in CONTACT_KEYS.items()) + """
+- Each line item is an array [sku, description, quantity, unit_price, amount]; drop trailing nulls
+- OMIT every key whose value is null, "UNKNOWN", 0.0, an empty object or array, or currency "USD"
+- Always include "cf" (confidence)
+- The example outputs above are shown in this compact form"""
+
+
+# =============================================================================
+# CONVERSION
+# =============================================================================
+
+def _omitted(full_key: str, value: Any) -> bool:
+    if value is None or value == [] or value == {}:
+        return True
+    return full_key in SCHEMA_DEFAULTS and value == SCHEMA_DEFAULTS[full_key]
+
+
+def compact_extraction(extracted: dict) -> dict:
+    """A full-schema extraction in compact form (inverse of expand_extraction)."""
+    compact = {}
+    for full, short in COMPACT_KEYS.items():
+        value = extracted.get(full)
+        if full in CONTACT_FIELDS and isinstance(value, dict):
+            value = {CONTACT_KEYS[k]: v for k, v in value.items() if k in CONTACT_KEYS and v is not None}
+        elif full == "items" and isinstance(value, list):
+            rows = []
+            for item in value:
+                row = [item.get(field) for field in ITEM_FIELDS]
+                while row and row[-1] is None:
+                    row.pop()
+                rows.append(row)
+            value = rows
+        if full == "confidence" or not _omitted(full, value):
+            compact[short] = value
+    return compact
+
+
+def _expand_item(item: Any) -> Any:
+    if isinstance(item, list):
+        return {field: item[i] if i < len(item) else None for i, field in enumerate(ITEM_FIELDS)}
+    return item
+
+
+def _expand_contact(full_key: str, value: Any) -> dict:
+    value = value if isinstance(value, dict) else {}
+    return {
+        field: value.get(CONTACT_KEYS[field], value.get(field))
+        for field in CONTACT_FIELDS[full_key]
+    }
+
+
+def expand_extraction(compact: dict) -> dict:
+    """
+    Full extraction dict from a compact answer.
+
+    Every key of the full schema is present: omitted ones get their
+    SCHEMA_DEFAULTS value, or None. Full-key answers pass through.
+    """
+    if not isinstance(compact, dict):
+        return compact
+    expanded = {}
+    for key, value in compact.items():
+        expanded[EXPANDED_KEYS.get(key, key)] = value
+
+    for full in COMPACT_KEYS:
+        if expanded.get(full) is None:
+            default = SCHEMA_DEFAULTS.get(full)
+            expanded[full] = list(default) if isinstance(default, list) else default
+    for full in CONTACT_FIELDS:
+        expanded[full] = _expand_contact(full, expanded[full])
+    if isinstance(expanded["items"], list):
+        expanded["items"] = [_expand_item(item) for item in expanded["items"]]
+    return expanded
+
+
+def expand_partial(path: tuple, value: Any) -> tuple[tuple, Any]:
+    """A streamed partial field (see call_grok_async on_partial) with full keys."""
+    if not path:
+        return path, value
+    full = EXPANDED_KEYS.get(path[0], path[0])
+    if full == "items" and len(path) > 1:
+        value = _expand_item(value)
+    elif full == "items" and isinstance(value, list):
+        value = [_expand_item(item) for item in value]
+    elif full in CONTACT_FIELDS:
+        value = _expand_contact(full, value)
+    return (full, *path[1:]), value
+
+
+def expanding_partials(on_partial: Optional[Callable]) -> Optional[Callable]:
+    """Wrap an on_partial callback so it receives full keys."""
+    if on_partial is None:
+        return None
+
+    def callback(path: tuple, value: Any):
+        on_partial(*expand_partial(path, value))
+    return callback
+
+
+_OUTPUT_LINE = re.compile(r"^(OUTPUT:\n)(\{.*\})$", re.MULTILINE)
+
+
+def compact_examples(examples: str) -> str:
+    """Few-shot examples with each "OUTPUT:" JSON line rewritten in compact form."""
+    def rewrite(match: re.Match) -> str:
+        return match.group(1) + json.dumps(compact_extraction(json.loads(match.group(2))), separators=(",", ":"))
+    return _OUTPUT_LINE.sub(rewrite, examples)
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+class CompactSchemaStats:
+    """Completion tokens of compact answers vs. the same answers in the full schema."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.compact_tokens = 0
+        self.full_tokens = 0
+
+    def record(self, compact_tokens: int, full_tokens: int):
+        with self._lock:
+            self.answers += 1
+            self.compact_tokens += compact_tokens
+            self.full_tokens += full_tokens
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            answers = self.answers
+            compact, full = self.compact_tokens, self.full_tokens
+        return {
+            "enabled": compact_schema_enabled(),
+            "answers": answers,
+            "completion_tokens_per_answer": round(compact / answers, 1) if answers else None,
+            "full_schema_tokens_per_answer": round(full / answers, 1) if answers else None,
+            "tokens_saved_per_answer": round((full - compact) / answers, 1) if answers else None,
+            "saved_ratio": round(1 - compact / full, 4) if full else None,
+        }
+
+
+compact_schema_stats = CompactSchemaStats()
+
+
+def get_compact_schema_stats() -> dict:
+    return compact_schema_stats.get_stats()
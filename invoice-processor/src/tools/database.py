@@ -9,6 +9,9 @@ Provides:
 - Stock level checks
 - Vendor master data for enrichment and validation
 - Purchase order tracking (future)
+- Grok usage ledger (per-invoice token cost)
+- Extraction memo (content hash -> extracted invoice_data)
+- Vendor layout templates (learned from confirmed PDF extractions)
 
 Test Data (from MISSION.md):
 - WidgetA: 10 in stock (Invoice 1 needs 10 - exact match)
@@ -141,6 +144,17 @@ def init_database(force_reset: bool = False) -> None:
             )
         """)
         
+        # =============================================================================
+        # GROK USAGE LEDGER (per-invoice token cost, never reset)
+        # =============================================================================
+        _create_usage_ledger(cursor)
+        
+        # EXTRACTION MEMO (content hash -> invoice_data, never reset)
+        _create_extraction_memo(cursor)
+        
+        # VENDOR LAYOUT TEMPLATES (learned, never reset)
+        _create_vendor_templates(cursor)
+        
         # Insert test inventory data (UPSERT pattern for idempotency)
         test_inventory = [
             ("WidgetA", 10, 100.0),   # Invoice 1 needs 10 - exact match (variance 0)
@@ -668,6 +682,359 @@ def find_matching_po(vendor_id: str, amount: float, tolerance: float = 0.05) ->
         return None
 
 
+# =============================================================================
+# GROK USAGE LEDGER
+# =============================================================================
+
+def _create_usage_ledger(cursor) -> None:
+    """Create the usage ledger table (idempotent)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS grok_usage_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id TEXT NOT NULL,
+            stage TEXT,
+            model TEXT,
+            prompt_tokens INTEGER DEFAULT 0,
+            completion_tokens INTEGER DEFAULT 0,
+            total_tokens INTEGER DEFAULT 0,
+            cached_prompt_tokens INTEGER DEFAULT 0,
+            saved_tokens INTEGER DEFAULT 0,
+            cached INTEGER DEFAULT 0,
+            deduplicated INTEGER DEFAULT 0,
+            hedged INTEGER DEFAULT 0,
+            hedge_tokens INTEGER DEFAULT 0,
+            called_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_grok_usage_invoice ON grok_usage_ledger(invoice_id)"
+    )
+    
+    # Ledgers created by earlier versions lack the newer columns
+    cursor.execute("PRAGMA table_info(grok_usage_ledger)")
+    columns = {row[1] for row in cursor.fetchall()}
+    for column in ("hedged", "hedge_tokens", "cached_prompt_tokens"):
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE grok_usage_ledger ADD COLUMN {column} INTEGER DEFAULT 0")
+
+
+def record_usage_ledger(invoice_id: str, records: list[dict]) -> None:
+    """
+    Append Grok usage records for an invoice to the ledger.
+    
+    Args:
+        invoice_id: Invoice the calls were made for
+        records: Usage records from src.llm.usage.UsageTracker
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_usage_ledger(cursor)
+        cursor.executemany("""
+            INSERT INTO grok_usage_ledger (
+                invoice_id, stage, model, prompt_tokens, completion_tokens,
+                total_tokens, cached_prompt_tokens, saved_tokens, cached,
+                deduplicated, hedged, hedge_tokens, called_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (
+                invoice_id, r.get("stage"), r.get("model"),
+                r.get("prompt_tokens", 0), r.get("completion_tokens", 0),
+                r.get("total_tokens", 0), r.get("cached_prompt_tokens", 0), r.get("saved_tokens", 0),
+                int(bool(r.get("cached"))), int(bool(r.get("deduplicated"))),
+                int(bool(r.get("hedged"))), r.get("hedge_tokens", 0),
+                r.get("timestamp"),
+            )
+            for r in records
+        ])
+        conn.commit()
+
+
+def get_invoice_usage(invoice_id: str) -> dict:
+    """
+    Get the persisted Grok token cost for an invoice, in total and per stage.
+    
+    Returns:
+        {"invoice_id", "calls", "prompt_tokens", "completion_tokens",
+         "total_tokens", "cached_prompt_tokens", "saved_tokens", "hedge_tokens",
+         "stages": {stage: {...}}}
+        
+        cached_prompt_tokens is the part of prompt_tokens Grok served from
+        its prompt cache.
+        hedge_tokens is the extra spend of hedged duplicate requests, on top
+        of total_tokens.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_usage_ledger(cursor)
+        cursor.execute("""
+            SELECT COALESCE(stage, 'unknown') AS stage,
+                   COUNT(*) AS calls,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   SUM(total_tokens) AS total_tokens,
+                   SUM(cached_prompt_tokens) AS cached_prompt_tokens,
+                   SUM(saved_tokens) AS saved_tokens,
+                   SUM(hedge_tokens) AS hedge_tokens
+            FROM grok_usage_ledger
+            WHERE invoice_id = ?
+            GROUP BY COALESCE(stage, 'unknown')
+        """, (invoice_id,))
+        stages = {row["stage"]: dict(row) for row in cursor.fetchall()}
+    
+    summary = {
+        "invoice_id": invoice_id,
+        "calls": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "total_tokens": 0,
+        "cached_prompt_tokens": 0,
+        "saved_tokens": 0,
+        "hedge_tokens": 0,
+    }
+    for stage in stages.values():
+        stage.pop("stage")
+        for key, value in stage.items():
+            summary[key] += value or 0
+    summary["stages"] = stages
+    return summary
+
+
+# =============================================================================
+# EXTRACTION MEMO
+# =============================================================================
+
+def _create_extraction_memo(cursor) -> None:
+    """Create the extraction memo table (idempotent)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS extraction_memo (
+            content_hash TEXT PRIMARY KEY,
+            invoice_id TEXT,
+            source_type TEXT,
+            invoice_data TEXT NOT NULL,
+            hits INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def get_extraction_memo(content_hash: str, touch: bool = True) -> Optional[dict]:
+    """
+    Get the memoized extraction for a content hash.
+    
+    Args:
+        content_hash: SHA-256 from src.tools.extraction_memo.content_hash
+        touch: Count this lookup as a hit (bumps hits and last_seen_at)
+        
+    Returns:
+        {"content_hash", "invoice_id", "source_type", "invoice_data", "hits",
+         "created_at", "last_seen_at"} or None if the content is new.
+        invoice_id is the invoice the content was first extracted for.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_extraction_memo(cursor)
+        cursor.execute("SELECT * FROM extraction_memo WHERE content_hash = ?", (content_hash,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        
+        memo = dict(row)
+        memo["invoice_data"] = json.loads(memo["invoice_data"])
+        if touch:
+            cursor.execute("""
+                UPDATE extraction_memo
+                SET hits = hits + 1, last_seen_at = CURRENT_TIMESTAMP
+                WHERE content_hash = ?
+            """, (content_hash,))
+            conn.commit()
+            memo["hits"] += 1
+        return memo
+
+
+def save_extraction_memo(content_hash: str, invoice_id: str, invoice_data: dict) -> None:
+    """
+    Memoize an extraction by content hash.
+    
+    Saving a hash that is already memoized replaces its entry (and resets
+    its hit count).
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_extraction_memo(cursor)
+        cursor.execute("""
+            INSERT OR REPLACE INTO extraction_memo (content_hash, invoice_id, source_type, invoice_data)
+            VALUES (?, ?, ?, ?)
+        """, (content_hash, invoice_id, invoice_data.get("source_type"), json.dumps(invoice_data)))
+        conn.commit()
+
+
+def delete_extraction_memo(content_hash: str) -> bool:
+    """
+    Drop the memoized extraction for a content hash.
+    
+    Returns:
+        True if there was one
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_extraction_memo(cursor)
+        cursor.execute("DELETE FROM extraction_memo WHERE content_hash = ?", (content_hash,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+# =============================================================================
+# VENDOR LAYOUT TEMPLATES
+# =============================================================================
+
+def _create_vendor_templates(cursor) -> None:
+    """Create the template and template sample tables (idempotent)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vendor_template_samples (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vendor_id TEXT NOT NULL,
+            content_hash TEXT NOT NULL,
+            invoice_data TEXT NOT NULL,
+            words TEXT NOT NULL,
+            stale INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (vendor_id, content_hash)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS vendor_templates (
+            vendor_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'active',
+            template TEXT NOT NULL,
+            samples INTEGER DEFAULT 0,
+            uses INTEGER DEFAULT 0,
+            spot_checks INTEGER DEFAULT 0,
+            disagreements INTEGER DEFAULT 0,
+            demotion_reason TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            demoted_at TIMESTAMP,
+            PRIMARY KEY (vendor_id, version)
+        )
+    """)
+
+
+def record_template_sample(vendor_id: str, content_hash: str, invoice_data: dict, words: list[dict]) -> int:
+    """
+    Store a confirmed PDF extraction as a template sample.
+    
+    The same document (content_hash) counts once per vendor.
+    
+    Returns:
+        Number of current (not stale) samples for the vendor
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("""
+            INSERT OR IGNORE INTO vendor_template_samples (vendor_id, content_hash, invoice_data, words)
+            VALUES (?, ?, ?, ?)
+        """, (vendor_id, content_hash, json.dumps(invoice_data), json.dumps(words)))
+        conn.commit()
+        cursor.execute(
+            "SELECT COUNT(*) FROM vendor_template_samples WHERE vendor_id = ? AND stale = 0",
+            (vendor_id,)
+        )
+        return cursor.fetchone()[0]
+
+
+def get_template_samples(vendor_id: str, limit: int) -> list[dict]:
+    """Newest current samples for a vendor: [{"invoice_data", "words"}]."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("""
+            SELECT invoice_data, words FROM vendor_template_samples
+            WHERE vendor_id = ? AND stale = 0
+            ORDER BY id DESC LIMIT ?
+        """, (vendor_id, limit))
+        return [
+            {"invoice_data": json.loads(row["invoice_data"]), "words": json.loads(row["words"])}
+            for row in cursor.fetchall()
+        ]
+
+
+def save_vendor_template(vendor_id: str, template: dict, samples: int) -> int:
+    """
+    Store a new template version for a vendor and make it the active one.
+    
+    Returns:
+        The new version number
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM vendor_templates WHERE vendor_id = ?", (vendor_id,))
+        version = cursor.fetchone()[0] + 1
+        cursor.execute(
+            "UPDATE vendor_templates SET status = 'superseded' WHERE vendor_id = ? AND status = 'active'",
+            (vendor_id,)
+        )
+        cursor.execute("""
+            INSERT INTO vendor_templates (vendor_id, version, template, samples)
+            VALUES (?, ?, ?, ?)
+        """, (vendor_id, version, json.dumps(template), samples))
+        conn.commit()
+        return version
+
+
+def get_active_templates() -> list[dict]:
+    """Active templates: [{"vendor_id", "version", "template", "uses", "spot_checks", "disagreements"}]."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("""
+            SELECT vendor_id, version, template, uses, spot_checks, disagreements
+            FROM vendor_templates WHERE status = 'active'
+            ORDER BY vendor_id
+        """)
+        templates = []
+        for row in cursor.fetchall():
+            template = dict(row)
+            template["template"] = json.loads(template["template"])
+            templates.append(template)
+        return templates
+
+
+def record_template_use(vendor_id: str, version: int, spot_check: bool = False, disagreed: bool = False) -> None:
+    """Count one use of a template (and its spot-check outcome)."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("""
+            UPDATE vendor_templates
+            SET uses = uses + 1, spot_checks = spot_checks + ?, disagreements = disagreements + ?
+            WHERE vendor_id = ? AND version = ?
+        """, (int(spot_check), int(disagreed), vendor_id, version))
+        conn.commit()
+
+
+def demote_vendor_template(vendor_id: str, version: int, reason: str) -> None:
+    """
+    Take a template out of service.
+    
+    Its samples are marked stale, so the vendor's next template is learned
+    only from confirmations recorded after the demotion.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _create_vendor_templates(cursor)
+        cursor.execute("""
+            UPDATE vendor_templates
+            SET status = 'demoted', demotion_reason = ?, demoted_at = CURRENT_TIMESTAMP
+            WHERE vendor_id = ? AND version = ?
+        """, (reason, vendor_id, version))
+        cursor.execute("UPDATE vendor_template_samples SET stale = 1 WHERE vendor_id = ?", (vendor_id,))
+        conn.commit()
+
+
 # =============================================================================
 # MAIN (for testing)
 # =============================================================================
@@ -0,0 +1,190 @@
+"""
+Extraction Memo
+===============
+Reuse the extraction of a document that was already processed.
+
+Users re-upload the same PDF (data/uploads holds dozens of byte-identical
+copies of Invoice_1.pdf) and re-paste the same text. Each submission is
+keyed by a SHA-256 of its content:
+
+- PDF uploads / PDF paths: the file bytes, so a repeat costs no PDF parsing
+- Raw text: the text after normalize_text() (line endings, Unicode form
+  and whitespace runs), so reformatting alone does not defeat the memo
+
+Clean extractions (no flags, nothing the ingestion agent would retry;
+see is_clean_extraction in src/agents/ingestion.py) are stored in the
+extraction_memo table (src/tools/database.py) and survive restarts. A
+later submission with the same hash gets a copy of that invoice_data
+flagged "probable_duplicate", with duplicate_of naming the first invoice,
+and skips ingestion entirely. Flagged extractions are not stored, so a
+resubmission of one is extracted afresh. forget_extraction() (DELETE
+/api/extraction-memo/{hash}) drops a bad entry; the next submission of
+that content is extracted again and its extraction replaces it.
+
+Settings (read from the environment on each call):
+- GROK_EXTRACTION_MEMO_ENABLED   reuse memoized extractions (default 1)
+"""
+
+import hashlib
+import os
+import threading
+import unicodedata
+from typing import Optional, Union
+
+from src.tools.database import delete_extraction_memo, get_extraction_memo, save_extraction_memo
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DUPLICATE_FLAG = "probable_duplicate"
+
+# Read size when hashing PDF files
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def memo_enabled() -> bool:
+    return os.environ.get("GROK_EXTRACTION_MEMO_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+# =============================================================================
+# CONTENT HASHING
+# =============================================================================
+
+def normalize_text(text: str) -> str:
+    """Canonical form of invoice text: NFC, single spaces, no blank lines."""
+    text = unicodedata.normalize("NFC", text)
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def content_hash(content: Union[str, bytes]) -> Optional[str]:
+    """
+    SHA-256 hex digest identifying an invoice's content.
+
+    Args:
+        content: Uploaded file bytes, a PDF path, or raw invoice text
+
+    Returns:
+        The digest, or None for a PDF path that cannot be read (ingestion
+        reports that error itself).
+    """
+    if isinstance(content, bytes):
+        return hashlib.sha256(content).hexdigest()
+
+    path = content.strip()
+    if path.lower().endswith(".pdf"):
+        try:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+            return digest.hexdigest()
+        except OSError:
+            return None
+
+    return hashlib.sha256(normalize_text(content).encode("utf-8")).hexdigest()
+
+
+# =============================================================================
+# LOOKUP & STORE
+# =============================================================================
+
+def find_duplicate(digest: Optional[str], touch: bool = True) -> Optional[dict]:
+    """The memo entry for a digest (see database.get_extraction_memo), or None."""
+    if not digest or not memo_enabled():
+        return None
+    memo = get_extraction_memo(digest, touch=touch)
+    if touch:
+        memo_stats.record_lookup(hit=memo is not None)
+    return memo
+
+
+def reuse_extraction(memo: dict, raw_invoice: str, digest: str) -> dict:
+    """
+    invoice_data for a repeat submission, copied from its memo entry.
+
+    Provenance is rewritten for the new submission (its own raw text or
+    upload path) and the copy is flagged as a probable duplicate.
+    """
+    invoice_data = dict(memo["invoice_data"])
+    if invoice_data.get("source_type") == "pdf":
+        invoice_data["source_path"] = raw_invoice.strip()
+    else:
+        invoice_data["raw_text"] = raw_invoice
+
+    flags = list(invoice_data.get("flags") or [])
+    if DUPLICATE_FLAG not in flags:
+        flags.append(DUPLICATE_FLAG)
+    invoice_data["flags"] = flags
+    invoice_data["duplicate_of"] = memo["invoice_id"]
+    invoice_data["content_hash"] = digest
+    return invoice_data
+
+
+def remember_extraction(digest: Optional[str], invoice_id: str, invoice_data: dict) -> None:
+    """
+    Memoize a fresh extraction, replacing any entry for the digest.
+
+    Callers pass clean extractions only: a memo hit skips ingestion, so a
+    flagged or low-confidence answer would be served again unchecked.
+    """
+    if not digest or not memo_enabled():
+        return
+    save_extraction_memo(digest, invoice_id, invoice_data)
+    memo_stats.record_store()
+
+
+def forget_extraction(digest: str) -> bool:
+    """Invalidate the memo entry for a digest; True if there was one."""
+    forgotten = delete_extraction_memo(digest)
+    if forgotten:
+        memo_stats.record_invalidation()
+    return forgotten
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+class MemoStats:
+    """Memo lookups, hits and stores since startup."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    def record_lookup(self, hit: bool):
+        with self._lock:
+            self.lookups += 1
+            self.hits += hit
+
+    def record_store(self):
+        with self._lock:
+            self.stores += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": memo_enabled(),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "stores": self.stores,
+                "invalidations": self.invalidations,
+            }
+
+
+memo_stats = MemoStats()
+
+
+def get_memo_stats() -> dict:
+    return memo_stats.get_stats()
@@ -0,0 +1,389 @@
+"""
+Rule-Based Invoice Parser
+=========================
+Deterministic fast path for simple invoices, tried before any Grok call.
+
+Many invoices are short key/value layouts:
+
+    Vendor: Widgets Inc.            Vndr: Gadgets Co.
+    Amount: $5,000                  Amt: $15,000
+    Items: WidgetA:10, WidgetB:5    Itms: GadgetX:20 @ $750
+    Due: 2026-02-25                 Due: 2026-01-30
+
+parse_invoice() reads these layouts with precompiled patterns (key aliases,
+"Bill From:" / "Bill To:" blocks, inline "Name:qty @ $price" lists and
+tabular "Name  qty @ $price  $amount" rows). It returns the same dict
+shape Grok's JSON mode produces, plus a computed confidence.
+
+Confidence starts at 100 and drops for every line the parser did not
+understand, missing header fields, unparseable dates, inferred unit prices
+and totals that do not add up. The ingestion agent only skips Grok when
+the result passes its own retry checks and reaches
+GROK_FAST_PATH_MIN_CONFIDENCE, so anything unusual still goes to the model.
+
+Settings (read from the environment on each call):
+- GROK_FAST_PATH_ENABLED          try the parser first (default 1)
+- GROK_FAST_PATH_MIN_CONFIDENCE   confidence needed to skip Grok (default 80)
+"""
+
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Optional
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+DEFAULT_MIN_CONFIDENCE = 80
+
+# Confidence penalties
+UNKNOWN_LINE_PENALTY = 15
+MISSING_FIELD_PENALTY = {
+    "invoice_number": 10,
+    "invoice_date": 5,
+    "bill_to": 5,
+}
+UNPARSEABLE_DATE_PENALTY = 20
+INFERRED_PRICE_PENALTY = 10
+MISSING_ITEMS_PENALTY = 20
+TOTALS_MISMATCH_PENALTY = 30
+
+# Rounding slack when reconciling line items, subtotal, tax and total
+AMOUNT_TOLERANCE = 0.011
+
+DATE_FORMATS = (
+    "%Y-%m-%d", "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y",
+    "%d %B %Y", "%d %b %Y", "%m/%d/%Y", "%m/%d/%y", "%d-%b-%Y",
+)
+
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY"}
+
+# Key aliases (lower case, without the colon) → field
+KEY_ALIASES = {
+    "vendor": "vendor", "vndr": "vendor", "supplier": "vendor", "from": "vendor",
+    "bill from": "bill_from",
+    "bill to": "bill_to", "to": "bill_to", "sold to": "bill_to",
+    "invoice": "invoice_number", "invoice #": "invoice_number", "invoice no": "invoice_number",
+    "invoice number": "invoice_number", "inv": "invoice_number", "inv #": "invoice_number",
+    "date": "invoice_date", "invoice date": "invoice_date",
+    "due": "due_date", "due date": "due_date",
+    "total": "amount", "total due": "amount", "amount": "amount", "amt": "amount",
+    "amount due": "amount", "grand total": "amount", "invoice total": "amount",
+    "balance due": "amount",
+    "subtotal": "subtotal", "sub total": "subtotal",
+    "tax": "tax", "sales tax": "tax", "vat": "tax", "gst": "tax",
+    "terms": "payment_terms", "payment terms": "payment_terms",
+    "po": "po_number", "po #": "po_number", "po#": "po_number", "po number": "po_number",
+    "purchase order": "po_number",
+    "currency": "currency",
+    "items": "items", "itms": "items", "line items": "items",
+}
+
+_KEY_VALUE = re.compile(r"^\s*([A-Za-z][A-Za-z #]*?)\s*(?:\([^)]*\))?\s*:\s*(.*?)\s*$")
+_HEADER_NUMBER = re.compile(r"^\s*INVOICE\s*(?:#|No\.?|Number)?\s*:?\s*([A-Z0-9][\w\-/]*)\s*$", re.IGNORECASE)
+_MONEY = re.compile(r"^\s*([$€£¥])?\s*(\d{1,3}(?:,\d{3})+|\d+)(\.\d{1,2})?\s*([A-Z]{3})?\s*$")
+_INLINE_ITEM = re.compile(
+    r"^\s*(?P<name>[^:,@]+?)\s*:\s*(?P<qty>\d+)"
+    r"(?:\s*@\s*(?P<price>[$€£¥]?\s*[\d,]+(?:\.\d{1,2})?))?\s*$"
+)
+_TABLE_ITEM = re.compile(
+    r"^\s*(?P<name>\S.*?)\s+(?:x\s*)?(?P<qty>\d+)(?:\s*(?:units?|pcs?))?\s*@\s*"
+    r"(?P<price>[$€£¥]?\s*[\d,]+(?:\.\d{1,2})?)(?:\s*ea)?"
+    r"(?:\s+(?P<amount>[$€£¥]?\s*[\d,]+(?:\.\d{1,2})?))?\s*$"
+)
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_PHONE = re.compile(r"\(?\d{3}\)?[\s.-]*\d{3}[\s.-]*\d{4}")
+
+
+def fast_path_enabled() -> bool:
+    return os.environ.get("GROK_FAST_PATH_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def fast_path_min_confidence() -> int:
+    return int(os.environ.get("GROK_FAST_PATH_MIN_CONFIDENCE", str(DEFAULT_MIN_CONFIDENCE)))
+
+
+def count_labels(text: str) -> int:
+    """Lines starting with a known "Key:" label — a cheap sign of a readable layout."""
+    count = 0
+    for line in text.splitlines():
+        match = _KEY_VALUE.match(line)
+        if match and match.group(1).strip().lower() in KEY_ALIASES:
+            count += 1
+    return count
+
+
+# =============================================================================
+# VALUE PARSERS
+# =============================================================================
+
+def parse_money(text: str) -> tuple[Optional[float], Optional[str]]:
+    """Parse "$15,000.00" / "100000" / "5000 EUR" into (amount, currency or None)."""
+    match = _MONEY.match(text)
+    if not match:
+        return None, None
+    symbol, whole, cents, code = match.groups()
+    amount = float(whole.replace(",", "") + (cents or ""))
+    return amount, code or CURRENCY_SYMBOLS.get(symbol)
+
+
+def parse_date(text: str) -> Optional[str]:
+    """Parse a written date into YYYY-MM-DD; None for relative or unknown dates."""
+    cleaned = re.sub(r"(\d)(st|nd|rd|th)\b", r"\1", text.strip().rstrip("."))
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_items(lines: list[str]) -> Optional[list[dict]]:
+    """Parse inline ("A:10, B:5 @ $3") or tabular item lines; None if any line fails."""
+    items = []
+    for line in lines:
+        table = _TABLE_ITEM.match(line)
+        if table:
+            parts = [table]
+        else:
+            parts = [_INLINE_ITEM.match(part) for part in line.split(",")]
+            if not all(parts):
+                return None
+        for part in parts:
+            quantity = int(part["qty"])
+            unit_price = parse_money(part["price"])[0] if part["price"] else None
+            amount = parse_money(part["amount"])[0] if part.groupdict().get("amount") else None
+            if part["price"] and unit_price is None:
+                return None
+            if amount is None and unit_price is not None:
+                amount = round(quantity * unit_price, 2)
+            items.append({
+                "sku": None,
+                "description": part["name"].strip(),
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "amount": amount,
+            })
+    return items
+
+
+def _contact_block(lines: list[str]) -> dict:
+    """Name, address, email and phone from the lines of a From/To block."""
+    block = {"name": None, "address": None, "email": None, "phone": None}
+    address = []
+    for line in lines:
+        email = _EMAIL.search(line)
+        phone = _PHONE.search(line)
+        if email or phone:
+            block["email"] = block["email"] or (email.group() if email else None)
+            block["phone"] = block["phone"] or (phone.group() if phone else None)
+        elif block["name"] is None:
+            block["name"] = line.strip()
+        else:
+            address.append(line.strip())
+    if address:
+        block["address"] = ", ".join(address)
+    return block
+
+
+# =============================================================================
+# PARSER
+# =============================================================================
+
+def parse_invoice(text: str) -> Optional[dict]:
+    """
+    Extract an invoice from simple key/value text without calling Grok.
+
+    Returns:
+        Dict in the Grok extraction schema (invoice_number, amount, vendor,
+        bill_from, bill_to, items, confidence, flags, ...), or None when
+        the text has no vendor or no amount/items to work from
+    """
+    lines = [line.rstrip() for line in text.strip().splitlines()]
+    fields: dict = {}
+    blocks: dict[str, list[str]] = {}
+    item_lines: list[str] = []
+    unknown = 0
+    currency = None
+
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        i += 1
+        if not line.strip():
+            continue
+
+        header = _HEADER_NUMBER.match(line)
+        if header and "invoice_number" not in fields:
+            fields["invoice_number"] = header.group(1)
+            continue
+
+        match = _KEY_VALUE.match(line)
+        key = KEY_ALIASES.get(match.group(1).strip().lower()) if match else None
+        if key is None:
+            unknown += 1
+            continue
+        value = match.group(2)
+
+        if key in ("vendor", "bill_from", "bill_to", "items"):
+            # Continuation lines run to the next blank line or "Key:" line
+            continuation = []
+            while i < len(lines) and lines[i].strip():
+                nxt = _KEY_VALUE.match(lines[i])
+                if nxt and KEY_ALIASES.get(nxt.group(1).strip().lower()):
+                    break
+                continuation.append(lines[i])
+                i += 1
+            if key == "items":
+                item_lines.extend(([value] if value else []) + continuation)
+            else:
+                target = "bill_from" if key == "vendor" else key
+                blocks[target] = ([value] if value else []) + continuation
+            continue
+
+        if key in ("amount", "subtotal", "tax"):
+            amount, symbol_currency = parse_money(value)
+            if amount is None:
+                unknown += 1
+                continue
+            fields[key] = amount
+            currency = currency or symbol_currency
+        elif key == "currency":
+            currency = value.upper()[:3]
+        elif key == "invoice_number":
+            fields[key] = value.lstrip("#").strip()
+        else:
+            fields[key] = value
+
+    bill_from = _contact_block(blocks.get("bill_from", []))
+    bill_to = _contact_block(blocks.get("bill_to", []))
+    items = _parse_items(item_lines) if item_lines else []
+    if items is None:
+        # An item list we could not read: leave the invoice to Grok
+        return None
+
+    vendor = bill_from["name"]
+    amount = fields.get("amount")
+    if not vendor or (amount is None and not items):
+        return None
+
+    flags = []
+    confidence = 100 - UNKNOWN_LINE_PENALTY * unknown
+
+    for field, penalty in MISSING_FIELD_PENALTY.items():
+        present = bill_to["name"] if field == "bill_to" else fields.get(field)
+        if not present:
+            flags.append(f"missing_{field}")
+            confidence -= penalty
+
+    dates = {}
+    for field in ("invoice_date", "due_date"):
+        raw = fields.get(field)
+        dates[field] = parse_date(raw) if raw else None
+        if raw and dates[field] is None:
+            confidence -= UNPARSEABLE_DATE_PENALTY
+            if "unparseable_date" not in flags:
+                flags.append("unparseable_date")
+
+    # Fill in missing prices/amounts the way an AP clerk would
+    tax = fields.get("tax", 0.0)
+    if amount is None:
+        amount = round(sum(item["amount"] or 0.0 for item in items) + tax, 2)
+    subtotal = fields.get("subtotal", round(amount - tax, 2))
+    unpriced = [item for item in items if item["unit_price"] is None]
+    if len(items) == 1 and unpriced:
+        only = items[0]
+        only["amount"] = subtotal
+        only["unit_price"] = round(subtotal / only["quantity"], 2) if only["quantity"] else 0.0
+        confidence -= INFERRED_PRICE_PENALTY
+    elif unpriced:
+        for item in unpriced:
+            item["unit_price"] = 0.0
+            item["amount"] = 0.0
+        flags.append("missing_unit_prices")
+        confidence -= TOTALS_MISMATCH_PENALTY
+
+    if not items:
+        flags.append("missing_line_items")
+        confidence -= MISSING_ITEMS_PENALTY
+    elif abs(sum(item["amount"] for item in items) - subtotal) > AMOUNT_TOLERANCE:
+        flags.append("amount_mismatch")
+        confidence -= TOTALS_MISMATCH_PENALTY
+    if abs(subtotal + tax - amount) > AMOUNT_TOLERANCE:
+        if "amount_mismatch" not in flags:
+            flags.append("amount_mismatch")
+        confidence -= TOTALS_MISMATCH_PENALTY
+
+    return {
+        "invoice_number": fields.get("invoice_number", "UNKNOWN"),
+        "invoice_date": dates["invoice_date"],
+        "due_date": dates["due_date"],
+        "amount": amount,
+        "subtotal": subtotal,
+        "tax": tax,
+        "currency": currency or "USD",
+        "payment_terms": fields.get("payment_terms"),
+        "po_number": fields.get("po_number"),
+        "vendor": vendor,
+        "bill_from": bill_from,
+        "bill_to": {"name": bill_to["name"], "address": bill_to["address"], "entity": None},
+        "items": items,
+        "confidence": max(0, confidence),
+        "flags": flags,
+    }
+
+
+# =============================================================================
+# STATS
+# =============================================================================
+
+class FastPathStats:
+    """Hit rate of the rule-based fast path and the Grok time it saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.fast_seconds = 0.0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+
+    def record(self, hit: bool, seconds: float):
+        """One fast-path attempt (hit: Grok was skipped)."""
+        with self._lock:
+            self.attempts += 1
+            self.hits += hit
+            self.fast_seconds += seconds
+
+    def record_llm(self, seconds: float):
+        """Wall time of one Grok extraction (first pass plus any retry)."""
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            mean_fast = self.fast_seconds / self.attempts if self.attempts else 0.0
+            mean_llm = self.llm_seconds / self.llm_calls if self.llm_calls else None
+            return {
+                "enabled": fast_path_enabled(),
+                "min_confidence": fast_path_min_confidence(),
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+                "mean_fast_path_ms": round(mean_fast * 1000, 3),
+                "mean_llm_extraction_ms": round(mean_llm * 1000, 1) if mean_llm is not None else None,
+                # Each hit saves a Grok extraction at its observed mean latency
+                "estimated_seconds_saved": round(self.hits * (mean_llm - mean_fast), 3) if mean_llm else None,
+            }
+
+
+fast_path_stats = FastPathStats()
+
+
+def get_fast_path_stats() -> dict:
+    """Get fast-path attempts, hit rate and estimated Grok time saved."""
+    return fast_path_stats.get_stats()
@@ -0,0 +1,305 @@
+"""
+PDF Worker Pool
+===============
+Parse PDFs in worker processes, off the API's event loop.
+
+pdfplumber is pure Python and CPU-bound: a large PDF parsed in a thread of
+the API process holds the GIL for seconds, and every other WebSocket
+stalls with it. The streaming ingestion agent hands PDFs to this pool
+instead and awaits the result:
+
+- at most GROK_PDF_WORKERS worker processes, spawned (never forked from
+  the threaded server); further PDFs wait their turn in the event loop
+- a job gets GROK_PDF_TIMEOUT_SECONDS once a worker has it (waiting does
+  not count); on timeout the workers are killed, the pool starts afresh
+  and the PDF fails like any unreadable one
+- workers run with an address-space cap of GROK_PDF_MEMORY_MB, so a
+  pathological PDF fails with MemoryError, or takes down only its worker,
+  instead of the server
+- a worker is replaced after GROK_PDF_JOBS_PER_WORKER documents, so
+  pdfminer's caches and heap fragmentation do not build up (before Python
+  3.11, the whole pool after that many documents per worker)
+
+Jobs that lose their worker to another job's timeout or crash are retried
+once on the new pool. Queue depth and parse time per page are reported
+under "pdf_pool" in /api/metrics. With GROK_PDF_POOL_ENABLED=0 PDFs are
+parsed in a thread, as before.
+
+Settings (read from the environment when the pool starts):
+- GROK_PDF_POOL_ENABLED      parse PDFs in worker processes (default 1)
+- GROK_PDF_WORKERS           worker processes (default 2)
+- GROK_PDF_TIMEOUT_SECONDS   per-PDF parse time limit (default 30)
+- GROK_PDF_MEMORY_MB         address-space cap per worker, 0 = none (default 1024)
+- GROK_PDF_JOBS_PER_WORKER   documents before a worker is replaced (default 50)
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from .pdf_extractor import PDFExtractionResult, extract_pdf
+
+try:
+    import resource
+except ImportError:  # Windows: no address-space cap
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# ProcessPoolExecutor replaces single workers (max_tasks_per_child) from
+# Python 3.11; before that the whole pool is replaced once it has run
+# jobs_per_worker jobs per worker
+_RECYCLES_WORKERS = sys.version_info >= (3, 11)
+
+
+# =============================================================================
+# WORKER SIDE
+# =============================================================================
+
+def _init_worker(memory_mb: int):
+    """Runs once in each new worker process."""
+    if resource is not None and memory_mb > 0:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _extract_job(pdf_path: str, with_words: bool) -> tuple[PDFExtractionResult, float]:
+    """extract_pdf in a worker; returns the result and its parse time."""
+    start = time.perf_counter()
+    try:
+        result = extract_pdf(pdf_path, with_words=with_words)
+    except MemoryError:
+        result = _failure(pdf_path, "PDF too complex to extract (memory limit reached)")
+    return result, time.perf_counter() - start
+
+
+def _failure(pdf_path: str, error: str) -> PDFExtractionResult:
+    return PDFExtractionResult(
+        success=False,
+        text="",
+        page_count=0,
+        error=error,
+        is_likely_scanned=False,
+        source_path=pdf_path,
+    )
+
+
+# =============================================================================
+# POOL
+# =============================================================================
+
+class PDFPool:
+    """A bounded, self-healing process pool for extract_pdf, awaited from asyncio."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        timeout_seconds: float = 30.0,
+        memory_mb: int = 1024,
+        jobs_per_worker: int = 50,
+    ):
+        self.workers = max(1, workers)
+        self.timeout_seconds = timeout_seconds
+        self.memory_mb = memory_mb
+        self.jobs_per_worker = max(1, jobs_per_worker)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_jobs = 0
+        self._lock = threading.Lock()
+        # One slot per worker, so a submitted job starts at once and its
+        # timeout measures parsing only (made per event loop)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop = None
+        self.waiting = 0
+        self.running = 0
+        self.stats = {
+            "jobs": 0,
+            "pages": 0,
+            "parse_seconds": 0.0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "crashes": 0,
+            "restarts": 0,
+            "max_queue_depth": 0,
+        }
+
+    def _executor_for_job(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if (
+                self._executor is not None
+                and not _RECYCLES_WORKERS
+                and self._executor_jobs >= self.workers * self.jobs_per_worker
+            ):
+                # Running jobs finish in the old workers, which then exit
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            if self._executor is None:
+                recycling = {"max_tasks_per_child": self.jobs_per_worker} if _RECYCLES_WORKERS else {}
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.memory_mb,),
+                    **recycling,
+                )
+                self._executor_jobs = 0
+            self._executor_jobs += 1
+            return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor, reason: str):
+        """Kill executor's workers; the next job starts a new pool."""
+        with self._lock:
+            if self._executor is not executor:
+                return  # another job already replaced it
+            self._executor = None
+            self.stats["restarts"] += 1
+        logger.warning(f"PDF worker pool restarted: {reason}")
+        # ProcessPoolExecutor cannot stop a running job: kill its processes
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _slots_for_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+        return self._slots
+
+    async def extract(self, pdf_path: str, with_words: bool = False) -> PDFExtractionResult:
+        """
+        extract_pdf(pdf_path, with_words) in a worker process.
+
+        Timeouts and crashed workers come back as a failed
+        PDFExtractionResult, like any other unreadable PDF.
+        """
+        queued = time.perf_counter()
+        started = False
+        with self._lock:
+            self.waiting += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.waiting)
+        try:
+            async with self._slots_for_loop():
+                started = True
+                with self._lock:
+                    self.waiting -= 1
+                    self.running += 1
+                    self.stats["wait_seconds"] += time.perf_counter() - queued
+                try:
+                    return await self._run(pdf_path, with_words)
+                finally:
+                    with self._lock:
+                        self.running -= 1
+        finally:
+            if not started:  # cancelled while waiting
+                with self._lock:
+                    self.waiting -= 1
+
+    async def _run(self, pdf_path: str, with_words: bool, attempt: int = 1) -> PDFExtractionResult:
+        executor = self._executor_for_job()
+        try:
+            future = executor.submit(_extract_job, pdf_path, with_words)
+        except RuntimeError:
+            # Broken, or shut down by another job's restart since we got it
+            self._restart(executor, "a worker process died")
+            return await self._run(pdf_path, with_words, attempt)
+        try:
+            result, parse_seconds = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self._restart(executor, f"{pdf_path} took over {self.timeout_seconds:.0f}s")
+            self._record_failure("timeouts")
+            return _failure(pdf_path, f"PDF extraction timed out after {self.timeout_seconds:.0f}s")
+        except BrokenProcessPool:
+            # This job's worker died, or another job's timeout killed it
+            self._restart(executor, "a worker process died")
+            if attempt == 1:
+                return await self._run(pdf_path, with_words, attempt=2)
+            self._record_failure("crashes")
+            return _failure(pdf_path, "PDF extraction worker crashed (memory limit?)")
+
+        with self._lock:
+            self.stats["jobs"] += 1
+            self.stats["pages"] += result.page_count
+            self.stats["parse_seconds"] += parse_seconds
+        return result
+
+    def _record_failure(self, kind: str):
+        with self._lock:
+            self.stats["jobs"] += 1
+            self.stats[kind] += 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            waiting, running = self.waiting, self.running
+        pages = stats["pages"]
+        jobs = stats["jobs"]
+        parse_seconds = stats.pop("parse_seconds")
+        wait_seconds = stats.pop("wait_seconds")
+        stats.update({
+            "enabled": pool_enabled(),
+            "workers": self.workers,
+            "jobs_per_worker": self.jobs_per_worker,
+            "timeout_seconds": self.timeout_seconds,
+            "memory_mb": self.memory_mb,
+            "queue_depth": waiting,
+            "running": running,
+            "parse_ms_per_page": round(parse_seconds / pages * 1000, 1) if pages else None,
+            "wait_ms_per_job": round(wait_seconds / jobs * 1000, 1) if jobs else None,
+        })
+        return stats
+
+
+# =============================================================================
+# MODULE API
+# =============================================================================
+
+_pool: Optional[PDFPool] = None
+_pool_lock = threading.Lock()
+
+
+def pool_enabled() -> bool:
+    return os.environ.get("GROK_PDF_POOL_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def get_pool() -> PDFPool:
+    """The process-wide pool, built from the environment on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PDFPool(
+                workers=int(os.environ.get("GROK_PDF_WORKERS", "2")),
+                timeout_seconds=float(os.environ.get("GROK_PDF_TIMEOUT_SECONDS", "30")),
+                memory_mb=int(os.environ.get("GROK_PDF_MEMORY_MB", "1024")),
+                jobs_per_worker=int(os.environ.get("GROK_PDF_JOBS_PER_WORKER", "50")),
+            )
+        return _pool
+
+
+async def extract_pdf_async(pdf_path: str, with_words: bool = False) -> PDFExtractionResult:
+    """extract_pdf without blocking the event loop: in the pool, or a thread when it is off."""
+    if not pool_enabled():
+        return await asyncio.to_thread(extract_pdf, pdf_path, with_words=with_words)
+    return await get_pool().extract(pdf_path, with_words=with_words)
+
+
+def shutdown_pool():
+    """Stop the worker processes (server shutdown)."""
+    if _pool is not None:
+        _pool.shutdown()
+
+
+def get_pdf_pool_stats() -> dict:
+    return get_pool().get_stats()
@@ -0,0 +1,661 @@
+"""
+Vendor Layout Templates
+=======================
+Extract PDF invoices from repeat vendors locally, using a layout learned
+from their confirmed extractions.
+
+Most volume comes from a few vendors whose PDFs never change layout. Once
+a vendor in the vendor master has GROK_TEMPLATE_MIN_SAMPLES confirmed
+extractions (approved invoices, automatically or by a human, that were not
+themselves template output), learn_template() lines up the pdfplumber word
+boxes of those PDFs with the approved values:
+
+- header fields: the label left of the value on its line ("Total Due:")
+  or above it ("Balance Due" over "$100,000.00"), and the value's offset
+  from the label
+- line items: the table's header line and the x position of the
+  quantity / unit price / amount columns
+- fields with the same value on every sample (vendor, bill_from, bill_to,
+  currency, payment_terms)
+
+A rule is kept only when every sample agrees on it. Templates are stored
+in SQLite (vendor_templates), one version per learning run.
+
+apply_templates() takes milliseconds. It picks the active template whose
+vendor name appears in the PDF, reads the values next to the labels and
+parses the item rows. A result without an invoice number, a total or
+items, or whose items do not add up to the subtotal or total, is dropped
+and the invoice goes to Grok.
+
+The first use of a template and every GROK_TEMPLATE_SPOT_CHECK_EVERY-th
+use after that are spot-checked: the invoice is also extracted by Grok
+and Grok's answer is kept. If the two disagree on a templated field, the
+template is demoted and its samples retired, and the vendor starts
+collecting confirmations again.
+
+Settings (read from the environment on each call):
+- GROK_TEMPLATES_ENABLED           learn and use templates (default 1)
+- GROK_TEMPLATE_MIN_SAMPLES        confirmations needed to learn (default 3)
+- GROK_TEMPLATE_SPOT_CHECK_EVERY   Grok re-checks every Nth use (default 10)
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from src.tools.database import (
+    demote_vendor_template,
+    get_active_templates,
+    get_template_samples,
+    get_vendor_by_id,
+    record_template_sample,
+    record_template_use,
+    save_vendor_template,
+)
+from src.tools.extraction_memo import content_hash
+from src.tools.invoice_parser import AMOUNT_TOLERANCE, KEY_ALIASES, parse_date, parse_money
+from src.tools.pdf_extractor import extract_words
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# CONFIGURATION
+# =============================================================================
+
+# Header fields read next to a label, and how their values are parsed
+SCALAR_FIELDS = {
+    "invoice_number": "text",
+    "invoice_date": "date",
+    "due_date": "date",
+    "po_number": "text",
+    "amount": "money",
+    "subtotal": "money",
+    "tax": "money",
+}
+
+# Fields copied from the samples when all of them agree
+CONSTANT_FIELDS = ("vendor", "bill_from", "bill_to", "currency", "payment_terms")
+
+# Numeric item columns, located by their x center
+ITEM_COLUMNS = ("quantity", "unit_price", "amount")
+
+# A template must produce these (plus items) to be used
+REQUIRED_FIELDS = ("invoice_number", "amount")
+
+LINE_TOLERANCE = 3.0      # points: words this close vertically share a line
+LABEL_GAP = 6.0           # points: wider gaps separate a label from other text
+VALUE_GAP = 6.0           # points: wider gaps end a value
+LABEL_REACH = 80.0        # points: farthest a value may sit right of its label
+OFFSET_TOLERANCE = 40.0   # points a value or column may move from where it was learned
+MAX_LABEL_WORDS = 4
+MAX_VALUE_WORDS = 6
+
+TEMPLATE_CONFIDENCE = 95
+
+
+def templates_enabled() -> bool:
+    return os.environ.get("GROK_TEMPLATES_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def template_min_samples() -> int:
+    return max(1, int(os.environ.get("GROK_TEMPLATE_MIN_SAMPLES", "3")))
+
+
+def template_spot_check_every() -> int:
+    return max(1, int(os.environ.get("GROK_TEMPLATE_SPOT_CHECK_EVERY", "10")))
+
+
+# =============================================================================
+# WORD LAYOUT
+# =============================================================================
+
+def _norm(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _label_key(text: str) -> str:
+    """Label identity: lower case, without "(8%)"-style notes or a trailing colon."""
+    return _norm(re.sub(r"\([^)]*\)", " ", text)).rstrip(":").strip()
+
+
+def _lines(words: list[dict]) -> list[list[dict]]:
+    """Words grouped into lines (by page, then top), each sorted left to right."""
+    lines: list[list[dict]] = []
+    for word in sorted(words, key=lambda w: (w["page"], w["top"], w["x0"])):
+        line = lines[-1] if lines else None
+        if line and line[0]["page"] == word["page"] and abs(line[0]["top"] - word["top"]) <= LINE_TOLERANCE:
+            line.append(word)
+        else:
+            lines.append([word])
+    return [sorted(line, key=lambda w: w["x0"]) for line in lines]
+
+
+def _text(words: list[dict]) -> str:
+    return " ".join(w["text"] for w in words)
+
+
+def _center(word: dict) -> float:
+    return (word["x0"] + word["x1"]) / 2
+
+
+def _run(words: list[dict], start: int, gap: float, limit: int) -> list[dict]:
+    """Words from start onward while they sit within gap of each other."""
+    run = [words[start]]
+    for word in words[start + 1:start + limit]:
+        if word["x0"] - run[-1]["x1"] > gap:
+            break
+        run.append(word)
+    return run
+
+
+def _parse_value(kind: str, text: str):
+    if kind == "money":
+        return parse_money(text)[0]
+    if kind == "date":
+        return parse_date(text)
+    value = text.strip().lstrip("#").strip()
+    return value or None
+
+
+def _same_value(kind: str, a, b) -> bool:
+    if a is None or b is None:
+        return False
+    if kind == "money":
+        try:
+            return abs(float(a) - float(b)) <= AMOUNT_TOLERANCE
+        except (TypeError, ValueError):
+            return False
+    return _norm(str(a)).lstrip("#").strip() == _norm(str(b)).lstrip("#").strip()
+
+
+def _read_value(kind: str, words: list[dict]):
+    """Longest leading span of words that parses as kind (one word for text)."""
+    if kind == "text":
+        return _parse_value(kind, words[0]["text"])
+    for end in range(len(words), 0, -1):
+        value = _parse_value(kind, _text(words[:end]))
+        if value is not None:
+            return value
+    return None
+
+
+# =============================================================================
+# LEARNING
+# =============================================================================
+
+def _label_left(line: list[dict], start: int) -> Optional[list[dict]]:
+    """The label phrase ending right before line[start], if any."""
+    label = []
+    i = start - 1
+    while i >= 0 and len(label) < MAX_LABEL_WORDS:
+        right = label[0] if label else line[start]
+        if right["x0"] - line[i]["x1"] > (LABEL_GAP if label else LABEL_REACH):
+            break
+        label.insert(0, line[i])
+        i -= 1
+    if not label or not re.search(r"[A-Za-z]", _text(label)):
+        return None
+    return label
+
+
+def _label_above(lines: list[list[dict]], index: int, span: list[dict]) -> Optional[list[dict]]:
+    """The label phrase on the line above span, overlapping it horizontally."""
+    if index == 0 or lines[index - 1][0]["page"] != span[0]["page"]:
+        return None
+    above = lines[index - 1]
+    x0, x1 = span[0]["x0"], span[-1]["x1"]
+    overlapping = [i for i, w in enumerate(above) if w["x1"] >= x0 - LABEL_GAP and w["x0"] <= x1 + LABEL_GAP]
+    if not overlapping:
+        return None
+    # Extend to the whole phrase the overlapping words belong to
+    first, last = overlapping[0], overlapping[-1]
+    while first > 0 and above[first]["x0"] - above[first - 1]["x1"] <= LABEL_GAP:
+        first -= 1
+    while last + 1 < len(above) and above[last + 1]["x0"] - above[last]["x1"] <= LABEL_GAP:
+        last += 1
+    label = above[first:last + 1]
+    if len(label) > MAX_LABEL_WORDS or not re.search(r"[A-Za-z]", _text(label)):
+        return None
+    return label
+
+
+def _field_candidates(lines: list[list[dict]], field: str, value) -> dict[tuple, float]:
+    """{(label key, "right" | "below"): offset} for every place value appears."""
+    kind = SCALAR_FIELDS[field]
+    candidates = {}
+    for index, line in enumerate(lines):
+        for start in range(len(line)):
+            for end in range(start + 1, min(start + MAX_VALUE_WORDS, len(line)) + 1):
+                span = line[start:end]
+                if not _same_value(kind, _parse_value(kind, _text(span)), value):
+                    continue
+                label = _label_left(line, start)
+                if label:
+                    candidates.setdefault((_label_key(_text(label)), "right"), span[0]["x0"] - label[-1]["x1"])
+                label = _label_above(lines, index, span)
+                if label:
+                    candidates.setdefault((_label_key(_text(label)), "below"), span[0]["top"] - label[0]["top"])
+    return candidates
+
+
+def _item_rows(lines: list[list[dict]], items: list[dict]) -> Optional[tuple[int, list[dict]]]:
+    """
+    Locate the item table: (index of its header line, column x centers).
+
+    Each item must be found on its own row, in order, directly below the
+    previous one; the line above the first row is the header.
+    """
+    rows = []
+    for item in items:
+        amount, quantity = item.get("amount"), item.get("quantity")
+        found = None
+        for index in range(rows[-1][0] + 1 if rows else 1, len(lines)):
+            line = lines[index]
+            money = [w for w in line if _same_value("money", parse_money(w["text"])[0], amount)]
+            qty = [w for w in line if w["text"].isdigit() and _same_value("money", int(w["text"]), quantity)]
+            if money and qty:
+                found = (index, {"quantity": _center(qty[0]), "amount": _center(money[-1])})
+                unit = [
+                    w for w in line
+                    if _same_value("money", parse_money(w["text"])[0], item.get("unit_price")) and w is not money[-1]
+                ]
+                if unit:
+                    found[1]["unit_price"] = _center(unit[0])
+                break
+        if found is None or (rows and found[0] != rows[-1][0] + 1):
+            return None
+        rows.append(found)
+    if not rows:
+        return None
+    columns = {}
+    for column in ITEM_COLUMNS:
+        centers = [cols[column] for _, cols in rows if column in cols]
+        if centers:
+            columns[column] = sum(centers) / len(centers)
+    return rows[0][0] - 1, columns
+
+
+def learn_template(vendor: dict, samples: list[dict]) -> Optional[dict]:
+    """
+    Learn a layout template from confirmed samples of one vendor.
+
+    Args:
+        vendor: Vendor master record (vendor_id, name, aliases)
+        samples: [{"invoice_data", "words"}] (see get_template_samples)
+
+    Returns:
+        Template dict, or None when the samples do not agree on enough
+        rules (invoice number, total and the item table) to extract alone.
+    """
+    layouts = [_lines(sample["words"]) for sample in samples]
+    fields = {}
+    for field, kind in SCALAR_FIELDS.items():
+        common = None
+        for lines, sample in zip(layouts, samples):
+            value = sample["invoice_data"].get(field)
+            candidates = _field_candidates(lines, field, value) if value not in (None, "", "UNKNOWN") else {}
+            if common is None:
+                common = {key: [offset] for key, offset in candidates.items()}
+            else:
+                common = {key: offsets + [candidates[key]] for key, offsets in common.items() if key in candidates}
+        if not common:
+            continue
+        # Prefer a label that names the field ("Total Due" → amount); else it must be unambiguous
+        named = [key for key in common if KEY_ALIASES.get(key[0]) == field]
+        keys = named or list(common)
+        if len(keys) != 1:
+            continue
+        (label, where), offsets = keys[0], common[keys[0]]
+        if max(offsets) - min(offsets) > OFFSET_TOLERANCE:
+            continue
+        fields[field] = {"label": label, "where": where, "offset": round(sum(offsets) / len(offsets), 1), "kind": kind}
+
+    tables = [_item_rows(lines, sample["invoice_data"].get("items") or []) for lines, sample in zip(layouts, samples)]
+    headers = {_norm(_text(lines[table[0]])) for lines, table in zip(layouts, tables) if table}
+    if any(table is None for table in tables) or len(headers) != 1:
+        return None
+    columns = {}
+    for column in ITEM_COLUMNS:
+        centers = [table[1][column] for table in tables if column in table[1]]
+        if len(centers) == len(tables) and max(centers) - min(centers) <= OFFSET_TOLERANCE:
+            columns[column] = round(sum(centers) / len(centers), 1)
+    if "quantity" not in columns or "amount" not in columns:
+        return None
+
+    if any(field not in fields for field in REQUIRED_FIELDS):
+        return None
+
+    constants = {}
+    for field in CONSTANT_FIELDS:
+        values = {json.dumps(sample["invoice_data"].get(field), sort_keys=True) for sample in samples}
+        if len(values) == 1:
+            constants[field] = samples[0]["invoice_data"].get(field)
+
+    return {
+        "vendor_id": vendor["vendor_id"],
+        "names": sorted({_norm(name) for name in [vendor["name"], *(vendor.get("aliases") or [])] if name}),
+        "fields": fields,
+        "items": {"header": headers.pop(), "columns": columns},
+        "constants": constants,
+    }
+
+
+# =============================================================================
+# APPLYING
+# =============================================================================
+
+def _find_label(lines: list[list[dict]], label: str) -> Optional[tuple[int, int, int]]:
+    """(line index, first word, end word) of the first occurrence of a label."""
+    for index, line in enumerate(lines):
+        for start in range(len(line)):
+            for end in range(start + 1, min(start + MAX_LABEL_WORDS, len(line)) + 1):
+                if _label_key(_text(line[start:end])) == label:
+                    return index, start, end
+    return None
+
+
+def _read_field(lines: list[list[dict]], rule: dict):
+    found = _find_label(lines, rule["label"])
+    if found is None:
+        return None
+    index, start, end = found
+    line = lines[index]
+    if rule["where"] == "right":
+        if end >= len(line) or abs(line[end]["x0"] - line[end - 1]["x1"] - rule["offset"]) > OFFSET_TOLERANCE:
+            return None
+        return _read_value(rule["kind"], _run(line, end, VALUE_GAP, MAX_VALUE_WORDS))
+
+    label = line[start:end]
+    for below in lines[index + 1:index + 4]:
+        if below[0]["page"] != line[0]["page"]:
+            break
+        if abs(below[0]["top"] - label[0]["top"] - rule["offset"]) > OFFSET_TOLERANCE:
+            continue
+        x0, x1 = label[0]["x0"], label[-1]["x1"]
+        for i, word in enumerate(below):
+            if word["x1"] >= x0 - OFFSET_TOLERANCE and word["x0"] <= x1 + OFFSET_TOLERANCE:
+                return _read_value(rule["kind"], _run(below, i, VALUE_GAP, MAX_VALUE_WORDS))
+    return None
+
+
+def _read_items(lines: list[list[dict]], table: dict) -> list[dict]:
+    header = next((i for i, line in enumerate(lines) if _norm(_text(line)) == table["header"]), None)
+    if header is None:
+        return []
+    columns = table["columns"]
+    first_column = min(columns.values())
+    items = []
+    for line in lines[header + 1:]:
+        if line[0]["page"] != lines[header][0]["page"]:
+            break
+        description, values = [], {}
+        for word in line:
+            column = min(columns, key=lambda c: abs(columns[c] - _center(word)))
+            if abs(columns[column] - _center(word)) <= OFFSET_TOLERANCE and column not in values:
+                values[column] = word["text"]
+            elif word["x1"] < first_column - OFFSET_TOLERANCE / 2:
+                description.append(word)
+            else:
+                values = {}
+                break
+        quantity = values.get("quantity", "")
+        amount = parse_money(values.get("amount", ""))[0]
+        if not description or not quantity.isdigit() or amount is None:
+            break
+        unit_price = parse_money(values.get("unit_price", ""))[0]
+        quantity = int(quantity)
+        items.append({
+            "sku": None,
+            "description": _text(description),
+            "quantity": quantity,
+            "unit_price": unit_price if unit_price is not None else round(amount / quantity, 2) if quantity else 0.0,
+            "amount": amount,
+        })
+    return items
+
+
+def _extract(template: dict, lines: list[list[dict]]) -> Optional[dict]:
+    """Extraction in Grok's JSON shape, or None if the document does not fit."""
+    extracted = {field: None for field in SCALAR_FIELDS}
+    for field, rule in template["fields"].items():
+        extracted[field] = _read_field(lines, rule)
+    if any(extracted[field] is None for field in REQUIRED_FIELDS):
+        return None
+
+    items = _read_items(lines, template["items"])
+    if not items:
+        return None
+    total = round(sum(item["amount"] for item in items), 2)
+    expected = extracted["subtotal"]
+    if expected is None:
+        expected = extracted["amount"] - (extracted["tax"] or 0.0)
+    if abs(total - expected) > AMOUNT_TOLERANCE:
+        return None
+
+    constants = template["constants"]
+    vendor = constants.get("vendor") or template["names"][0]
+    extracted.update({
+        "subtotal": extracted["subtotal"] if extracted["subtotal"] is not None else total,
+        "tax": extracted["tax"] or 0.0,
+        "currency": constants.get("currency") or "USD",
+        "payment_terms": constants.get("payment_terms"),
+        "vendor": vendor,
+        "bill_from": constants.get("bill_from") or {"name": vendor, "address": None, "email": None, "phone": None},
+        "bill_to": constants.get("bill_to") or {"name": None, "address": None, "entity": None},
+        "items": items,
+        "confidence": TEMPLATE_CONFIDENCE,
+        "flags": [],
+    })
+    return extracted
+
+
+@dataclass
+class TemplateHit:
+    """
+    A document extracted with a vendor template.
+
+    Attributes:
+        vendor_id: Vendor the template belongs to
+        version: Template version
+        extracted: Extraction in Grok's JSON shape
+        spot_check: Grok should extract this one too (see check_template)
+        templated_fields: Fields the template reads, compared on spot checks
+    """
+    vendor_id: str
+    version: int
+    extracted: dict
+    spot_check: bool
+    templated_fields: list[str]
+
+    @property
+    def label(self) -> str:
+        return f"{self.vendor_id} v{self.version}"
+
+
+def has_active_templates() -> bool:
+    return templates_enabled() and bool(get_active_templates())
+
+
+def apply_templates(words: list[dict]) -> Optional[TemplateHit]:
+    """
+    Extract a document with the active template of the vendor it names.
+
+    Args:
+        words: Word boxes (src.tools.pdf_extractor.extract_words)
+
+    Returns:
+        TemplateHit, or None if templates are off, no template's vendor
+        appears in the document, or the layout did not fit.
+    """
+    if not templates_enabled() or not words:
+        return None
+    start = time.perf_counter()
+    lines = _lines(words)
+    text = _norm(" ".join(_text(line) for line in lines))
+
+    hit = None
+    for active in get_active_templates():
+        template = active["template"]
+        if not any(name in text for name in template["names"]):
+            continue
+        extracted = _extract(template, lines)
+        if extracted is None:
+            continue
+        # uses counts earlier uses: the first use and every Nth after it are checked
+        spot_check = active["uses"] % template_spot_check_every() == 0
+        hit = TemplateHit(active["vendor_id"], active["version"], extracted, spot_check, sorted(template["fields"]))
+        if not spot_check:
+            # Spot-checked uses are counted by check_template, with their outcome
+            record_template_use(hit.vendor_id, hit.version)
+        break
+
+    template_stats.record_attempt(hit, time.perf_counter() - start)
+    return hit
+
+
+def check_template(hit: TemplateHit, llm_extracted: dict) -> bool:
+    """
+    Compare a spot-checked template extraction with Grok's.
+
+    Demotes the template if any templated field (or the item count or
+    total) disagrees.
+
+    Returns:
+        True if they agree
+    """
+    disagreements = [
+        field for field in hit.templated_fields
+        if llm_extracted.get(field) not in (None, "", "UNKNOWN")
+        and not _same_value(SCALAR_FIELDS[field], hit.extracted.get(field), llm_extracted.get(field))
+    ]
+    llm_items = llm_extracted.get("items") or []
+    if llm_items and len(llm_items) != len(hit.extracted["items"]):
+        disagreements.append("items")
+
+    agreed = not disagreements
+    record_template_use(hit.vendor_id, hit.version, spot_check=True, disagreed=not agreed)
+    template_stats.record_spot_check(agreed)
+    if not agreed:
+        reason = f"Spot check disagreed on {', '.join(disagreements)}"
+        demote_vendor_template(hit.vendor_id, hit.version, reason)
+        template_stats.record_demotion()
+        logger.warning(f"Vendor template {hit.label} demoted: {reason}")
+    return agreed
+
+
+# =============================================================================
+# CONFIRMATIONS
+# =============================================================================
+
+def confirm_extraction(invoice_data: dict) -> Optional[int]:
+    """
+    Record an approved PDF invoice as a sample for its vendor's template.
+
+    Only Grok extractions of PDFs matched to a vendor master record count;
+    once the vendor has GROK_TEMPLATE_MIN_SAMPLES of them (and no active
+    template), a template is learned. Failures are logged, never raised:
+    approval must not depend on template learning.
+
+    Returns:
+        The new template version, if one was learned
+    """
+    vendor_id = invoice_data.get("matched_vendor_id")
+    source_path = invoice_data.get("source_path")
+    if (
+        not templates_enabled()
+        or not vendor_id
+        or invoice_data.get("source_type") != "pdf"
+        or not source_path
+        or invoice_data.get("extraction_template")
+        or invoice_data.get("duplicate_of")
+    ):
+        return None
+
+    try:
+        digest = invoice_data.get("content_hash") or content_hash(source_path)
+        words = extract_words(source_path)
+        if not digest or not words:
+            return None
+        samples = record_template_sample(vendor_id, digest, invoice_data, words)
+        needed = template_min_samples()
+        if samples < needed or any(t["vendor_id"] == vendor_id for t in get_active_templates()):
+            return None
+
+        vendor = get_vendor_by_id(vendor_id)
+        template = learn_template(vendor, get_template_samples(vendor_id, needed)) if vendor else None
+        if template is None:
+            logger.info(f"No consistent layout for {vendor_id} across {needed} samples yet")
+            return None
+        version = save_vendor_template(vendor_id, template, needed)
+        template_stats.record_learned()
+        logger.info(f"Learned vendor template {vendor_id} v{version} ({', '.join(sorted(template['fields']))} + items)")
+        return version
+    except Exception as e:
+        logger.warning(f"Template sample for {vendor_id} not recorded: {e}")
+        return None
+
+
+# =============================================================================
+# STATISTICS
+# =============================================================================
+
+class TemplateStats:
+    """Template attempts, hits, spot checks and demotions since startup."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.hits = 0
+        self.seconds = 0.0
+        self.spot_checks = 0
+        self.disagreements = 0
+        self.demotions = 0
+        self.learned = 0
+
+    def record_attempt(self, hit: Optional[TemplateHit], seconds: float):
+        with self._lock:
+            self.attempts += 1
+            self.hits += hit is not None
+            self.seconds += seconds
+
+    def record_spot_check(self, agreed: bool):
+        with self._lock:
+            self.spot_checks += 1
+            self.disagreements += not agreed
+
+    def record_demotion(self):
+        with self._lock:
+            self.demotions += 1
+
+    def record_learned(self):
+        with self._lock:
+            self.learned += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": templates_enabled(),
+                "min_samples": template_min_samples(),
+                "spot_check_every": template_spot_check_every(),
+                "attempts": self.attempts,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.attempts, 4) if self.attempts else 0.0,
+                "mean_ms": round(self.seconds / self.attempts * 1000, 3) if self.attempts else 0.0,
+                "spot_checks": self.spot_checks,
+                "disagreements": self.disagreements,
+                "demotions": self.demotions,
+                "learned": self.learned,
+            }
+
+
+template_stats = TemplateStats()
+
+
+def get_template_stats() -> dict:
+    return template_stats.get_stats()
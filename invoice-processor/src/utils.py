@@ -7,6 +7,8 @@ Created: Session 2026-01-26_PHOENIX
 Purpose: DRY - Extract duplicated code from agents
 """
 
+from src.llm.decoding import json_span
+
 
 def clean_json_response(response: str) -> str:
     """
@@ -15,7 +17,10 @@ def clean_json_response(response: str) -> str:
     Handles common LLM output issues:
     - Markdown code fences (```json...```)
     - Leading/trailing whitespace
-    - Explanatory text before/after JSON
+    - Explanatory text before/after JSON (even text containing braces)
+    
+    Agents decode answers with src.llm.decoding.decode_json, which also
+    repairs truncated output; this returns the span it would parse.
     
     Args:
         response: Raw response string from LLM
@@ -23,25 +28,7 @@ def clean_json_response(response: str) -> str:
     Returns:
         Cleaned JSON string ready for parsing
     """
-    text = response.strip()
-    
-    # Remove markdown code fences if present
-    if text.startswith("```"):
-        first_newline = text.find("\n")
-        if first_newline != -1:
-            text = text[first_newline + 1:]
-        if text.endswith("```"):
-            text = text[:-3]
-        text = text.strip()
-    
-    # Find JSON object boundaries
-    start = text.find("{")
-    end = text.rfind("}") + 1
-    
-    if start != -1 and end > start:
-        text = text[start:end]
-    
-    return text
+    return json_span(response)
 
 
 def safe_get(data: dict, key: str, default):
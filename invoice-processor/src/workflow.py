@@ -19,10 +19,12 @@ Legacy single-pipeline flow is preserved for backward compatibility.
 Updated: Session 2026-01-27_WORKFLOW
 """
 
-from langgraph.graph import StateGraph, END
-from typing import Literal, Optional
+from typing import TYPE_CHECKING, Literal, Optional
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
+
 # Initialize path setup via package init
 import src  # noqa: F401 - triggers path setup in __init__.py
 
@@ -35,10 +37,11 @@ from src.schemas.models import (
 )
 
 # Import REAL agents (Phase 2)
-from src.agents.ingestion import ingestion_agent
-from src.agents.validation import validation_agent
-from src.agents.approval import approval_agent
+from src.agents.ingestion import ingestion_agent, ingestion_agent_batch
+from src.agents.validation import validation_agent, validation_agent_batch
+from src.agents.approval import approval_agent, duplicate_payment_block
 from src.agents.payment import payment_agent
+from src.tools.vendor_templates import confirm_extraction
 
 
 # =============================================================================
@@ -89,12 +92,16 @@ def handle_rejection(state: WorkflowState) -> dict:
 # WORKFLOW GRAPH
 # =============================================================================
 
-def create_workflow() -> StateGraph:
+def create_workflow() -> "StateGraph":
     """
     Create and compile the invoice processing workflow.
     
     Returns a compiled LangGraph that can be invoked with initial state.
     """
+    # LangGraph is imported on first use: it accounts for most of the
+    # import time of this module.
+    from langgraph.graph import StateGraph, END
+    
     # Initialize the state graph with our state schema
     workflow = StateGraph(WorkflowState)
     
@@ -252,6 +259,71 @@ def run_ingestion_workflow(raw_invoice: str) -> WorkflowState:
     return state
 
 
+def run_batch_ingestion_workflow(raw_invoices: dict[str, str]) -> dict[str, WorkflowState]:
+    """
+    STAGE 1 in bulk: Ingestion + Validation for a backlog of invoices.
+    
+    Same outcome per invoice as run_ingestion_workflow, but the Grok calls
+    of all invoices are submitted together as batch jobs (see
+    src.client.call_grok_batch): extraction, self-correction, inventory
+    matching and validation reasoning are one batch round each, so
+    throughput is set by the batch backend rather than one HTTP round trip
+    per invoice.
+    
+    Args:
+        raw_invoices: {invoice key (e.g. file name): raw text or PDF path}
+        
+    Returns:
+        {invoice key: WorkflowState}, in the order given
+    """
+    states: dict[str, WorkflowState] = {}
+    for key, raw_invoice in raw_invoices.items():
+        states[key] = {
+            "raw_invoice": raw_invoice,
+            "invoice_data": None,
+            "validation_result": None,
+            "approval_analysis": None,
+            "approval_decision": None,
+            "payment_result": None,
+            "invoice_status": InvoiceStatus.INGESTING.value,
+            "current_agent": "ingestion",
+            "status": "processing",
+            "error": None,
+            "approved_by": None,
+            "approved_at": None,
+            "rejected_by": None,
+            "rejected_at": None,
+            "rejection_reason": None,
+        }
+    
+    # Run ingestion for the whole backlog
+    for key, ingestion_result in ingestion_agent_batch(states).items():
+        states[key].update(ingestion_result)
+    
+    extracted = {}
+    for key, state in states.items():
+        if not state.get("invoice_data"):
+            state["invoice_status"] = InvoiceStatus.VALIDATION_FAILED.value
+            state["status"] = "failed"
+            state["error"] = "Ingestion failed - could not extract invoice data"
+            continue
+        state["invoice_status"] = InvoiceStatus.VALIDATING.value
+        state["current_agent"] = "validation"
+        extracted[key] = state
+    
+    # Validate everything that was extracted
+    if extracted:
+        for key, validation_result in validation_agent_batch(extracted).items():
+            state = states[key]
+            state.update(validation_result)
+            # Valid or not, the invoice goes to the inbox for human review
+            state["invoice_status"] = InvoiceStatus.INBOX.value
+            state["current_agent"] = "awaiting_routing"
+            state["status"] = "processing"
+    
+    return states
+
+
 def run_approval_workflow(state: WorkflowState) -> WorkflowState:
     """
     STAGE 2: Approval Triage
@@ -299,8 +371,11 @@ def run_approval_workflow(state: WorkflowState) -> WorkflowState:
         state["rejection_reason"] = approval_decision.get("reason", "High risk or validation failure")
         state["status"] = "rejected"
         
-    # Check for auto-approve conditions
-    elif amount < APPROVAL_THRESHOLDS["auto_approve_max"] and risk_score < 0.3 and is_valid:
+    # Check for auto-approve conditions (never when the agent asks for review)
+    elif (
+        amount < APPROVAL_THRESHOLDS["auto_approve_max"] and risk_score < 0.3 and is_valid
+        and not approval_decision.get("requires_review")
+    ):
         state["invoice_status"] = InvoiceStatus.AUTO_APPROVED.value
         state["approved_by"] = "agent"
         state["approved_at"] = datetime.utcnow().isoformat()
@@ -311,6 +386,8 @@ def run_approval_workflow(state: WorkflowState) -> WorkflowState:
             "decided_by": "agent",
             "decided_at": datetime.utcnow().isoformat(),
         }
+        # Approved extractions teach the vendor's layout template
+        confirm_extraction(state["invoice_data"])
         
     # Route to human approval
     else:
@@ -356,6 +433,9 @@ def human_approve(state: WorkflowState, approver: str, notes: Optional[str] = No
     
     state["current_agent"] = "awaiting_payment"
     
+    # Approved extractions teach the vendor's layout template
+    confirm_extraction(state.get("invoice_data", {}))
+    
     return state
 
 
@@ -418,6 +498,12 @@ def run_payment_workflow(state: WorkflowState) -> WorkflowState:
         state["error"] = f"Cannot process payment - invoice status is {state.get('invoice_status')}"
         return state
     
+    # Probable duplicates are paid only on a human decision
+    blocked = duplicate_payment_block(state)
+    if blocked:
+        state["error"] = f"Cannot process payment - {blocked}"
+        return state
+    
     state["invoice_status"] = InvoiceStatus.PAYING.value
     state["current_agent"] = "payment"
     